@@ -1,5 +1,6 @@
 import sys
 import re
+from array import array
 from pathlib import Path
 
 # --- SỬA LỖI IMPORT ---
@@ -10,15 +11,63 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 # THAY ĐỔI: Import các định nghĩa từ file chung
 from iss.definitions import ALL_INSTRUCTIONS, GPR_MAP, MATRIX_REG_MAP
+from iss.program_file import ProgramWriter
 
 sys.stdout.reconfigure(encoding='utf-8')
 
+# Biểu thức chính quy dùng chung, biên dịch một lần (đường nhanh assemble())
+_LINE_RE = re.compile(r'^\s*([a-zA-Z0-9.]+)\s*(.*)')
+_SPLIT_LOADSTORE_RE = re.compile(r'[,\s]+(?![^()]*\))')   # Giữ nguyên (rs1)
+_MEM_OPERAND_RE = re.compile(r'\(\s*(x\d+|[a-z][a-z0-9]+)\s*\)')
+_INDEXED_RE = re.compile(r'(\w+)\[(\d+)\]')
+
+_LINE_CACHE_SIZE = 1 << 16     # Số dòng khác nhau tối đa được nhớ trong một lần assemble()
+
+
+def _split_operands(remainder):
+    """Tách toán hạng theo dấu phẩy / khoảng trắng (như re.split(r'[,\\s]+'))."""
+    return remainder.replace(',', ' ').split()
+
+
+def _split_loadstore_operands(remainder):
+    """Như _split_operands nhưng giữ nguyên (rs1), kể cả khi có khoảng trắng bên trong."""
+    return [op for op in _SPLIT_LOADSTORE_RE.split(remainder) if op]
+
+
+class _RegisterLookup(dict):
+    """Tên thanh ghi -> mã (tra trực tiếp, chữ thường hoặc chữ hoa); tên khác (chữ lẫn,
+    khoảng trắng, tên sai) đi qua hàm _encode_* gốc để chuẩn hóa hoặc báo lỗi."""
+
+    def __init__(self, table, encode):
+        super().__init__(table)
+        self.update({name.upper(): code for name, code in table.items()})
+        self._encode = encode
+
+    def __missing__(self, name):
+        return self._encode(name)
+
+
+class AssemblyError(ValueError):
+    """Lỗi dịch một dòng: line_num (đếm từ 1), line (dòng gốc), message."""
+
+    def __init__(self, line_num, line, message):
+        super().__init__(f"line {line_num}: {message} ({line.strip()})")
+        self.line_num = line_num
+        self.line = line
+        self.message = message
+
+
 class Assembler:
     def __init__(self):
         """Khởi tạo Assembler với các bảng tra cứu."""
         self.instr_map = ALL_INSTRUCTIONS
         self.gpr_map = GPR_MAP
         self.matrix_reg_map = MATRIX_REG_MAP
+        self._matrix_lookup = _RegisterLookup(MATRIX_REG_MAP, self._encode_matrix_register)
+        self._gpr_lookup = _RegisterLookup(GPR_MAP, self._encode_gpr)
+        # Bộ mã hóa dựng sẵn cho từng mnemonic: {mnemonic: (hàm tách toán hạng, encode)}
+        self._encoders = {mnemonic: self._compile_encoder(mnemonic, info)
+                          for mnemonic, info in self.instr_map.items()}
 
     def _encode_matrix_register(self, reg_name):
         """
@@ -52,6 +101,11 @@ class Assembler:
         rs1 = 0
         rs2 = 0
 
+        # Số toán hạng luôn được kiểm tra (như assemble()): thừa / thiếu đều là lỗi
+        num_operands = 0 if info["operand_type"] not in ("immediate", "register") else 1
+        if len(tokens) != num_operands + 1:
+            raise ValueError(f"Lệnh {tokens[0]} yêu cầu {num_operands} toán hạng.")
+
         if info["operand_type"] == "immediate":
             operand = tokens[1]
             imm = int(operand)
@@ -171,6 +225,8 @@ class Assembler:
         """
         Lắp ráp lệnh MULTIPLY. (Logic này đã đúng)
         """
+        if len(tokens) != 4:
+            raise ValueError(f"Lệnh {tokens[0]} yêu cầu 3 toán hạng: md, ms1, ms2.")
         md_val  = self._encode_matrix_register(tokens[1]) & 0x7
         ms1_val = self._encode_matrix_register(tokens[2]) & 0x7
         ms2_val = self._encode_matrix_register(tokens[3]) & 0x7
@@ -345,52 +401,327 @@ class Assembler:
         else:
             raise ValueError(f"Chưa hỗ trợ instr_type = '{instr_type}'.")
 
-    def assemble_file(self, input_path, output_path):
+    # ------------------------------------------------------------------------
+    # ĐƯỜNG NHANH: bộ phân tích toán hạng dựng sẵn cho từng mnemonic
+    # ------------------------------------------------------------------------
+    def assemble(self, source):
+        """
+        Dịch mã assembly trong bộ nhớ (chuỗi nhiều dòng hoặc iterable các dòng) thành
+        array('I') mã máy, không in gì. Cho cùng mã máy với assemble_line nhưng mỗi dòng
+        chỉ qua một regex + một lần tra bảng _encoders; dòng lặp lại được lấy từ cache.
+        Dòng 'tên:' / '.section tên' được bỏ qua (không sinh mã).
+        Lỗi: AssemblyError (lớp con của ValueError) kèm số dòng và dòng gốc.
+        """
+        if isinstance(source, str):
+            source = source.splitlines()
+        words = array('I')
+        append = words.append
+        cache = {}
+        encode_line = self._encode_line
+        for line_num, line in enumerate(source, 1):
+            code = cache.get(line, -1)
+            if code == -1:
+                try:
+                    code = encode_line(line)
+                except ValueError as e:
+                    raise AssemblyError(line_num, line, str(e)) from None
+                if len(cache) < _LINE_CACHE_SIZE:
+                    cache[line] = code
+            if code is not None:
+                append(code)
+        return words
+
+    def _encode_line(self, line):
+        """Mã máy của một dòng (None nếu dòng trống / chú thích / label / .section)."""
+        text = line.split('#', 1)[0].strip()
+        if not text:
+            return None
+        # Thường gặp: "mnemonic toán_hạng..." -> tách ở khoảng trắng đầu tiên, không cần regex
+        parts = text.split(None, 1)
+        encoder = self._encoders.get(parts[0].lower())
+        if encoder is not None:
+            remainder = parts[1] if len(parts) > 1 else ""
+        else:
+            match = _LINE_RE.match(text)
+            if not match:
+                raise ValueError(f"Không thể phân tích dòng lệnh: '{text}'")
+            mnemonic = match.group(1).lower()
+            encoder = self._encoders.get(mnemonic)
+            if encoder is None:
+                if self._parse_directive(text) is not None:
+                    return None
+                raise ValueError(f"Lệnh '{mnemonic}' không tồn tại trong INSTRUCTION_MAP.")
+            remainder = match.group(2).strip()
+        split_operands, encode = encoder
+        return encode(split_operands(remainder))
+
+    def _compile_encoder(self, mnemonic, info):
+        """
+        Dựng (regex tách toán hạng, encode(operands) -> int) cho một mnemonic: các trường
+        cố định trong info được ghép sẵn vào base, encode chỉ còn tra thanh ghi / đọc số.
+        Ghép bit giống hệt các hàm _assemble_* tương ứng; số toán hạng luôn được kiểm tra.
+        """
+        matrix_reg = self._matrix_lookup
+        gpr = self._gpr_lookup
+
+        def expect(operands, names):
+            if len(operands) != len(names):
+                raise ValueError(f"Lệnh {mnemonic} yêu cầu {len(names)} toán hạng: {', '.join(names)}.")
+
+        def unsupported(message):
+            # Lỗi chỉ báo khi dòng dùng mnemonic này được dịch (giống assemble_line)
+            def encode(operands):
+                raise ValueError(message)
+            return _split_operands, encode
+
+        instr_type = info.get("instr_type", "UNKNOWN")
+
+        if instr_type == "CONFIG":
+            base = (info["func"] << 28) | (info["uop"] << 26) | (info["ctrl"] << 25) | \
+                   (info["func3"] << 12) | (info["nop"] << 7) | info["major_opcode"]
+            if info["operand_type"] == "immediate":
+                def encode(operands):
+                    expect(operands, ("imm",))
+                    imm = int(operands[0])
+                    if not (0 <= imm < 1024):
+                        raise ValueError(f"Immediate '{imm}' out of range for 10 bits")
+                    return base | (((imm >> 5) & 0x1F) << 20) | ((imm & 0x1F) << 15)
+            elif info["operand_type"] == "register":
+                def encode(operands):
+                    expect(operands, ("rs1",))
+                    return base | (gpr[operands[0]] << 15)
+            else:
+                def encode(operands):
+                    expect(operands, ())
+                    return base
+            return _split_operands, encode
+
+        if instr_type == "MULTIPLY":
+            base = ((info.get("func", 0) & 0xF) << 28) | ((info.get("uop", 0) & 0x3) << 26) | \
+                   ((info.get("size_sup", 0) & 0x7) << 23) | ((info.get("s_size", 0) & 0x3) << 18) | \
+                   ((info.get("func3", 0) & 0x7) << 12) | ((info.get("d_size", 0) & 0x3) << 10) | \
+                   (info.get("major_opcode", 0) & 0x7F)
+
+            def encode(operands):
+                expect(operands, ("md", "ms1", "ms2"))
+                return base | (matrix_reg[operands[0]] << 7) | (matrix_reg[operands[1]] << 15) | \
+                       (matrix_reg[operands[2]] << 20)
+            return _split_operands, encode
+
+        if instr_type == "LOADSTORE":
+            base = ((info.get("func", 0) & 0xF) << 28) | ((info.get("uop", 0) & 0x3) << 26) | \
+                   ((info.get("ls", 0) & 0x1) << 25) | ((info.get("func3", 0) & 0x7) << 12) | \
+                   ((info.get("d_size", 0) & 0x3) << 10) | (info.get("major_opcode", 0) & 0x7F)
+            whole = mnemonic.startswith("mlme") or mnemonic.startswith("msme")
+            names = ("md/ms3", "(rs1)") if whole else ("md/ms3", "(rs1)", "rs2")
+
+            def encode(operands):
+                if not (len(operands) == len(names) or (whole and len(operands) == 3)):
+                    expect(operands, names)
+                match = _MEM_OPERAND_RE.match(operands[1].lower())
+                if not match:
+                    raise ValueError(f"Toán hạng thứ 2 của Load/Store phải là (rs1), ví dụ: (x5) hoặc (sp). "
+                                     f"Nhận được: '{operands[1]}'")
+                code = base | (matrix_reg[operands[0]] << 7) | (gpr[match.group(1)] << 15)
+                if len(operands) == 3:
+                    code |= gpr[operands[2]] << 20
+                return code
+            return _split_loadstore_operands, encode
+
+        if instr_type == "EW":
+            variant = info.get("variant", "md_ms2_ms1")
+            base = ((info.get("func", 0) & 0xF) << 28) | ((info.get("uop", 0) & 0x3) << 26) | \
+                   ((info.get("s_size", 0) & 0x3) << 18) | ((info.get("func3", 0) & 0x7) << 12) | \
+                   ((info.get("d_size", 0) & 0x3) << 10) | (info.get("major_opcode", 0) & 0x7F)
+            ctrl = (info.get("ctrl", 0) & 0x7) << 23
+            fixed_ms2 = (info.get("ms2", 0) & 0x7) << 20
+            if variant == "md_ms1":
+                def encode(operands):
+                    expect(operands, ("md", "ms1"))
+                    return base | ctrl | fixed_ms2 | (matrix_reg[operands[0]] << 7) | (matrix_reg[operands[1]] << 15)
+            elif variant == "md_ms2_ms1":
+                def encode(operands):
+                    expect(operands, ("md", "ms2", "ms1"))
+                    return base | ctrl | (matrix_reg[operands[0]] << 7) | (matrix_reg[operands[1]] << 20) | \
+                           (matrix_reg[operands[2]] << 15)
+            elif variant == "md_ms2_ms1_imm3_direct":
+                def encode(operands):
+                    expect(operands, ("md", "ms2", "ms1[imm3]"))
+                    third = operands[2]
+                    if '[' not in third or ']' not in third:
+                        raise ValueError(f"Lệnh {mnemonic} yêu cầu định dạng ms1[imm3], ví dụ: acc2[3]")
+                    reg_part, imm_part = third.split('[')[:2]
+                    return base | ((int(imm_part.rstrip(']')) & 0x7) << 23) | (matrix_reg[operands[0]] << 7) | \
+                           (matrix_reg[operands[1]] << 20) | (matrix_reg[reg_part] << 15)
+            else:
+                return unsupported(f"Variant '{variant}' không được hỗ trợ cho lệnh Element-wise.")
+            return _split_operands, encode
+
+        if instr_type == "MISC":
+            variant = info.get("variant", "rs2_rs1")
+            base = ((info.get("func", 0) & 0xF) << 28) | ((info.get("uop", 0) & 0x3) << 26) | \
+                   ((info.get("func3", 0) & 0x7) << 12) | (info.get("opcode", 0) & 0x7F)
+            ms2 = (info.get("ms2", 0) & 0x7) << 20
+            s_size = (info.get("s_size", 0) & 0x3) << 18
+            d_size = (info.get("d_size", 0) & 0x3) << 10
+            ctrl25 = info.get("ctrl25", 0) & 0x1
+            ctrl = ((ctrl25 << 2) | (info.get("ctrl24_23", 0) & 0x3)) << 23
+            if variant == "mzero":
+                base |= ms2 | s_size | d_size | ((info.get("ctrl", 0) & 0x7) << 23)
+
+                def encode(operands):
+                    expect(operands, ("md",))
+                    return base | (matrix_reg[operands[0]] << 7)
+            elif variant == "md_ms1":
+                base |= ms2 | s_size | d_size
+
+                def encode(operands):
+                    expect(operands, ("md", "ms1"))
+                    return base | (matrix_reg[operands[0]] << 7) | (matrix_reg[operands[1]] << 15)
+            elif variant == "md_rs2_rs1":
+                base |= d_size | ((ctrl25 << 2) << 23)
+                if mnemonic in {"mdupb.m.x", "mduph.m.x", "mdupw.m.x", "mdupd.m.x"}:
+                    def encode(operands):
+                        expect(operands, ("md", "rs2"))
+                        return base | (matrix_reg[operands[0]] << 7) | ((gpr[operands[1]] & 0x7) << 20)
+                else:
+                    def encode(operands):
+                        expect(operands, ("md", "rs2", "rs1"))
+                        rs2 = gpr[operands[1]]
+                        rs1 = gpr[operands[2]]
+                        return base | (matrix_reg[operands[0]] << 7) | ((rs2 & 0x7) << 20) | \
+                               (((rs2 >> 3) & 0x3) << 23) | (((rs1 >> 3) & 0x3) << 18) | ((rs1 & 0x7) << 15)
+            elif variant == "rd_ms2_rs1":
+                base |= ctrl
+
+                def encode(operands):
+                    expect(operands, ("rd", "ms2", "rs1"))
+                    rd = gpr[operands[0]]
+                    rs1 = gpr[operands[2]]
+                    return base | ((rd & 0x7) << 7) | (((rd >> 3) & 0x3) << 10) | (matrix_reg[operands[1]] << 20) | \
+                           (((rs1 >> 3) & 0x3) << 18) | ((rs1 & 0x7) << 15)
+            elif variant == "md_ms1_imm3":
+                base |= ms2 | s_size | d_size
+
+                def encode(operands):
+                    expect(operands, ("md", "ms1[imm3]"))
+                    match = _INDEXED_RE.match(operands[1])
+                    if not match:
+                        raise ValueError(f"Toán hạng không hợp lệ: {operands[1]}")
+                    return base | (matrix_reg[operands[0]] << 7) | (matrix_reg[match.group(1)] << 15) | \
+                           ((int(match.group(2)) & 0x7) << 23)
+            elif variant == "md_ms2_ms1":
+                base |= s_size | d_size | ctrl
+
+                def encode(operands):
+                    expect(operands, ("md", "ms2", "ms1"))
+                    return base | (matrix_reg[operands[0]] << 7) | (matrix_reg[operands[1]] << 20) | \
+                           (matrix_reg[operands[2]] << 15)
+            elif variant == "md_ms1_imm3_direct":
+                base |= s_size | d_size
+
+                def encode(operands):
+                    expect(operands, ("md", "ms1", "imm3"))
+                    return base | (matrix_reg[operands[0]] << 7) | (matrix_reg[operands[1]] << 15) | \
+                           ((int(operands[2]) & 0x7) << 23)
+            else:
+                return unsupported(f"Variant không được hỗ trợ: {variant}")
+            return _split_operands, encode
+
+        return unsupported(f"Chưa hỗ trợ instr_type = '{instr_type}'.")
+
+    def assemble_file(self, input_path, output_path, binary=None, verbose=True):
         """
         Hàm public: Dịch file assembly thành file mã máy.
+        binary=None: chọn định dạng theo đuôi file output ('.bin' -> nhị phân iss/program_file.py,
+        còn lại -> text 32 ký tự '0'/'1' mỗi dòng). Cả input và output đều xử lý theo luồng
+        (từng dòng), nên chương trình sinh tự động rất lớn không cần nằm trọn trong RAM.
+        File nhị phân giữ thêm bảng symbol (dòng 'tên:') và section (dòng '.section tên');
+        file text bỏ qua hai loại dòng này.
         """
+        if binary is None:
+            binary = Path(output_path).suffix.lower() == ".bin"
         try:
-            with open(input_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+            source = open(input_path, "r", encoding="utf-8")
         except FileNotFoundError:
             print(f"Lỗi: Không tìm thấy file input '{input_path}'")
             return False
 
-        machine_codes = []
         print(f"Assembling '{input_path}' -> '{output_path}'")
-        for line_num, line in enumerate(lines, 1):
-            try:
-                code = self.assemble_line(line)
-                if code is not None:
-                    machine_codes.append(f"{code:032b}")
-                    # In ra dòng gốc đã được làm sạch (lấy từ assemble_line xử lý nội bộ, ở đây chỉ in để debug)
-                    print(f"  {line.strip():<30} -> {code:032b}")
-            except ValueError as e:
-                print(f"Lỗi ở dòng {line_num}: {e}\n  > {line.strip()}")
-                return False
-        
+        # Ghi ra file tạm rồi đổi tên: lỗi giữa chừng không làm hỏng file output cũ
+        temp_path = Path(str(output_path) + ".tmp")
         try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write("\n".join(machine_codes))
+            with source:
+                if binary:
+                    writer = ProgramWriter(temp_path)
+                    emit = writer.write
+                else:
+                    writer = open(temp_path, "w", encoding="utf-8")
+                    count = 0
+                    def emit(code):
+                        nonlocal count
+                        writer.write(f"{code:032b}" if count == 0 else f"\n{code:032b}")
+                        count += 1
+                try:
+                    for line_num, line in enumerate(source, 1):
+                        try:
+                            directive = self._parse_directive(line)
+                            if directive is not None:
+                                kind, name = directive
+                                if binary and kind == "label":
+                                    writer.add_symbol(name)
+                                elif binary:
+                                    writer.begin_section(name)
+                                continue
+                            code = self._encode_line(line)
+                            if code is not None:
+                                emit(code)
+                                # In ra dòng gốc đã được làm sạch (lấy từ _encode_line xử lý nội bộ, ở đây chỉ in để debug)
+                                if verbose:
+                                    print(f"  {line.strip():<30} -> {code:032b}")
+                        except ValueError as e:
+                            print(f"Lỗi ở dòng {line_num}: {e}\n  > {line.strip()}")
+                            writer.close()
+                            temp_path.unlink()
+                            return False
+                finally:
+                    writer.close()
+            temp_path.replace(output_path)
             print("Assembly successful.")
             return True
         except IOError as e:
             print(f"Lỗi khi ghi file output '{output_path}': {e}")
             return False
 
+    @staticmethod
+    def _parse_directive(line):
+        """('label', tên) cho dòng 'tên:', ('section', tên) cho '.section tên', ngược lại None."""
+        line = line.split('#')[0].strip()
+        match = re.match(r'^([A-Za-z_][A-Za-z0-9_.]*)\s*:$', line)
+        if match:
+            return "label", match.group(1)
+        match = re.match(r'^\.section\s+(\S+)$', line)
+        if match:
+            return "section", match.group(1)
+        return None
+
 # ------------------------------------------------------------------------
 # HÀM MAIN: ĐỌC FILE INPUT, DỊCH, GHI FILE OUTPUT
 # ------------------------------------------------------------------------
 def main():
+    # --binary / -b : ghi machine_code.bin (định dạng nhị phân, iss/program_file.py)
+    # --quiet  / -q : không in từng dòng đã dịch (chương trình lớn)
     base_dir = Path(__file__).resolve().parent
+    binary = any(arg in ['--binary', '-b'] for arg in sys.argv[1:])
+    verbose = not any(arg in ['--quiet', '-q'] for arg in sys.argv[1:])
     input_path  = base_dir / "assembly.txt"
-    output_path = base_dir / "machine_code.txt" 
+    output_path = base_dir / ("machine_code.bin" if binary else "machine_code.txt")
 
     # 1. Tạo đối tượng Assembler
     asm = Assembler()
     
     # 2. Gọi phương thức assemble_file
-    asm.assemble_file(input_path, output_path)
+    asm.assemble_file(input_path, output_path, verbose=verbose)
 
 if __name__ == "__main__":
     main()
@@ -3,22 +3,50 @@ ISS (Instruction Set Simulator) Package
 RISC-V Matrix Extension Simulator
 """
 
-# Export main classes
-from .iss import Simulator
-from .components import RegisterFile, CSRFile, MatrixAccelerator, MainMemory
-from .state_manager import load_state_from_files, save_state_to_files
-from .definitions import XLEN, ELEN, ROWNUM, ELEMENTS_PER_ROW_TR
+# Export main classes - import lười (PEP 562): `import iss` không nạp gì thêm, mỗi tên chỉ
+# nạp module của nó ở lần truy cập đầu (vd iss.Simulator không kéo theo batch / state_manager).
+# numpy chỉ được import khi chọn engine "numpy" hoặc dùng BatchSimulator / hàm *_array.
+_EXPORTS = {
+    'Simulator': '.iss',
+    'Checkpoint': '.iss',
+    'RegisterFile': '.components',
+    'CSRFile': '.components',
+    'MatrixAccelerator': '.components',
+    'MainMemory': '.components',
+    'SimLogger': '.logger',
+    'Profiler': '.profiler',
+    'TimingModel': '.timing',
+    'TimingConfig': '.timing',
+    'BatchSimulator': '.batch',
+    'ProgramFile': '.program_file',
+    'ProgramWriter': '.program_file',
+    'write_program': '.program_file',
+    'read_machine_code': '.program_file',
+    'load_state_from_files': '.state_manager',
+    'save_state_to_files': '.state_manager',
+    'load_snapshot': '.state_manager',
+    'save_snapshot': '.state_manager',
+    'text_to_snapshot': '.state_manager',
+    'snapshot_to_text': '.state_manager',
+    'XLEN': '.definitions',
+    'ELEN': '.definitions',
+    'ROWNUM': '.definitions',
+    'ELEMENTS_PER_ROW_TR': '.definitions',
+    'Geometry': '.definitions',
+}
 
-__all__ = [
-    'Simulator',
-    'RegisterFile',
-    'CSRFile', 
-    'MatrixAccelerator',
-    'MainMemory',
-    'load_state_from_files',
-    'save_state_to_files',
-    'XLEN',
-    'ELEN',
-    'ROWNUM',
-    'ELEMENTS_PER_ROW_TR',
-]
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
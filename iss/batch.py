@@ -0,0 +1,499 @@
+# iss/batch.py
+"""
+Mô phỏng theo lô (batch): MỘT chương trình đã giải mã chạy trên B trạng thái độc lập.
+
+Dùng khi cùng một kernel được đánh giá trên rất nhiều bộ dữ liệu vào khác nhau. Mọi
+trạng thái có thêm chiều lô ở đầu:
+
+  gpr:        (B, 32)                 int64 (giá trị 32-bit không dấu, x0 luôn là 0)
+  csrs[name]: (B,)                    int64
+  int_bank:   (B, 8, rownum, cols)    int32   (cùng bố cục MatrixRegisterFile)
+  float_bank: (B, 8, rownum, cols)    float32
+  memory:     (B, memory_size)        uint8   (RAM liền mạch, không phân trang)
+
+Chương trình được giải mã và tra bảng dispatch MỘT lần (dùng DispatchTable của một
+Simulator mẫu); mỗi lệnh sau đó là một phép toán numpy trên cả lô thay cho B lần
+fetch / dispatch / vòng lặp từng phần tử. Kết quả của từng phần tử lô giống từng bit
+một Simulator chạy riêng với trạng thái đó (xem test_batch.py); to_simulator(b) trả về
+trạng thái cuối của phần tử b dưới dạng Simulator thường (dùng lại được state_manager,
+harness, ...).
+
+Giới hạn:
+  - M/N/K phải bằng nhau trên cả lô tại mỗi lệnh dùng chúng (ValueError nếu khác),
+    vì kích thước tile quyết định hình dạng mảng; địa chỉ / stride / dữ liệu thì tùy ý
+  - lỗi (MemoryError, IndexError, struct.error) ở bất kỳ phần tử nào dừng cả lô tại lệnh đó
+    (pc trỏ vào lệnh lỗi); trạng thái lúc đó không so sánh được với chạy riêng lẻ
+  - thông báo lỗi / cảnh báo được in một lần cho cả lô
+"""
+import struct
+from functools import partial
+
+from .iss import Simulator
+from .components import CSRFile
+from .definitions import DEFAULT_GEOMETRY
+from .converters import ARRAY_CONVERTERS, array_quantizer, bits_to_float16, float_to_bits16
+from .logic_elementwise import ew_int_array_ops, ew_float_array_ops
+
+INT32_MAX = 0x7FFFFFFF
+INT32_MIN = -0x80000000
+
+# Tên handler (dispatch, đã resolve) -> phương thức batch tương ứng.
+# Handler chỉ in lỗi (tên *_error, _unknown_*) được gọi một lần trên Simulator mẫu.
+_BATCH_HANDLERS = {
+    "_exec_mrelease": "_batch_mrelease",
+    "_exec_msettile": "_batch_msettile",
+    "_exec_load_store": "_batch_load_store",
+    "_exec_matmul": "_batch_matmul",
+    "_execute_ew_integer": "_batch_ew_integer",
+    "_execute_ew_float": "_batch_ew_float",
+    "_exec_mzero": "_batch_mzero",
+    "_exec_mmov_mm": "_batch_mmov_mm",
+    "_exec_mmov_x_m": "_batch_mmov_x_m",
+    "_exec_mmov_m_x_or_mdup": "_batch_mmov_m_x_or_mdup",
+    "_exec_slide": "_batch_slide",
+}
+
+
+def _is_log_only(name):
+    return name.endswith("_error") or name.startswith("_unknown_")
+
+
+class BatchSimulator:
+    """B trạng thái mô phỏng độc lập chạy cùng một chương trình (xem docstring module)."""
+
+    def __init__(self, batch_size, memory_size=64 * 1024, geometry=None, log_level="warning"):
+        """
+        batch_size: số trạng thái B
+        memory_size: kích thước RAM của MỖI trạng thái (byte, cấp phát liền mạch B x memory_size)
+        geometry: definitions.Geometry (None: mặc định)
+        log_level: như Simulator (mặc định 'warning'; thông báo được in một lần cho cả lô)
+        """
+        import numpy as np
+        if batch_size <= 0:
+            raise ValueError(f"batch_size phải dương, nhận {batch_size}")
+        self._np = np
+        self.batch_size = batch_size
+        self.memory_size = memory_size
+        self.geometry = geometry if geometry is not None else DEFAULT_GEOMETRY
+        self.rownum = self.geometry.rownum
+        self.cols = self.geometry.elements_per_row
+        # Simulator mẫu: bảng dispatch, logger, và handler chỉ in thông báo lỗi
+        self.template = Simulator(log_level=log_level, geometry=self.geometry, memory_size=memory_size)
+        self.log = self.template.log
+
+        self.pc = 0
+        self.decoded = []
+        self.steps = []
+        self.gpr = np.zeros((batch_size, 32), dtype=np.int64)
+        self.csrs = {name: np.full(batch_size, value, dtype=np.int64)
+                     for name, value in CSRFile(log=self.log, geometry=self.geometry).csrs.items()}
+        shape = (batch_size, 8, self.rownum, self.cols)
+        self.int_bank = np.zeros(shape, dtype=np.int32)
+        self.float_bank = np.zeros(shape, dtype=np.float32)
+        self.memory = np.zeros((batch_size, memory_size), dtype=np.uint8)
+        self.acc_dest_bits_float = [32] * 4
+        self.acc_dest_bits_int = [32] * 4
+        self._batch_index = np.arange(batch_size)
+        self._ew_int_ops = ew_int_array_ops(np)
+        self._ew_float_ops = ew_float_array_ops(np)
+
+    # -------------------------------------------------------------------------
+    # Trạng thái từng phần tử lô
+    # -------------------------------------------------------------------------
+    @classmethod
+    def from_simulators(cls, sims, log_level="warning"):
+        """Dựng lô từ trạng thái của các Simulator (cùng geometry và kích thước RAM)."""
+        sims = list(sims)
+        batch = cls(len(sims), memory_size=len(sims[0].memory), geometry=sims[0].geometry,
+                    log_level=log_level)
+        for b, sim in enumerate(sims):
+            batch.load_state(b, sim)
+        return batch
+
+    def load_state(self, b, sim):
+        """Chép GPR / CSR / thanh ghi ma trận / RAM của một Simulator vào phần tử lô b."""
+        np = self._np
+        if sim.geometry != self.geometry:
+            raise ValueError(f"Geometry khác nhau: {sim.geometry!r} != {self.geometry!r}")
+        self.gpr[b] = sim.gpr.registers
+        for name, value in sim.csr.csrs.items():
+            if name in self.csrs:
+                self.csrs[name][b] = value
+        regs = sim.matrix_accelerator.regs
+        self.int_bank[b] = np.frombuffer(regs.int_bank, dtype=np.int32).reshape(self.int_bank.shape[1:])
+        self.float_bank[b] = np.frombuffer(regs.float_bank, dtype=np.float32).reshape(self.float_bank.shape[1:])
+        memory = sim.memory
+        self.memory[b] = 0
+        for index, page in memory.pages.items():
+            start = index * memory.page_size
+            length = max(0, min(len(page), self.memory_size - start))
+            if any(page[length:]):
+                raise ValueError(f"RAM của Simulator có dữ liệu ngoài {self.memory_size} byte của lô")
+            self.memory[b, start:start + length] = np.frombuffer(page, dtype=np.uint8, count=length)
+        self.acc_dest_bits_float = list(sim.matrix_accelerator.acc_dest_bits_float)
+        self.acc_dest_bits_int = list(sim.matrix_accelerator.acc_dest_bits_int)
+
+    def to_simulator(self, b, **sim_kwargs):
+        """Simulator mới mang trạng thái cuối của phần tử lô b (sim_kwargs truyền tiếp cho Simulator)."""
+        sim_kwargs.setdefault("log_level", "silent")
+        sim = Simulator(geometry=self.geometry, memory_size=self.memory_size, **sim_kwargs)
+        sim.gpr.registers = [int(v) for v in self.gpr[b]]
+        sim.csr.csrs.update({name: int(values[b]) for name, values in self.csrs.items()})
+        regs = sim.matrix_accelerator.regs
+        regs.int_bank[:] = self.int_bank[b].tobytes()
+        regs.float_bank[:] = self.float_bank[b].tobytes()
+        # Chỉ ghi các trang khác 0 (RAM của Simulator phân trang)
+        page_size = sim.memory.page_size
+        row = self.memory[b]
+        for start in range(0, self.memory_size, page_size):
+            chunk = row[start:start + page_size]
+            if chunk.any():
+                sim.memory.write(start, chunk.tobytes())
+        sim.matrix_accelerator.acc_dest_bits_float[:] = self.acc_dest_bits_float
+        sim.matrix_accelerator.acc_dest_bits_int[:] = self.acc_dest_bits_int
+        sim.pc = self.pc
+        return sim
+
+    def set_gpr(self, index, values):
+        """Ghi GPR index cho cả lô (values: một số hoặc B số), giữ 32 bit; x0 không ghi được."""
+        if index != 0:
+            self.gpr[:, index] = self._np.asarray(values, dtype=self._np.int64) & 0xFFFFFFFF
+
+    def set_csr(self, name, values):
+        self.csrs[name][:] = values
+
+    def write_memory(self, address, data):
+        """Ghi data (bytes chung cho cả lô, hoặc mảng uint8 B x n) vào RAM tại address."""
+        np = self._np
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = np.frombuffer(bytes(data), dtype=np.uint8)
+        data = np.asarray(data, dtype=np.uint8)
+        if address + data.shape[-1] > self.memory_size:
+            raise MemoryError(f"Lỗi ghi RAM: Địa chỉ 0x{address:X} vượt quá giới hạn")
+        self.memory[:, address:address + data.shape[-1]] = data
+
+    def read_memory(self, address, num_bytes):
+        """Bản sao (B x num_bytes, uint8) của một vùng RAM trên cả lô."""
+        if address + num_bytes > self.memory_size:
+            raise MemoryError(f"Lỗi đọc RAM: Địa chỉ 0x{address:X} vượt quá giới hạn")
+        return self.memory[:, address:address + num_bytes].copy()
+
+    # -------------------------------------------------------------------------
+    # Nạp và chạy chương trình
+    # -------------------------------------------------------------------------
+    def load_program(self, machine_code_list):
+        """Giải mã và tra bảng dispatch một lần; mỗi lệnh thành một bước chạy trên cả lô.
+        Ném ValueError nếu chương trình có lệnh mà chế độ lô chưa hỗ trợ."""
+        template = self.template
+        template.load_program(machine_code_list)
+        self.decoded = template.decoded
+        self.steps = []
+        for pc, (instruction, (label, handler)) in enumerate(zip(template.decoded, template.handlers)):
+            name = getattr(handler, "func", handler).__name__
+            batch_name = _BATCH_HANDLERS.get(name)
+            if batch_name is not None:
+                step = partial(getattr(self, batch_name), instruction, handler,
+                               **getattr(handler, "keywords", {}))
+            elif _is_log_only(name):
+                step = partial(handler, instruction)
+            else:
+                raise ValueError(f"Lệnh tại PC 0x{4 * pc:x} ({label}: {name}) chưa hỗ trợ chế độ lô")
+            self.steps.append(step)
+        self.pc = 0
+
+    def run(self):
+        """Chạy chương trình trên cả lô (ISA không có lệnh nhảy: chạy tuần tự từng bước).
+        Khi một bước lỗi, pc dừng ở lệnh đó và ngoại lệ được ném tiếp."""
+        log = self.log
+        for index in range(self.pc // 4, len(self.steps)):
+            self.pc = 4 * index
+            if log.info_enabled:
+                log.info("\nPC: 0x{:08x} | Executing: {} (batch={})", self.pc,
+                         self.decoded[index].bits, self.batch_size)
+            self.steps[index]()
+        self.pc = 4 * len(self.steps)
+
+    # -------------------------------------------------------------------------
+    # Helper
+    # -------------------------------------------------------------------------
+    def _tile(self, name):
+        """Giá trị CSR M/N/K chung cho cả lô (ValueError nếu các phần tử khác nhau)."""
+        values = self.csrs[name]
+        value = int(values[0])
+        if (values != value).any():
+            raise ValueError(f"{name} khác nhau giữa các phần tử lô ({sorted(set(values.tolist()))[:4]} ...); "
+                             "chế độ lô cần kích thước tile giống nhau")
+        return value
+
+    def _check_dims(self, what, rows, cols):
+        if rows > self.rownum or cols > self.cols:
+            raise IndexError(f"{what}: tile {rows}x{cols} vượt quá thanh ghi {self.rownum}x{self.cols}")
+
+    def _quantizer(self, to_bits, to_float):
+        """Hàm mảng float64 -> float64 tương đương to_float(to_bits(x)) từng phần tử."""
+        return array_quantizer(to_bits, to_float)
+
+    def _read_gpr(self, index):
+        """GPR index của cả lô (B,); x0 luôn là 0."""
+        if index == 0:
+            return self._np.zeros(self.batch_size, dtype=self._np.int64)
+        return self.gpr[:, index]
+
+    def _write_gpr(self, index, values, mask=None):
+        if index == 0:
+            return
+        if mask is None:
+            self.gpr[:, index] = values & 0xFFFFFFFF
+        else:
+            self.gpr[mask, index] = values & 0xFFFFFFFF
+
+    # -------------------------------------------------------------------------
+    # Config
+    # -------------------------------------------------------------------------
+    def _batch_mrelease(self, instruction, handler):
+        self.csrs['mstatus_ms'][:] = 1
+
+    def _batch_msettile(self, instruction, handler, target_csr, mnemonic, use_register):
+        if use_register:
+            self.csrs[target_csr][:] = self._read_gpr(instruction.rs1)
+        else:
+            self.csrs[target_csr][:] = instruction.imm10
+
+    # -------------------------------------------------------------------------
+    # Load / Store
+    # -------------------------------------------------------------------------
+    def _batch_load_store(self, instruction, handler, is_load, is_float, eew, num_bytes, format_type,
+                          instr_name, layout):
+        np = self._np
+        _, _, (_, row_csr), (_, col_csr), transposed, acc_only, _ = layout
+        rows, cols = self._tile(row_csr), self._tile(col_csr)
+        if rows <= 0 or cols <= 0:
+            return
+        self._check_dims(instr_name, rows, cols)
+        reg_idx = instruction.md
+        phys_idx = 4 + (reg_idx - 4) % 4 if acc_only else reg_idx
+
+        # Phần tử (i, j) nằm ở base + i*row_step + j*col_step (stride theo từng phần tử lô)
+        base = self._read_gpr(instruction.rs1)
+        stride = self._read_gpr(instruction.rs2)
+        if transposed:
+            row_step, col_step = np.full(self.batch_size, num_bytes), stride
+            overlapping = cols > 1 and (stride < rows * num_bytes).any()
+        else:
+            row_step, col_step = stride, np.full(self.batch_size, num_bytes)
+            overlapping = rows > 1 and (stride < cols * num_bytes).any()
+        addr = (base[:, None, None] + np.arange(rows)[None, :, None] * row_step[:, None, None]
+                + np.arange(cols)[None, None, :] * col_step[:, None, None])
+        past_end = addr + num_bytes > self.memory_size
+        if past_end.any():
+            bad = int(addr[past_end][0])
+            raise MemoryError(f"Lỗi {'đọc' if is_load else 'ghi'} RAM: Địa chỉ 0x{bad:X} vượt quá giới hạn")
+        byte_addr = addr[..., None] + np.arange(num_bytes)
+        batch = self._batch_index[:, None, None, None]
+
+        if is_load:
+            raw = self.memory[batch, byte_addr]
+            if format_type == 'i8':
+                self.int_bank[:, phys_idx, :rows, :cols] = raw[..., 0].view(np.int8)
+            elif format_type == 'f16':
+                bits = raw[..., 0].astype(np.uint16) | (raw[..., 1].astype(np.uint16) << 8)
+                self.float_bank[:, phys_idx, :rows, :cols] = ARRAY_CONVERTERS[bits_to_float16](bits)
+            else:
+                # Cùng đường float32 -> double -> float32 như struct.unpack / ghi memoryview
+                values = np.ascontiguousarray(raw).view('<f4')[..., 0]
+                with np.errstate(invalid='ignore', over='ignore'):   # NaN / Inf không sinh RuntimeWarning
+                    self.float_bank[:, phys_idx, :rows, :cols] = values.astype(np.float64)
+            return
+
+        if format_type == 'i8':
+            values = self.int_bank[:, phys_idx, :rows, :cols]
+            out_of_range = (values < -128) | (values > 127)
+            if out_of_range.any():
+                struct.pack('<b', int(values[out_of_range][0]))  # Ném struct.error như bản từng phần tử
+            data = values.astype(np.int8).view(np.uint8)[..., None]
+        elif format_type == 'f16':
+            values = self.float_bank[:, phys_idx, :rows, :cols].astype(np.float64)
+            with np.errstate(invalid='ignore', over='ignore'):
+                data = ARRAY_CONVERTERS[float_to_bits16](values).astype('<u2')
+            data = data.view(np.uint8).reshape(data.shape + (2,))
+        else:
+            with np.errstate(invalid='ignore', over='ignore'):
+                data = self.float_bank[:, phys_idx, :rows, :cols].astype(np.float64).astype('<f4')
+            data = data.view(np.uint8).reshape(data.shape + (4,))
+        if overlapping:
+            # Store chồng lấn: ghi từng phần tử theo đúng thứ tự (i, j) của vòng lặp gốc
+            batch = self._batch_index[:, None]
+            for i in range(rows):
+                for j in range(cols):
+                    self.memory[batch, byte_addr[:, i, j]] = data[:, i, j]
+        else:
+            self.memory[batch, byte_addr] = data
+
+    # -------------------------------------------------------------------------
+    # Matmul
+    # -------------------------------------------------------------------------
+    def _batch_matmul(self, instruction, handler, instr_name, is_float_op,
+                      float_to_source_bits, bits_to_source_float,
+                      float_to_dest_bits, bits_to_dest_float,
+                      source_bits, dest_bits, a_signed, b_signed):
+        np = self._np
+        ms1, ms2, md = instruction.ms1, instruction.ms2, instruction.md
+        acc_idx = md - 4 if md >= 4 else md
+        if is_float_op:
+            self.acc_dest_bits_float[acc_idx] = dest_bits
+        else:
+            self.acc_dest_bits_int[acc_idx] = dest_bits
+        M, N, K = self._tile('mtilem'), self._tile('mtilen'), self._tile('mtilek')
+        if M * N * K == 0:
+            self.log.warning("  [Warning] Tile dimensions are zero. Skipping.")
+            return
+        self._check_dims(instr_name, M, K)
+        self._check_dims(instr_name, N, K)
+        self._check_dims(instr_name, M, N)
+        c_idx = 4 + acc_idx
+
+        if not is_float_op:
+            # int(x) & 0xFF rồi diễn giải có dấu / không dấu = ép kiểu int8 / uint8; cộng dồn
+            # số nguyên chính xác (tổng float64 của bản gốc cũng chính xác ở dải này)
+            a = self.int_bank[:, ms1, :M, :K].astype(np.int8 if a_signed else np.uint8).astype(np.int64)
+            b = self.int_bank[:, ms2, :N, :K].astype(np.int8 if b_signed else np.uint8).astype(np.int64)
+            c_new = self.int_bank[:, c_idx, :M, :N].astype(np.int64) + np.matmul(a, b.transpose(0, 2, 1))
+            self.int_bank[:, c_idx, :M, :N] = (c_new & 0xFFFFFFFF).astype(np.uint32).view(np.int32)
+            return
+
+        bank = self.float_bank
+        if instr_name in ("mfmacc.bf16.e5", "mfmacc.bf16.e4"):
+            # Dữ liệu FP8 nằm ở bank int (nạp bằng mlbe8); B được dựng K x N rồi đọc B[n][k]
+            if N != K:
+                raise IndexError(f"{instr_name}: cần N == K (nhận N={N}, K={K})")
+            decode = ARRAY_CONVERTERS[bits_to_source_float]
+            a = decode(self.int_bank[:, ms1, :M, :K])
+            b = decode(self.int_bank[:, ms2, :N, :K])
+        else:
+            if instr_name == "mfmacc.s.bf16":
+                # Như bản gốc: diễn giải lại tại chỗ giá trị FP16 đã nạp thành BF16 (A [M,K], B [K,N])
+                self._check_dims(instr_name, K, N)
+                reinterpret = ARRAY_CONVERTERS[float_to_bits16]
+                decode = ARRAY_CONVERTERS[bits_to_source_float]
+                bank[:, ms1, :M, :K] = decode(reinterpret(bank[:, ms1, :M, :K].astype(np.float64)))
+                bank[:, ms2, :K, :N] = decode(reinterpret(bank[:, ms2, :K, :N].astype(np.float64)))
+            a = bank[:, ms1, :M, :K].astype(np.float64)
+            b = bank[:, ms2, :N, :K].astype(np.float64)
+
+        quantize_source = self._quantizer(float_to_source_bits, bits_to_source_float)
+        quantize_dest = self._quantizer(float_to_dest_bits, bits_to_dest_float)
+        a_q, b_q = quantize_source(a), quantize_source(b)
+        c_old = quantize_dest(bank[:, c_idx, :M, :N].astype(np.float64))
+        # Cộng dồn tuần tự theo k (float64, từ 0.0) như hai engine vô hướng
+        dot_product = np.zeros((self.batch_size, M, N), dtype=np.float64)
+        with np.errstate(all='ignore'):
+            for k in range(K):
+                dot_product += a_q[:, :, k, None] * b_q[:, None, :, k]
+            c_new = quantize_dest(c_old + dot_product)
+            bank[:, c_idx, :M, :N] = c_new
+
+    # -------------------------------------------------------------------------
+    # Element-wise
+    # -------------------------------------------------------------------------
+    def _batch_ew_integer(self, instruction, handler, op):
+        np = self._np
+        M, N = self._tile('mtilem'), self._tile('mtilen')
+        if M <= 0 or N <= 0:
+            return
+        self._check_dims("EW-Integer", M, N)
+        ctrl = instruction.ctrl
+        v2 = self.int_bank[:, instruction.ms2, :M, :N].astype(np.int64)
+        # ctrl != 111: imm3 (không đọc ms1)
+        v1 = ctrl & 0x7 if ctrl != 0b111 else self.int_bank[:, instruction.ms1, :M, :N].astype(np.int64)
+        res = self._ew_int_ops[instruction.func4](v2, v1)
+
+        saturate = self.csrs['xmsaten'] == 1
+        if saturate.any():
+            high = (res > INT32_MAX) & saturate[:, None, None]
+            low = (res < INT32_MIN) & saturate[:, None, None]
+            res = np.where(high, INT32_MAX, np.where(low, INT32_MIN, res))
+            self.csrs['xmsat'][(high | low).any(axis=(1, 2))] = 1
+        self.int_bank[:, instruction.md, :M, :N] = (res & 0xFFFFFFFF).astype(np.uint32).view(np.int32)
+
+    def _batch_ew_float(self, instruction, handler, op, float_to_bits, bits_to_float):
+        np = self._np
+        M, N = self._tile('mtilem'), self._tile('mtilen')
+        if M <= 0 or N <= 0:
+            return
+        self._check_dims("EW-Float", M, N)
+        ctrl, md, ms1, ms2 = instruction.ctrl, instruction.md, instruction.ms1, instruction.ms2
+        is_matrix_matrix = (ctrl == 0b111)
+        vector_row = ctrl % self.rownum
+        quantize = self._quantizer(float_to_bits, bits_to_float)
+        array_op = self._ew_float_ops[instruction.func4]
+        bank = self.float_bank
+
+        # .mv với md == ms1: các hàng sau vector_row đọc hàng vector đã bị ghi đè (như vòng lặp gốc)
+        segments = [(0, M)]
+        if not is_matrix_matrix and md == ms1 and vector_row < M - 1:
+            segments = [(0, vector_row + 1), (vector_row + 1, M)]
+        with np.errstate(all='ignore'):
+            for lo, hi in segments:
+                v2 = bank[:, ms2, lo:hi, :N].astype(np.float64)
+                if is_matrix_matrix:
+                    v1 = bank[:, ms1, lo:hi, :N].astype(np.float64)
+                else:
+                    v1 = bank[:, ms1, vector_row:vector_row + 1, :N].astype(np.float64)
+                bank[:, md, lo:hi, :N] = quantize(array_op(quantize(v2), quantize(v1)))
+
+    # -------------------------------------------------------------------------
+    # MISC
+    # -------------------------------------------------------------------------
+    def _batch_mzero(self, instruction, handler):
+        if instruction.ctrl != 0b000:
+            return handler(instruction)  # Chỉ in lỗi
+        self.int_bank[:, instruction.md] = 0
+        self.float_bank[:, instruction.md] = 0
+
+    def _batch_mmov_mm(self, instruction, handler):
+        self.int_bank[:, instruction.md] = self.int_bank[:, instruction.ms1]
+        self.float_bank[:, instruction.md] = self.float_bank[:, instruction.ms1]
+
+    def _element_index(self, values, mnemonic):
+        """(mask, row, col) cho chỉ số phần tử FP32 theo GPR; cảnh báo nếu hàng vượt giới hạn."""
+        row, col = values // self.cols, values % self.cols
+        mask = row < self.rownum
+        if not mask.all():
+            self.log.warning("    [Warning] {} index (row={}) out of bounds ({} batch element(s))",
+                             mnemonic, int(row[~mask][0]), int((~mask).sum()))
+        return mask, row[mask], col[mask]
+
+    def _batch_mmov_x_m(self, instruction, handler):
+        np = self._np
+        if instruction.ctrl & 0x3 != 0b10:
+            return handler(instruction)
+        rs1_val = self._read_gpr(instruction.rs1)
+        mask, row, col = self._element_index(rs1_val, "mmovw.x.m")
+        values = self.float_bank[self._batch_index[mask], instruction.ms2, row, col].astype(np.float64)
+        bits = values.astype(np.float32).view(np.uint32).astype(np.int64)
+        self._write_gpr(instruction.rd, bits, mask)
+
+    def _batch_mmov_m_x_or_mdup(self, instruction, handler):
+        np = self._np
+        if instruction.d_size != 0b10:
+            return handler(instruction)
+        rs1_val = self._read_gpr(instruction.rs1)
+        rs2_val = self._read_gpr(instruction.rs2)
+        # bits_to_float32: bit 32-bit -> float32 -> double (như struct.unpack)
+        values = rs2_val.astype(np.uint32).view(np.float32).astype(np.float64)
+        if instruction.ctrl >> 2 == 1:   # mmovw.m.x
+            mask, row, col = self._element_index(rs1_val, "mmovw.m.x")
+            self.float_bank[self._batch_index[mask], instruction.md, row, col] = values[mask]
+        else:                            # mdupw.m.x
+            self.float_bank[:, instruction.md] = values[:, None, None]
+
+    def _batch_slide(self, instruction, handler, slide_type):
+        # Từng hàng / cột theo thứ tự vòng lặp gốc (md trùng ms1 đọc lại giá trị đã ghi)
+        md, ms1, imm3 = instruction.md, instruction.ms1, instruction.ctrl
+        bank = self.float_bank
+        if slide_type == 'row_down':
+            for i in range(self.rownum):
+                bank[:, md, i, :] = bank[:, ms1, (i - imm3) % self.rownum, :]
+        else:
+            for j in range(self.cols):
+                bank[:, md, :, j] = bank[:, ms1, :, (j - imm3) % self.cols]
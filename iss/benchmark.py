@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Benchmark thông lượng simulator theo nhóm lệnh.
+
+Mỗi benchmark là một chương trình cố định: một lệnh lặp lại `count` lần trên trạng thái
+đầu vào sinh từ seed (thanh ghi, RAM, tile M=N=K=4). Thời gian chỉ tính Simulator.run(),
+lấy lần nhanh nhất trong `repeat` lần (trạng thái được dựng lại trước mỗi lần).
+
+Nhóm: config, loadstore (mọi layout simulator hỗ trợ x e8/e16/e32, load và store),
+matmul (mọi biến thể mfmacc/mmacc), elementwise (int/float), misc (move, dup, slide).
+
+Kết quả: instr/s, ns/instr và ns/element (element = M·N·K cho matmul, M·N cho elementwise,
+số phần tử của tile cho load/store, cả thanh ghi cho mzero/mmov/mdup/slide), ghi ra file JSON
+để so sánh giữa các commit.
+
+Usage:
+    python -m iss.benchmark                                   # -> benchmark_results.json
+    python -m iss.benchmark --groups matmul --matmul-engine numpy
+    python -m iss.benchmark --output new.json --compare benchmark_results.json
+"""
+import sys
+import json
+import time
+import random
+import struct
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from collections import namedtuple
+
+# Cho phép chạy trực tiếp: python iss/benchmark.py
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR.parent) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.definitions import ROWNUM, ELEMENTS_PER_ROW_TR, ALL_INSTRUCTIONS
+from iss.logic_loadstore import LOADSTORE_LAYOUTS
+from iss.logic_matmul import MATMUL_VARIANTS
+from assembler.assembler import Assembler
+
+FORMAT_VERSION = 1
+TILE = 4                                  # M = N = K
+REG_ELEMENTS = ROWNUM * ELEMENTS_PER_ROW_TR
+
+# Vùng RAM cho dữ liệu load/store theo kích thước phần tử (x1 = base, x2 = stride)
+LOADSTORE_BASE = {8: 0x1000, 16: 0x2000, 32: 0x3000}
+LOADSTORE_STRIDE = 64
+
+Benchmark = namedtuple("Benchmark", "group name instr elements")
+
+GROUPS = ("config", "loadstore", "matmul", "elementwise", "misc")
+
+
+def _loadstore_benchmarks():
+    """Mọi lệnh load/store trong ALL_INSTRUCTIONS mà simulator thực thi được (func4 có trong
+    LOADSTORE_LAYOUTS, e8/e16/e32)."""
+    benches = []
+    for name, info in ALL_INSTRUCTIONS.items():
+        if info.get("instr_type") != "LOADSTORE" or info["d_size"] == 0b11:
+            continue
+        layout = LOADSTORE_LAYOUTS.get(info["func"])
+        if layout is None:
+            continue
+        eew = 8 << info["d_size"]
+        base_reg = {8: "x3", 16: "x4", 32: "x1"}[eew]
+        reg = "acc0" if layout[5] else "tr0"                        # Layout acc_only: chỉ acc
+        benches.append(Benchmark("loadstore", name, f"{name} {reg}, ({base_reg}), x2", TILE * TILE))
+    return benches
+
+
+def _matmul_benchmarks():
+    names = sorted(variant["instr_name"] for variant in MATMUL_VARIANTS.values())
+    return [Benchmark("matmul", name, f"{name} acc0, tr0, tr1", TILE * TILE * TILE) for name in names]
+
+
+BENCHMARKS = [
+    Benchmark("config", "msettilemi", "msettilemi 4", 1),
+    Benchmark("config", "msettilem", "msettilem x5", 1),
+    Benchmark("config", "mrelease", "mrelease", 1),
+    *_loadstore_benchmarks(),
+    *_matmul_benchmarks(),
+    *[Benchmark("elementwise", name, f"{name} acc0, acc2, acc1", TILE * TILE)
+      for name in ("madd.w", "msub.w", "mmul.w", "mmax.w", "mumin.w", "msll.w", "msra.w",
+                   "mfadd.s", "mfsub.s", "mfmul.s", "mfmax.s", "mfadd.h", "mfmul.h")],
+    Benchmark("elementwise", "madd.w.mv.i", "madd.w.mv.i acc0, acc2, acc1[1]", TILE * TILE),
+    Benchmark("elementwise", "mfadd.s.mv.i", "mfadd.s.mv.i acc0, acc2, acc1[1]", TILE * TILE),
+    Benchmark("misc", "mzero", "mzero tr2", REG_ELEMENTS),
+    Benchmark("misc", "mmov.mm", "mmov.mm tr2, tr0", REG_ELEMENTS),
+    Benchmark("misc", "mmovw.x.m", "mmovw.x.m x7, tr0, x6", 1),
+    Benchmark("misc", "mmovw.m.x", "mmovw.m.x tr2, x5, x6", 1),
+    Benchmark("misc", "mdupw.m.x", "mdupw.m.x tr2, x5", REG_ELEMENTS),
+    Benchmark("misc", "mrslidedown", "mrslidedown tr2, tr0, 1", REG_ELEMENTS),
+    Benchmark("misc", "mcslidedown.w", "mcslidedown.w tr2, tr0, 1", REG_ELEMENTS),
+]
+
+
+def setup_state(sim, seed):
+    """Trạng thái đầu vào cố định theo seed: tile 4x4x4, GPR, RAM và các thanh ghi ma trận."""
+    rng = random.Random(seed)
+    for csr in ("mtilem", "mtilen", "mtilek"):
+        sim.csr.write(csr, TILE)
+    for index, value in {1: LOADSTORE_BASE[32], 2: LOADSTORE_STRIDE, 3: LOADSTORE_BASE[8],
+                         4: LOADSTORE_BASE[16], 5: TILE, 6: 5}.items():
+        sim.gpr.write(index, value)
+
+    count = LOADSTORE_STRIDE * TILE
+    sim.memory.write(LOADSTORE_BASE[8], struct.pack(f"<{count}b", *(rng.randint(-100, 100) for _ in range(count))))
+    sim.memory.write(LOADSTORE_BASE[16], struct.pack(f"<{count // 2}e", *(rng.uniform(-4, 4) for _ in range(count // 2))))
+    sim.memory.write(LOADSTORE_BASE[32], struct.pack(f"<{count // 4}f", *(rng.uniform(-4, 4) for _ in range(count // 4))))
+
+    ma = sim.matrix_accelerator
+    for reg in range(8):
+        for row in range(ma.rownum):
+            for col in range(ma.elements_per_row_tr):
+                ma.regs.int_regs[reg][row][col] = rng.randint(-100, 100)
+                ma.regs.float_regs[reg][row][col] = struct.unpack("<e", struct.pack("<e", rng.uniform(-4, 4)))[0]
+
+
+def assemble_body(bench, count):
+    code = Assembler().assemble_line(bench.instr)
+    return [code] * count
+
+
+def run_benchmark(bench, count=200, repeat=5, seed=2024, **sim_kwargs):
+    """Chạy một benchmark; trả về dict kết quả (thời gian tốt nhất trong `repeat` lần)."""
+    program = assemble_body(bench, count)
+    best = float("inf")
+    for _ in range(repeat):
+        sim = Simulator(log_level="silent", **sim_kwargs)
+        setup_state(sim, seed)
+        sim.load_program(program)
+        start = time.perf_counter()
+        sim.run()
+        best = min(best, time.perf_counter() - start)
+    ns_per_instr = best * 1e9 / count
+    return {
+        "group": bench.group,
+        "name": bench.name,
+        "instr": bench.instr,
+        "count": count,
+        "elements": bench.elements,
+        "seconds": best,
+        "instr_per_sec": count / best,
+        "ns_per_instr": ns_per_instr,
+        "ns_per_element": ns_per_instr / bench.elements,
+    }
+
+
+def select_benchmarks(groups=None, name_filter=None):
+    return [b for b in BENCHMARKS
+            if (not groups or b.group in groups) and (not name_filter or name_filter in b.name)]
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(benches, count=200, repeat=5, seed=2024, matmul_engine="reference",
+              loadstore_engine="reference", progress=None, elementwise_engine="reference"):
+    """Chạy danh sách benchmark; trả về dict JSON-serializable (xem FORMAT_VERSION)."""
+    results = []
+    for bench in benches:
+        result = run_benchmark(bench, count, repeat, seed, matmul_engine=matmul_engine,
+                               loadstore_engine=loadstore_engine, elementwise_engine=elementwise_engine)
+        results.append(result)
+        if progress:
+            progress(result)
+    return {
+        "format_version": FORMAT_VERSION,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"count": count, "repeat": repeat, "seed": seed, "tile": [TILE, TILE, TILE],
+                   "matmul_engine": matmul_engine, "loadstore_engine": loadstore_engine,
+                   "elementwise_engine": elementwise_engine},
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """[(group, name, ns_per_instr cũ, ns_per_instr mới, speedup)] cho các benchmark có ở cả hai."""
+    old = {(r["group"], r["name"]): r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        base = old.get((r["group"], r["name"]))
+        if base is not None:
+            rows.append((r["group"], r["name"], base["ns_per_instr"], r["ns_per_instr"],
+                         base["ns_per_instr"] / r["ns_per_instr"]))
+    return rows
+
+
+def _print_result(result):
+    print(f"  {result['group']:<12} {result['name']:<16} {result['instr_per_sec']:>12,.0f} instr/s "
+          f"{result['ns_per_instr']:>12,.0f} ns/instr {result['ns_per_element']:>10,.1f} ns/elem")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator throughput benchmarks per instruction class")
+    parser.add_argument('--groups', nargs='+', choices=GROUPS, help='Groups to run (default: all)')
+    parser.add_argument('--filter', help='Only benchmarks whose name contains this string')
+    parser.add_argument('--count', type=int, default=200, help='Instructions per program (default: 200)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs, best is kept (default: 5)')
+    parser.add_argument('--seed', type=int, default=2024, help='Seed of the input state (default: 2024)')
+    parser.add_argument('--matmul-engine', default="reference", help='reference | numpy')
+    parser.add_argument('--loadstore-engine', default="reference", help='reference | numpy | struct')
+    parser.add_argument('--elementwise-engine', default="reference", help='reference | numpy')
+    parser.add_argument('--output', default="benchmark_results.json", help='JSON results file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--list', action='store_true', help='List benchmarks and exit')
+    args = parser.parse_args()
+
+    benches = select_benchmarks(args.groups, args.filter)
+    if args.list:
+        for bench in benches:
+            print(f"  {bench.group:<12} {bench.name:<16} {bench.instr}")
+        return 0
+
+    print("=" * 80)
+    print(f"SIMULATOR BENCHMARK: {len(benches)} benchmark(s), {args.count} instr x best of {args.repeat}, "
+          f"matmul={args.matmul_engine}, loadstore={args.loadstore_engine}, "
+          f"elementwise={args.elementwise_engine}")
+    print("=" * 80)
+    report = run_suite(benches, args.count, args.repeat, args.seed, args.matmul_engine,
+                       args.loadstore_engine, progress=_print_result,
+                       elementwise_engine=args.elementwise_engine)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print("\n" + "=" * 80)
+        print(f"COMPARISON vs {args.compare} (commit {baseline.get('commit')})")
+        if baseline.get("config") != report["config"]:
+            print(f"  [Warning] Different config: {baseline.get('config')}")
+        print("=" * 80)
+        for group, name, old_ns, new_ns, speedup in compare(report, baseline):
+            print(f"  {group:<12} {name:<16} {old_ns:>12,.0f} -> {new_ns:>12,.0f} ns/instr  x{speedup:.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# iss/blocks.py
+"""
+Biên dịch khối lệnh thẳng (straight-line block) cho Simulator.run.
+
+Kernel ma trận là các chuỗi dài msettile* / load / mfmacc / store không có lệnh nhảy.
+Lần đầu một khối được thực thi, nó được biên dịch thành danh sách bước (closure không
+tham số); các lần chạy sau chỉ gọi lần lượt các bước, bỏ qua fetch / kiểm tra PC /
+decode_and_execute của từng lệnh:
+
+  - msettile*i liên tiếp được gộp thành một lần ghi CSR, và giá trị M/N/K được theo dõi
+    tĩnh trong khối (msettile* dạng thanh ghi làm giá trị đó thành "chưa biết")
+  - các nhóm có hook compile_<nhóm>(instruction, tile) (load/store, matmul) dựng sẵn
+    những gì chỉ phụ thuộc vào M/N/K (view thanh ghi, kích thước, converter)
+  - các lệnh còn lại gọi handler đã tra sẵn trong bảng dispatch
+
+Khối được cache theo (PC bắt đầu, engine, giá trị lúc vào khối của các CSR M/N/K mà khối
+đọc trước khi tự ghi - block_guard): các giá trị đó là điều kiện bảo vệ (guard), khác giá
+trị thì biên dịch biến thể khác. Khối tự đặt đủ M/N/K ở đầu (kernel thường gặp) có guard
+rỗng nên chạy lại luôn dùng lại bản đã biên dịch.
+Khối kết thúc ở cuối chương trình hoặc sau một lệnh ngoài các nhóm ma trận (label None,
+vd lệnh vô hướng / nhảy sau này), vì chỉ lệnh như vậy mới có thể đổi PC.
+
+Chỉ dùng khi log không ở mức info/debug, không gắn profiler / timing model (các chế độ
+đó cần thấy từng lệnh) và có ít nhất một engine có hook biên dịch (worth_compiling):
+với toàn engine tham chiếu mọi bước vẫn là handler từng phần tử, phần bỏ được (fetch /
+decode) không đáng kể nên khối không nhanh hơn vòng lặp thông dịch (đo được 0.9-1.0x).
+Kết quả giống hệt vòng lặp thông dịch.
+"""
+from functools import partial
+
+from .logic_config import TILE_CONFIG_CSRS
+
+TILE_CSRS = ("mtilem", "mtilen", "mtilek")
+
+# Nhãn nhóm (dispatch.py) -> tên hook biên dịch trên MatrixAccelerator
+COMPILE_HOOKS = {
+    "Load/Store": "compile_load_store",
+    "Matmul": "compile_matmul",
+}
+
+
+def worth_compiling(accelerator):
+    """True nếu engine đang chọn có hook dựng sẵn bước riêng (COMPILE_HOOKS): matmul numpy,
+    load/store numpy / struct. Engine tham chiếu chỉ gọi lại handler thường."""
+    return accelerator.matmul_engine == "numpy" or accelerator.loadstore_engine != "reference"
+
+
+class Block:
+    """Một khối đã biên dịch: steps = [(pc, step)], length = số lệnh trong khối."""
+
+    __slots__ = ("start_pc", "length", "steps")
+
+    def __init__(self, start_pc, length, steps):
+        self.start_pc = start_pc
+        self.length = length
+        self.steps = steps
+
+    def __repr__(self):
+        return f"Block(pc=0x{self.start_pc:x}, instructions={self.length}, steps={len(self.steps)})"
+
+
+def block_length(handlers, start):
+    """Số lệnh của khối bắt đầu tại chỉ số start (tính cả lệnh kết thúc khối)."""
+    for index in range(start, len(handlers)):
+        if handlers[index][0] is None:
+            return index - start + 1
+    return len(handlers) - start
+
+
+def block_guard(decoded, handlers, start_pc):
+    """Các CSR M/N/K mà khối tại start_pc đọc trước khi tự ghi (giá trị lúc vào khối)."""
+    start = start_pc // 4
+    written = set()
+    for index in range(start, start + block_length(handlers, start)):
+        instruction = decoded[index]
+        if handlers[index][0] == "Config" and instruction.func4 in TILE_CONFIG_CSRS:
+            written.add(TILE_CONFIG_CSRS[instruction.func4][0])
+        else:
+            # Mọi lệnh khác được coi là đọc cả M, N, K (thận trọng)
+            return tuple(name for name in TILE_CSRS if name not in written)
+    return ()
+
+
+def _csr_update(csrs, values):
+    return lambda: csrs.update(values)
+
+
+def compile_block(sim, start_pc):
+    """Biên dịch khối bắt đầu tại start_pc với giá trị M/N/K hiện tại trong CSR."""
+    start = start_pc // 4
+    length = block_length(sim.handlers, start)
+    accelerator = sim.matrix_accelerator
+    csrs = sim.csr.csrs
+    tile = {name: csrs[name] for name in TILE_CSRS}
+
+    steps = []
+    pending = {}        # msettile*i chưa ghi (gộp lại)
+    pending_pc = None
+    for offset in range(length):
+        index = start + offset
+        pc = start_pc + 4 * offset
+        instruction = sim.decoded[index]
+        label, handler = sim.handlers[index]
+
+        if label == "Config" and instruction.func4 in TILE_CONFIG_CSRS:
+            target = TILE_CONFIG_CSRS[instruction.func4][0]
+            if instruction.ctrl >> 2 == 0:           # msettile*i: hằng số
+                if not pending:
+                    pending_pc = pc
+                pending[target] = tile[target] = instruction.imm10
+                continue
+            tile[target] = None                       # msettile* x: giá trị GPR lúc chạy
+
+        if pending:
+            steps.append((pending_pc, _csr_update(csrs, dict(pending))))
+            pending.clear()
+
+        step = None
+        hook = COMPILE_HOOKS.get(label)
+        if hook is not None:
+            step = getattr(accelerator, hook)(instruction, dict(tile))
+        steps.append((pc, step if step is not None else partial(handler, instruction)))
+
+    if pending:
+        steps.append((pending_pc, _csr_update(csrs, dict(pending))))
+    return Block(start_pc, length, steps)
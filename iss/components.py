@@ -1,13 +1,12 @@
-import os
-import re
-import struct
-import math
-from .definitions import XLEN, ELEN, ROWNUM, ELEMENTS_PER_ROW_TR
+import sys
+from .definitions import XLEN, ELEN, TLEN, TRLEN, ROWNUM, ELEMENTS_PER_ROW_TR, DEFAULT_GEOMETRY
+from .logger import SimLogger
+from .converters import bits_to_signed_int32
 
 from .logic_config import ConfigLogic
-from .logic_matmul import MatmulLogic
-from .logic_loadstore import LoadStoreLogic
-from .logic_elementwise import ElementwiseLogic
+from .logic_matmul import MatmulLogic, MATMUL_ENGINES
+from .logic_loadstore import LoadStoreLogic, LOADSTORE_ENGINES
+from .logic_elementwise import ElementwiseLogic, ELEMENTWISE_ENGINES
 from .logic_misc import MiscLogic
 
 class RegisterFile:
@@ -26,13 +25,14 @@ class RegisterFile:
 
 class CSRFile:
     """Đại diện cho các thanh ghi CSR."""
-    def __init__(self):
+    def __init__(self, log=None, geometry=DEFAULT_GEOMETRY):
+        self.log = log if log is not None else SimLogger()
         # Khởi tạo các CSR trong RAM (dùng dict)
         self.csrs = {
             "xmcsr": 0, "mtilem": 0, "mtilen": 0, "mtilek": 0,
             "xmxrm": 0, "xmsat": 0, "xmfflags": 0, "xmfrm": 0, "xmsaten": 0,
             "xmisa": 0xE00003FF, # Giá trị đã tính toán
-            "xtlenb": 64, "xtrlenb": 16, "xalenb": 64,
+            "xtlenb": geometry.reg_bytes, "xtrlenb": geometry.row_bytes, "xalenb": geometry.reg_bytes,
             "mstatus_ms": 0
         }
     
@@ -45,20 +45,155 @@ class CSRFile:
                 if name not in ["xmisa", "xtlenb", "xtrlenb", "xalenb"]:
                     self.csrs[name] = value
             else:
-                print(f"  [Warning] Cố gắng ghi vào CSR không xác định: {name}")
+                self.log.warning("  [Warning] Cố gắng ghi vào CSR không xác định: {}", name)
+
+class MatrixRegisterFile:
+    """
+    Bộ thanh ghi ma trận vật lý, lưu dạng byte.
+    SPECS: 8 thanh ghi vật lý - index 0-3 = tr0-tr3, index 4-7 = acc0-acc3 (alias tr4-tr7).
+
+    Mỗi thanh ghi là một vùng TLEN bit (mặc định 512 bit = 64 byte) liên tục, rownum hàng x
+    cols khe ELEN bit (kích thước lấy từ definitions.Geometry). Có hai bank độc lập cùng bố cục:
+      - int_bank:   mỗi khe là int32 (số nguyên 8/16-bit được mở rộng dấu)
+      - float_bank: mỗi khe là fp32 (giá trị fp16/bf16 được mở rộng chính xác)
+
+    LỆCH so với phần cứng (một vùng bit duy nhất cho mỗi thanh ghi, mọi kiểu là cách đọc
+    khác nhau của cùng các bit) - cố ý giữ lại:
+      - Các file trạng thái matrix.txt / matrix_float.txt, acc.txt / acc_float.txt (và
+        test_matmul.py, snapshot) khởi tạo nội dung int và float KHÁC NHAU cho cùng một
+        thanh ghi, rồi lệnh int đọc bank int còn lệnh float đọc bank float. Gộp thành một
+        bank thì một trong hai bị ghi đè và các chương trình / test hiện có cho kết quả khác.
+      - Hệ quả: zero() / copy() (mzero, mmov.mm) phải đụng cả hai bank - mỗi bank một lần
+        copy byte; lệnh int không thấy giá trị lệnh float vừa ghi (và ngược lại).
+      - view("fp16") là BẢN SAO đã chuyển đổi: bank float lưu fp16 đã mở rộng lên fp32
+        nên không có sẵn 16 bit fp16 nào để trỏ tới (bf16 thì có: nửa cao của khe fp32).
+
+    int_regs[r][i][j] / float_regs[r][i][j] là memoryview theo hàng trỏ thẳng vào bank
+    (không sao chép): đọc trả về int / float, ghi int phải nằm trong dải int32,
+    ghi float được làm tròn về fp32.
+    """
+
+    SLOT_BYTES = ELEN // 8        # 4 byte mỗi phần tử
+    ROW_BYTES = TRLEN // 8        # 16 byte mỗi hàng (mặc định; xem geometry)
+    REG_BYTES = TLEN // 8         # 64 byte mỗi thanh ghi (mặc định; xem geometry)
+    NUM_REGS = 8
+
+    # Tên view -> (bank, dtype numpy, vị trí trong khe 32-bit hoặc None nếu dùng cả khe)
+    # int8/int16: byte thấp của khe int32; bf16: nửa cao của khe fp32 (16 bit cao của fp32)
+    VIEW_FORMATS = {
+        "int8":  ("int",   "int8",    0 if sys.byteorder == "little" else 3),
+        "int16": ("int",   "int16",   0 if sys.byteorder == "little" else 1),
+        "int32": ("int",   "int32",   None),
+        "fp32":  ("float", "float32", None),
+        "bf16":  ("float", "uint16",  1 if sys.byteorder == "little" else 0),
+    }
+
+    def __init__(self, geometry=DEFAULT_GEOMETRY):
+        # Kích thước theo từng instance (ghi đè hằng số lớp khi geometry khác mặc định)
+        self.geometry = geometry
+        self.SLOT_BYTES = geometry.slot_bytes
+        self.ROW_BYTES = geometry.row_bytes
+        self.REG_BYTES = geometry.reg_bytes
+        self.rownum = geometry.rownum
+        self.cols = geometry.elements_per_row
+        self.int_bank = bytearray(self.NUM_REGS * self.REG_BYTES)
+        self.float_bank = bytearray(self.NUM_REGS * self.REG_BYTES)
+        self.int_regs = [self._row_views(self.int_bank, r, 'i') for r in range(self.NUM_REGS)]
+        self.float_regs = [self._row_views(self.float_bank, r, 'f') for r in range(self.NUM_REGS)]
+
+    def _row_views(self, bank, reg_idx, fmt):
+        base = reg_idx * self.REG_BYTES
+        mv = memoryview(bank)
+        return [mv[base + row * self.ROW_BYTES : base + (row + 1) * self.ROW_BYTES].cast(fmt)
+                for row in range(self.rownum)]
+
+    def _span(self, reg_idx):
+        base = reg_idx * self.REG_BYTES
+        return slice(base, base + self.REG_BYTES)
+
+    def zero(self, reg_idx):
+        """Xóa cả hai bank của một thanh ghi (không cấp phát list mới; hai bank - xem docstring lớp)."""
+        span = self._span(reg_idx)
+        zeros = bytes(self.REG_BYTES)
+        self.int_bank[span] = zeros
+        self.float_bank[span] = zeros
+
+    def copy(self, dst_idx, src_idx):
+        """Sao chép nguyên thanh ghi (cả hai bank) bằng một lần copy byte."""
+        src, dst = self._span(src_idx), self._span(dst_idx)
+        self.int_bank[dst] = self.int_bank[src]
+        self.float_bank[dst] = self.float_bank[src]
+
+    def raw(self, reg_idx, bank="int"):
+        """memoryview byte (không sao chép) của một thanh ghi trong bank 'int' hoặc 'float'."""
+        return memoryview(self.int_bank if bank == "int" else self.float_bank)[self._span(reg_idx)]
+
+    def view(self, reg_idx, fmt):
+        """
+        View numpy (không sao chép, ghi được) rownum x cols của một thanh ghi.
+        fmt: 'int8' | 'int16' | 'int32' (bank int) | 'fp32' | 'bf16' (bank float, bf16 = bit pattern)
+             | 'fp16' (bit pattern; bank float chỉ giữ fp32 nên đây là bản sao đã chuyển đổi,
+             ghi vào nó không đổi thanh ghi - xem docstring lớp).
+        """
+        import numpy as np
+        if fmt == "fp16":
+            from .converters import float_to_bits16_array
+            return float_to_bits16_array(self.view(reg_idx, "fp32"))
+        try:
+            bank_name, dtype, part = self.VIEW_FORMATS[fmt]
+        except KeyError:
+            raise ValueError(f"Unknown register view format: {fmt!r}")
+        bank = self.int_bank if bank_name == "int" else self.float_bank
+        dtype = np.dtype(dtype)
+        per_slot = self.SLOT_BYTES // dtype.itemsize
+        arr = np.frombuffer(bank, dtype=dtype, count=self.REG_BYTES // dtype.itemsize,
+                            offset=reg_idx * self.REG_BYTES)
+        arr = arr.reshape(self.rownum, self.cols, per_slot)
+        return arr[:, :, 0 if part is None else part]
+
 
 class MatrixAccelerator(ConfigLogic, MatmulLogic, LoadStoreLogic, ElementwiseLogic, MiscLogic):
     """Đại diện cho bộ tăng tốc ma trận."""
-    def __init__(self, csr_file_ref, gpr_file_ref, memory_ref):
+    def __init__(self, csr_file_ref, gpr_file_ref, memory_ref, log=None, matmul_engine="reference",
+                 loadstore_engine="reference", timing=None, geometry=DEFAULT_GEOMETRY,
+                 elementwise_engine="reference"):
         # Lưu một tham chiếu đến CSRs, GPRs và Memory
         self.csr_ref = csr_file_ref 
         self.gpr_ref = gpr_file_ref
         self.memory = memory_ref
+        # Logger có cấp độ (dùng chung với Simulator)
+        self.log = log if log is not None else SimLogger()
+
+        # Engine matmul: "reference" (vòng lặp Python) hoặc "numpy" (vector hóa)
+        if matmul_engine not in MATMUL_ENGINES:
+            raise ValueError(f"Unknown matmul_engine: {matmul_engine!r} (expected one of {MATMUL_ENGINES})")
+        if matmul_engine == "numpy":
+            import numpy  # noqa: F401 - báo lỗi sớm nếu chưa cài numpy
+        self.matmul_engine = matmul_engine
+
+        # Engine load/store: "reference" (từng phần tử), "numpy" (copy cả tile qua view có stride)
+        # hoặc "struct" (từng dòng, chỉ thư viện chuẩn)
+        if loadstore_engine not in LOADSTORE_ENGINES:
+            raise ValueError(f"Unknown loadstore_engine: {loadstore_engine!r} (expected one of {LOADSTORE_ENGINES})")
+        if loadstore_engine == "numpy":
+            import numpy  # noqa: F401 - báo lỗi sớm nếu chưa cài numpy
+        self.loadstore_engine = loadstore_engine
+
+        # Engine element-wise: "reference" (từng phần tử) hoặc "numpy" (cả tile, int64 / float64)
+        if elementwise_engine not in ELEMENTWISE_ENGINES:
+            raise ValueError(f"Unknown elementwise_engine: {elementwise_engine!r} (expected one of {ELEMENTWISE_ENGINES})")
+        if elementwise_engine == "numpy":
+            import numpy  # noqa: F401 - báo lỗi sớm nếu chưa cài numpy
+        self.elementwise_engine = elementwise_engine
+
+        # Mô hình thời gian (timing.TimingModel) hoặc None: chỉ mô phỏng chức năng
+        self.timing = timing
         
-        # Lưu các hằng số kích thước (cần cho logic_misc.py)
-        self.rownum = ROWNUM
-        self.elements_per_row_tr = ELEMENTS_PER_ROW_TR
-        self.elements_per_row_acc = ELEMENTS_PER_ROW_TR  # ACC cũng có cùng kích thước
+        # Lưu các kích thước (definitions.Geometry) cho các mixin
+        self.geometry = geometry
+        self.rownum = geometry.rownum
+        self.elements_per_row_tr = geometry.elements_per_row
+        self.elements_per_row_acc = geometry.elements_per_row  # ACC cũng có cùng kích thước
         
         # Khởi tạo các thanh ghi trong RAM
         # SPECS: Chỉ có 8 thanh ghi vật lý:
@@ -66,13 +201,17 @@ class MatrixAccelerator(ConfigLogic, MatmulLogic, LoadStoreLogic, ElementwiseLog
         #   - acc0-acc3 (register 4-7): Accumulator registers
         #   - tr4-tr7 là ALIAS của acc0-acc3, không phải bộ nhớ riêng
         
+        # Bộ thanh ghi dạng byte (xem MatrixRegisterFile); các danh sách dưới đây là
+        # view theo hàng trỏ vào cùng bộ nhớ, nên chỉ số [reg][row][col] vẫn như cũ.
+        self.regs = MatrixRegisterFile(geometry)
+
         # Pure tile registers: tr0-tr3 only (4 registers)
-        self.tr_int = [[[0]*ELEMENTS_PER_ROW_TR for _ in range(ROWNUM)] for _ in range(4)]
-        self.tr_float = [[[0.0]*ELEMENTS_PER_ROW_TR for _ in range(ROWNUM)] for _ in range(4)]
+        self.tr_int = self.regs.int_regs[0:4]
+        self.tr_float = self.regs.float_regs[0:4]
         
         # Accumulator registers: acc0-acc3 (aka tr4-tr7)
-        self.acc_int = [[[0]*ELEMENTS_PER_ROW_TR for _ in range(ROWNUM)] for _ in range(4)]
-        self.acc_float = [[[0.0]*ELEMENTS_PER_ROW_TR for _ in range(ROWNUM)] for _ in range(4)]
+        self.acc_int = self.regs.int_regs[4:8]
+        self.acc_float = self.regs.float_regs[4:8]
         
         # Metadata: Lưu destination bit-width cho mỗi accumulator
         # Tách riêng cho int và float vì chúng độc lập
@@ -97,35 +236,165 @@ class MatrixAccelerator(ConfigLogic, MatmulLogic, LoadStoreLogic, ElementwiseLog
             return self.acc_float[reg_idx - 4]  # tr4-tr7 = acc0-acc3
     
     def set_matrix_reg_int(self, reg_idx, value):
-        """Set integer matrix register (tr0-tr7)"""
-        if reg_idx < 4:
-            self.acc_int[reg_idx] = value
-        else:
-            self.tr_int[reg_idx - 4] = value
+        """Set integer matrix register (tr0-tr7) - copies values into the register
+        (giá trị được wrap về int32)"""
+        dest = self.get_matrix_reg_int(reg_idx)
+        for i, row in enumerate(value):
+            for j, v in enumerate(row):
+                dest[i][j] = bits_to_signed_int32(int(v))
     
     def set_matrix_reg_float(self, reg_idx, value):
-        """Set float matrix register (tr0-tr7)"""
-        if reg_idx < 4:
-            self.acc_float[reg_idx] = value
-        else:
-            self.tr_float[reg_idx - 4] = value
+        """Set float matrix register (tr0-tr7) - copies values into the register"""
+        dest = self.get_matrix_reg_float(reg_idx)
+        for i, row in enumerate(value):
+            for j, v in enumerate(row):
+                dest[i][j] = v
 
 
 class MainMemory:
-    """Mô phỏng bộ nhớ chính (RAM) của simulator."""
-    def __init__(self, size_in_bytes=1024*1024): # 1MB RAM
-        self.memory = bytearray(size_in_bytes)
-        print(f"  [Init] MainMemory đã khởi tạo ({size_in_bytes // 1024} KB RAM)")
+    """
+    Mô phỏng bộ nhớ chính (RAM) của simulator.
+
+    Bộ nhớ phân trang: mỗi trang (page_size byte) chỉ được cấp phát khi bị ghi
+    lần đầu, trang chưa ghi đọc ra toàn 0. Nhờ vậy không gian địa chỉ có thể lớn
+    (vd 4 GB) mà không tốn RAM của máy chạy mô phỏng.
+
+    fork() tạo một MainMemory mới dùng chung các trang (copy-on-write): trang chỉ
+    bị sao chép khi một trong hai bên ghi vào nó.
+    """
+    PAGE_SIZE = 4096
+
+    def __init__(self, size_in_bytes=1024*1024, log=None, page_size=PAGE_SIZE): # 1MB RAM
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError(f"page_size phải là lũy thừa của 2, nhận {page_size}")
+        self.log = log if log is not None else SimLogger()
+        self.size = size_in_bytes
+        self.page_size = page_size
+        self.page_shift = page_size.bit_length() - 1
+        self.page_mask = page_size - 1
+        self.pages = {}         # page index -> bytearray(page_size), cấp phát khi ghi
+        self.shared = set()     # page index đang dùng chung với MainMemory khác (copy-on-write)
+        self.log.info("  [Init] MainMemory đã khởi tạo ({} KB RAM)", size_in_bytes // 1024)
+
+    def __len__(self):
+        return self.size
 
     def read(self, address, num_bytes):
         """Đọc num_bytes từ một địa chỉ."""
-        if address + num_bytes > len(self.memory):
+        if address + num_bytes > self.size:
             raise MemoryError(f"Lỗi đọc RAM: Địa chỉ 0x{address:X} vượt quá giới hạn")
-        return self.memory[address : address + num_bytes]
+        offset = address & self.page_mask
+        if offset + num_bytes <= self.page_size:
+            # Nằm gọn trong một trang (trường hợp thường gặp)
+            page = self.pages.get(address >> self.page_shift)
+            if page is None:
+                return bytearray(num_bytes)
+            return page[offset : offset + num_bytes]
+        result = bytearray(num_bytes)
+        self._copy_pages(address, num_bytes, result, to_memory=False)
+        return result
 
     def write(self, address, byte_data):
         """Ghi một mảng bytes vào một địa chỉ."""
         num_bytes = len(byte_data)
-        if address + num_bytes > len(self.memory):
+        if address + num_bytes > self.size:
             raise MemoryError(f"Lỗi ghi RAM: Địa chỉ 0x{address:X} vượt quá giới hạn")
-        self.memory[address : address + num_bytes] = byte_data
+        offset = address & self.page_mask
+        if offset + num_bytes <= self.page_size:
+            page = self._writable_page(address >> self.page_shift)
+            page[offset : offset + num_bytes] = byte_data
+            return
+        self._copy_pages(address, num_bytes, byte_data, to_memory=True)
+
+    def unpack_from(self, codec, address):
+        """codec.unpack_from (struct.Struct) tại một địa chỉ, đọc thẳng trên trang khi vùng
+        nằm gọn trong một trang (không sao chép, không cấp phát trang chưa ghi)."""
+        num_bytes = codec.size
+        if address + num_bytes > self.size:
+            raise MemoryError(f"Lỗi đọc RAM: Địa chỉ 0x{address:X} vượt quá giới hạn")
+        offset = address & self.page_mask
+        if offset + num_bytes <= self.page_size:
+            page = self.pages.get(address >> self.page_shift)
+            if page is not None:
+                return codec.unpack_from(page, offset)
+        return codec.unpack_from(self.read(address, num_bytes))
+
+    def _copy_pages(self, address, num_bytes, buffer, to_memory):
+        """Copy giữa buffer và một vùng trải qua nhiều trang."""
+        done = 0
+        while done < num_bytes:
+            index = (address + done) >> self.page_shift
+            offset = (address + done) & self.page_mask
+            chunk = min(self.page_size - offset, num_bytes - done)
+            if to_memory:
+                self._writable_page(index)[offset : offset + chunk] = buffer[done : done + chunk]
+            else:
+                page = self.pages.get(index)
+                if page is not None:
+                    buffer[done : done + chunk] = page[offset : offset + chunk]
+            done += chunk
+
+    def _writable_page(self, index):
+        """Trả về trang riêng (có thể ghi) cho index: cấp phát trang mới hoặc sao chép trang dùng chung."""
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = bytearray(self.page_size)
+        elif index in self.shared:
+            page = self.pages[index] = bytearray(page)
+            self.shared.discard(index)
+        return page
+
+    def fork(self, log=None):
+        """Tạo MainMemory mới cùng nội dung, dùng chung các trang theo kiểu copy-on-write."""
+        child = MainMemory.__new__(MainMemory)
+        child.log = log if log is not None else self.log
+        child.size = self.size
+        child.page_size = self.page_size
+        child.page_shift = self.page_shift
+        child.page_mask = self.page_mask
+        child.pages = dict(self.pages)
+        self.shared.update(self.pages)
+        child.shared = set(self.pages)
+        return child
+
+    def restore(self, other):
+        """Thay toàn bộ nội dung bằng nội dung của MainMemory khác (vd bản fork() giữ trong
+        checkpoint), dùng chung trang copy-on-write như fork(): không sao chép dữ liệu."""
+        if other.size != self.size or other.page_size != self.page_size:
+            raise ValueError(f"Kích thước RAM khác nhau: {other.size}/{other.page_size} "
+                             f"!= {self.size}/{self.page_size}")
+        self.pages = dict(other.pages)
+        other.shared.update(other.pages)
+        self.shared = set(other.pages)
+
+    def changed_pages(self, other):
+        """Chỉ số (tăng dần) các trang có nội dung khác MainMemory other - thường là fork() giữ
+        trong checkpoint. Trang chưa bị ghi từ lúc fork vẫn là cùng một đối tượng với bên kia
+        (copy-on-write) nên bỏ qua không cần so; chỉ trang đã bị sao chép / cấp phát mới so nội
+        dung, trang chưa cấp phát coi là toàn 0."""
+        if other.page_size != self.page_size:
+            raise ValueError(f"page_size khác nhau: {other.page_size} != {self.page_size}")
+        zero_page = bytes(self.page_size)
+        changed = []
+        for index in sorted(self.pages.keys() | other.pages.keys()):
+            page, old = self.pages.get(index), other.pages.get(index)
+            if page is old:
+                continue
+            if (page if page is not None else zero_page) != (old if old is not None else zero_page):
+                changed.append(index)
+        return changed
+
+    def clear(self):
+        """Xóa toàn bộ RAM về 0 (bỏ mọi trang đã cấp phát)."""
+        self.pages = {}
+        self.shared = set()
+
+    def allocated_bytes(self):
+        """Số byte trang đã cấp phát (kể cả trang dùng chung)."""
+        return len(self.pages) * self.page_size
+
+    def tobytes(self, address=0, num_bytes=None):
+        """Trả về bản sao bytes của một vùng RAM (mặc định toàn bộ - chỉ nên dùng với RAM nhỏ)."""
+        if num_bytes is None:
+            num_bytes = self.size - address
+        return bytes(self.read(address, num_bytes))
@@ -5,17 +5,26 @@ import math
 # CÁC HÀM TIỆN ÍCH CHUYỂN ĐỔI KIỂU DỮ LIỆU
 # =============================================================================
 
+# Struct biên dịch sẵn (tránh parse format string ở mỗi lời gọi)
+_STRUCT_F32 = struct.Struct('f')
+_STRUCT_U32 = struct.Struct('I')
+
 # --- Float <-> Bits ---
 def bits_to_float32(bits):
-    try: return struct.unpack('f', struct.pack('I', bits & 0xFFFFFFFF))[0]
+    try: return _STRUCT_F32.unpack(_STRUCT_U32.pack(bits & 0xFFFFFFFF))[0]
     except: return 0.0
 
 def float_to_bits32(f):
-    try: return struct.unpack('I', struct.pack('f', f))[0]
+    try: return _STRUCT_U32.unpack(_STRUCT_F32.pack(f))[0]
     except OverflowError: return 0x7f800000 if f > 0 else 0xff800000
     except: return 0
 
-def bits_to_float16(bits):
+# =============================================================================
+# BẢN THAM CHIẾU (từng giá trị, rẽ nhánh) - chỉ dùng để dựng bảng tra và kiểm thử.
+# Các hàm công khai cùng tên nằm ở phần "BẢNG TRA" bên dưới.
+# =============================================================================
+
+def _bits_to_float16_ref(bits):
     """
     Chuyển đổi 16-bit pattern thành float16 value.
     Implement IEEE 754 half-precision manually.
@@ -45,7 +54,7 @@ def bits_to_float16(bits):
         value = (1.0 + mantissa / 1024.0) * (2 ** (exponent - 15))
         return -value if sign else value
 
-def float_to_bits16(f):
+def _float_to_bits16_ref(f):
     """
     Chuyển đổi float value thành 16-bit FP16 pattern.
     """
@@ -88,20 +97,8 @@ def float_to_bits16(f):
     mant16 = mant32 >> 13  # Truncate to 10 bits
     return (sign << 15) | (exp16 << 10) | mant16
 
-# --- BFloat16 Converters ---
-def float_to_bfloat16(f):
-    """Chuyển đổi float32 sang bfloat16 (16-bit)."""
-    try:
-        bits32 = float_to_bits32(f)
-        # BFloat16 = Lấy 16 bit cao của Float32
-        # Làm tròn: kiểm tra bit thứ 16 (từ phải sang)
-        rounding_bias = (bits32 >> 16) & 0x1
-        bfloat16_bits = (bits32 + (rounding_bias << 15)) >> 16
-        return bfloat16_bits & 0xFFFF
-    except:
-        return 0
-
-def bfloat16_to_float(bits):
+# --- BFloat16 ---
+def _bfloat16_to_float_ref(bits):
     """Chuyển đổi bfloat16 (16-bit) sang float32."""
     bits &= 0xFFFF
     # BFloat16 -> Float32: Dịch trái 16 bit
@@ -109,7 +106,7 @@ def bfloat16_to_float(bits):
     return bits_to_float32(bits32)
 
 # --- FP8 Simplified Converters ---
-def float_to_bits8_e4m3(f):
+def _float_to_bits8_e4m3_ref(f):
     if math.isnan(f): return 0b10000000
     if math.isinf(f): return 0b01111000 if f > 0 else 0b11111000
     bits32 = float_to_bits32(f); sign = (bits32 >> 31) & 0x1
@@ -125,7 +122,7 @@ def float_to_bits8_e4m3(f):
         if exponent8 >= 15: return 0b11111000 if sign else 0b01111000
     return (sign << 7) | (exponent8 << 3) | mantissa8
 
-def float_to_bits8_e5m2(f):
+def _float_to_bits8_e5m2_ref(f):
     if math.isnan(f): return 0b10000000
     if math.isinf(f): return 0b01111100 if f > 0 else 0b11111100
     bits32 = float_to_bits32(f); sign = (bits32 >> 31) & 0x1
@@ -142,7 +139,7 @@ def float_to_bits8_e5m2(f):
     return (sign << 7) | (exponent8 << 2) | mantissa8
 
 # --- (THÊM MỚI) Hàm chuyển đổi ngược 8-bit ---
-def bits_to_float8_e4m3(bits):
+def _bits_to_float8_e4m3_ref(bits):
     """Chuyển đổi bit pattern 8-bit (E4M3) thành float."""
     bits &= 0xFF
     sign = (bits >> 7) & 0x1
@@ -157,7 +154,7 @@ def bits_to_float8_e4m3(bits):
     val = (1 + (mantissa / 8.0)) * (2.0 ** (exponent - 7))
     return -val if sign else val
 
-def bits_to_float8_e5m2(bits):
+def _bits_to_float8_e5m2_ref(bits):
     """Chuyển đổi bit pattern 8-bit (E5M2) thành float."""
     bits &= 0xFF
     sign = (bits >> 7) & 0x1
@@ -172,6 +169,297 @@ def bits_to_float8_e5m2(bits):
     val = (1 + (mantissa / 4.0)) * (2.0 ** (exponent - 15))
     return -val if sign else val
 
+# =============================================================================
+# BẢNG TRA (LUT) - các hàm công khai dùng trong simulator
+#   * Giải mã 8-bit/16-bit: bảng 256 / 65536 phần tử, dựng ở lần tra đầu tiên (_LazyTable).
+#   * Mã hóa: lấy bit float32 một lần rồi tra bảng theo (dấu, số mũ[, vài bit mantissa cao]).
+# Kết quả trùng từng bit với bản tham chiếu _*_ref ở trên (xem test_converters.py).
+# =============================================================================
+
+def _build_fp16_decode():
+    # struct 'e' giải mã IEEE half chính xác; NaN được chuẩn hóa về float('nan') như bản gốc
+    values = list(struct.unpack('<65536e', struct.pack('<65536H', *range(65536))))
+    nan = float('nan')
+    for inf_bits in (0x7C00, 0xFC00):
+        values[inf_bits + 1:inf_bits + 0x400] = [nan] * 0x3FF
+    return tuple(values)
+
+def _build_fp16_encode():
+    """Bảng (base, shift) theo 9 bit cao của float32 (dấu + số mũ):
+    fp16 = base[e] + (mant32 >> shift[e]). shift=24 nghĩa là bỏ hết mantissa."""
+    base, shift = [], []
+    for e in range(512):
+        sign = (e >> 8) << 15
+        exp16 = (e & 0xFF) - 127 + 15
+        if exp16 >= 0x1F:      # Tràn -> Inf
+            base.append(sign | 0x7C00); shift.append(24)
+        elif exp16 < -10:      # Quá nhỏ -> 0
+            base.append(sign); shift.append(24)
+        elif exp16 <= 0:       # Subnormal (cắt cụt, bit ẩn dịch theo)
+            base.append(sign | (0x400 >> (1 - exp16))); shift.append(14 - exp16)
+        else:                  # Chuẩn (cắt cụt 13 bit mantissa)
+            base.append(sign | (exp16 << 10)); shift.append(13)
+    return tuple(base), tuple(shift)
+
+def _build_fp16_truncate_mask():
+    """Mask bit float32 theo 9 bit cao (dấu + số mũ) giữ đúng phần mantissa mà fp16 còn giữ
+    (cắt cụt như _float_to_bits16_ref): sau mask, giá trị float32 nằm trên lưới fp16 nên ép
+    sang float16 là chính xác (không còn làm tròn), tràn thành ±Inf."""
+    masks = []
+    for e in range(512):
+        exp16 = (e & 0xFF) - 127 + 15
+        if exp16 >= 1:         # Chuẩn (hoặc tràn): bỏ 13 bit mantissa thấp
+            masks.append(0xFFFFE000)
+        elif exp16 >= -9:      # Subnormal: còn 9 + exp16 bit mantissa cao
+            kept = 9 + exp16
+            masks.append(0xFF800000 | (((1 << kept) - 1) << (23 - kept)))
+        else:                  # Quá nhỏ -> ±0
+            masks.append(0x80000000)
+    return tuple(masks)
+
+def _build_fp8_encode(exp_bits, man_bits):
+    """Bảng mã hóa FP8 theo bits32 >> (23 - man_bits - 1): dấu, số mũ float32,
+    man_bits bit mantissa cao và 1 bit làm tròn - giống hệt _float_to_bits8_*_ref."""
+    exp_max = (1 << exp_bits) - 1
+    bias8 = (1 << (exp_bits - 1)) - 1
+    man_max = (1 << man_bits) - 1
+    table = []
+    for sign in (0, 1):
+        saturate = (sign << 7) | (exp_max << man_bits)
+        for exp32 in range(256):
+            exponent8 = exp32 - 127 + bias8
+            for top in range(1 << (man_bits + 1)):
+                if exp32 == 0 or exponent8 <= 0:   # 0 / quá nhỏ -> ±0
+                    table.append(sign << 7)
+                    continue
+                if exponent8 >= exp_max:           # Tràn (gồm cả Inf) -> bão hòa
+                    table.append(saturate)
+                    continue
+                e8, mantissa8 = exponent8, top >> 1
+                if top & 1:
+                    mantissa8 += 1
+                    if mantissa8 > man_max: mantissa8 = 0; e8 += 1
+                    if e8 >= exp_max:
+                        table.append(saturate)
+                        continue
+                table.append((sign << 7) | (e8 << man_bits) | mantissa8)
+    return tuple(table)
+
+def _build_bf16_decode():
+    return struct.unpack('<65536f', struct.pack('<65536I', *range(0, 0x100000000, 0x10000)))
+
+class _LazyTable:
+    """Bảng tra dựng ở lần tra đầu tiên (giữ `import iss` nhanh: hai bảng 65536 phần tử
+    tốn ~8 ms). Lần tra đầu thay chính nó trong globals() bằng tuple thật, nên các hàm
+    tra ở dưới (đọc biến toàn cục mỗi lần gọi) không tốn thêm gì từ lần thứ hai."""
+    __slots__ = ('name', 'builder')
+
+    def __init__(self, name, builder):
+        self.name = name
+        self.builder = builder
+
+    def build(self):
+        table = self.builder()
+        globals()[self.name] = table
+        return table
+
+    def __getitem__(self, index):
+        return self.build()[index]
+
+def _lut(name):
+    """Bảng tra thật (dựng nếu chưa có) - dùng khi cần cả bảng, vd chép sang numpy."""
+    table = globals()[name]
+    return table.build() if isinstance(table, _LazyTable) else table
+
+_FP16_ENC_BASE, _FP16_ENC_SHIFT = _build_fp16_encode()
+_FP16_TRUNC_MASK = _build_fp16_truncate_mask()
+_FP16_DECODE = _LazyTable('_FP16_DECODE', _build_fp16_decode)
+_BF16_DECODE = _LazyTable('_BF16_DECODE', _build_bf16_decode)
+_E4M3_DECODE = _LazyTable('_E4M3_DECODE', lambda: tuple(_bits_to_float8_e4m3_ref(b) for b in range(256)))
+_E5M2_DECODE = _LazyTable('_E5M2_DECODE', lambda: tuple(_bits_to_float8_e5m2_ref(b) for b in range(256)))
+_E4M3_ENCODE = _LazyTable('_E4M3_ENCODE', lambda: _build_fp8_encode(4, 3))
+_E5M2_ENCODE = _LazyTable('_E5M2_ENCODE', lambda: _build_fp8_encode(5, 2))
+
+# --- FP16 ---
+def bits_to_float16(bits):
+    """Chuyển đổi 16-bit pattern thành float16 value (tra bảng)."""
+    return _FP16_DECODE[bits & 0xFFFF]
+
+def float_to_bits16(f):
+    """Chuyển đổi float value thành 16-bit FP16 pattern (cắt cụt mantissa)."""
+    if f != f:
+        return 0x7E00  # NaN
+    if f == 0:
+        return 0x0000  # Cả +0.0 và -0.0 (giống bản gốc)
+    bits32 = float_to_bits32(f)
+    e = bits32 >> 23
+    return _FP16_ENC_BASE[e] + ((bits32 & 0x7FFFFF) >> _FP16_ENC_SHIFT[e])
+
+# --- BFloat16 ---
+def float_to_bfloat16(f):
+    """Chuyển đổi float32 sang bfloat16 (16-bit)."""
+    try:
+        bits32 = float_to_bits32(f)
+        # BFloat16 = Lấy 16 bit cao của Float32
+        # Làm tròn: kiểm tra bit thứ 16 (từ phải sang)
+        rounding_bias = (bits32 >> 16) & 0x1
+        bfloat16_bits = (bits32 + (rounding_bias << 15)) >> 16
+        return bfloat16_bits & 0xFFFF
+    except:
+        return 0
+
+def bfloat16_to_float(bits):
+    """Chuyển đổi bfloat16 (16-bit) sang float32 (tra bảng)."""
+    return _BF16_DECODE[bits & 0xFFFF]
+
+# --- FP8 ---
+def float_to_bits8_e4m3(f):
+    if f != f: return 0b10000000
+    return _E4M3_ENCODE[float_to_bits32(f) >> 19]
+
+def float_to_bits8_e5m2(f):
+    if f != f: return 0b10000000
+    return _E5M2_ENCODE[float_to_bits32(f) >> 20]
+
+def bits_to_float8_e4m3(bits):
+    """Chuyển đổi bit pattern 8-bit (E4M3) thành float (tra bảng)."""
+    return _E4M3_DECODE[bits & 0xFF]
+
+def bits_to_float8_e5m2(bits):
+    """Chuyển đổi bit pattern 8-bit (E5M2) thành float (tra bảng)."""
+    return _E5M2_DECODE[bits & 0xFF]
+
+# =============================================================================
+# BIẾN THỂ THEO MẢNG (numpy, import lười) - áp dụng cho cả tile một lần
+#   Giải mã: nhận mảng bit (số nguyên) -> mảng float64.
+#   Mã hóa: nhận mảng float (float32 dùng thẳng, không sao chép) -> mảng uint16 / uint8
+#   trong một lượt; ±0 / NaN hiếm gặp nên chỉ sửa (np.where) khi mảng có chúng.
+# =============================================================================
+_numpy_tables = None
+
+def _get_numpy_tables():
+    global _numpy_tables
+    import numpy as np
+    if _numpy_tables is None:
+        _numpy_tables = {
+            'fp16_dec':   np.array(_lut('_FP16_DECODE'), dtype=np.float64),
+            'bf16_dec':   np.array(_lut('_BF16_DECODE'), dtype=np.float64),
+            'e4m3_dec':   np.array(_lut('_E4M3_DECODE'), dtype=np.float64),
+            'e5m2_dec':   np.array(_lut('_E5M2_DECODE'), dtype=np.float64),
+            'fp16_mask':  np.array(_FP16_TRUNC_MASK, dtype=np.uint32),
+            'e4m3_enc':   np.array(_lut('_E4M3_ENCODE'), dtype=np.uint8),
+            'e5m2_enc':   np.array(_lut('_E5M2_ENCODE'), dtype=np.uint8),
+        }
+    return np, _numpy_tables
+
+def _as_float32(np, values):
+    """(mảng float gốc, mảng float32) - ép kiểu làm tròn như struct.pack('f'), tràn -> ±Inf."""
+    if isinstance(values, np.ndarray) and values.dtype == np.float32:
+        return values, values
+    f = np.asarray(values, dtype=np.float64)
+    with np.errstate(over='ignore', invalid='ignore'):
+        return f, f.astype(np.float32)
+
+def _float32_bits_array(np, values):
+    """(mảng float gốc, bit float32 dạng uint32) - ép kiểu làm tròn như struct.pack('f')."""
+    f, f32 = _as_float32(np, values)
+    bits32 = f32.view(np.uint32)
+    if f is f32:
+        # Đã là float32 (vd: view thanh ghi): dùng thẳng bit, chỉ bật bit quiet của NaN
+        # như khi đi qua double rồi struct.pack('f')
+        nan = f != f
+        if nan.any():
+            bits32 = np.where(nan, bits32 | 0x400000, bits32)
+    return f, bits32
+
+def _float16_truncated(np, t, values):
+    """(mảng float gốc, mảng float16 đã cắt cụt như float_to_bits16; ±0 / NaN chưa sửa)."""
+    f, f32 = _as_float32(np, values)
+    bits32 = f32.view(np.uint32)
+    with np.errstate(over='ignore', invalid='ignore'):
+        return f, (bits32 & t['fp16_mask'][bits32 >> 23]).view(np.float32).astype(np.float16)
+
+def bits_to_float16_array(bits):
+    np, t = _get_numpy_tables()
+    return t['fp16_dec'][np.asarray(bits, dtype=np.int64) & 0xFFFF]
+
+def bfloat16_to_float_array(bits):
+    np, t = _get_numpy_tables()
+    return t['bf16_dec'][np.asarray(bits, dtype=np.int64) & 0xFFFF]
+
+def bits_to_float8_e4m3_array(bits):
+    np, t = _get_numpy_tables()
+    return t['e4m3_dec'][np.asarray(bits, dtype=np.int64) & 0xFF]
+
+def bits_to_float8_e5m2_array(bits):
+    np, t = _get_numpy_tables()
+    return t['e5m2_dec'][np.asarray(bits, dtype=np.int64) & 0xFF]
+
+def float_to_bits16_array(values):
+    np, t = _get_numpy_tables()
+    f, half = _float16_truncated(np, t, values)
+    out = half.view(np.uint16)
+    nonzero = np.abs(f) > 0        # False cho ±0 (-> 0x0000 như bản vô hướng) và NaN
+    if not nonzero.all():
+        out = np.where(nonzero, out, np.where(f != f, 0x7E00, 0)).astype(np.uint16)
+    return out
+
+def quantize_float16_array(values):
+    """bits_to_float16(float_to_bits16(x)) cho cả mảng -> float64, không qua mẫu bit."""
+    np, t = _get_numpy_tables()
+    f, half = _float16_truncated(np, t, values)
+    out = half.astype(np.float64)
+    nonzero = np.abs(f) > 0
+    if not nonzero.all():
+        out = np.where(nonzero, out, np.where(f != f, math.nan, 0.0))
+    return out
+
+def float_to_bfloat16_array(values):
+    np, _ = _get_numpy_tables()
+    _, bits32 = _float32_bits_array(np, values)
+    # uint32 tràn vòng giống "& 0xFFFF" của bản vô hướng
+    return ((bits32 + (((bits32 >> 16) & 1) << 15)) >> 16).astype(np.uint16)
+
+def float_to_bits8_e4m3_array(values):
+    np, t = _get_numpy_tables()
+    f, f32 = _as_float32(np, values)        # NaN được sửa riêng: không cần bật bit quiet
+    out = t['e4m3_enc'][f32.view(np.uint32) >> 19]
+    nan = f != f
+    return np.where(nan, 0b10000000, out).astype(np.uint8) if nan.any() else out
+
+def float_to_bits8_e5m2_array(values):
+    np, t = _get_numpy_tables()
+    f, f32 = _as_float32(np, values)        # NaN được sửa riêng: không cần bật bit quiet
+    out = t['e5m2_enc'][f32.view(np.uint32) >> 20]
+    nan = f != f
+    return np.where(nan, 0b10000000, out).astype(np.uint8) if nan.any() else out
+
+# Hàm vô hướng -> biến thể theo mảng tương ứng
+ARRAY_CONVERTERS = {
+    bits_to_float16: bits_to_float16_array,
+    float_to_bits16: float_to_bits16_array,
+    bfloat16_to_float: bfloat16_to_float_array,
+    float_to_bfloat16: float_to_bfloat16_array,
+    bits_to_float8_e4m3: bits_to_float8_e4m3_array,
+    bits_to_float8_e5m2: bits_to_float8_e5m2_array,
+    float_to_bits8_e4m3: float_to_bits8_e4m3_array,
+    float_to_bits8_e5m2: float_to_bits8_e5m2_array,
+}
+
+def array_quantizer(float_to_bits, bits_to_float):
+    """Hàm mảng -> mảng float64 tương đương bits_to_float(float_to_bits(x)) từng phần tử
+    (làm tròn về độ chính xác của định dạng, như các engine vô hướng)."""
+    np, _ = _get_numpy_tables()
+    if float_to_bits is float_to_bits32:
+        def quantize(values):
+            with np.errstate(over='ignore', invalid='ignore'):
+                return np.asarray(values).astype(np.float32).astype(np.float64)
+        return quantize
+    if float_to_bits is float_to_bits16 and bits_to_float is bits_to_float16:
+        return quantize_float16_array
+    encode, decode = ARRAY_CONVERTERS[float_to_bits], ARRAY_CONVERTERS[bits_to_float]
+    return lambda values: decode(encode(values))
+
 # --- Bits -> Signed Int ---
 def bits_to_signed_int32(bits):
     bits &= 0xFFFFFFFF; return bits - 0x100000000 if bits & 0x80000000 else bits
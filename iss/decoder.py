@@ -0,0 +1,73 @@
+# iss/decoder.py
+"""
+Instruction predecoder.
+
+Machine code is decoded once (at load time) into a DecodedInstruction record
+holding every bit field as an integer, so the execution loop never slices the
+32-character binary string or calls int(..., 2) again.
+
+Bit layout (custom-1 matrix instructions):
+    31..28 | 27..26 | 25..23 | 22..20 | 19..18 | 17..15 | 14..12 | 11..10 | 9..7 | 6..0
+    func4  | uop    | ctrl   | ms2    | s_size | ms1    | func3  | d_size | md   | opcode
+                      [ rs2 (24..20) ] [ rs1 (19..15)   ]          [ rd (11..7)   ]
+"""
+
+
+class DecodedInstruction:
+    """One predecoded 32-bit instruction word (all fields are ints)."""
+
+    __slots__ = (
+        "word", "bits",
+        "opcode", "func3", "uop", "func4",
+        "md", "ms1", "ms2", "d_size", "s_size", "ctrl",
+        "rs1", "rs2", "rd", "imm10",
+    )
+
+    def __init__(self, word):
+        word &= 0xFFFFFFFF
+        self.word   = word
+        self.bits   = f"{word:032b}"        # Giữ lại chuỗi bit để in log
+
+        self.opcode = word & 0x7F           # bits 6-0
+        self.md     = (word >> 7) & 0x7     # bits 9-7
+        self.d_size = (word >> 10) & 0x3    # bits 11-10
+        self.func3  = (word >> 12) & 0x7    # bits 14-12
+        self.ms1    = (word >> 15) & 0x7    # bits 17-15
+        self.s_size = (word >> 18) & 0x3    # bits 19-18
+        self.ms2    = (word >> 20) & 0x7    # bits 22-20
+        self.ctrl   = (word >> 23) & 0x7    # bits 25-23 (ctrl / size_sup / imm3)
+        self.uop    = (word >> 26) & 0x3    # bits 27-26
+        self.func4  = (word >> 28) & 0xF    # bits 31-28
+
+        # GPR views of the same bits
+        self.rs1    = (word >> 15) & 0x1F   # bits 19-15
+        self.rs2    = (word >> 20) & 0x1F   # bits 24-20
+        self.rd     = (word >> 7) & 0x1F    # bits 11-7
+        self.imm10  = (word >> 15) & 0x3FF  # bits 24-15 (msettile*i)
+
+    def __repr__(self):
+        return f"DecodedInstruction(0b{self.bits})"
+
+
+def decode_instruction(instruction):
+    """Decode one instruction given as a 32-bit binary string, an int, or an
+    already decoded record."""
+    if isinstance(instruction, DecodedInstruction):
+        return instruction
+    if isinstance(instruction, str):
+        return DecodedInstruction(int(instruction.strip(), 2))
+    return DecodedInstruction(int(instruction))
+
+
+def predecode_program(machine_code_list):
+    """Decode a whole program once. Identical words share one record, so the
+    result is a per-PC list (index = pc // 4) backed by a small word cache."""
+    cache = {}
+    decoded = []
+    for instruction in machine_code_list:
+        record = cache.get(instruction)
+        if record is None:
+            record = decode_instruction(instruction)
+            cache[instruction] = record
+        decoded.append(record)
+    return decoded
@@ -10,6 +10,47 @@ ARLEN = (TLEN // TRLEN) * ELEN
 ALEN = ARLEN * ROWNUM
 ELEMENTS_PER_ROW_TR = TRLEN // ELEN
 
+
+class Geometry:
+    """
+    Kích thước thanh ghi ma trận của một Simulator (mặc định = các hằng số ở trên).
+
+        Simulator(geometry=Geometry(tlen=2048))            # 16 hàng x 4 phần tử 32-bit
+        Simulator(geometry=Geometry(tlen=4096, trlen=256)) # 16 hàng x 8 phần tử 32-bit
+
+    TRLEN phải chia hết TLEN và ELEN phải chia hết TRLEN. Mỗi khe lưu int32 / fp32
+    (xem MatrixRegisterFile) nên hiện chỉ hỗ trợ ELEN = 32.
+    ACC là alias của tr4-tr7 nên kích thước accumulator đi theo TLEN.
+    """
+
+    def __init__(self, tlen=TLEN, trlen=TRLEN, elen=ELEN):
+        if elen != 32:
+            raise ValueError(f"Unsupported ELEN={elen} (only 32-bit slots are implemented)")
+        if trlen <= 0 or trlen % elen or tlen <= 0 or tlen % trlen:
+            raise ValueError(f"Invalid geometry TLEN={tlen}, TRLEN={trlen}, ELEN={elen}: "
+                             "TRLEN must be a multiple of ELEN and TLEN a multiple of TRLEN")
+        self.tlen = tlen
+        self.trlen = trlen
+        self.elen = elen
+        self.rownum = tlen // trlen
+        self.elements_per_row = trlen // elen
+        self.slot_bytes = elen // 8
+        self.row_bytes = trlen // 8
+        self.reg_bytes = tlen // 8
+
+    def __eq__(self, other):
+        return isinstance(other, Geometry) and \
+            (self.tlen, self.trlen, self.elen) == (other.tlen, other.trlen, other.elen)
+
+    def __hash__(self):
+        return hash((self.tlen, self.trlen, self.elen))
+
+    def __repr__(self):
+        return f"Geometry(tlen={self.tlen}, trlen={self.trlen}, elen={self.elen})"
+
+
+DEFAULT_GEOMETRY = Geometry()
+
 # ------------------------------------------------------------------------
 # BẢNG ÁNH XẠ TÊN THANH GHI
 # ------------------------------------------------------------------------
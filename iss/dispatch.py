@@ -0,0 +1,136 @@
+# iss/dispatch.py
+"""
+Table-driven instruction dispatch.
+
+Each decoded instruction maps to a dispatch key: the instruction word masked
+down to the bits that select a handler for its group (opcode/func3/uop pick
+the group; each group adds the fields its variants depend on). The table maps
+that key to (group label, handler), where handler is a bound MatrixAccelerator
+method with all variant parameters already resolved (functools.partial).
+
+The table is pre-populated from definitions.ALL_INSTRUCTIONS; encodings not
+listed there are resolved once on first use and cached, so dispatch is two
+dict lookups per instruction regardless of how many encodings exist.
+"""
+from functools import partial
+
+from .decoder import DecodedInstruction
+from .definitions import ALL_INSTRUCTIONS
+
+MATRIX_OPCODE = 0b0101011
+
+# --- Field masks (word-level) ---
+OPCODE_MASK = 0x7F
+FUNC3_MASK  = 0x7 << 12
+UOP_MASK    = 0x3 << 26
+FUNC4_MASK  = 0xF << 28
+CTRL_MASK   = 0x7 << 23     # ctrl / size_sup / imm3 (bits 25-23)
+BIT25_MASK  = 0x1 << 25     # ls / ctrl25
+S_SIZE_MASK = 0x3 << 18
+D_SIZE_MASK = 0x3 << 10
+
+# opcode + func3 + uop chọn nhóm lệnh
+SELECT_MASK = OPCODE_MASK | FUNC3_MASK | UOP_MASK
+
+# Group: (label, resolver method name, key mask)
+_FUNC3_000_GROUPS = {
+    0b00: ("Config",     "resolve_config",    SELECT_MASK | FUNC4_MASK | BIT25_MASK),
+    0b01: ("Load/Store", "resolve_load_store", SELECT_MASK | FUNC4_MASK | BIT25_MASK | D_SIZE_MASK),
+    0b10: ("Matmul",     "resolve_matmul",    SELECT_MASK | FUNC4_MASK | CTRL_MASK | S_SIZE_MASK | D_SIZE_MASK),
+    0b11: ("MISC",       "resolve_misc",      SELECT_MASK | FUNC4_MASK | S_SIZE_MASK | D_SIZE_MASK),
+}
+_ELEMENT_WISE_GROUP = ("Element-Wise", "resolve_element_wise", SELECT_MASK | FUNC4_MASK | S_SIZE_MASK | D_SIZE_MASK)
+
+
+def definition_word(info):
+    """Build a template instruction word from an ALL_INSTRUCTIONS entry
+    (operand fields left as zero)."""
+    word  = info.get("major_opcode", info.get("opcode", 0)) & 0x7F
+    word |= (info.get("func3", 0) & 0x7) << 12
+    word |= (info.get("uop", 0) & 0x3) << 26
+    word |= (info.get("func", 0) & 0xF) << 28
+    word |= (info.get("s_size", 0) & 0x3) << 18
+    word |= (info.get("d_size", 0) & 0x3) << 10
+    word |= (info.get("ms2", 0) & 0x7) << 20
+    if info.get("instr_type") == "CONFIG":
+        word |= (info.get("ctrl", 0) & 0x1) << 25           # ctrl là bit 25
+    else:
+        word |= (info.get("ctrl", 0) & 0x7) << 23           # ctrl / imm3 (bits 25-23)
+    word |= (info.get("size_sup", 0) & 0x7) << 23
+    word |= (info.get("ls", 0) & 0x1) << 25
+    word |= (info.get("ctrl25", 0) & 0x1) << 25
+    word |= (info.get("ctrl24_23", 0) & 0x3) << 23
+    return word
+
+
+def definition_mask(info):
+    """Mask of the bits an ALL_INSTRUCTIONS entry fixes (fields present in the
+    entry), so that word & definition_mask(info) == definition_word(info)
+    for every encoding of that instruction."""
+    mask = OPCODE_MASK
+    if "func3" in info:
+        mask |= FUNC3_MASK
+    if "uop" in info:
+        mask |= UOP_MASK
+    if "func" in info:
+        mask |= FUNC4_MASK
+    if "s_size" in info:
+        mask |= S_SIZE_MASK
+    if "d_size" in info:
+        mask |= D_SIZE_MASK
+    if "ms2" in info:
+        mask |= 0x7 << 20
+    if "ctrl" in info:
+        mask |= BIT25_MASK if info.get("instr_type") == "CONFIG" else CTRL_MASK
+    if "size_sup" in info:
+        mask |= CTRL_MASK
+    if "ls" in info or "ctrl25" in info:
+        mask |= BIT25_MASK
+    if "ctrl24_23" in info:
+        mask |= 0x3 << 23
+    return mask
+
+
+def _unknown_group(instruction, log, func3):
+    log.error("  -> ERROR: Unknown custom-1 instruction group (func3={:03b})", func3)
+
+
+def _unknown_opcode(instruction, log, opcode):
+    log.error("  -> ERROR: Unknown or unsupported instruction opcode: {:07b}", opcode)
+
+
+class DispatchTable:
+    """Maps decoded instructions to (group label, bound handler)."""
+
+    def __init__(self, accelerator):
+        self.accelerator = accelerator
+        self.groups = {}
+        for uop, group in _FUNC3_000_GROUPS.items():
+            self.groups[MATRIX_OPCODE | (0b000 << 12) | (uop << 26)] = group
+        for uop in range(4):
+            self.groups[MATRIX_OPCODE | (0b001 << 12) | (uop << 26)] = _ELEMENT_WISE_GROUP
+        self.table = {}
+
+        # Pre-populate từ ALL_INSTRUCTIONS
+        for info in ALL_INSTRUCTIONS.values():
+            self.lookup(DecodedInstruction(definition_word(info)))
+
+    def lookup(self, instruction):
+        """Return (label, handler) for a DecodedInstruction. label is None for
+        encodings outside the matrix groups."""
+        word = instruction.word
+        group = self.groups.get(word & SELECT_MASK)
+        key = word & (group[2] if group is not None else SELECT_MASK)
+        entry = self.table.get(key)
+        if entry is None:
+            entry = self._resolve(instruction, group)
+            self.table[key] = entry
+        return entry
+
+    def _resolve(self, instruction, group):
+        if group is not None:
+            label, resolver, _ = group
+            return label, getattr(self.accelerator, resolver)(instruction)
+        if instruction.opcode == MATRIX_OPCODE:
+            return None, partial(_unknown_group, log=self.accelerator.log, func3=instruction.func3)
+        return None, partial(_unknown_opcode, log=self.accelerator.log, opcode=instruction.opcode)
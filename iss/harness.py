@@ -0,0 +1,163 @@
+# iss/harness.py
+"""
+Harness chạy assembler + simulator trong cùng tiến trình (không subprocess, không
+đọc/ghi đĩa) cho các script test.
+
+Hai cách dùng:
+
+1. Python API - dựng trạng thái, chạy và kiểm tra trực tiếp trên Simulator:
+
+    h = SimHarness()
+    h.set_gpr(1, 0x100)
+    h.write_memory(0x100, data)
+    h.run("msettilemi 4\\nmlae32 tr0, (x1), x2")
+    h.matrix("tr0", "float")
+
+2. Thay cho luồng file cũ (assembly.txt -> assembler.py -> run_simulator -> iss/*.txt):
+   open()/exists() thao tác trên các file trạng thái ảo trong bộ nhớ (StateFiles),
+   assemble_file() tương đương `python assembler.py`, run_files() tương đương
+   `python -m iss.run_simulator`. Logic kiểm tra của script giữ nguyên.
+"""
+import io
+import contextlib
+from pathlib import Path
+
+from .iss import Simulator
+from .state_manager import StateFiles, load_state_from_files, save_state_to_files
+from .definitions import MATRIX_REG_MAP
+from assembler.assembler import Assembler
+
+STATE_FILE_NAMES = ["gpr.txt", "config.txt", "status.txt", "matrix.txt", "acc.txt",
+                    "matrix_float.txt", "acc_float.txt", "memory.txt"]
+
+
+class SimHarness:
+    """Một Simulator + Assembler trong tiến trình, với các file trạng thái ảo."""
+
+    def __init__(self, state_dir=None, log_level="silent", **sim_kwargs):
+        """
+        state_dir: nạp sẵn các file iss/*.txt từ thư mục này (bản sao trong bộ nhớ)
+        log_level: cấp độ log của simulator khi chạy (mặc định silent)
+        sim_kwargs: truyền tiếp cho Simulator (matmul_engine, loadstore_engine, memory_size, ...)
+        """
+        self.sim_kwargs = dict(log_level=log_level, **sim_kwargs)
+        self.files = StateFiles.from_dir(state_dir, STATE_FILE_NAMES) if state_dir is not None else StateFiles()
+        self.assembler = Assembler()
+        self.sim = Simulator(**self.sim_kwargs)
+        self.program = []
+        self.output = ""    # stdout của lần assemble/run gần nhất (log simulator, thông báo nạp/lưu)
+
+    # -------------------------------------------------------------------------
+    # Python API
+    # -------------------------------------------------------------------------
+    def reset(self):
+        """Tạo Simulator mới (mọi thanh ghi và RAM về 0)."""
+        self.sim = Simulator(**self.sim_kwargs)
+        return self.sim
+
+    def assemble(self, source):
+        """Dịch mã assembly (chuỗi nhiều dòng) thành danh sách mã máy 32-bit.
+        Ném AssemblyError (ValueError) kèm số dòng nếu có lỗi."""
+        return self.assembler.assemble(source).tolist()
+
+    def run(self, source=None):
+        """Chạy chương trình (assembly hoặc danh sách mã máy; mặc định: self.program) trên self.sim."""
+        if source is not None:
+            self.program = self.assemble(source) if isinstance(source, str) else list(source)
+        sim = self.sim
+        sim.load_program(self.program)
+        sim.run()
+        return sim
+
+    def checkpoint(self):
+        """Chụp trạng thái của self.sim (xem Simulator.checkpoint): dựng trạng thái gốc một lần,
+        rồi restore() trước mỗi test case thay vì dựng lại."""
+        return self.sim.checkpoint()
+
+    def restore(self, checkpoint):
+        self.sim.restore(checkpoint)
+
+    def set_gpr(self, index, value):
+        self.sim.gpr.write(index, value)
+
+    def gpr(self, index):
+        return self.sim.gpr.read(index)
+
+    def set_csr(self, name, value):
+        self.sim.csr.write(name, value)
+
+    def csr(self, name):
+        return self.sim.csr.read(name)
+
+    def write_memory(self, address, data):
+        self.sim.memory.write(address, bytes(data))
+
+    def read_memory(self, address, num_bytes):
+        return bytes(self.sim.memory.read(address, num_bytes))
+
+    def set_matrix(self, reg, values, kind="int"):
+        """Ghi ma trận (list các hàng) vào thanh ghi 'tr0'..'tr7' / 'acc0'..'acc3' (hoặc chỉ số vật lý)."""
+        rows = self._register(reg, kind)
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                rows[i][j] = value
+
+    def matrix(self, reg, kind="int"):
+        """Bản sao nội dung thanh ghi dưới dạng list các hàng."""
+        return [list(row) for row in self._register(reg, kind)]
+
+    def _register(self, reg, kind):
+        index = MATRIX_REG_MAP[reg] if isinstance(reg, str) else reg
+        regs = self.sim.matrix_accelerator.regs
+        if kind == "int":
+            return regs.int_regs[index]
+        if kind == "float":
+            return regs.float_regs[index]
+        raise ValueError(f"kind phải là 'int' hoặc 'float', nhận {kind!r}")
+
+    # -------------------------------------------------------------------------
+    # File trạng thái ảo (thay cho iss/*.txt, assembly.txt, machine_code.txt)
+    # -------------------------------------------------------------------------
+    def open(self, path, mode="r", encoding=None):
+        """Như open() nhưng trên file ảo; chỉ dùng tên file (iss_dir / 'acc.txt' -> 'acc.txt')."""
+        return self.files.open(Path(path).name, mode)
+
+    def exists(self, path):
+        return Path(path).name in self.files
+
+    def assemble_file(self, path="assembly.txt"):
+        """Tương đương `python assembler.py`: dịch file assembly ảo vào self.program.
+        Trả về False nếu có lỗi (thông báo nằm trong self.output)."""
+        try:
+            with self.open(path) as f:
+                self.program = self.assemble(f.read())
+        except (ValueError, FileNotFoundError) as e:
+            self.output = f"Assembly failed: {e}\n"
+            return False
+        self.output = ""
+        return True
+
+    def run_files(self, log_level=None):
+        """Tương đương `python -m iss.run_simulator`: Simulator mới nạp trạng thái từ các
+        file ảo, chạy self.program rồi ghi trạng thái cuối trở lại. Trả về False nếu lỗi.
+        log_level: ghi đè cấp độ log cho lần chạy này (vd 'debug' để xem log đầy đủ)."""
+        buffer = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buffer):
+                sim = self.reset()
+                if log_level is not None:
+                    sim.log.set_level(log_level)
+                load_state_from_files(sim, self.files)
+                if self.program:
+                    self.run()
+                    save_state_to_files(sim, self.files)
+            return True
+        except Exception as e:
+            buffer.write(f"{type(e).__name__}: {e}\n")
+            return False
+        finally:
+            self.output = buffer.getvalue()
+
+    def save_files(self, state_dir):
+        """Ghi các file trạng thái ảo (iss/*.txt) ra thư mục thật để xem lại sau khi test."""
+        StateFiles({name: text for name, text in self.files.items() if name in STATE_FILE_NAMES}).to_dir(state_dir)
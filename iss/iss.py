@@ -1,115 +1,312 @@
-from .matrix_input import *
-
 # Import các thành phần (components)
 from .components import RegisterFile, CSRFile, MatrixAccelerator, MainMemory
+from .decoder import DecodedInstruction, decode_instruction, predecode_program
+from .dispatch import DispatchTable
+from .logger import SimLogger, DEBUG
+from .definitions import DEFAULT_GEOMETRY
+from .blocks import compile_block, block_guard, worth_compiling
+
+class Checkpoint:
+    """Trạng thái đã chụp bằng Simulator.checkpoint(): PC, GPR, CSR, hai bank thanh ghi ma trận,
+    metadata acc_dest_bits và RAM (MainMemory fork, dùng chung trang copy-on-write)."""
+
+    __slots__ = ("geometry", "pc", "gpr", "csrs", "int_bank", "float_bank",
+                 "acc_dest_bits_float", "acc_dest_bits_int", "memory")
+
+    def __init__(self, geometry, pc, gpr, csrs, int_bank, float_bank,
+                 acc_dest_bits_float, acc_dest_bits_int, memory):
+        self.geometry = geometry
+        self.pc = pc
+        self.gpr = gpr
+        self.csrs = csrs
+        self.int_bank = int_bank
+        self.float_bank = float_bank
+        self.acc_dest_bits_float = acc_dest_bits_float
+        self.acc_dest_bits_int = acc_dest_bits_int
+        self.memory = memory
+
+    def __repr__(self):
+        return f"Checkpoint(pc=0x{self.pc:x}, pages={len(self.memory.pages)})"
+
+
+class StateChanges:
+    """Phần trạng thái khác với một checkpoint (Simulator.changes_since): chỉ số GPR, tên CSR,
+    chỉ số thanh ghi ma trận vật lý 0-7 theo bank (acc đổi acc_dest_bits cũng tính) và chỉ số
+    trang RAM. Dùng để chỉ lưu phần đã đổi (save_state_to_files(since=...), delta snapshot)."""
+
+    __slots__ = ("gpr", "csrs", "int_regs", "float_regs", "pages")
+
+    def __init__(self, gpr, csrs, int_regs, float_regs, pages):
+        self.gpr = gpr
+        self.csrs = csrs
+        self.int_regs = int_regs
+        self.float_regs = float_regs
+        self.pages = pages
+
+    def __bool__(self):
+        return bool(self.gpr or self.csrs or self.int_regs or self.float_regs or self.pages)
+
+    def __repr__(self):
+        return (f"StateChanges(gpr={self.gpr}, csrs={sorted(self.csrs)}, int_regs={self.int_regs}, "
+                f"float_regs={self.float_regs}, pages={len(self.pages)})")
+
+
+def _changed_registers(bank, old_bank, reg_bytes, dest_bits, old_dest_bits):
+    """Chỉ số thanh ghi có block reg_bytes khác nhau; acc (4-7) cũng tính khi dest_bits đổi."""
+    changed = []
+    for r in range(len(bank) // reg_bytes):
+        start = r * reg_bytes
+        if (bank[start:start + reg_bytes] != old_bank[start:start + reg_bytes]
+                or (r >= 4 and dest_bits[r - 4] != old_dest_bits[r - 4])):
+            changed.append(r)
+    return changed
+
 
 class Simulator:
-    def __init__(self):
-        """Khởi tạo tất cả các thành phần phần cứng trong RAM."""
+    def __init__(self, log_level=DEBUG, matmul_engine="reference", loadstore_engine="reference",
+                 memory_size=1024*1024, memory=None, timing_model=None, geometry=None,
+                 compile_blocks=True, elementwise_engine="reference"):
+        """Khởi tạo tất cả các thành phần phần cứng trong RAM.
+        log_level: 'silent' | 'error' | 'warning' | 'info' | 'debug' (mặc định, in mọi thứ)
+        hoặc hằng số tương ứng trong logger.py.
+        matmul_engine: 'reference' (vòng lặp Python) | 'numpy' (vector hóa, cần numpy).
+        loadstore_engine: 'reference' (từng phần tử) | 'numpy' (copy cả tile, cần numpy)
+        | 'struct' (từng dòng bằng struct.Struct dựng sẵn, không cần numpy).
+        elementwise_engine: 'reference' (từng phần tử) | 'numpy' (cả tile một lần, cần numpy;
+        cùng bão hòa / xmsat / làm tròn fp16-fp32 như bản tham chiếu).
+        memory_size: kích thước không gian địa chỉ RAM (byte, mặc định 1 MB; vd 4 << 30 cho 4 GB),
+        trang chỉ được cấp phát khi bị ghi.
+        memory: MainMemory có sẵn để dùng thay vì tạo mới, vd other_sim.memory.fork()
+        (dùng chung trang copy-on-write).
+        timing_model: timing.TimingModel gắn vào MatrixAccelerator để ước lượng số chu kỳ
+        (None: chỉ mô phỏng chức năng).
+        geometry: definitions.Geometry (TLEN/TRLEN/ELEN) của thanh ghi ma trận
+        (None: mặc định 512/128/32).
+        compile_blocks: biên dịch khối lệnh thẳng khi chạy lần đầu và dùng lại ở các lần
+        sau (blocks.py); chỉ áp dụng khi log dưới mức info, không đo đạc và có engine
+        numpy / struct (với engine tham chiếu khối không nhanh hơn nên không biên dịch)."""
+        self.log = SimLogger(log_level)
+        self.geometry = geometry if geometry is not None else DEFAULT_GEOMETRY
         self.pc = 0
         self.instructions = []
+        self.decoded = []   # Cache giải mã theo PC (index = pc // 4)
+        self.handlers = []  # (label, handler) đã tra bảng theo PC
+        self.profiler = None  # Profiler (profiler.py) để đếm / đo thời gian / hook; None = tắt
+        self.compile_blocks = compile_blocks
+        self.blocks = {}      # Cache khối đã biên dịch (blocks.py), xóa khi nạp chương trình khác
+        self.block_guards = {}  # PC -> các CSR M/N/K làm guard của khối (blocks.block_guard)
+        self._program_words = ()
         
         # 1. Tạo các đối tượng thành phần
         self.gpr = RegisterFile()
-        self.csr = CSRFile()
-        self.memory = MainMemory()
+        self.csr = CSRFile(log=self.log, geometry=self.geometry)
+        self.memory = memory if memory is not None else MainMemory(memory_size, log=self.log)
         # 2. Tạo Bộ tăng tốc và inject các tham chiếu
         #    để nó có thể giao tiếp với GPR, CSR và Memory
-        self.matrix_accelerator = MatrixAccelerator(self.csr, self.gpr, self.memory)
+        self.matrix_accelerator = MatrixAccelerator(self.csr, self.gpr, self.memory, log=self.log,
+                                                    matmul_engine=matmul_engine,
+                                                    loadstore_engine=loadstore_engine,
+                                                    elementwise_engine=elementwise_engine,
+                                                    timing=timing_model,
+                                                    geometry=self.geometry)
+        # 3. Bảng dispatch dựng sẵn từ ALL_INSTRUCTIONS
+        self.dispatch = DispatchTable(self.matrix_accelerator)
 
     def load_program(self, machine_code_list):
-        """Nạp mã máy (danh sách các chuỗi 32-bit) vào bộ nhớ lệnh."""
+        """Nạp mã máy (danh sách các chuỗi 32-bit hoặc số nguyên) vào bộ nhớ lệnh.
+        Mỗi lệnh được giải mã một lần duy nhất tại đây (predecode)."""
         self.instructions = machine_code_list
+        self.decoded = predecode_program(machine_code_list)
+        self.handlers = [self.dispatch.lookup(instruction) for instruction in self.decoded]
+        # Cùng chương trình (vd chạy lại một kernel) thì giữ các khối đã biên dịch
+        words = tuple(instruction.word for instruction in self.decoded)
+        if words != self._program_words:
+            self.blocks.clear()
+            self.block_guards.clear()
+            self._program_words = words
         self.pc = 0 # Reset PC về 0
 
+    def checkpoint(self):
+        """Chụp trạng thái hiện tại (PC, GPR, CSR, thanh ghi ma trận, RAM) để restore() sau này.
+        RAM không bị sao chép: checkpoint giữ một fork() dùng chung trang copy-on-write, trang
+        chỉ bị sao chép khi simulator ghi vào nó. Chương trình đã nạp không thuộc checkpoint."""
+        ma = self.matrix_accelerator
+        return Checkpoint(self.geometry, self.pc, list(self.gpr.registers), dict(self.csr.csrs),
+                          bytes(ma.regs.int_bank), bytes(ma.regs.float_bank),
+                          list(ma.acc_dest_bits_float), list(ma.acc_dest_bits_int),
+                          self.memory.fork())
+
+    def changes_since(self, checkpoint):
+        """Những gì đã đổi so với checkpoint -> StateChanges. Rẻ: GPR / CSR / 8 block thanh ghi
+        so trực tiếp, RAM chỉ so các trang đã bị ghi từ lúc chụp (xem MainMemory.changed_pages)."""
+        if checkpoint.geometry != self.geometry:
+            raise ValueError(f"Checkpoint geometry {checkpoint.geometry!r} != {self.geometry!r}")
+        ma = self.matrix_accelerator
+        csrs, old_csrs = self.csr.csrs, checkpoint.csrs
+        reg_bytes = self.geometry.reg_bytes
+        return StateChanges(
+            [i for i, (value, old) in enumerate(zip(self.gpr.registers, checkpoint.gpr)) if value != old],
+            {name for name in csrs.keys() | old_csrs.keys() if csrs.get(name) != old_csrs.get(name)},
+            _changed_registers(ma.regs.int_bank, checkpoint.int_bank, reg_bytes,
+                               ma.acc_dest_bits_int, checkpoint.acc_dest_bits_int),
+            _changed_registers(ma.regs.float_bank, checkpoint.float_bank, reg_bytes,
+                               ma.acc_dest_bits_float, checkpoint.acc_dest_bits_float),
+            self.memory.changed_pages(checkpoint.memory))
+
+    def restore(self, checkpoint):
+        """Khôi phục trạng thái từ checkpoint() - dùng lại được nhiều lần, kể cả trên Simulator
+        khác cùng geometry và kích thước RAM. Ghi tại chỗ (cùng list GPR, dict CSR, bank và
+        MainMemory) nên view thanh ghi và các khối đã biên dịch vẫn hợp lệ."""
+        if checkpoint.geometry != self.geometry:
+            raise ValueError(f"Checkpoint geometry {checkpoint.geometry!r} != {self.geometry!r}")
+        ma = self.matrix_accelerator
+        self.memory.restore(checkpoint.memory)
+        self.pc = checkpoint.pc
+        self.gpr.registers[:] = checkpoint.gpr
+        self.csr.csrs.clear()
+        self.csr.csrs.update(checkpoint.csrs)
+        ma.regs.int_bank[:] = checkpoint.int_bank
+        ma.regs.float_bank[:] = checkpoint.float_bank
+        ma.acc_dest_bits_float[:] = checkpoint.acc_dest_bits_float
+        ma.acc_dest_bits_int[:] = checkpoint.acc_dest_bits_int
+
     def run(self):
         """Vòng lặp CPU chính, chạy trong RAM."""
-        print(f"\n--- Bắt đầu Vòng lặp Mô phỏng (Chạy trong RAM) ---")
+        log = self.log
+        log.info("\n--- Bắt đầu Vòng lặp Mô phỏng (Chạy trong RAM) ---")
+        if self.profiler is not None or self.matrix_accelerator.timing is not None:
+            from .profiler import Profiler   # Chỉ cần khi đo đạc (giữ import iss nhẹ)
+            self._run_profiled(self.profiler if self.profiler is not None else Profiler(timing=False))
+            log.info("--- Vòng lặp Mô phỏng Kết thúc ---")
+            return
+        if self.compile_blocks and not log.info_enabled and worth_compiling(self.matrix_accelerator):
+            self._run_blocks()
+            return
         while True:
             # 1. Tính toán địa chỉ lệnh
             if self.pc < 0:
-                print(f"  [Error] PC âm: {self.pc}. Dừng mô phỏng.")
+                log.error("  [Error] PC âm: {}. Dừng mô phỏng.", self.pc)
                 break
             instr_index = self.pc // 4 # Mỗi lệnh 4 bytes
 
             # 2. Kiểm tra kết thúc chương trình
-            if instr_index >= len(self.instructions):
+            if instr_index >= len(self.decoded):
                 break
             
-            # 3. Nạp lệnh
-            instruction = self.instructions[instr_index]
-            print(f"\nPC: 0x{self.pc:08x} | Executing: {instruction}")
+            # 3. Nạp lệnh (đã giải mã sẵn)
+            instruction = self.decoded[instr_index]
+            if log.info_enabled:
+                log.info("\nPC: 0x{:08x} | Executing: {}", self.pc, instruction.bits)
             
             # 4. Giữ PC cũ để kiểm tra lệnh nhảy
             old_pc = self.pc
             
             # 5. Giải mã và Thực thi
-            self.decode_and_execute(instruction)
+            self.decode_and_execute(instruction, self.handlers[instr_index])
             
             # 6. Cập nhật PC (chỉ khi lệnh không phải là lệnh nhảy)
             if self.pc == old_pc:
                 self.pc += 4
         
-        print("--- Vòng lặp Mô phỏng Kết thúc ---")
+        log.info("--- Vòng lặp Mô phỏng Kết thúc ---")
+
+    def _run_profiled(self, profiler):
+        """Vòng lặp của run() có đo đạc: đếm lệnh / phần tử, đo thời gian handler, gọi hook,
+        ước lượng chu kỳ nếu MatrixAccelerator có mô hình thời gian."""
+        log = self.log
+        entries = profiler.prepare(self.decoded)
+        counts, times, elements = profiler.counts, profiler.times, profiler.elements
+        before, after = profiler.before, profiler.after
+        clock = profiler.clock if profiler.timing else None
+        csr = self.csr
+        timing = self.matrix_accelerator.timing
+        while True:
+            if self.pc < 0:
+                log.error("  [Error] PC âm: {}. Dừng mô phỏng.", self.pc)
+                break
+            instr_index = self.pc // 4
+            if instr_index >= len(self.decoded):
+                break
+
+            instruction = self.decoded[instr_index]
+            if log.info_enabled:
+                log.info("\nPC: 0x{:08x} | Executing: {}", self.pc, instruction.bits)
+            old_pc = self.pc
+            mnemonic, count_elements = entries[instr_index]
+            counts[mnemonic] += 1
+            elements[mnemonic] += count_elements(csr)
+
+            if timing is not None:
+                timing.account(self, old_pc, instruction, mnemonic)
+            if before is not None:
+                before(self, old_pc, instruction, mnemonic)
+            if clock is not None:
+                start = clock()
+                self.decode_and_execute(instruction, self.handlers[instr_index])
+                times[mnemonic] += clock() - start
+            else:
+                self.decode_and_execute(instruction, self.handlers[instr_index])
+            if after is not None:
+                after(self, old_pc, instruction, mnemonic)
+
+            if self.pc == old_pc:
+                self.pc += 4
+
+    def _run_blocks(self):
+        """Vòng lặp của run() theo khối đã biên dịch (blocks.py): mỗi khối được tra cache
+        theo PC + guard (M/N/K lúc vào khối mà khối đọc), biên dịch nếu chưa có, rồi chạy tuần tự các bước."""
+        log = self.log
+        csrs = self.csr.csrs
+        blocks = self.blocks
+        guards = self.block_guards
+        accelerator = self.matrix_accelerator
+        engines = (accelerator.matmul_engine, accelerator.loadstore_engine, accelerator.elementwise_engine)
+        num_instructions = len(self.decoded)
+        while True:
+            pc = self.pc
+            if pc < 0:
+                log.error("  [Error] PC âm: {}. Dừng mô phỏng.", pc)
+                break
+            if pc // 4 >= num_instructions:
+                break
+            guard = guards.get(pc)
+            if guard is None:
+                guard = guards[pc] = block_guard(self.decoded, self.handlers, pc)
+            key = (pc, engines, tuple(csrs[name] for name in guard))
+            block = blocks.get(key)
+            if block is None:
+                block = blocks[key] = compile_block(self, pc)
+            step_pc = pc
+            try:
+                for step_pc, step in block.steps:
+                    step()
+            except BaseException:
+                self.pc = step_pc   # Như vòng lặp thông dịch: PC dừng ở lệnh gây lỗi
+                raise
+            if self.pc == pc:
+                self.pc = pc + 4 * block.length
 
     # --- (SỬA LỖI 1: HÀM NÀY PHẢI NẰM BÊN TRONG CLASS SIMULATOR) ---
-    def decode_and_execute(self, instruction):
+    def decode_and_execute(self, instruction, entry=None):
             """
             Bộ điều phối (Dispatcher) của CPU.
-            Gọi đúng phương thức của thành phần dựa trên opcode.
+            Tra bảng dispatch (xem dispatch.py) để lấy handler đã resolve sẵn.
+            `instruction` là DecodedInstruction (hoặc chuỗi bit / số nguyên, sẽ được giải mã).
+            `entry` là (label, handler) đã tra trước (nếu có).
             """
-            # --- 1. Trích xuất các trường bit chính ---
-            opcode = instruction[25:32]      # bits 6-0
-            func3  = instruction[17:20]      # bits 14-12
-            uop    = instruction[4:6]        # bits 27-26
-            func4  = instruction[0:4]        # bits 31-28
-            
-            # Chỉ trích xuất d_size cho lệnh Load/Store (vì hàm đó cần)
-            d_size_str = instruction[20:22]      # bits 11-10
+            if not isinstance(instruction, DecodedInstruction):
+                instruction = decode_instruction(instruction)
 
-            print(f"  [Debug] opcode: {opcode}, func3: {func3}, uop: {uop}, func4: {func4}")
-            
-            # --- 2. Logic Điều phối (Dispatch) ---
+            # --- 1. Các trường bit chính (đã giải mã sẵn) ---
+            log = self.log
+            if log.debug_enabled:
+                log.debug("  [Debug] opcode: {:07b}, func3: {:03b}, uop: {:02b}, func4: {:04b}",
+                          instruction.opcode, instruction.func3, instruction.uop, instruction.func4)
             
-            # Opcode cho các lệnh Matrix (custom-1)
-            if opcode == "0101011":
-
-                # --- NHÓM LỆNH func3 = 000 ---
-                if func3 == "000":
-                    
-                    # A. CONFIG (uop = 00)
-                    if uop == "00":
-                        print("  -> Dispatching to: MatrixAccelerator (Config)")
-                        self.matrix_accelerator.execute_config(instruction)
-                    
-                    # B. LOAD/STORE (uop = 01)
-                    elif uop == "01":
-                        print("  -> Dispatching to: MatrixAccelerator (Load/Store)")
-                        self.matrix_accelerator.execute_load_store(instruction)
-
-                    # C. MATMUL (uop = 10)
-                    elif uop == "10":
-                        print("  -> Dispatching to: MatrixAccelerator (Matmul)")
-                        # GỌI HÀM THEO YÊU CẦU CỦA BẠN (chỉ 1 tham số)
-                        self.matrix_accelerator.execute_matmul(instruction)
-
-                    # D. MISC (uop = 11)
-                    elif uop == "11":
-                        print("  -> Dispatching to: MatrixAccelerator (MISC)")
-                        # Gọi hàm placeholder
-                        self.matrix_accelerator.execute_misc(instruction)
-
-                    else:
-                        print(f"  -> ERROR: Unknown custom-1 group (func3=000, uop={uop})")
-
-                # --- NHÓM LỆNH func3 = 001 (Element-Wise) ---
-                elif func3 == "001":
-                    print("  -> Dispatching to: MatrixAccelerator (Element-Wise)")
-                    # Gọi hàm placeholder
-                    self.matrix_accelerator.execute_element_wise(instruction)
-
-                else:
-                    print(f"  -> ERROR: Unknown custom-1 instruction group (func3={func3})")
-            
-            else:
-                print(f"  -> ERROR: Unknown or unsupported instruction opcode: {opcode}")
\ No newline at end of file
+            # --- 2. Điều phối (Dispatch) qua bảng ---
+            if entry is None:
+                entry = self.dispatch.lookup(instruction)
+            label, handler = entry
+            if label is not None:
+                log.debug("  -> Dispatching to: MatrixAccelerator ({})", label)
+            handler(instruction)
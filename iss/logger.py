@@ -0,0 +1,83 @@
+# iss/logger.py
+"""
+Logging có cấp độ (levelled logging) cho simulator.
+
+Thông điệp dùng cú pháp str.format và được định dạng LƯỜI (lazy): template và
+tham số chỉ được ghép khi cấp độ tương ứng đang bật, nên ở chế độ SILENT
+không có chi phí định dạng chuỗi hay I/O terminal.
+
+    log.info("  -> Executing: {} on tr{}", instr_name, ms1_idx)
+    log.debug("    - func4={:04b}", func4)
+
+Vòng lặp nóng có thể kiểm tra cờ trước (log.debug_enabled, log.info_enabled, ...)
+để bỏ qua cả lời gọi hàm.
+"""
+import sys
+
+# --- Các cấp độ (càng lớn càng chi tiết) ---
+SILENT  = 0
+ERROR   = 1
+WARNING = 2
+INFO    = 3
+DEBUG   = 4
+
+LEVEL_NAMES = {
+    "silent": SILENT,
+    "error": ERROR,
+    "warning": WARNING,
+    "info": INFO,
+    "debug": DEBUG,
+}
+
+
+def parse_level(level):
+    """Chuyển tên cấp độ ('info', 'DEBUG', ...) hoặc số nguyên thành cấp độ."""
+    if isinstance(level, str):
+        try:
+            return LEVEL_NAMES[level.strip().lower()]
+        except KeyError:
+            raise ValueError(f"Unknown log level: {level!r} (expected one of {', '.join(LEVEL_NAMES)})")
+    return int(level)
+
+
+class SimLogger:
+    """
+    Logger có cấp độ cho Simulator và các mixin của MatrixAccelerator.
+
+    Mặc định là DEBUG (in mọi thứ như trước đây). SILENT tắt toàn bộ output.
+    `stream=None` nghĩa là ghi ra sys.stdout hiện tại (tra cứu lúc ghi, nên
+    vẫn hoạt động với contextlib.redirect_stdout).
+    """
+
+    def __init__(self, level=DEBUG, stream=None):
+        self.stream = stream
+        self.set_level(level)
+
+    def set_level(self, level):
+        self.level = parse_level(level)
+        # Cờ dùng để guard trong vòng lặp nóng
+        self.error_enabled   = self.level >= ERROR
+        self.warning_enabled = self.level >= WARNING
+        self.info_enabled    = self.level >= INFO
+        self.debug_enabled   = self.level >= DEBUG
+
+    def _write(self, msg, args):
+        if args:
+            msg = msg.format(*args)
+        print(msg, file=self.stream if self.stream is not None else sys.stdout)
+
+    def error(self, msg, *args):
+        if self.error_enabled:
+            self._write(msg, args)
+
+    def warning(self, msg, *args):
+        if self.warning_enabled:
+            self._write(msg, args)
+
+    def info(self, msg, *args):
+        if self.info_enabled:
+            self._write(msg, args)
+
+    def debug(self, msg, *args):
+        if self.debug_enabled:
+            self._write(msg, args)
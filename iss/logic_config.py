@@ -1,9 +1,17 @@
 # iss/logic_config.py
-from typing import TYPE_CHECKING
+from functools import partial
+TYPE_CHECKING = False  # typing.TYPE_CHECKING, khỏi import typing lúc chạy
 
 if TYPE_CHECKING:
     from .components import CSRFile, RegisterFile
 
+# func4 -> (CSR đích, tên lệnh) cho nhóm msettile*
+TILE_CONFIG_CSRS = {
+    0b0001: ("mtilek", "msettilek"),
+    0b0010: ("mtilem", "msettilem"),
+    0b0011: ("mtilen", "msettilen"),
+}
+
 class ConfigLogic:
     """
     Mixin class for configuration instructions.
@@ -11,64 +19,49 @@ class ConfigLogic:
     Expected attributes (provided by MatrixAccelerator):
         - csr_ref: CSRFile - Reference to CSR registers
         - gpr_ref: RegisterFile - Reference to GPR registers
+        - log: SimLogger - Levelled logger (see logger.py)
     """
     
-    def execute_config(self, instruction):
-        """Thực thi các lệnh cấu hình (đã bao gồm mrelease)."""
-        func4 = instruction[0:4]
-        ctrl_bit_25 = instruction[6]
+    def resolve_config(self, instruction):
+        """Chọn handler cho lệnh cấu hình (func4 + bit 25).
+        Trả về callable handler(instruction) với tham số đã được gắn sẵn."""
+        func4 = instruction.func4
+        ctrl_bit_25 = instruction.ctrl >> 2
         
         # 1. Lệnh MRELEASE
-        if func4 == "0000":
-            print(f"  -> Executing: mrelease")
-            self.csr_ref.write('mstatus_ms', 1) 
-            print(f"     -> (Simulated: mstatus.MS set to 01)")
-
-        # 2. Lệnh MSETTILEK
-        elif func4 == "0001":
-            target_csr = "mtilek"
-            if ctrl_bit_25 == '0': # msettileki
-                imm10_bin = instruction[7:17]
-                value = int(imm10_bin, 2)
-                print(f"  -> Executing: msettileki {value}")
-            else: # msettilek
-                rs1_bin = instruction[12:17]
-                value = self.gpr_ref.read(int(rs1_bin, 2))
-                print(f"  -> Executing: msettilek x{int(rs1_bin, 2)} (value={value})")
-            
-            self.csr_ref.write(target_csr, value) 
-            print(f"     -> {target_csr} set to {value}")
+        if func4 == 0b0000:
+            return self._exec_mrelease
 
-        # 3. Lệnh MSETTILEM
-        elif func4 == "0010":
-            target_csr = "mtilem"
-            # ... (logic của msettilem) ...
-            if ctrl_bit_25 == '0':
-                imm10_bin = instruction[7:17]
-                value = int(imm10_bin, 2)
-                print(f"  -> Executing: msettilemi {value}")
-            else:
-                rs1_bin = instruction[12:17]
-                value = self.gpr_ref.read(int(rs1_bin, 2))
-                print(f"  -> Executing: msettilem x{int(rs1_bin, 2)} (value={value})")
-            self.csr_ref.write(target_csr, value) 
-            print(f"     -> {target_csr} set to {value}")
-            
-        # 4. Lệnh MSETTILEN
-        elif func4 == "0011":
-            target_csr = "mtilen"
-            # ... (logic của msettilen) ...
-            if ctrl_bit_25 == '0':
-                imm10_bin = instruction[7:17]
-                value = int(imm10_bin, 2)
-                print(f"  -> Executing: msettileni {value}")
-            else:
-                rs1_bin = instruction[12:17]
-                value = self.gpr_ref.read(int(rs1_bin, 2))
-                print(f"  -> Executing: msettilen x{int(rs1_bin, 2)} (value={value})")
-            self.csr_ref.write(target_csr, value) 
-            print(f"     -> {target_csr} set to {value}")
+        # 2-4. Lệnh MSETTILEK / MSETTILEM / MSETTILEN
+        if func4 in TILE_CONFIG_CSRS:
+            target_csr, mnemonic = TILE_CONFIG_CSRS[func4]
+            return partial(self._exec_msettile, target_csr=target_csr, mnemonic=mnemonic,
+                           use_register=(ctrl_bit_25 == 1))
         
         # 5. Lỗi
-        else:
-             print(f"  -> ERROR: Unknown configuration instruction with func4={func4}")
\ No newline at end of file
+        return partial(self._exec_config_error, func4=func4)
+
+    def execute_config(self, instruction):
+        """Thực thi các lệnh cấu hình (đã bao gồm mrelease).
+        `instruction` là một DecodedInstruction (xem decoder.py)."""
+        self.resolve_config(instruction)(instruction)
+
+    def _exec_mrelease(self, instruction):
+        self.log.info("  -> Executing: mrelease")
+        self.csr_ref.write('mstatus_ms', 1) 
+        self.log.info("     -> (Simulated: mstatus.MS set to 01)")
+
+    def _exec_msettile(self, instruction, target_csr, mnemonic, use_register):
+        if not use_register: # msettile*i
+            value = instruction.imm10
+            self.log.info("  -> Executing: {}i {}", mnemonic, value)
+        else: # msettile* (GPR)
+            rs1 = instruction.rs1
+            value = self.gpr_ref.read(rs1)
+            self.log.info("  -> Executing: {} x{} (value={})", mnemonic, rs1, value)
+        
+        self.csr_ref.write(target_csr, value) 
+        self.log.info("     -> {} set to {}", target_csr, value)
+
+    def _exec_config_error(self, instruction, func4):
+        self.log.error("  -> ERROR: Unknown configuration instruction with func4={:04b}", func4)
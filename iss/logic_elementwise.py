@@ -1,7 +1,7 @@
 # Import các hàm tiện ích
+from functools import partial
 from .converters import *
-from .definitions import ROWNUM, ELEMENTS_PER_ROW_TR
-from typing import TYPE_CHECKING
+TYPE_CHECKING = False  # typing.TYPE_CHECKING, khỏi import typing lúc chạy
 
 if TYPE_CHECKING:
     from typing import List
@@ -15,10 +15,87 @@ INT8_MAX = 127
 INT8_MIN = -128
 UINT8_MAX = 255
 UINT8_MIN = 0
-rows = ROWNUM # = 4
-cols_32bit = ELEMENTS_PER_ROW_TR # = 4
-cols_16bit = cols_32bit * 2 # = 8
-cols_8bit = cols_32bit * 4 # = 16
+
+# --- Phép toán EW đã giải quyết sẵn theo func4 ---
+# Semantics: md = ms2 op ms1 (val2 op val1)
+def _ew_mumax(val2, val1):
+    # Chuyển sang unsigned để so sánh
+    u_val1 = val1 & 0xFFFFFFFF
+    u_val2 = val2 & 0xFFFFFFFF
+    return u_val1 if u_val1 > u_val2 else u_val2
+
+def _ew_mumin(val2, val1):
+    u_val1 = val1 & 0xFFFFFFFF
+    u_val2 = val2 & 0xFFFFFFFF
+    return u_val1 if u_val1 < u_val2 else u_val2
+
+# Nhóm 5.5.1 (uop=01): chỉ hỗ trợ madd/msub/mmul/mmax/mmin và các phép dịch
+EW_INT_OPS = {
+    0b0000: lambda val2, val1: val2 + val1,                          # madd.w
+    0b0001: lambda val2, val1: val2 - val1,                          # msub.w
+    0b0010: lambda val2, val1: val2 * val1,                          # mmul.w
+    0b0100: lambda val2, val1: max(val1, val2),                      # mmax.w
+    0b0101: _ew_mumax,                                               # mumax.w
+    0b0110: lambda val2, val1: min(val1, val2),                      # mmin.w
+    0b0111: _ew_mumin,                                               # mumin.w
+    0b1000: lambda val2, val1: (val2 & 0xFFFFFFFF) >> (val1 & 0x1F), # msrl.w / msrl.w.mv.i
+    0b1001: lambda val2, val1: val2 << (val1 & 0x1F),                # msll.w / msll.w.mv.i
+    0b1010: lambda val2, val1: val2 >> (val1 & 0x1F),                # msra.w (dịch số học)
+}
+
+# Nhóm 5.5.2 (uop=10): mfadd/mfsub/mfmul/mfmax/mfmin
+EW_FLOAT_OPS = {
+    0b0000: lambda val2, val1: val2 + val1,     # mfadd
+    0b0001: lambda val2, val1: val2 - val1,     # mfsub
+    0b0010: lambda val2, val1: val2 * val1,     # mfmul
+    0b0011: lambda val2, val1: max(val2, val1), # mfmax
+    0b0100: lambda val2, val1: min(val2, val1), # mfmin
+}
+
+# Cùng các phép toán trên mảng numpy (engine "numpy", BatchSimulator): int trên int64
+# (giá trị trước bão hòa như bản Python); float giữ thứ tự đối số của max(val2, val1) /
+# min(val2, val1) (kể cả NaN và ±0)
+def ew_int_array_ops(np):
+    return {
+        0b0000: lambda v2, v1: v2 + v1,
+        0b0001: lambda v2, v1: v2 - v1,
+        0b0010: lambda v2, v1: v2 * v1,
+        0b0100: lambda v2, v1: np.maximum(v1, v2),
+        0b0101: lambda v2, v1: np.where((v1 & 0xFFFFFFFF) > (v2 & 0xFFFFFFFF), v1 & 0xFFFFFFFF, v2 & 0xFFFFFFFF),
+        0b0110: lambda v2, v1: np.minimum(v1, v2),
+        0b0111: lambda v2, v1: np.where((v1 & 0xFFFFFFFF) < (v2 & 0xFFFFFFFF), v1 & 0xFFFFFFFF, v2 & 0xFFFFFFFF),
+        0b1000: lambda v2, v1: (v2 & 0xFFFFFFFF) >> (v1 & 0x1F),
+        0b1001: lambda v2, v1: v2 << (v1 & 0x1F),
+        0b1010: lambda v2, v1: v2 >> (v1 & 0x1F),
+    }
+
+def ew_float_array_ops(np):
+    return {
+        0b0000: lambda v2, v1: v2 + v1,
+        0b0001: lambda v2, v1: v2 - v1,
+        0b0010: lambda v2, v1: v2 * v1,
+        0b0011: lambda v2, v1: np.where(v1 > v2, v1, v2),
+        0b0100: lambda v2, v1: np.where(v1 < v2, v1, v2),
+    }
+
+_numpy_ew_ops = None
+
+def _get_numpy_ew_ops():
+    """(np, phép int, phép float) theo func4, dựng lần đầu engine numpy được dùng."""
+    global _numpy_ew_ops
+    if _numpy_ew_ops is None:
+        import numpy as np
+        _numpy_ew_ops = (np, ew_int_array_ops(np), ew_float_array_ops(np))
+    return _numpy_ew_ops
+
+# Engine element-wise, chọn khi khởi tạo MatrixAccelerator(elementwise_engine=...)
+ELEMENTWISE_ENGINES = ("reference", "numpy")
+
+# s_size -> (float_to_bits, bits_to_float); theo Bảng 6 các lệnh này có s_size = d_size
+EW_FLOAT_FORMATS = {
+    0b01: (float_to_bits16, bits_to_float16), # Lệnh .h (fp16)
+    0b10: (float_to_bits32, bits_to_float32), # Lệnh .s (fp32)
+}
 
 class ElementwiseLogic:
     """
@@ -29,9 +106,12 @@ class ElementwiseLogic:
         - tr_float: List[List[List[float]]] - Tile registers (float)
         - acc_int: List[List[List[int]]] - Accumulator registers (integer)
         - acc_float: List[List[List[float]]] - Accumulator registers (float)
+        - regs: MatrixRegisterFile - Byte-backed storage (tr_*/acc_* are row views into it)
         - csr_ref: CSRFile - Reference to CSR registers
         - rownum: int - Number of rows in matrix
         - elements_per_row_tr: int - Elements per row in TR
+        - elementwise_engine: str - "reference" (từng phần tử) hoặc "numpy" (cả tile)
+        - log: SimLogger - Levelled logger (see logger.py)
     """
     
     def _get_register_storage(self, reg_idx, is_float):
@@ -67,8 +147,23 @@ class ElementwiseLogic:
         storage, idx = self._get_register_storage(reg_idx, is_float)
         storage[idx][row][col] = value
 
-    def _execute_ew_integer(self, instruction, func4, ctrl, md_idx, ms1_idx, ms2_idx):
-        """Thực thi Nhóm 5.5.1: Lệnh số học số nguyên (uop=01)."""
+    def _register_rows(self, reg_idx, is_float):
+        """Row views (rownum hàng) of a register (acc or tr), for whole-tile loops."""
+        storage, idx = self._get_register_storage(reg_idx, is_float)
+        return storage[idx]
+
+    def _ew_numpy_fits(self, M, N):
+        """Engine numpy chỉ dùng khi tile nằm gọn trong thanh ghi; tile rỗng / vượt giới hạn
+        đi qua vòng lặp tham chiếu để lỗi (IndexError sau khi đã ghi một phần) giữ nguyên."""
+        return self.elementwise_engine == "numpy" and 0 < M <= self.rownum and 0 < N <= self.elements_per_row_tr
+
+    def _execute_ew_integer(self, instruction, op):
+        """Thực thi Nhóm 5.5.1: Lệnh số học số nguyên (uop=01).
+        `op` là phép toán đã được resolve_element_wise chọn theo func4."""
+        self.log.debug("  -> Dispatching to: EW-Integer")
+        md_idx  = instruction.md
+        ms1_idx = instruction.ms1
+        ms2_idx = instruction.ms2
         
         # Đọc kích thước tile (M, N) từ CSR 
         M = self.csr_ref.read('mtilem')
@@ -76,68 +171,40 @@ class ElementwiseLogic:
         
         # Kiểm tra chế độ bão hòa (saturation) 
         saturation_enabled = (self.csr_ref.read('xmsaten') == 1)
-        
-        # Xác định chế độ: matrix-matrix hay matrix-vector 
-        is_matrix_matrix = (ctrl == "111")
-        vector_row_idx = int(ctrl, 2) # Dùng cho chế độ .mv.i 
 
-        print(f"    - Executing EW-Integer (M={M}, N={N}, md={md_idx}, ms1={ms1_idx}, ms2={ms2_idx})")
+        self.log.info("    - Executing EW-Integer (M={}, N={}, md={}, ms1={}, ms2={})", M, N, md_idx, ms1_idx, ms2_idx)
+
+        if self._ew_numpy_fits(M, N):
+            self._ew_integer_numpy(instruction, M, N, saturation_enabled)
+        else:
+            self._ew_integer_reference(instruction, op, M, N, saturation_enabled)
+        # Debug: print first write for accumulator registers
+        if md_idx >= 4 and M > 0 and N > 0 and self.log.debug_enabled:
+            self.log.debug("    [Debug] Writing tr{}[0][0] = {}", md_idx, self._register_rows(md_idx, is_float=False)[0][0])
 
+    def _ew_integer_reference(self, instruction, op, M, N, saturation_enabled):
+        ctrl = instruction.ctrl
         # Lặp qua từng phần tử của tile (M x N)
+        # Row view của các thanh ghi được lấy một lần (không tra acc/tr cho từng phần tử);
+        # view trỏ thẳng vào bank nên md trùng ms1/ms2 vẫn đọc/ghi theo đúng thứ tự cũ
+        # Immediate variant: ctrl != 111 (imm3 nằm trong ctrl), register variant: ctrl == 111
+        is_immediate = (ctrl != 0b111)
+        ms2_rows = self._register_rows(instruction.ms2, is_float=False)
+        ms1_rows = self._register_rows(instruction.ms1, is_float=False)
+        md_rows = self._register_rows(instruction.md, is_float=False)
+        imm = ctrl & 0x7  # imm3 (0-7); ms1_idx chỉ là thanh ghi chỉ số theo cú pháp
         for i in range(M):
+            ms2_row = ms2_rows[i]
+            md_row = md_rows[i]
+            # Lấy toán hạng 1 (matrix hoặc immediate; ctrl != 111 luôn là imm3, không đọc ms1)
+            ms1_row = None if is_immediate else ms1_rows[i]
             for j in range(N):
-                # Lấy toán hạng 2 (luôn là matrix) - supports both acc and tr
-                val2 = self._read_register_element(ms2_idx, i, j, is_float=False)
-                
-                # Check if this is immediate variant
-                # Immediate variant: ctrl != "111" (immediate encoded in ctrl)
-                # Register variant: ctrl == "111" (use ms1 register value)
-                is_immediate = (ctrl != "111")
-                
-                # Lấy toán hạng 1 (matrix, vector, or immediate)
-                if is_immediate:
-                    # For immediate variants, use ctrl as immediate value
-                    # ms1_idx is the index register (not used, just for syntax)
-                    val1 = int(ctrl, 2) & 0x7  # imm3 (0-7)
-                elif is_matrix_matrix:
-                    val1 = self._read_register_element(ms1_idx, i, j, is_float=False)
-                else:
-                    val1 = self._read_register_element(ms1_idx, vector_row_idx, j, is_float=False) 
-
-                # Thực hiện phép toán dựa trên func4
+                val2 = ms2_row[j]
+                val1 = imm if is_immediate else ms1_row[j]
+
+                # Thực hiện phép toán (đã chọn sẵn theo func4)
                 # Semantics: md = ms2 op ms1 (val2 op val1)
-                res = 0
-                if func4 == "0000": # madd.w 
-                    res = val2 + val1
-                elif func4 == "0001": # msub.w 
-                    res = val2 - val1
-                elif func4 == "0010": # mmul.w 
-                    res = val2 * val1
-                elif func4 == "0100": # mmax.w 
-                    res = max(val1, val2)
-                elif func4 == "0101": # mumax.w 
-                    # Chuyển sang unsigned để so sánh
-                    u_val1 = val1 & 0xFFFFFFFF
-                    u_val2 = val2 & 0xFFFFFFFF
-                    res = u_val1 if u_val1 > u_val2 else u_val2
-                elif func4 == "0110": # mmin.w 
-                    res = min(val1, val2)
-                elif func4 == "0111": # mumin.w 
-                    u_val1 = val1 & 0xFFFFFFFF
-                    u_val2 = val2 & 0xFFFFFFFF
-                    res = u_val1 if u_val1 < u_val2 else u_val2
-                elif func4 == "1000": # msrl.w or msrl.w.mv.i
-                    shift_amount = val1 & 0x1F # val1 is already immediate or register value
-                    res = (val2 & 0xFFFFFFFF) >> shift_amount
-                elif func4 == "1001": # msll.w or msll.w.mv.i
-                    shift_amount = val1 & 0x1F
-                    res = val2 << shift_amount
-                elif func4 == "1010": # msra.w or msra.w.mv.i
-                    shift_amount = val1 & 0x1F
-                    res = val2 >> shift_amount # Dịch phải số học (Python tự xử lý)
-                else:
-                    print(f"    [Warning] EW-Integer instruction with func4={func4} is not supported.")
-                    continue
+                res = op(val2, val1)
 
                 # Xử lý bão hòa (Saturation) 
                 if saturation_enabled:
@@ -149,135 +216,162 @@ class ElementwiseLogic:
                         self.csr_ref.write('xmsat', 1)
                 
                 # Ghi kết quả (wrap-around nếu không bão hòa) - supports both acc and tr
-                result_val = res & 0xFFFFFFFF
-                self._write_register_element(md_idx, i, j, result_val, is_float=False)
-                # Debug: print first write for tile registers
-                if md_idx >= 4 and i == 0 and j == 0:
-                    print(f"    [Debug] Writing tr{md_idx}[0][0] = {result_val}")
+                # Thanh ghi lưu int32: giữ bit pattern 32-bit, đọc lại dưới dạng có dấu
+                md_row[j] = bits_to_signed_int32(res)
 
+    def _ew_integer_numpy(self, instruction, M, N, saturation_enabled):
+        """Cả tile một lần trên int64 (tích / dịch trái của int32 vẫn nằm gọn trong int64):
+        cùng phép toán, cùng bão hòa + xmsat, rồi cắt về bit pattern 32-bit như bản tham chiếu.
+        md trùng ms1/ms2 không ảnh hưởng: mỗi phần tử chỉ đọc đúng vị trí nó ghi."""
+        np, int_ops, _ = _get_numpy_ew_ops()
+        view = self.regs.view
+        ctrl = instruction.ctrl
+        v2 = view(instruction.ms2, "int32")[:M, :N].astype(np.int64)
+        # ctrl != 111: imm3 áp cho mọi phần tử (không đọc ms1)
+        v1 = ctrl & 0x7 if ctrl != 0b111 else view(instruction.ms1, "int32")[:M, :N].astype(np.int64)
+        res = int_ops[instruction.func4](v2, v1)
+        if saturation_enabled:
+            saturated = (res > INT32_MAX) | (res < INT32_MIN)
+            if saturated.any():
+                res = np.clip(res, INT32_MIN, INT32_MAX)
+                self.csr_ref.write('xmsat', 1)
+        view(instruction.md, "int32")[:M, :N] = (res & 0xFFFFFFFF).astype(np.uint32).view(np.int32)
 
-    def _execute_ew_float(self, instruction, func4, ctrl, md_idx, ms1_idx, ms2_idx, s_size, d_size):
-            """Thực thi Nhóm 5.5.2: Lệnh số học số thực (uop=10)."""
-            
-            # --- 1. Xác định độ chính xác (Precision) ---
-            # Theo Bảng 6, các lệnh này có s_size = d_size 
-            float_to_bits = None
-            bits_to_float = None
-
-            if s_size == "01": # Lệnh .h (fp16) 
-                float_to_bits = float_to_bits16
-                bits_to_float = bits_to_float16
-            elif s_size == "10": # Lệnh .s (fp32)
-                float_to_bits = float_to_bits32
-                bits_to_float = bits_to_float32
-            else:
-                print(f"  [Error] Invalid s_size/d_size for EW-Float: {s_size}")
-                return
+
+    def _execute_ew_float(self, instruction, op, float_to_bits, bits_to_float):
+            """Thực thi Nhóm 5.5.2: Lệnh số học số thực (uop=10).
+            `op` và cặp converter (fp16/fp32) đã được resolve_element_wise chọn sẵn."""
+            self.log.debug("  -> Dispatching to: EW-Float")
+            s_size  = instruction.s_size
 
             # --- 2. Đọc cấu hình Tile ---
             M = self.csr_ref.read('mtilem')
             N = self.csr_ref.read('mtilen')
-            
-            # Xác định chế độ: matrix-matrix hay matrix-vector
-            is_matrix_matrix = (ctrl == "111") 
-            vector_row_idx = int(ctrl, 2) % ROWNUM 
 
-            print(f"    - Executing EW-Float (M={M}, N={N}, Precision={s_size}, md={md_idx}, ms1={ms1_idx}, ms2={ms2_idx})")
+            self.log.info("    - Executing EW-Float (M={}, N={}, Precision={:02b}, md={}, ms1={}, ms2={})", M, N, s_size,
+                          instruction.md, instruction.ms1, instruction.ms2)
+
+            if self._ew_numpy_fits(M, N):
+                self._ew_float_numpy(instruction, M, N, float_to_bits, bits_to_float)
+            else:
+                self._ew_float_reference(instruction, op, M, N, float_to_bits, bits_to_float)
+
+    def _ew_float_reference(self, instruction, op, M, N, float_to_bits, bits_to_float):
+            ctrl = instruction.ctrl
+            # Xác định chế độ: matrix-matrix hay matrix-vector
+            is_matrix_matrix = (ctrl == 0b111) 
+            vector_row_idx = ctrl % self.rownum
 
             # --- 3. Vòng lặp tính toán ---
+            # Row view lấy một lần cho cả tile (xem _ew_integer_reference)
+            ms2_rows = self._register_rows(instruction.ms2, is_float=True)
+            ms1_rows = self._register_rows(instruction.ms1, is_float=True)
+            md_rows = self._register_rows(instruction.md, is_float=True)
             for i in range(M):
+                ms2_row = ms2_rows[i]
+                md_row = md_rows[i]
+                # Logic matrix-vector: ms2[i,j] op ms1[vector_row_idx, j]
+                ms1_row = ms1_rows[i] if is_matrix_matrix else ms1_rows[vector_row_idx]
                 for j in range(N):
                     # Đọc giá trị đầy đủ (Python float 64-bit) - supports both acc and tr
-                    val2_full = self._read_register_element(ms2_idx, i, j, is_float=True)
-                    
-                    if is_matrix_matrix:
-                        val1_full = self._read_register_element(ms1_idx, i, j, is_float=True)
-                    else:
-                        # Logic matrix-vector: ms2[i,j] op ms1[vector_row_idx, j]
-                        val1_full = self._read_register_element(ms1_idx, vector_row_idx, j, is_float=True)
+                    val2_full = ms2_row[j]
+                    val1_full = ms1_row[j]
 
                     # --- 4. Mô phỏng độ chính xác (Precision Simulation) ---
                     # Chuyển đổi các toán hạng nguồn về đúng độ chính xác (fp16/fp32)
                     val1_quantized = bits_to_float(float_to_bits(val1_full))
                     val2_quantized = bits_to_float(float_to_bits(val2_full))
                     
-                    # Đọc giá trị cũ (md) và cũng làm tròn nó - supports both acc and tr
-                    md_old_val = self._read_register_element(md_idx, i, j, is_float=True)
-                    c_old_quantized = bits_to_float(float_to_bits(md_old_val))
-                    
-                    res_full = 0.0
-                    
                     # --- 5. Thực hiện phép toán ---
                     # Semantics: md = ms2 op ms1 (val2 op val1)
-                    if func4 == "0000": # mfadd 
-                        res_full = val2_quantized + val1_quantized
-                    elif func4 == "0001": # mfsub
-                        res_full = val2_quantized - val1_quantized
-                    elif func4 == "0010": # mfmul 
-                        res_full = val2_quantized * val1_quantized
-                    elif func4 == "0011": # mfmax 
-                        res_full = max(val2_quantized, val1_quantized)
-                    elif func4 == "0100": # mfmin 
-                        res_full = min(val2_quantized, val1_quantized)
-                    else:
-                        print(f"    [Warning] EW-Float instruction with func4={func4} is not supported.")
-                        continue
+                    res_full = op(val2_quantized, val1_quantized)
                     
                     # --- 6. Ghi kết quả (Làm tròn về độ chính xác ĐÍCH) ---
                     # Phép toán float-point được làm tròn sau khi cộng vào destination
-                    res_quantized = bits_to_float(float_to_bits(res_full))
-                    self._write_register_element(md_idx, i, j, res_quantized, is_float=True)
+                    md_row[j] = bits_to_float(float_to_bits(res_full))
+
+    def _ew_float_numpy(self, instruction, M, N, float_to_bits, bits_to_float):
+            """Cả tile một lần trên float64: lượng tử hóa nguồn, phép toán, lượng tử hóa đích
+            bằng converter mảng (converters.array_quantizer), giống bản tham chiếu từng bit.
+            .mv.i (ctrl != 111) phát hàng ms1[ctrl % rownum] cho mọi hàng; nếu md trùng ms1,
+            các hàng sau hàng vector đọc hàng vector đã bị ghi đè (như vòng lặp tham chiếu)."""
+            np, _, float_ops = _get_numpy_ew_ops()
+            ctrl = instruction.ctrl
+            is_matrix_matrix = (ctrl == 0b111)
+            vector_row = ctrl % self.rownum
+            quantize = array_quantizer(float_to_bits, bits_to_float)
+            array_op = float_ops[instruction.func4]
+            view = self.regs.view
+            ms2_view = view(instruction.ms2, "fp32")
+            ms1_view = view(instruction.ms1, "fp32")
+            md_view = view(instruction.md, "fp32")
+
+            segments = [(0, M)]
+            if not is_matrix_matrix and instruction.md == instruction.ms1 and vector_row < M - 1:
+                segments = [(0, vector_row + 1), (vector_row + 1, M)]
+            with np.errstate(all='ignore'):
+                for lo, hi in segments:
+                    v2 = ms2_view[lo:hi, :N].astype(np.float64)
+                    if is_matrix_matrix:
+                        v1 = ms1_view[lo:hi, :N].astype(np.float64)
+                    else:
+                        v1 = ms1_view[vector_row:vector_row + 1, :N].astype(np.float64)
+                    md_view[lo:hi, :N] = quantize(array_op(quantize(v2), quantize(v1)))
+
+    def _exec_ew_error(self, instruction, lines):
+        """In thông báo lỗi (đã dựng sẵn lúc resolve) cho lệnh EW không hỗ trợ."""
+        for line in lines:
+            self.log.error(line)
 
     # --- HÀM DISPATCHER CHÍNH ---
-    def execute_element_wise(self, instruction):
+    def resolve_element_wise(self, instruction):
         """
-        Giải mã và điều phối các lệnh Element-Wise (func3=001).
+        Chọn handler cho lệnh Element-Wise (func3=001) theo uop/func4/s_size/d_size.
+        Trả về callable handler(instruction) với phép toán và converter đã gắn sẵn.
         """
-        # --- 1. Giải mã các trường chung ---
-        uop        = instruction[4:6]        # bits 27-26
-        func4      = instruction[0:4]        # bits 31-28
-        ctrl       = instruction[6:9]        # bits 25-23 (dùng cho imm3 hoặc ctrl)
-        ms2_bin    = instruction[9:12]
-        s_size_str = instruction[12:14]
-        ms1_bin    = instruction[14:17]
-        d_size_str = instruction[20:22]
-        md_bin     = instruction[22:25]
-        
-        # Chuyển đổi index - tr0-tr3 (0-3), acc0-acc3/tr4-tr7 (4-7)
-        md_idx  = int(md_bin, 2)
-        ms1_idx = int(ms1_bin, 2)
-        ms2_idx = int(ms2_bin, 2)
-
-        # --- 1.5 Reject unsupported sizes (64-bit) ---
-        if s_size_str == "11" or d_size_str == "11":
-            print("  -> ERROR: 64-bit element-wise operations are NOT supported (ELEN=32).")
-            print(f"     func4={func4}, uop={uop}, s_size={s_size_str}, d_size={d_size_str}")
-            print("     Use 8/16/32-bit variants for ML workloads")
-            return
-
-        # --- 1.6 Whitelist supported func4 encodings ---
-        # For integer uop=01: support basic arithmetic and shifts
-        supported_int_func4 = {"0000","0001","0010","0100","0101","0110","0111","1000","1001","1010"}
-        # For float uop=10: support add/sub/mul/max/min (s_size: 01 or 10)
-        supported_float_func4 = {"0000","0001","0010","0011","0100"}
-
-        # --- 2. Điều phối (Dispatch) dựa trên uop ---
+        uop        = instruction.uop         # bits 27-26
+        func4      = instruction.func4       # bits 31-28
+        s_size     = instruction.s_size
+        d_size     = instruction.d_size
+
+        # --- 1. Reject unsupported sizes (64-bit) ---
+        if s_size == 0b11 or d_size == 0b11:
+            return partial(self._exec_ew_error, lines=(
+                "  -> ERROR: 64-bit element-wise operations are NOT supported (ELEN=32).",
+                f"     func4={func4:04b}, uop={uop:02b}, s_size={s_size:02b}, d_size={d_size:02b}",
+                "     Use 8/16/32-bit variants for ML workloads"))
+
+        # --- 2. Điều phối (Dispatch) dựa trên uop, whitelist theo func4 ---
         # Nhóm Integer Arithmetic 
-        if uop == "01":
-            if func4 not in supported_int_func4:
-                print(f"  -> ERROR: Unsupported/ambiguous EW-Integer func4={func4}")
-                print("     Only basic madd/msub/mmul/mmax/mmin and shifts are supported.")
-                return
-            print("  -> Dispatching to: EW-Integer")
-            self._execute_ew_integer(instruction, func4, ctrl, md_idx, ms1_idx, ms2_idx)
+        if uop == 0b01:
+            op = EW_INT_OPS.get(func4)
+            if op is None:
+                return partial(self._exec_ew_error, lines=(
+                    f"  -> ERROR: Unsupported/ambiguous EW-Integer func4={func4:04b}",
+                    "     Only basic madd/msub/mmul/mmax/mmin and shifts are supported."))
+            return partial(self._execute_ew_integer, op=op)
         
         # Nhóm Float Arithmetic 
-        elif uop == "10":
-            if func4 not in supported_float_func4:
-                print(f"  -> ERROR: Unsupported/ambiguous EW-Float func4={func4}")
-                print("     Only mfadd/mfsub/mfmul/mfmax/mfmin are supported (fp16/fp32).")
-                return
-            print("  -> Dispatching to: EW-Float")
-            self._execute_ew_float(instruction, func4, ctrl, md_idx, ms1_idx, ms2_idx, s_size_str, d_size_str)
-        else:
-            print(f"  -> ERROR: Unknown Element-Wise instruction (uop={uop})")
+        elif uop == 0b10:
+            op = EW_FLOAT_OPS.get(func4)
+            if op is None:
+                return partial(self._exec_ew_error, lines=(
+                    f"  -> ERROR: Unsupported/ambiguous EW-Float func4={func4:04b}",
+                    "     Only mfadd/mfsub/mfmul/mfmax/mfmin are supported (fp16/fp32)."))
+            if s_size not in EW_FLOAT_FORMATS:
+                return partial(self._exec_ew_error, lines=(
+                    "  -> Dispatching to: EW-Float",
+                    f"  [Error] Invalid s_size/d_size for EW-Float: {s_size:02b}"))
+            float_to_bits, bits_to_float = EW_FLOAT_FORMATS[s_size]
+            return partial(self._execute_ew_float, op=op,
+                           float_to_bits=float_to_bits, bits_to_float=bits_to_float)
+
+        return partial(self._exec_ew_error, lines=(
+            f"  -> ERROR: Unknown Element-Wise instruction (uop={uop:02b})",))
+
+    def execute_element_wise(self, instruction):
+        """
+        Giải mã và điều phối các lệnh Element-Wise (func3=001).
+        `instruction` là DecodedInstruction (xem decoder.py).
+        """
+        self.resolve_element_wise(instruction)(instruction)
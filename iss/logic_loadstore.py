@@ -1,14 +1,71 @@
 # iss/logic_loadstore.py
 import struct
-from typing import TYPE_CHECKING
-from .definitions import ROWNUM, ELEMENTS_PER_ROW_TR
+from array import array
+from functools import partial
+TYPE_CHECKING = False  # typing.TYPE_CHECKING, khỏi import typing lúc chạy
 # Import utility functions
-from .converters import bits_to_float16, float_to_bits16, bits_to_float32, float_to_bits32
+from .converters import (bits_to_float16, float_to_bits16, bits_to_float32, float_to_bits32,
+                         bits_to_float16_array, float_to_bits16_array)
 
 if TYPE_CHECKING:
     from typing import List
     from .components import RegisterFile, MainMemory
 
+# func4 -> (matrix, name suffix, (row label, row CSR), (col label, col CSR),
+#           transposed, acc_only, debug_first_store)
+# acc_only: mlcte/mscte index acc_* directly (reg_idx - 4)
+LOADSTORE_LAYOUTS = {
+    0b0000: ("a", "e",  ("M", "mtilem"), ("K", "mtilek"), False, False, True),   # mlae / msae
+    0b0001: ("b", "e",  ("K", "mtilek"), ("N", "mtilen"), False, False, False),  # mlbe / msbe (K×N)
+    0b0010: ("c", "e",  ("M", "mtilem"), ("N", "mtilen"), False, False, False),  # mlce / msce
+    0b0100: ("a", "te", ("M", "mtilem"), ("K", "mtilek"), True,  False, False),  # mlate / msate
+    0b0101: ("c", "te", ("M", "mtilem"), ("N", "mtilen"), True,  True,  False),  # mlcte / mscte
+}
+
+# func4 -> (load name, store name) used in the 64-bit rejection message
+LOADSTORE_64BIT_NAMES = {
+    0b0000: ("mlae64", "msae64"),
+    0b0001: ("mlbe64", "msbe64"),
+    0b0010: ("mlce64", "msce64"),
+    0b0011: ("mlme64", "msme64"),
+    0b0100: ("mlate64", "msate64"),
+    0b0101: ("mlbte64", "msbte64"),
+    0b0110: ("mlcte64", "mscte64"),
+}
+
+# Engine load/store, chọn khi khởi tạo MatrixAccelerator(loadstore_engine=...)
+#   reference: từng phần tử (memory.read + struct)
+#   numpy:     mỗi tile một lần copy qua view có stride trên vùng RAM chứa tile
+#   struct:    chỉ thư viện chuẩn, mỗi dòng của tile một lần unpack_from / pack_into
+LOADSTORE_ENGINES = ("reference", "numpy", "struct")
+
+# format_type -> (dtype trong bộ nhớ, view thanh ghi trong MatrixRegisterFile)
+_BULK_FORMATS = {
+    'i8':  ('<i1', 'int32'),
+    'f16': ('<u2', 'fp32'),
+    'f32': ('<f4', 'fp32'),
+}
+
+# format_type -> (mã struct trong bộ nhớ, typecode array của hàng thanh ghi)
+_ROW_FORMATS = {
+    'i8':  ('b', 'i'),
+    'f16': ('H', 'f'),
+    'f32': ('f', 'f'),
+}
+_row_structs = {}
+
+# Struct dựng sẵn cho một phần tử (vòng lặp tham chiếu)
+_STRUCT_I8 = struct.Struct('<b')
+_STRUCT_U16 = struct.Struct('<H')
+_STRUCT_F32 = struct.Struct('<f')
+
+def _row_struct(code, count):
+    """struct.Struct '<{count}{code}' cho một dòng của tile, dựng một lần cho mỗi (mã, số phần tử)."""
+    codec = _row_structs.get((code, count))
+    if codec is None:
+        codec = _row_structs[(code, count)] = struct.Struct(f"<{count}{code}")
+    return codec
+
 class LoadStoreLogic:
     """
     Mixin class for load/store operations.
@@ -18,10 +75,14 @@ class LoadStoreLogic:
         - tr_float: List[List[List[float]]] - Tile registers (float)
         - acc_int: List[List[List[int]]] - Accumulator registers (integer)
         - acc_float: List[List[List[float]]] - Accumulator registers (float)
+        - regs: MatrixRegisterFile - Byte-backed storage (tr_*/acc_* are row views into it)
         - gpr_ref: RegisterFile - Reference to GPR registers
         - memory: MainMemory - Reference to main memory
+        - log: SimLogger - Levelled logger (see logger.py)
         - rownum: int - Number of rows in matrix
         - elements_per_row_tr: int - Elements per row in TR
+        - loadstore_engine: str - "reference" (từng phần tử), "numpy" (copy cả tile)
+          hoặc "struct" (từng dòng, chỉ thư viện chuẩn)
     """
 
     def _bytes_to_value(self, byte_data, format_type):
@@ -31,14 +92,14 @@ class LoadStoreLogic:
         """
         if format_type == 'i8':
             # 8-bit signed integer
-            return struct.unpack('<b', byte_data)[0]  # little-endian signed byte
+            return _STRUCT_I8.unpack(byte_data)[0]  # little-endian signed byte
         elif format_type == 'f16':
             # 16-bit float - convert via bits
-            bits = struct.unpack('<H', byte_data)[0]  # little-endian unsigned short
+            bits = _STRUCT_U16.unpack(byte_data)[0]  # little-endian unsigned short
             return bits_to_float16(bits)
         elif format_type == 'f32':
             # 32-bit float
-            return struct.unpack('<f', byte_data)[0]  # little-endian float
+            return _STRUCT_F32.unpack(byte_data)[0]  # little-endian float
         else:
             raise ValueError(f"Unknown format_type: {format_type}")
     
@@ -47,16 +108,16 @@ class LoadStoreLogic:
         Convert value to bytes based on format_type.
         """
         if format_type == 'i8':
-            return struct.pack('<b', int(value))
+            return _STRUCT_I8.pack(int(value))
         elif format_type == 'f16':
             bits = float_to_bits16(value)
-            return struct.pack('<H', bits)
+            return _STRUCT_U16.pack(bits)
         elif format_type == 'f32':
-            return struct.pack('<f', value)
+            return _STRUCT_F32.pack(value)
         else:
             raise ValueError(f"Unknown format_type: {format_type}")
 
-    def _get_eew_and_format(self, d_size_str, is_float=True):
+    def _get_eew_and_format(self, d_size, is_float=True):
         """
         Helper: Get EEW (bits), number of bytes, and format info.
         ONLY SUPPORTS 8/16/32-bit. 64-bit CONFLICTS WITH ELEN=32.
@@ -66,249 +127,300 @@ class LoadStoreLogic:
         Returns:
             tuple: (int | None, int | None, str | None)
         """
-        if d_size_str == "00": 
+        if d_size == 0b00: 
             return 8, 1, 'i8'  # 8-bit signed integer
-        elif d_size_str == "01": 
+        elif d_size == 0b01: 
             return 16, 2, 'f16'  # 16-bit float (FP16) - requires custom conversion
-        elif d_size_str == "10": 
+        elif d_size == 0b10: 
             return 32, 4, 'f32'  # 32-bit float
-        elif d_size_str == "11":
+        elif d_size == 0b11:
             # ERROR: 64-bit not supported
             return None, None, None
         else:
-            raise ValueError(f"Invalid d_size: {d_size_str}")
+            raise ValueError(f"Invalid d_size: {d_size}")
+
+    def resolve_load_store(self, instruction):
+        """
+        Select the handler for a Load/Store encoding (func4 + ls + d_size).
+        Returns a callable handler(instruction) with the variant parameters
+        (layout, element format, instruction name) already bound.
+        """
+        func4      = instruction.func4
+        ls_bit     = instruction.ctrl >> 2   # bit 25
+        d_size     = instruction.d_size
+
+        # --- 1. Reject 64-bit immediately ---
+        if d_size == 0b11:
+            return partial(self._exec_load_store_64bit_error, func4=func4, ls_bit=ls_bit, d_size=d_size)
+
+        # --- 2. Reject whole register operations (func4=0011) ---
+        if func4 == 0b0011:
+            return partial(self._exec_load_store_whole_error, func4=func4, ls_bit=ls_bit, d_size=d_size)
+
+        layout = LOADSTORE_LAYOUTS.get(func4)
+        if layout is None:
+            return partial(self._exec_load_store_unknown_error, func4=func4, ls_bit=ls_bit, d_size=d_size)
+
+        # --- 3. Resolve element format and instruction name ---
+        # 8-bit is int, 16/32-bit is float
+        is_float = (d_size != 0b00)
+        eew, num_bytes, format_type = self._get_eew_and_format(d_size, is_float)
+        is_load = (ls_bit == 0)
+        matrix, suffix = layout[0], layout[1]
+        instr_name = f"{'ml' if is_load else 'ms'}{matrix}{suffix}{eew}"
+
+        return partial(self._exec_load_store, is_load=is_load, is_float=is_float, eew=eew,
+                       num_bytes=num_bytes, format_type=format_type, instr_name=instr_name,
+                       layout=layout)
 
     def execute_load_store(self, instruction):
         """
         Execute Load/Store instructions.
         ONLY SUPPORTS 32 INSTRUCTIONS (func4=0000-0110, d_size=00/01/10).
+        `instruction` is a DecodedInstruction (see decoder.py).
         """
-        
-        # --- 1. Decode ---
-        func4      = instruction[0:4]
-        ls_bit     = instruction[6]
-        rs2_bin    = instruction[7:12]
-        rs1_bin    = instruction[12:17]
-        md_ms3_bin = instruction[22:25]
-        d_size_str = instruction[20:22]
-        
-        # --- 2. Check d_size first (reject 64-bit immediately) ---
-        if d_size_str == "11":
-            print(f"  -> ERROR: 64-bit load/store is NOT supported")
-            print(f"     Reason: ELEN=32, but instruction requests 64-bit elements")
-            print(f"     func4={func4}, ls={'Load' if ls_bit=='0' else 'Store'}, d_size={d_size_str}")
-            if func4 == "0000":
-                print(f"     Instruction: {'mlae64' if ls_bit=='0' else 'msae64'}")
-            elif func4 == "0001":
-                print(f"     Instruction: {'mlbe64' if ls_bit=='0' else 'msbe64'}")
-            elif func4 == "0010":
-                print(f"     Instruction: {'mlce64' if ls_bit=='0' else 'msce64'}")
-            elif func4 == "0011":
-                print(f"     Instruction: {'mlme64' if ls_bit=='0' else 'msme64'}")
-            elif func4 == "0100":
-                print(f"     Instruction: {'mlate64' if ls_bit=='0' else 'msate64'}")
-            elif func4 == "0101":
-                print(f"     Instruction: {'mlbte64' if ls_bit=='0' else 'msbte64'}")
-            elif func4 == "0110":
-                print(f"     Instruction: {'mlcte64' if ls_bit=='0' else 'mscte64'}")
-            print(f"     Neural networks do not use FP64/INT64")
-            print(f"     Use 32-bit (FP32) for training, 8/16-bit for inference")
-            return
-        
-        # --- 3. Check whole register operations (func4=0011) ---
-        if func4 == "0011":
-            print(f"  -> ERROR: Whole register load/store (mlme*/msme*) is NOT supported")
-            print(f"     func4={func4}, ls={'Load' if ls_bit=='0' else 'Store'}, d_size={d_size_str}")
-            if d_size_str == "00":
-                print(f"     Instruction: {'mlme8' if ls_bit=='0' else 'msme8'}")
-            elif d_size_str == "01":
-                print(f"     Instruction: {'mlme16' if ls_bit=='0' else 'msme16'}")
-            elif d_size_str == "10":
-                print(f"     Instruction: {'mlme32' if ls_bit=='0' else 'msme32'}")
-            print(f"     Reason: Spec unclear about memory layout and semantics")
-            print(f"     Use mlae*/mlbe*/mlce* for matrix load/store instead")
-            return
-        
-        # --- 4. Get values ---
-        base_addr  = self.gpr_ref.read(int(rs1_bin, 2))
-        row_stride = self.gpr_ref.read(int(rs2_bin, 2))
-        reg_idx    = int(md_ms3_bin, 2)
-        
-        # 8-bit is int, 16/32-bit is float
-        is_float = (d_size_str != "00")
-        eew, num_bytes, format_type = self._get_eew_and_format(d_size_str, is_float)
-        
-        # Check if valid (should not happen due to earlier checks, but for type safety)
-        if num_bytes is None or format_type is None:
-            print(f"  -> ERROR: Invalid data size configuration")
-            return
+        self.resolve_load_store(instruction)(instruction)
 
-        # --- 5. Read CSRs to get Tile dimensions ---
-        M = self.csr_ref.read('mtilem')
-        N = self.csr_ref.read('mtilen')
-        K = self.csr_ref.read('mtilek')
+    def _exec_load_store(self, instruction, is_load, is_float, eew, num_bytes, format_type,
+                         instr_name, layout):
+        """Run one resolved Load/Store variant (see LOADSTORE_LAYOUTS)."""
+        _, _, (row_label, row_csr), (col_label, col_csr), transposed, acc_only, debug_first_store = layout
 
-        is_load = (ls_bit == '0')
-        
-        # --- 6. Dispatch logic based on func4 ---
-        
-        # mlae8/16/32 / msae8/16/32 (Matrix A, non-transposed)
-        if func4 == "0000":
-            rows, cols = M, K
-            target_reg = self.get_matrix_reg_float(reg_idx) if is_float else self.get_matrix_reg_int(reg_idx)
-            
-            # Instruction name based on d_size
-            instr_suffix = {
-                "00": "8",
-                "01": "16", 
-                "10": "32"
-            }[d_size_str]
-            instr_name = f"{'mla' if is_load else 'msa'}e{instr_suffix}"
-            
-            print(f"  -> Executing {instr_name} (M={M}, K={K}, element_size={eew}-bit)")
-            for i in range(rows):
-                for j in range(cols):
-                    mem_addr = base_addr + (i * row_stride) + (j * num_bytes)
-                    if is_load:
-                        byte_data = self.memory.read(mem_addr, num_bytes)
-                        val = self._bytes_to_value(byte_data, format_type)
-                        target_reg[i][j] = val
-                    else: # Store
-                        val = target_reg[i][j]
-                        byte_data = self._value_to_bytes(val, format_type)
-                        self.memory.write(mem_addr, byte_data)
-                        if i == 0 and j == 0:
-                            print(f"     [Debug] Stored [{i},{j}] to 0x{mem_addr:X}: val={val}, bytes={byte_data.hex() if isinstance(byte_data, (bytes, bytearray)) else 'NOT_BYTES'}")
-
-        # mlbe8/16/32 / msbe8/16/32 (Matrix B, non-transposed)
-        elif func4 == "0001":
-            rows, cols = K, N  # Matrix B is K×N for C = A×B^T
-            target_reg = self.get_matrix_reg_float(reg_idx) if is_float else self.get_matrix_reg_int(reg_idx)
-            
-            instr_suffix = {
-                "00": "8",
-                "01": "16", 
-                "10": "32"
-            }[d_size_str]
-            instr_name = f"{'mlb' if is_load else 'msb'}e{instr_suffix}"
-            
-            print(f"  -> Executing {instr_name} (K={K}, N={N}, element_size={eew}-bit)")
-            for i in range(rows):
-                for j in range(cols):
-                    mem_addr = base_addr + (i * row_stride) + (j * num_bytes)
-                    if is_load:
-                        byte_data = self.memory.read(mem_addr, num_bytes)
-                        val = self._bytes_to_value(byte_data, format_type)
-                        target_reg[i][j] = val
-                    else: # Store
-                        val = target_reg[i][j]
-                        byte_data = self._value_to_bytes(val, format_type)
-                        self.memory.write(mem_addr, byte_data)
-
-        # mlce8/16/32 / msce8/16/32 (Matrix C, non-transposed)
-        elif func4 == "0010":
-            rows, cols = M, N
-            target_reg = self.get_matrix_reg_float(reg_idx) if is_float else self.get_matrix_reg_int(reg_idx)
-            
-            instr_suffix = {
-                "00": "8",
-                "01": "16", 
-                "10": "32"
-            }[d_size_str]
-            instr_name = f"{'mlc' if is_load else 'msc'}e{instr_suffix}"
-            
-            print(f"  -> Executing {instr_name} (M={M}, N={N}, element_size={eew}-bit)")
-            # Matrix C is row-major in memory: mem_addr = base + row*stride + col*element_size
-            for i in range(rows):  # For each row
-                for j in range(cols):  # For each column
-                    mem_addr = base_addr + (i * row_stride) + (j * num_bytes)
-                    if is_load:
-                        byte_data = self.memory.read(mem_addr, num_bytes)
-                        val = self._bytes_to_value(byte_data, format_type)
-                        target_reg[i][j] = val
-                    else: # Store
-                        val = target_reg[i][j]
-                        byte_data = self._value_to_bytes(val, format_type)
-                        self.memory.write(mem_addr, byte_data)
-
-        # mlate8/16/32 / msate8/16/32 (Matrix A, Transposed)
-        elif func4 == "0100":
-            rows, cols = M, K # Register dimensions (M x K)
-            target_reg = self.get_matrix_reg_float(reg_idx) if is_float else self.get_matrix_reg_int(reg_idx)
-            
-            instr_suffix = {
-                "00": "8",
-                "01": "16", 
-                "10": "32"
-            }[d_size_str]
-            instr_name = f"{'mla' if is_load else 'msa'}te{instr_suffix}"
-            
-            print(f"  -> Executing {instr_name} (M={M}, K={K}, Transposed, element_size={eew}-bit)")
-            for i in range(rows): # Loop through M
-                for j in range(cols): # Loop through K
-                    # Read/Write column-wise (K x M) in memory
-                    mem_addr = base_addr + (j * row_stride) + (i * num_bytes)
-                    if is_load:
-                        byte_data = self.memory.read(mem_addr, num_bytes)
-                        val = self._bytes_to_value(byte_data, format_type)
-                        target_reg[i][j] = val
-                    else: # Store
-                        val = target_reg[i][j]
-                        byte_data = self._value_to_bytes(val, format_type)
-                        self.memory.write(mem_addr, byte_data)
-
-        # mlbte8/16/32 / msbte8/16/32 (Matrix B^T - transposed)
-        elif func4 == "0011":
-            rows, cols = N, K
-            target_reg = self.get_matrix_reg_float(reg_idx) if is_float else self.get_matrix_reg_int(reg_idx)
-            
-            instr_suffix = {
-                "00": "8",
-                "01": "16", 
-                "10": "32"
-            }[d_size_str]
-            instr_name = f"{'mlb' if is_load else 'msb'}te{instr_suffix}"
-            
-            print(f"  -> Executing {instr_name} (N={N}, K={K}, Transposed, element_size={eew}-bit)")
-            for i in range(rows): # Lặp qua N
-                for j in range(cols): # Lặp qua K
-                    mem_addr = base_addr + (j * row_stride) + (i * num_bytes)
-                    if is_load:
-                        byte_data = self.memory.read(mem_addr, num_bytes)
-                        val = self._bytes_to_value(byte_data, format_type)
-                        target_reg[i][j] = val
-                    else: # Store
-                        val = target_reg[i][j]
-                        byte_data = self._value_to_bytes(val, format_type)
-                        self.memory.write(mem_addr, byte_data)
-
-        # mlcte8/16/32 / mscte8/16/32 (Matrix C, Transposed)
-        elif func4 == "0101":
-            rows, cols = M, N
+        # --- 1. Get values ---
+        base_addr  = self.gpr_ref.read(instruction.rs1)
+        row_stride = self.gpr_ref.read(instruction.rs2)
+        reg_idx    = instruction.md
+
+        # --- 2. Read CSRs to get Tile dimensions ---
+        rows = self.csr_ref.read(row_csr)
+        cols = self.csr_ref.read(col_csr)
+
+        if acc_only:
             target_reg = self.acc_float[reg_idx - 4] if is_float else self.acc_int[reg_idx - 4]
-            
-            instr_suffix = {
-                "00": "8",
-                "01": "16", 
-                "10": "32"
-            }[d_size_str]
-            instr_name = f"{'mlc' if is_load else 'msc'}te{instr_suffix}"
-            
-            print(f"  -> Executing {instr_name} (M={M}, N={N}, Transposed, element_size={eew}-bit)")
-            for i in range(rows): # Lặp qua M
-                for j in range(cols): # Lặp qua N
+        else:
+            target_reg = self.get_matrix_reg_float(reg_idx) if is_float else self.get_matrix_reg_int(reg_idx)
+
+        self.log.info("  -> Executing {} ({}={}, {}={}{}, element_size={}-bit)", instr_name,
+                      row_label, rows, col_label, cols, ', Transposed' if transposed else '', eew)
+
+        if self.loadstore_engine == "numpy":
+            # acc_only: acc_*[reg_idx - 4] (chỉ số âm quay vòng như list) -> thanh ghi vật lý 4-7
+            phys_idx = 4 + (reg_idx - 4) % 4 if acc_only else reg_idx
+            done = self._load_store_bulk(is_load, format_type, num_bytes, base_addr, row_stride,
+                                         rows, cols, transposed, phys_idx)
+        elif self.loadstore_engine == "struct":
+            done = self._load_store_rows(is_load, format_type, num_bytes, base_addr, row_stride,
+                                         rows, cols, transposed, target_reg)
+        else:
+            done = False
+        if done:
+            if debug_first_store and not is_load and rows > 0 and cols > 0 and self.log.debug_enabled:
+                val = target_reg[0][0]
+                self.log.debug("     [Debug] Stored [0,0] to 0x{:X}: val={}, bytes={}", base_addr, val,
+                               self._value_to_bytes(val, format_type).hex())
+            return
+
+        # --- 3. Element loop ---
+        # Non-transposed: row-major in memory, mem_addr = base + row*stride + col*element_size
+        # Transposed: read/write column-wise, mem_addr = base + col*stride + row*element_size
+        for i in range(rows):
+            for j in range(cols):
+                if transposed:
                     mem_addr = base_addr + (j * row_stride) + (i * num_bytes)
-                    if is_load:
-                        byte_data = self.memory.read(mem_addr, num_bytes)
-                        val = self._bytes_to_value(byte_data, format_type)
-                        target_reg[i][j] = val
-                    else: # Store
-                        val = target_reg[i][j]
-                        byte_data = self._value_to_bytes(val, format_type)
-                        self.memory.write(mem_addr, byte_data)
-        
+                else:
+                    mem_addr = base_addr + (i * row_stride) + (j * num_bytes)
+                if is_load:
+                    byte_data = self.memory.read(mem_addr, num_bytes)
+                    val = self._bytes_to_value(byte_data, format_type)
+                    target_reg[i][j] = val
+                else: # Store
+                    val = target_reg[i][j]
+                    byte_data = self._value_to_bytes(val, format_type)
+                    self.memory.write(mem_addr, byte_data)
+                    if debug_first_store and i == 0 and j == 0:
+                        self.log.debug("     [Debug] Stored [{},{}] to 0x{:X}: val={}, bytes={}", i, j, mem_addr, val,
+                                       byte_data.hex() if isinstance(byte_data, (bytes, bytearray)) else 'NOT_BYTES')
+
+    def compile_load_store(self, instruction, tile):
+        """
+        Bước đã biên dịch cho một lệnh load/store trong khối lệnh thẳng (xem blocks.py).
+        tile: {'mtilem': M, 'mtilen': N, 'mtilek': K} đã biết tại lệnh này (None = chưa biết).
+        Chỉ engine numpy với tile hợp lệ: view thanh ghi [:rows, :cols] được dựng một lần,
+        mỗi lần chạy chỉ đọc GPR và copy; các trường hợp còn lại trả về None (handler thường).
+        """
+        func4, d_size = instruction.func4, instruction.d_size
+        layout = LOADSTORE_LAYOUTS.get(func4)
+        if self.loadstore_engine == "reference" or layout is None or d_size == 0b11:
+            return None
+        _, _, (_, row_csr), (_, col_csr), transposed, acc_only, _ = layout
+        rows, cols = tile[row_csr], tile[col_csr]
+        if rows is None or cols is None or not (0 < rows <= self.rownum and 0 < cols <= self.elements_per_row_tr):
+            return None
+
+        handler = self.resolve_load_store(instruction)
+        is_load = (instruction.ctrl >> 2 == 0)
+        _, num_bytes, format_type = self._get_eew_and_format(d_size)
+        reg_idx = instruction.md
+        phys_idx = 4 + (reg_idx - 4) % 4 if acc_only else reg_idx
+        rs1, rs2 = instruction.rs1, instruction.rs2
+        gpr_read = self.gpr_ref.read
+        if self.loadstore_engine == "struct":
+            target_reg = (self.regs.float_regs if d_size != 0b00 else self.regs.int_regs)[phys_idx]
+            rows_copy = self._load_store_rows
+
+            def step():
+                if not rows_copy(is_load, format_type, num_bytes, gpr_read(rs1), gpr_read(rs2),
+                                 rows, cols, transposed, target_reg):
+                    handler(instruction)
+            return step
+
+        reg_view = self.regs.view(phys_idx, _BULK_FORMATS[format_type][1])[:rows, :cols]
+        bulk = self._load_store_bulk
+
+        def step():
+            if not bulk(is_load, format_type, num_bytes, gpr_read(rs1), gpr_read(rs2),
+                        rows, cols, transposed, phys_idx, reg_view):
+                handler(instruction)   # Vòng lặp từng phần tử (và thông báo lỗi) như cũ
+        return step
+
+    def _load_store_bulk(self, is_load, format_type, num_bytes, base_addr, row_stride,
+                         rows, cols, transposed, phys_idx, reg_view=None):
+        """
+        Copy cả tile giữa bộ nhớ và thanh ghi bằng một phép gán numpy. Chỉ đọc / ghi đúng
+        đoạn liền nhau của từng dòng (hàng i, hoặc cột j khi transposed) tại base + k*stride,
+        không đụng tới RAM giữa các dòng (stride lớn không cấp phát trang, không phá trang
+        dùng chung copy-on-write). Trả về False nếu cần rơi về vòng lặp từng phần tử
+        (tile vượt kích thước thanh ghi, vượt giới hạn RAM, store chồng lấn, giá trị int8
+        ngoài dải) - vòng lặp đó báo lỗi đúng như trước.
+        reg_view: view [:rows, :cols] của thanh ghi đã dựng sẵn (None: dựng tại đây).
+        """
+        if rows <= 0 or cols <= 0:
+            return True
+        if self._tile_span(is_load, num_bytes, base_addr, row_stride, rows, cols, transposed) is None:
+            return False
+
+        import numpy as np
+        mem_dtype, reg_format = _BULK_FORMATS[format_type]
+        lines, count = (cols, rows) if transposed else (rows, cols)
+        line_bytes = count * num_bytes
+        if reg_view is None:
+            reg_view = self.regs.view(phys_idx, reg_format)[:rows, :cols]
+
+        with np.errstate(invalid='ignore', over='ignore'):
+            if is_load:
+                read = self.memory.read
+                data = b"".join([read(base_addr + k * row_stride, line_bytes) for k in range(lines)])
+                mem_view = np.frombuffer(data, dtype=mem_dtype).reshape(lines, count)
+                if transposed:
+                    mem_view = mem_view.T
+                if format_type == 'i8':
+                    reg_view[...] = mem_view
+                elif format_type == 'f16':
+                    reg_view[...] = bits_to_float16_array(mem_view)
+                else:
+                    reg_view[...] = mem_view.astype(np.float64)  # Cùng đường float32 -> double như struct
+                return True
+
+            line_view = reg_view.T if transposed else reg_view
+            packed = np.empty((lines, count), dtype=mem_dtype)
+            if format_type == 'i8':
+                if reg_view.min() < -128 or reg_view.max() > 127:
+                    return False  # struct.pack('<b') sẽ báo lỗi trong vòng lặp
+                packed[...] = line_view
+            elif format_type == 'f16':
+                packed[...] = float_to_bits16_array(line_view)
+            else:
+                packed[...] = line_view.astype(np.float64)
+        data = packed.tobytes()
+        write = self.memory.write
+        for k in range(lines):
+            write(base_addr + k * row_stride, data[k * line_bytes:(k + 1) * line_bytes])
+        return True
+
+    def _tile_span(self, is_load, num_bytes, base_addr, row_stride, rows, cols, transposed):
+        """
+        (row_step, col_step, end) của tile trong RAM - phần tử (i, j) nằm ở
+        base + i*row_step + j*col_step - hoặc None nếu phải để vòng lặp từng phần tử xử lý
+        (tile vượt kích thước thanh ghi, vượt giới hạn RAM, store chồng lấn).
+        """
+        if rows > self.rownum or cols > self.elements_per_row_tr:
+            return None
+        if transposed:
+            row_step, col_step = num_bytes, row_stride
+            overlapping = cols > 1 and row_stride < rows * num_bytes
         else:
-            print(f"  -> ERROR: Unknown or unsupported Load/Store instruction")
-            print(f"     func4={func4}, ls={'Load' if ls_bit=='0' else 'Store'}, d_size={d_size_str}")
-            print(f"     Only func4=0000-0110 (with d_size=00/01/10) are supported")
-            print(f"     See loadstore_analysis.md for details")
\ No newline at end of file
+            row_step, col_step = row_stride, num_bytes
+            overlapping = rows > 1 and row_stride < cols * num_bytes
+        # Store chồng lấn: thứ tự ghi quyết định kết quả -> để vòng lặp xử lý
+        if overlapping and not is_load:
+            return None
+        end = base_addr + (rows - 1) * row_step + (cols - 1) * col_step + num_bytes
+        if end > len(self.memory):
+            return None
+        return row_step, col_step, end
+
+    def _load_store_rows(self, is_load, format_type, num_bytes, base_addr, row_stride,
+                         rows, cols, transposed, target_reg):
+        """
+        Engine "struct" (không cần numpy): mỗi dòng liền nhau trong RAM - hàng i, hoặc cột j
+        khi transposed - được đổi bằng MỘT lời gọi unpack_from / pack của Struct dựng sẵn
+        ngay trên đoạn count*num_bytes của dòng đó (không sao chép / ghi lại RAM giữa các
+        dòng); hàng thanh ghi được gán theo lát cắt.
+        Cùng điều kiện rơi về vòng lặp như _load_store_bulk (trả về False).
+        """
+        if rows <= 0 or cols <= 0:
+            return True
+        if self._tile_span(is_load, num_bytes, base_addr, row_stride, rows, cols, transposed) is None:
+            return False
+        code, typecode = _ROW_FORMATS[format_type]
+        lines = cols if transposed else rows
+        codec = _row_struct(code, rows if transposed else cols)
+
+        if is_load:
+            unpack_from = self.memory.unpack_from
+            data = [unpack_from(codec, base_addr + k * row_stride) for k in range(lines)]
+            if format_type == 'f16':
+                data = [map(bits_to_float16, line) for line in data]
+            if transposed:
+                data = zip(*data)
+            for row, values in zip(target_reg, data):
+                row[:cols] = array(typecode, values)   # float -> fp32 như khi gán từng phần tử
+            return True
+
+        data = [row[:cols].tolist() for row in target_reg[:rows]]
+        if transposed:
+            data = zip(*data)
+        if format_type == 'f16':
+            data = [map(float_to_bits16, values) for values in data]
+        try:
+            packed = [codec.pack(*values) for values in data]
+        except struct.error:
+            return False  # int8 ngoài dải: vòng lặp ghi từng phần tử rồi báo lỗi như cũ (chưa ghi gì)
+        write = self.memory.write
+        for k, line in enumerate(packed):
+            write(base_addr + k * row_stride, line)
+        return True
+
+    def _exec_load_store_64bit_error(self, instruction, func4, ls_bit, d_size):
+        self.log.error("  -> ERROR: 64-bit load/store is NOT supported")
+        self.log.error("     Reason: ELEN=32, but instruction requests 64-bit elements")
+        self.log.error("     func4={:04b}, ls={}, d_size={:02b}", func4, 'Load' if ls_bit==0 else 'Store', d_size)
+        if func4 in LOADSTORE_64BIT_NAMES:
+            load_name, store_name = LOADSTORE_64BIT_NAMES[func4]
+            self.log.error("     Instruction: {}", load_name if ls_bit==0 else store_name)
+        self.log.error("     Neural networks do not use FP64/INT64")
+        self.log.error("     Use 32-bit (FP32) for training, 8/16-bit for inference")
+
+    def _exec_load_store_whole_error(self, instruction, func4, ls_bit, d_size):
+        self.log.error("  -> ERROR: Whole register load/store (mlme*/msme*) is NOT supported")
+        self.log.error("     func4={:04b}, ls={}, d_size={:02b}", func4, 'Load' if ls_bit==0 else 'Store', d_size)
+        eew = {0b00: 8, 0b01: 16, 0b10: 32}[d_size]
+        self.log.error("     Instruction: {}{}", 'mlme' if ls_bit==0 else 'msme', eew)
+        self.log.error("     Reason: Spec unclear about memory layout and semantics")
+        self.log.error("     Use mlae*/mlbe*/mlce* for matrix load/store instead")
+
+    def _exec_load_store_unknown_error(self, instruction, func4, ls_bit, d_size):
+        self.log.error("  -> ERROR: Unknown or unsupported Load/Store instruction")
+        self.log.error("     func4={:04b}, ls={}, d_size={:02b}", func4, 'Load' if ls_bit==0 else 'Store', d_size)
+        self.log.error("     Only func4=0000-0110 (with d_size=00/01/10) are supported")
+        self.log.error("     See loadstore_analysis.md for details")
@@ -1,12 +1,69 @@
 # iss/logic_matmul.py
 # Import các hàm tiện ích từ file converters.py mới
+from functools import partial
 from .converters import *
-from typing import TYPE_CHECKING
+TYPE_CHECKING = False  # typing.TYPE_CHECKING, khỏi import typing lúc chạy
 
 if TYPE_CHECKING:
     from typing import List
     from .components import CSRFile
 
+# ------------------------------------------------------------------------
+# BẢNG BIẾN THỂ MATMUL: (func4, s_size, d_size, size_sup) -> tham số thực thi
+# Chỉ 10 lệnh được hỗ trợ; mọi encoding khác đi vào _exec_matmul_error.
+# ------------------------------------------------------------------------
+_FP32 = dict(float_to_dest_bits=float_to_bits32, bits_to_dest_float=bits_to_float32)
+
+def _int8_variant(instr_name, a_signed, b_signed):
+    return dict(instr_name=instr_name, is_float_op=False,
+                float_to_source_bits=float_to_bits32, bits_to_source_float=bits_to_float32, **_FP32,
+                source_bits=8, dest_bits=32, a_signed=a_signed, b_signed=b_signed)
+
+MATMUL_VARIANTS = {
+    # --- FLOAT (func4 = 0000) ---
+    # (fp8 -> bf16) s_size=00, d_size=01 - CHỈ HỖ TRỢ BF16
+    (0b0000, 0b00, 0b01, 0b100): dict(instr_name="mfmacc.bf16.e5", is_float_op=True,
+        float_to_source_bits=float_to_bits8_e5m2, bits_to_source_float=bits_to_float8_e5m2,
+        float_to_dest_bits=float_to_bfloat16, bits_to_dest_float=bfloat16_to_float,
+        source_bits=8, dest_bits=16, a_signed=True, b_signed=True),
+    (0b0000, 0b00, 0b01, 0b101): dict(instr_name="mfmacc.bf16.e4", is_float_op=True,
+        float_to_source_bits=float_to_bits8_e4m3, bits_to_source_float=bits_to_float8_e4m3,
+        float_to_dest_bits=float_to_bfloat16, bits_to_dest_float=bfloat16_to_float,
+        source_bits=8, dest_bits=16, a_signed=True, b_signed=True),
+    # (fp16 -> fp16) s_size=01, d_size=01
+    (0b0000, 0b01, 0b01, 0b000): dict(instr_name="mfmacc.h", is_float_op=True,
+        float_to_source_bits=float_to_bits16, bits_to_source_float=bits_to_float16,
+        float_to_dest_bits=float_to_bits16, bits_to_dest_float=bits_to_float16,
+        source_bits=16, dest_bits=16, a_signed=True, b_signed=True),
+    # (fp16/bf16 -> fp32) s_size=01, d_size=10
+    (0b0000, 0b01, 0b10, 0b000): dict(instr_name="mfmacc.s.h", is_float_op=True,
+        float_to_source_bits=float_to_bits16, bits_to_source_float=bits_to_float16, **_FP32,
+        source_bits=16, dest_bits=32, a_signed=True, b_signed=True),
+    (0b0000, 0b01, 0b10, 0b001): dict(instr_name="mfmacc.s.bf16", is_float_op=True,
+        float_to_source_bits=float_to_bfloat16, bits_to_source_float=bfloat16_to_float, **_FP32,
+        source_bits=16, dest_bits=32, a_signed=True, b_signed=True),
+    # (fp32 -> fp32) s_size=10, d_size=10
+    (0b0000, 0b10, 0b10, 0b000): dict(instr_name="mfmacc.s", is_float_op=True,
+        float_to_source_bits=float_to_bits32, bits_to_source_float=bits_to_float32, **_FP32,
+        source_bits=32, dest_bits=32, a_signed=True, b_signed=True),
+
+    # --- INTEGER (func4 = 0001): int8 -> int32, s_size=00, d_size=10 ---
+    (0b0001, 0b00, 0b10, 0b000): _int8_variant("mmaccu.w.b",  False, False), # unsigned * unsigned
+    (0b0001, 0b00, 0b10, 0b001): _int8_variant("mmaccus.w.b", False, True),  # unsigned * signed
+    (0b0001, 0b00, 0b10, 0b010): _int8_variant("mmaccsu.w.b", True,  False), # signed * unsigned
+    (0b0001, 0b00, 0b10, 0b011): _int8_variant("mmacc.w.b",   True,  True),  # signed * signed
+}
+
+# Engine tính toán matmul, chọn khi khởi tạo MatrixAccelerator(matmul_engine=...)
+MATMUL_ENGINES = ("reference", "numpy")
+
+def _int8_signed(x):
+    v = int(x) & 0xFF
+    return v - 256 if v > 127 else v
+
+def _int8_unsigned(x):
+    return int(x) & 0xFF
+
 class MatmulLogic:
     """
     Mixin class for matrix multiply-accumulate operations.
@@ -16,205 +73,207 @@ class MatmulLogic:
         - tr_float: List[List[List[float]]] - Tile registers (float)
         - acc_int: List[List[List[int]]] - Accumulator registers (integer)
         - acc_float: List[List[List[float]]] - Accumulator registers (float)
+        - regs: MatrixRegisterFile - Byte-backed storage (tr_*/acc_* are row views into it)
         - acc_dest_bits_int: List[int] - Destination bit-width for int accumulators
         - acc_dest_bits_float: List[int] - Destination bit-width for float accumulators
         - csr_ref: CSRFile - Reference to CSR registers
         - rownum: int - Number of rows in matrix
+        - matmul_engine: str - "reference" (vòng lặp Python) hoặc "numpy"
+        - log: SimLogger - Levelled logger (see logger.py)
     """
     
+    def resolve_matmul(self, instruction):
+        """Chọn handler cho lệnh nhân ma trận.
+        Khóa (func4, s_size, d_size, size_sup) được tra trong MATMUL_VARIANTS;
+        trả về callable handler(instruction) với các converter đã gắn sẵn."""
+        key = (instruction.func4, instruction.s_size, instruction.d_size, instruction.ctrl)
+        variant = MATMUL_VARIANTS.get(key)
+        if variant is None:
+            return partial(self._exec_matmul_error, func4=key[0], s_size=key[1],
+                           d_size=key[2], size_sup=key[3])
+        return partial(self._exec_matmul, **variant)
+
     def execute_matmul(self, instruction):
         """Thực thi các lệnh nhân ma trận (ĐÃ SỬA LỖI GIẢI MÃ)."""
-        
-        # 1. Giải mã Lệnh
-        func4 = instruction[0:4]
-        size_sup = instruction[6:9]
-        s_size = instruction[12:14] # bits 19-18
-        d_size = instruction[20:22] # bits 11-10
-        ms1_idx = int(instruction[14:17], 2)
-        ms2_idx = int(instruction[9:12], 2)
-        md_idx = int(instruction[22:25], 2)  # acc0-3 are encoded as 4-7 (tr4-tr7 aliases)
-        tr_source1_name = f"tr{ms1_idx}"; tr_source2_name = f"tr{ms2_idx}"; acc_dest_name = f"acc{md_idx - 4}"
-        
-        # 2. Xác định các thuộc tính & Hàm chuyển đổi (Converters)
-        
-        # Gán giá trị mặc định (cho mfmacc.s)
-        float_to_source_bits = float_to_bits32
-        bits_to_source_float = bits_to_float32
-        float_to_dest_bits = float_to_bits32
-        bits_to_dest_float = bits_to_float32
-        source_bits, dest_bits = 32, 32
-        instr_name, is_float_op = "mfmacc.s", True
+        self.resolve_matmul(instruction)(instruction)
 
-        # --- NHÓM LỆNH FLOAT (func4 = 0000) ---
-        if func4 == "0000":
-            is_float_op = True
-            
-            # (fp8 -> bf16) s_size="00", d_size="01" - CHỈ HỖ TRỢ BF16, KHÔNG HỖ TRỢ FP16
-            if s_size == "00" and d_size == "01":
-                if size_sup == "100":
-                    instr_name = "mfmacc.bf16.e5"
-                    float_to_source_bits = float_to_bits8_e5m2
-                    bits_to_source_float = bits_to_float8_e5m2
-                    float_to_dest_bits = float_to_bfloat16
-                    bits_to_dest_float = bfloat16_to_float
-                elif size_sup == "101":
-                    instr_name = "mfmacc.bf16.e4"
-                    float_to_source_bits = float_to_bits8_e4m3
-                    bits_to_source_float = bits_to_float8_e4m3
-                    float_to_dest_bits = float_to_bfloat16
-                    bits_to_dest_float = bfloat16_to_float
+    def compile_matmul(self, instruction, tile):
+        """
+        Bước đã biên dịch cho một lệnh matmul trong khối lệnh thẳng (xem blocks.py).
+        tile: {'mtilem': M, 'mtilen': N, 'mtilek': K} đã biết tại lệnh này (None = chưa biết).
+        Với engine numpy, M/N/K hợp lệ và toán hạng không cần lượng tử hóa lại (mfmacc.s:
+        bank float đã là fp32; mmacc*.w.b: byte thấp của bank int) thì các view [:M, :K],
+        [:N, :K], [:M, :N] được dựng một lần và bước chỉ còn phần tính toán vector hóa,
+        giống _matmul_numpy từng bit. Các trường hợp khác trả về None (handler thường).
+        """
+        key = (instruction.func4, instruction.s_size, instruction.d_size, instruction.ctrl)
+        variant = MATMUL_VARIANTS.get(key)
+        if self.matmul_engine != "numpy" or variant is None:
+            return None
+        M, N, K = tile["mtilem"], tile["mtilen"], tile["mtilek"]
+        if None in (M, N, K) or M * N * K == 0:
+            return None
+        if M > self.rownum or N > self.rownum or K > self.elements_per_row_tr or N > self.elements_per_row_acc:
+            return None
+        is_float_op = variant["is_float_op"]
+        if is_float_op and variant["instr_name"] != "mfmacc.s":
+            return None
+
+        import numpy as np
+        md_idx = instruction.md
+        acc_idx = md_idx - 4 if md_idx >= 4 else md_idx
+        dest_bits = variant["dest_bits"]
+        view = self.regs.view
+        if is_float_op:
+            a_view = view(instruction.ms1, "fp32")[:M, :K]
+            b_view = view(instruction.ms2, "fp32")[:N, :K]
+            c_view = view(4 + acc_idx, "fp32")[:M, :N]
+            dest_bits_list = self.acc_dest_bits_float
+        else:
+            a_view = view(instruction.ms1, "int32")[:M, :K]
+            b_view = view(instruction.ms2, "int32")[:N, :K]
+            c_view = view(4 + acc_idx, "int32")[:M, :N]
+            dest_bits_list = self.acc_dest_bits_int
+            a_type = np.int8 if variant["a_signed"] else np.uint8
+            b_type = np.int8 if variant["b_signed"] else np.uint8
+
+        def step():
+            dest_bits_list[acc_idx] = dest_bits
+            if is_float_op:
+                a_q = a_view.astype(np.float64)
+                b_q = b_view.astype(np.float64)
+            else:
+                # int(x) & 0xFF rồi diễn giải có dấu / không dấu = ép kiểu int8 / uint8
+                a_q = a_view.astype(a_type).astype(np.int64)
+                b_q = b_view.astype(b_type).astype(np.int64)
+            dot_product = np.zeros((M, N), dtype=np.float64)
+            with np.errstate(all='ignore'):
+                for k in range(K):
+                    dot_product += np.multiply.outer(a_q[:, k], b_q[:, k])
+                c_new = c_view.astype(np.float64) + dot_product
+                if is_float_op:
+                    c_view[...] = c_new.astype(np.float32)     # = float_to_bits32 / bits_to_float32
                 else:
-                    # LOẠI BỎ mfmacc.h.e5 (size_sup=000) và mfmacc.h.e4 (size_sup=001)
-                    print(f"  -> ERROR: Unsupported instruction (encoding conflict)")
-                    print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                    print(f"     mfmacc.h.e5/e4 are NOT supported due to encoding conflicts!")
-                    print(f"     Use mfmacc.bf16.e5/e4 instead.")
-                    return
-                
-                source_bits, dest_bits = 8, 16
-
-            # (fp8 -> 32-bit) s_size="00", d_size="10" - KHÔNG HỖ TRỢ DO ENCODING CONFLICT
-            elif s_size == "00" and d_size == "10":
+                    c_view[...] = c_new.astype(np.int64).astype(np.uint32).view(np.int32)  # Wrap về int32
+        return step
+
+    def _exec_matmul_error(self, instruction, func4, s_size, d_size, size_sup):
+        """In thông báo lỗi cho các encoding matmul không được hỗ trợ."""
+        # --- NHÓM LỆNH FLOAT (func4 = 0000) ---
+        if func4 == 0b0000:
+            # (fp8 -> bf16) s_size=00, d_size=01
+            if s_size == 0b00 and d_size == 0b01:
+                # LOẠI BỎ mfmacc.h.e5 (size_sup=000) và mfmacc.h.e4 (size_sup=001)
+                self.log.error("  -> ERROR: Unsupported instruction (encoding conflict)")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     mfmacc.h.e5/e4 are NOT supported due to encoding conflicts!")
+                self.log.error("     Use mfmacc.bf16.e5/e4 instead.")
+
+            # (fp8 -> 32-bit) s_size=00, d_size=10 - KHÔNG HỖ TRỢ DO ENCODING CONFLICT
+            elif s_size == 0b00 and d_size == 0b10:
                 # LOẠI BỎ mfmacc.s.e5 (size_sup=000) và mfmacc.s.e4 (size_sup=001)
-                print(f"  -> ERROR: Unsupported instruction (encoding conflict)")
-                print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                print(f"     mfmacc.s.e5/e4 are NOT supported due to encoding conflicts!")
-                print(f"     Use mfmacc.bf16.e5/e4 → mfmacc.s conversion if needed.")
-                return
+                self.log.error("  -> ERROR: Unsupported instruction (encoding conflict)")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     mfmacc.s.e5/e4 are NOT supported due to encoding conflicts!")
+                self.log.error("     Use mfmacc.bf16.e5/e4 → mfmacc.s conversion if needed.")
             
-            # (fp16/bf16 -> fp16) s_size="01", d_size="01"
-            elif s_size == "01" and d_size == "01":
-                if size_sup == "000": # mfmacc.h
-                    instr_name = "mfmacc.h"
-                    float_to_source_bits = float_to_bits16
-                    bits_to_source_float = bits_to_float16
-                    float_to_dest_bits = float_to_bits16
-                    bits_to_dest_float = bits_to_float16
-                    source_bits, dest_bits = 16, 16
-                else:
-                    print(f"  -> ERROR: Unsupported instruction")
-                    print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                    print(f"     Only mfmacc.h (size_sup=000) is supported for FP16→FP16")
-                    return
+            # (fp16/bf16 -> fp16) s_size=01, d_size=01
+            elif s_size == 0b01 and d_size == 0b01:
+                self.log.error("  -> ERROR: Unsupported instruction")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     Only mfmacc.h (size_sup=000) is supported for FP16→FP16")
             
-            # (fp16/bf16 -> fp32) s_size="01", d_size="10"
-            elif s_size == "01" and d_size == "10":
-                if size_sup == "000":
-                    instr_name = "mfmacc.s.h"
-                    float_to_source_bits = float_to_bits16
-                    bits_to_source_float = bits_to_float16
-                elif size_sup == "001":
-                    instr_name = "mfmacc.s.bf16"
-                    float_to_source_bits = float_to_bfloat16
-                    bits_to_source_float = bfloat16_to_float
-                else:
-                    print(f"  -> ERROR: Unsupported instruction")
-                    print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                    print(f"     Only mfmacc.s.h and mfmacc.s.bf16 are supported")
-                    return
-                
-                # (Đích là fp32, giữ nguyên mặc định)
-                source_bits, dest_bits = 16, 32
-
-            # (fp32 -> fp32) s_size="10", d_size="10"
-            elif s_size == "10" and d_size == "10":
-                if size_sup == "000": # mfmacc.s
-                    instr_name = "mfmacc.s"
-                    # (Tất cả mặc định đều là fp32, không cần làm gì)
-                else:
-                    # LOẠI BỎ mfmacc.s.tf32 (size_sup=001)
-                    print(f"  -> ERROR: Unsupported instruction")
-                    print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                    print(f"     mfmacc.s.tf32 is NOT supported (TensorFloat-32 not implemented)")
-                    print(f"     Use mfmacc.s (FP32) instead.")
-                    return
+            # (fp16/bf16 -> fp32) s_size=01, d_size=10
+            elif s_size == 0b01 and d_size == 0b10:
+                self.log.error("  -> ERROR: Unsupported instruction")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     Only mfmacc.s.h and mfmacc.s.bf16 are supported")
+
+            # (fp32 -> fp32) s_size=10, d_size=10
+            elif s_size == 0b10 and d_size == 0b10:
+                # LOẠI BỎ mfmacc.s.tf32 (size_sup=001)
+                self.log.error("  -> ERROR: Unsupported instruction")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     mfmacc.s.tf32 is NOT supported (TensorFloat-32 not implemented)")
+                self.log.error("     Use mfmacc.s (FP32) instead.")
             
-            # LOẠI BỎ tất cả lệnh FP64 (d_size="11")
-            elif d_size == "11":
-                print(f"  -> ERROR: FP64 instructions are NOT supported")
-                print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                print(f"     mfmacc.d.s and mfmacc.d are not needed for ML workloads")
-                print(f"     Use FP32 precision instead.")
-                return
+            # LOẠI BỎ tất cả lệnh FP64 (d_size=11)
+            elif d_size == 0b11:
+                self.log.error("  -> ERROR: FP64 instructions are NOT supported")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     mfmacc.d.s and mfmacc.d are not needed for ML workloads")
+                self.log.error("     Use FP32 precision instead.")
             
             else:
-                print(f"  -> ERROR: Unknown or unsupported float instruction")
-                print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                return
+                self.log.error("  -> ERROR: Unknown or unsupported float instruction")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
 
         # --- NHÓM LỆNH INTEGER (func4 = 0001) ---
-        elif func4 == "0001":
-            is_float_op = False
-            # (int8 -> int32) s_size="00", d_size="10" - CHỈ HỖ TRỢ 4 LỆNH CHUẨN
-            if s_size == "00" and d_size == "10":
-                if size_sup == "000":
-                    instr_name = "mmaccu.w.b" 
-                elif size_sup == "001":
-                    instr_name = "mmaccus.w.b" 
-                elif size_sup == "010":
-                    instr_name = "mmaccsu.w.b" 
-                elif size_sup == "011":
-                    instr_name = "mmacc.w.b"
-                else:
-                    # LOẠI BỎ packed variants (pmmacc.*, size_sup >= 100)
-                    print(f"  -> ERROR: Unsupported integer instruction")
-                    print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                    print(f"     Packed variants (pmmacc.*) are NOT supported")
-                    print(f"     Use standard mmacc.w.b variants (size_sup=000-011)")
-                    return
-                
-                source_bits, dest_bits = 8, 32
+        elif func4 == 0b0001:
+            if s_size == 0b00 and d_size == 0b10:
+                # LOẠI BỎ packed variants (pmmacc.*, size_sup >= 100)
+                self.log.error("  -> ERROR: Unsupported integer instruction")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     Packed variants (pmmacc.*) are NOT supported")
+                self.log.error("     Use standard mmacc.w.b variants (size_sup=000-011)")
             
-            # LOẠI BỎ INT16→INT64 (s_size="01", d_size="11")
-            elif s_size == "01" and d_size == "11":
-                print(f"  -> ERROR: INT16→INT64 instructions are NOT supported")
-                print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                print(f"     mmacc.d.h variants are not needed for neural networks")
-                print(f"     Use INT8→INT32 (mmacc.w.b) instead.")
-                return
+            # LOẠI BỎ INT16→INT64 (s_size=01, d_size=11)
+            elif s_size == 0b01 and d_size == 0b11:
+                self.log.error("  -> ERROR: INT16→INT64 instructions are NOT supported")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
+                self.log.error("     mmacc.d.h variants are not needed for neural networks")
+                self.log.error("     Use INT8→INT32 (mmacc.w.b) instead.")
             
             # LOẠI BỎ bit-packed (func4=0010)
             else:
-                print(f"  -> ERROR: Unknown or unsupported integer instruction")
-                print(f"     s_size={s_size}, d_size={d_size}, size_sup={size_sup}")
-                return
+                self.log.error("  -> ERROR: Unknown or unsupported integer instruction")
+                self.log.error("     s_size={:02b}, d_size={:02b}, size_sup={:03b}", s_size, d_size, size_sup)
         
         # LOẠI BỎ func4=0010 (bit-packed mmacc.w.bp)
-        elif func4 == "0010":
-            print(f"  -> ERROR: Bit-packed instructions are NOT supported")
-            print(f"     func4={func4}, mmacc.w.bp format is unclear in spec")
-            return
+        elif func4 == 0b0010:
+            self.log.error("  -> ERROR: Bit-packed instructions are NOT supported")
+            self.log.error("     func4={:04b}, mmacc.w.bp format is unclear in spec", func4)
 
         # --- CÁC LỆNH KHÔNG ĐƯỢC HỖ TRỢ ---
         else:
-            print(f"  -> ERROR: Unsupported instruction type")
-            print(f"     func4={func4} is not recognized")
-            print(f"     Only 10 safe instructions are supported (see docstring)")
-            return
+            self.log.error("  -> ERROR: Unsupported instruction type")
+            self.log.error("     func4={:04b} is not recognized", func4)
+            self.log.error("     Only 10 safe instructions are supported (see docstring)")
+
+    def _exec_matmul(self, instruction, instr_name, is_float_op,
+                     float_to_source_bits, bits_to_source_float,
+                     float_to_dest_bits, bits_to_dest_float,
+                     source_bits, dest_bits, a_signed, b_signed):
+        """Thực thi một biến thể matmul đã được giải quyết (xem MATMUL_VARIANTS)."""
+        ms1_idx = instruction.ms1
+        ms2_idx = instruction.ms2
+        md_idx = instruction.md  # acc0-3 are encoded as 4-7 (tr4-tr7 aliases)
+        tr_source1_name = f"tr{ms1_idx}"; tr_source2_name = f"tr{ms2_idx}"; acc_dest_name = f"acc{md_idx - 4}"
+
+        # md_idx is 4-7 for acc0-acc3, so use md_idx-4 to index into acc arrays
+        acc_idx = md_idx - 4 if md_idx >= 4 else md_idx
 
         # --- LƯU LẠI KIỂU DỮ LIỆU CỦA THANH GHI ĐÍCH ---
         if is_float_op:
-            self.acc_dest_bits_float[md_idx] = dest_bits
+            self.acc_dest_bits_float[acc_idx] = dest_bits
         else:
-            self.acc_dest_bits_int[md_idx] = dest_bits  # Lưu đúng bit-width của integer
+            self.acc_dest_bits_int[acc_idx] = dest_bits  # Lưu đúng bit-width của integer
 
         # In thông tin Widen Factor
         widen_factor = dest_bits // source_bits if source_bits > 0 else 1
-        print(f"  -> Executing: {instr_name} on {tr_source1_name}, {tr_source2_name} -> {acc_dest_name}")
-        print(f"    - Widen Factor: {widen_factor}x ({source_bits}-bit source -> {dest_bits}-bit dest)")
-        print(f"    - is_float_op: {is_float_op}")
+        self.log.info("  -> Executing: {} on {}, {} -> {}", instr_name, tr_source1_name, tr_source2_name, acc_dest_name)
+        self.log.debug("    - Widen Factor: {}x ({}-bit source -> {}-bit dest)", widen_factor, source_bits, dest_bits)
+        self.log.debug("    - is_float_op: {}", is_float_op)
 
         # 3. Đọc Trạng thái
         M = self.csr_ref.read('mtilem')
         N = self.csr_ref.read('mtilen')
         K = self.csr_ref.read('mtilek')
         if M*N*K == 0: 
-            print("  [Warning] Tile dimensions are zero. Skipping.")
+            self.log.warning("  [Warning] Tile dimensions are zero. Skipping.")
             return
 
         # Đọc mảng đầy đủ từ RAM
-        # md_idx is 4-7 for acc0-acc3, so use md_idx-4 to index into acc arrays
-        acc_idx = md_idx - 4 if md_idx >= 4 else md_idx
         if is_float_op:
             mat_A_full = self.get_matrix_reg_float(ms1_idx)
             mat_B_full = self.get_matrix_reg_float(ms2_idx)
@@ -227,7 +286,7 @@ class MatmulLogic:
         # --- FIX for FP8: Load stores INT8 values, need to convert to FP8 float ---
         if instr_name in ["mfmacc.bf16.e5", "mfmacc.bf16.e4"]:
             # FP8 data loaded via mlbe8 into tr_int, need to convert to float values
-            print(f"    - Converting FP8 INT8 data to float values...")
+            self.log.debug("    - Converting FP8 INT8 data to float values...")
             converter = bits_to_float8_e5m2 if instr_name == "mfmacc.bf16.e5" else bits_to_float8_e4m3
             
             # Read from tr_int instead of tr_float
@@ -242,7 +301,7 @@ class MatmulLogic:
         elif instr_name == "mfmacc.s.bf16":
             # tr_float contains values interpreted as FP16 by load logic
             # We need to re-convert: FP32 → FP16 bits → reinterpret as BF16 → FP32
-            print("    - Re-interpreting loaded FP16 data as BF16...")
+            self.log.debug("    - Re-interpreting loaded FP16 data as BF16...")
             for i in range(M):
                 for j in range(K):
                     # Get FP16 bits from wrongly-interpreted value
@@ -263,8 +322,40 @@ class MatmulLogic:
         # Matrix A: [M, K] in tr_source1
         # Matrix B: [K, N] in tr_source2
         # Matrix C: [M, N] in acc_dest
+        self.log.debug("    - Starting computation loop (with precision simulation)...")
+        compute = self._matmul_numpy if self.matmul_engine == "numpy" else self._matmul_reference
+        mat_C_new = compute(mat_A_full, mat_B_full, mat_C_old, M, N, K, is_float_op,
+                            float_to_source_bits, bits_to_source_float,
+                            float_to_dest_bits, bits_to_dest_float, a_signed, b_signed)
+        
+        self.log.debug("    - Computation complete.")
+
+        # 5. Ghi Trạng thái Mới (ghi M×N phần tử vào thanh ghi, phần còn lại giữ nguyên)
+        # md_idx is 4-7 for acc0-acc3, so use acc_idx from above
+        if is_float_op:
+            acc = self.acc_float[acc_idx]
+            for m, row in enumerate(mat_C_new):
+                acc_row = acc[m]
+                for n, value in enumerate(row):
+                    acc_row[n] = value
+        else:
+            acc = self.acc_int[acc_idx]
+            for m, row in enumerate(mat_C_new):
+                acc_row = acc[m]
+                for n, value in enumerate(row):
+                    acc_row[n] = bits_to_signed_int32(int(value)) # Wrap về int32
+            
+        self.log.debug("    - {} (in RAM) updated.", acc_dest_name)
+
+    # --- MATMUL ENGINES ---
+    # Cả hai engine nhận cùng tham số và trả về mat_C_new (M×N, list of lists).
+    # Kết quả phải giống nhau từng bit (xem test_matmul_engine.py).
+
+    def _matmul_reference(self, mat_A_full, mat_B_full, mat_C_old, M, N, K, is_float_op,
+                          float_to_source_bits, bits_to_source_float,
+                          float_to_dest_bits, bits_to_dest_float, a_signed, b_signed):
+        """Engine tham chiếu: vòng lặp Python M×N×K, lượng tử hóa từng toán hạng tại chỗ."""
         mat_C_new = [[mat_C_old[r][c] for c in range(N)] for r in range(M)]
-        print("    - Starting computation loop (with precision simulation)...")
         for m in range(M):
             for n in range(N):
                 if is_float_op:
@@ -289,22 +380,9 @@ class MatmulLogic:
                         a_int8 = int(a_full_precision) & 0xFF
                         b_int8 = int(b_full_precision) & 0xFF
                         
-                        a_val = 0
-                        b_val = 0
-
-                        # Kiểm tra instr_name để quyết định kiểu dữ liệu
-                        if instr_name == "mmaccu.w.b": # unsigned * unsigned
-                            a_val = a_int8
-                            b_val = b_int8
-                        elif instr_name == "mmaccus.w.b": # unsigned * signed
-                            a_val = a_int8
-                            b_val = b_int8 - 256 if b_int8 > 127 else b_int8
-                        elif instr_name == "mmaccsu.w.b": # signed * unsigned
-                            a_val = a_int8 - 256 if a_int8 > 127 else a_int8
-                            b_val = b_int8
-                        else: # Mặc định là 'mmacc.w.b' (signed * signed)
-                            a_val = a_int8 - 256 if a_int8 > 127 else a_int8
-                            b_val = b_int8 - 256 if b_int8 > 127 else b_int8
+                        # Dấu của toán hạng đã được giải quyết sẵn (a_signed / b_signed)
+                        a_val = a_int8 - 256 if (a_signed and a_int8 > 127) else a_int8
+                        b_val = b_int8 - 256 if (b_signed and b_int8 > 127) else b_int8
                             
                         dot_product += a_val * b_val
 
@@ -316,14 +394,46 @@ class MatmulLogic:
                     c_new_bits = float_to_dest_bits(c_new_full)
                     c_new_quantized = bits_to_dest_float(c_new_bits)
                     mat_C_new[m][n] = c_new_quantized
-        
-        print(f"    - Computation complete.")
+        return mat_C_new
+
+    def _matmul_numpy(self, mat_A_full, mat_B_full, mat_C_old, M, N, K, is_float_op,
+                      float_to_source_bits, bits_to_source_float,
+                      float_to_dest_bits, bits_to_dest_float, a_signed, b_signed):
+        """
+        Engine NumPy: lượng tử hóa mỗi toán hạng MỘT lần, rồi tính C += A·Bᵀ
+        vector hóa trên M×N.
+        Để giống engine tham chiếu từng bit, tích vô hướng vẫn được cộng dồn tuần tự
+        theo k (float64, bắt đầu từ 0.0) - chỉ thứ tự cộng này quyết định làm tròn.
+        """
+        import numpy as np
 
-        # 5. Ghi Trạng thái Mới
-        # md_idx is 4-7 for acc0-acc3, so use acc_idx from above
         if is_float_op:
-            self.acc_float[acc_idx] = mat_C_new
+            # Lượng tử hóa cả mảng một lần (converters.array_quantizer, giống từng bit bản vô hướng)
+            quantize_source = array_quantizer(float_to_source_bits, bits_to_source_float)
+            quantize_dest = array_quantizer(float_to_dest_bits, bits_to_dest_float)
+            a_q = quantize_source(np.array([[mat_A_full[m][k] for k in range(K)] for m in range(M)],
+                                           dtype=np.float64).reshape(M, K))
+            b_q = quantize_source(np.array([[mat_B_full[n][k] for k in range(K)] for n in range(N)],
+                                           dtype=np.float64).reshape(N, K))
+            c_old = quantize_dest(np.array([[mat_C_old[m][n] for n in range(N)] for m in range(M)],
+                                           dtype=np.float64).reshape(M, N))
         else:
-            self.acc_int[acc_idx] = mat_C_new
-            
-        print(f"    - {acc_dest_name} (in RAM) updated.")
+            # LOGIC SIGNED/UNSIGNED (dấu đã được giải quyết sẵn)
+            quantize_a = _int8_signed if a_signed else _int8_unsigned
+            quantize_b = _int8_signed if b_signed else _int8_unsigned
+            c_old = [[float(int(mat_C_old[m][n])) for n in range(N)] for m in range(M)]
+
+            # A: [M, K]; B được đọc theo B[n][k] (A * B.T) -> [N, K]
+            a_q = np.array([[quantize_a(mat_A_full[m][k]) for k in range(K)] for m in range(M)], dtype=np.int64).reshape(M, K)
+            b_q = np.array([[quantize_b(mat_B_full[n][k]) for k in range(K)] for n in range(N)], dtype=np.int64).reshape(N, K)
+            c_old = np.array(c_old, dtype=np.float64).reshape(M, N)
+
+        dot_product = np.zeros((M, N), dtype=np.float64)
+        with np.errstate(all='ignore'):
+            for k in range(K):
+                dot_product += np.multiply.outer(a_q[:, k], b_q[:, k])
+            c_new_full = c_old + dot_product
+
+        if not is_float_op:
+            return c_new_full.tolist() # (int add, giữ kiểu float như engine tham chiếu)
+        return quantize_dest(c_new_full).tolist()
@@ -1,6 +1,7 @@
 # iss/logic_misc.py
 import struct
-from typing import TYPE_CHECKING
+from functools import partial
+TYPE_CHECKING = False  # typing.TYPE_CHECKING, khỏi import typing lúc chạy
 
 # Import các hàm tiện ích (nếu bạn đã tách chúng ra 'converters.py')
 from .converters import (
@@ -22,12 +23,14 @@ class MiscLogic:
         - tr_float: List[List[List[float]]] - Tile registers (float)
         - acc_int: List[List[List[int]]] - Accumulator registers (integer)
         - acc_float: List[List[List[float]]] - Accumulator registers (float)
+        - regs: MatrixRegisterFile - Byte-backed storage (tr_*/acc_* are row views into it)
         - gpr_ref: RegisterFile - Reference to GPR registers
         - csr_ref: CSRFile - Reference to CSR registers
         - memory: MainMemory - Reference to main memory
         - rownum: int - Number of rows in matrix
         - elements_per_row_tr: int - Elements per row in TR
         - elements_per_row_acc: int - Elements per row in ACC
+        - log: SimLogger - Levelled logger (see logger.py)
     """
 
     # --- HÀM HELPER ĐỂ XỬ LÝ THANH GHI (TR/ACC) ---
@@ -49,73 +52,58 @@ class MiscLogic:
     
     def _zero_register(self, reg_idx):
         """Helper: Zeros out all elements of a given register (both int and float views).
-        SPECS: tr0-tr3 are pure tile registers, tr4-tr7 = acc0-acc3 (alias)"""
-        # Lấy kích thước vật lý của thanh ghi
-        tr_rows, tr_cols = self._get_reg_dims_by_idx(0)   # Kích thước TR (index 0-3)
-        acc_rows, acc_cols = self._get_reg_dims_by_idx(4) # Kích thước ACC (index 4-7)
-        
-        if reg_idx < 4: # tr0-tr3 (pure tile registers)
-            self.tr_int[reg_idx]   = [[0] * tr_cols for _ in range(tr_rows)]
-            self.tr_float[reg_idx] = [[0.0] * tr_cols for _ in range(tr_rows)]
-        else: # tr4-tr7 = acc0-acc3
-            idx = reg_idx - 4
-            self.acc_int[idx]   = [[0] * acc_cols for _ in range(acc_rows)]
-            self.acc_float[idx] = [[0.0] * acc_cols for _ in range(acc_rows)]
+        SPECS: tr0-tr3 are pure tile registers, tr4-tr7 = acc0-acc3 (alias)
+        Index 0-7 trùng với chỉ số thanh ghi vật lý trong MatrixRegisterFile."""
+        self.regs.zero(reg_idx)
 
     # --- CÁC HÀM THỰC THI CON (SUB-EXECUTORS) ---
 
-    def _exec_mzero(self, md_idx, ctrl_imm3):
+    def _exec_mzero(self, instruction):
         """Thực thi CHỈ mzero (loại bỏ mzero2r/4r/8r)"""
+        md_idx = instruction.md
+        ctrl_imm3 = instruction.ctrl # bits 25-23
         if ctrl_imm3 != 0b000:
-            print(f"  -> ERROR: Only mzero (ctrl=000) is supported")
-            print(f"     ctrl={ctrl_imm3:03b}")
-            print(f"     mzero2r/4r/8r are NOT supported (optimization variants)")
-            print(f"     Use multiple mzero instructions instead")
+            self.log.error("  -> ERROR: Only mzero (ctrl=000) is supported")
+            self.log.error("     ctrl={:03b}", ctrl_imm3)
+            self.log.error("     mzero2r/4r/8r are NOT supported (optimization variants)")
+            self.log.error("     Use multiple mzero instructions instead")
             return
         
-        print(f"    - Executing mzero (md={md_idx})")
+        self.log.info("    - Executing mzero (md={})", md_idx)
         self._zero_register(md_idx)
 
-    def _exec_mmov_mm(self, md_idx, ms1_idx, s_size_str, d_size_str):
+    def _exec_mmov_mm(self, instruction):
         """Thực thi mmov.mm md, ms1."""
-        print(f"    - Executing mmov.mm (md={md_idx}, ms1={ms1_idx})")
-        
-        rows_ms1, cols_ms1 = self._get_reg_dims_by_idx(ms1_idx)
-        rows_md, cols_md = self._get_reg_dims_by_idx(md_idx)
-        
-        # Kích thước hiệu dụng là kích thước nhỏ nhất
-        rows = min(rows_ms1, rows_md)
-        cols = min(cols_ms1, cols_md)
+        md_idx = instruction.md
+        ms1_idx = instruction.ms1
+        self.log.info("    - Executing mmov.mm (md={}, ms1={})", md_idx, ms1_idx)
         
         # mmov.mm copies entire matrix - copy both int and float views
         # to maintain data integrity regardless of how data is interpreted
-        src_int = self._get_reg_array_by_idx(ms1_idx, is_float=False)
-        src_float = self._get_reg_array_by_idx(ms1_idx, is_float=True)
-        dest_int = self._get_reg_array_by_idx(md_idx, is_float=False)
-        dest_float = self._get_reg_array_by_idx(md_idx, is_float=True)
-        
-        for i in range(rows):
-            for j in range(cols):
-                dest_int[i][j] = src_int[i][j]
-                dest_float[i][j] = src_float[i][j]
+        # (mọi thanh ghi có cùng kích thước vật lý -> một lần copy byte cho mỗi bank)
+        self.regs.copy(md_idx, ms1_idx)
 
-    def _exec_mmov_x_m(self, rd_idx, ms2_idx, rs1_val, ctrl_size):
+    def _exec_mmov_x_m(self, instruction):
         """Thực thi CHỈ mmovw.x.m (loại bỏ mmovb/h/d.x.m)"""
+        rd_idx = instruction.rd
+        ms2_idx = instruction.ms2
+        ctrl_size = instruction.ctrl & 0x3 # bits 24-23
         # CHỈ hỗ trợ FP32 (ctrl_size=10)
         if ctrl_size != 0b10:
-            print(f"  -> ERROR: Only mmovw.x.m (32-bit) is supported")
-            print(f"     ctrl_size={ctrl_size:02b}")
+            self.log.error("  -> ERROR: Only mmovw.x.m (32-bit) is supported")
+            self.log.error("     ctrl_size={:02b}", ctrl_size)
             if ctrl_size == 0b00:
-                print(f"     mmovb.x.m (8-bit) is NOT supported")
+                self.log.error("     mmovb.x.m (8-bit) is NOT supported")
             elif ctrl_size == 0b01:
-                print(f"     mmovh.x.m (16-bit) is NOT supported")
+                self.log.error("     mmovh.x.m (16-bit) is NOT supported")
             elif ctrl_size == 0b11:
-                print(f"     mmovd.x.m (64-bit) has ENCODING CONFLICT with mmovb.x.m!")
-            print(f"     Use mmovw.x.m (FP32) only")
+                self.log.error("     mmovd.x.m (64-bit) has ENCODING CONFLICT with mmovb.x.m!")
+            self.log.error("     Use mmovw.x.m (FP32) only")
             return
         
         eew = 32
-        print(f"    - Executing mmovw.x.m (rd={rd_idx}, ms2={ms2_idx}, rs1_val={rs1_val})")
+        rs1_val = self.gpr_ref.read(instruction.rs1)
+        self.log.info("    - Executing mmovw.x.m (rd={}, ms2={}, rs1_val={})", rd_idx, ms2_idx, rs1_val)
         
         src_array = self._get_reg_array_by_idx(ms2_idx, is_float=True)
         rows, cols_phys = self._get_reg_dims_by_idx(ms2_idx)
@@ -126,56 +114,64 @@ class MiscLogic:
         col_idx = rs1_val % elements_per_row_logical
         
         if row_idx >= rows:
-            print(f"    [Warning] mmovw.x.m index (row={row_idx}) out of bounds")
+            self.log.warning("    [Warning] mmovw.x.m index (row={}) out of bounds", row_idx)
             return
 
         val_to_write = float_to_bits32(src_array[row_idx][col_idx])
         self.gpr_ref.write(rd_idx, val_to_write)
 
-    def _exec_mmov_m_x_or_mdup(self, md_idx, rs2_val, rs1_val, ctrl_bit_25, d_size_str):
+    def _exec_mmov_m_x_or_mdup(self, instruction):
         """Thực thi CHỈ mmovw.m.x hoặc mdupw.m.x (loại bỏ 8/16/64-bit variants)"""
+        d_size = instruction.d_size
         # CHỈ hỗ trợ FP32 (d_size=10)
-        if d_size_str != "10":
-            print(f"  -> ERROR: Only FP32 (32-bit) operations are supported")
-            print(f"     d_size={d_size_str}")
-            if d_size_str == "00":
-                print(f"     mmovb/mdupb.m.x (8-bit) are NOT supported")
-            elif d_size_str == "01":
-                print(f"     mmovh/mduph.m.x (16-bit) are NOT supported")
-            elif d_size_str == "11":
-                print(f"     mmovd/mdupd.m.x (64-bit) are NOT supported")
-            print(f"     Use mmovw/mdupw.m.x (FP32) only")
+        if d_size != 0b10:
+            self.log.error("  -> ERROR: Only FP32 (32-bit) operations are supported")
+            self.log.error("     d_size={:02b}", d_size)
+            if d_size == 0b00:
+                self.log.error("     mmovb/mdupb.m.x (8-bit) are NOT supported")
+            elif d_size == 0b01:
+                self.log.error("     mmovh/mduph.m.x (16-bit) are NOT supported")
+            elif d_size == 0b11:
+                self.log.error("     mmovd/mdupd.m.x (64-bit) are NOT supported")
+            self.log.error("     Use mmovw/mdupw.m.x (FP32) only")
             return
         
         eew = 32
+        md_idx = instruction.md
+        ctrl_bit_25 = instruction.ctrl >> 2
+        rs1_val = self.gpr_ref.read(instruction.rs1)
+        rs2_val = self.gpr_ref.read(instruction.rs2)
         dest_array = self._get_reg_array_by_idx(md_idx, is_float=True)
         rows, cols_phys = self._get_reg_dims_by_idx(md_idx)
 
-        if ctrl_bit_25 == '1': # mmovw.m.x: Ghi 1 phần tử 
-            print(f"    - Executing mmovw.m.x (md={md_idx}, rs1_val={rs1_val})")
+        if ctrl_bit_25 == 1: # mmovw.m.x: Ghi 1 phần tử 
+            self.log.info("    - Executing mmovw.m.x (md={}, rs1_val={})", md_idx, rs1_val)
             elements_per_row = cols_phys # FP32: 1 element per slot
             row_idx = rs1_val // elements_per_row
             col_idx = rs1_val % elements_per_row
 
             if row_idx >= rows:
-                print(f"    [Warning] mmovw.m.x index (row={row_idx}) out of bounds")
+                self.log.warning("    [Warning] mmovw.m.x index (row={}) out of bounds", row_idx)
                 return
 
             dest_array[row_idx][col_idx] = bits_to_float32(rs2_val)
 
         else: # mdupw.m.x: Sao chép rs2 ra toàn bộ thanh ghi
-            print(f"    - Executing mdupw.m.x (md={md_idx})")
+            self.log.info("    - Executing mdupw.m.x (md={})", md_idx)
             val = bits_to_float32(rs2_val)
             for i in range(rows):
                 for j in range(cols_phys):
                     dest_array[i][j] = val
 
-    def _exec_slide(self, md_idx, ms1_idx, imm3, slide_type):
+    def _exec_slide(self, instruction, slide_type):
         """
         Thực thi slide operations (mrslidedown, mcslidedown.w)
         slide_type: 'row_down', 'col_down'
         """
-        print(f"    - Executing {slide_type} (md={md_idx}, ms1={ms1_idx}, imm3={imm3})")
+        md_idx = instruction.md
+        ms1_idx = instruction.ms1
+        imm3 = instruction.ctrl # bits 25-23
+        self.log.info("    - Executing {} (md={}, ms1={}, imm3={})", slide_type, md_idx, ms1_idx, imm3)
         
         src_array = self._get_reg_array_by_idx(ms1_idx, is_float=True)
         dest_array = self._get_reg_array_by_idx(md_idx, is_float=True)
@@ -195,122 +191,106 @@ class MiscLogic:
                     src_col = (j - imm3) % cols
                     dest_array[i][j] = src_array[i][src_col]
 
+    def _exec_misc_error(self, instruction, lines):
+        """In thông báo lỗi (đã dựng sẵn lúc resolve) cho lệnh MISC không hỗ trợ."""
+        for line in lines:
+            self.log.error(line)
+
     # --- HÀM DISPATCHER CHÍNH ---
-    def execute_misc(self, instruction):
+    def resolve_misc(self, instruction):
         """
-        Giải mã và điều phối các lệnh MISC (func3=000, uop=11).
-        CHỈ HỖ TRỢ 7 LỆNH CỐT LÕI.
+        Chọn handler cho lệnh MISC (func3=000, uop=11) theo func4/uop
+        (và s_size/d_size cho các lệnh slide).
+        CHỈ HỖ TRỢ 7 LỆNH CỐT LÕI. Trả về callable handler(instruction).
         """
-        # 1. Giải mã các trường bit
-        func4       = instruction[0:4]
-        uop         = instruction[4:6]
-        ctrl_imm3_bin = instruction[6:9]     # bits 25-23
-        ctrl_bit_25 = instruction[6]
-        ctrl_size_xm = int(instruction[7:9], 2) # bits 24-23 for mmov.x.m
-        
-        ms2_bin     = instruction[9:12]
-        s_size_str  = instruction[12:14]
-        ms1_bin     = instruction[14:17]
-        rs1_bin     = instruction[12:17]     # GPR rs1
-        d_size_str  = instruction[20:22]
-        rd_bin      = instruction[20:25]     # GPR rd
-        md_bin      = instruction[22:25]
-        rs2_bin_gpr = instruction[7:12]      # GPR rs2
-
-        # 2. Chuyển đổi các giá trị
-        ctrl_imm3 = int(ctrl_imm3_bin, 2)
-        md_idx    = int(md_bin, 2)
-        ms1_idx   = int(ms1_bin, 2)
-        ms2_idx   = int(ms2_bin, 2)
-        rd_idx    = int(rd_bin, 2)
-        rs1_val   = self.gpr_ref.read(int(rs1_bin, 2))
-        rs2_val   = self.gpr_ref.read(int(rs2_bin_gpr, 2))
-        
-        # 3. Điều phối (Dispatch) - CHỈ 7 LỆNH
+        func4  = instruction.func4
+        uop    = instruction.uop
+        s_size = instruction.s_size
+        d_size = instruction.d_size
         
         # Lệnh 1: mzero
-        if func4 == "0000" and uop == "11": 
-            self._exec_mzero(md_idx, ctrl_imm3)
+        if func4 == 0b0000 and uop == 0b11: 
+            return self._exec_mzero
         
         # Lệnh 2: mmov.mm
-        elif func4 == "0001" and uop == "11": 
-            self._exec_mmov_mm(md_idx, ms1_idx, s_size_str, d_size_str)
+        elif func4 == 0b0001 and uop == 0b11: 
+            return self._exec_mmov_mm
             
         # Lệnh 5: mmovw.x.m
-        elif func4 == "0010" and uop == "11": 
-            self._exec_mmov_x_m(rd_idx, ms2_idx, rs1_val, ctrl_size_xm)
+        elif func4 == 0b0010 and uop == 0b11: 
+            return self._exec_mmov_x_m
             
         # Lệnh 3,4: mmovw.m.x or mdupw.m.x
-        elif func4 == "0011" and uop == "11": 
-            self._exec_mmov_m_x_or_mdup(md_idx, rs2_val, rs1_val, ctrl_bit_25, d_size_str)
+        elif func4 == 0b0011 and uop == 0b11: 
+            return self._exec_mmov_m_x_or_mdup
         
         # Lệnh 6: mrslidedown
-        elif func4 == "0101" and uop == "11":
-            if s_size_str == "00" and d_size_str == "00":
-                self._exec_slide(md_idx, ms1_idx, ctrl_imm3, 'row_down')
-            else:
-                print(f"  -> ERROR: Only mrslidedown (s_size=00, d_size=00) is supported")
-                print(f"     s_size={s_size_str}, d_size={d_size_str}")
-                print(f"     mrslideup is NOT supported (use mrslidedown instead)")
-                return
+        elif func4 == 0b0101 and uop == 0b11:
+            if s_size == 0b00 and d_size == 0b00:
+                return partial(self._exec_slide, slide_type='row_down')
+            lines = (f"  -> ERROR: Only mrslidedown (s_size=00, d_size=00) is supported",
+                     f"     s_size={s_size:02b}, d_size={d_size:02b}",
+                     f"     mrslideup is NOT supported (use mrslidedown instead)")
         
         # Lệnh 7: mcslidedown.w
-        elif func4 == "0111" and uop == "11":
-            if s_size_str == "10" and d_size_str == "10":
-                self._exec_slide(md_idx, ms1_idx, ctrl_imm3, 'col_down')
-            else:
-                print(f"  -> ERROR: Only mcslidedown.w (FP32, s_size=10, d_size=10) is supported")
-                print(f"     s_size={s_size_str}, d_size={d_size_str}")
-                if s_size_str == "00":
-                    print(f"     mcslidedown.b (8-bit) is NOT supported")
-                elif s_size_str == "01":
-                    print(f"     mcslidedown.h (16-bit) is NOT supported")
-                elif s_size_str == "11":
-                    print(f"     mcslidedown.d (64-bit) is NOT supported")
-                print(f"     Use mcslidedown.w (FP32) only")
-                return
+        elif func4 == 0b0111 and uop == 0b11:
+            if s_size == 0b10 and d_size == 0b10:
+                return partial(self._exec_slide, slide_type='col_down')
+            lines = [f"  -> ERROR: Only mcslidedown.w (FP32, s_size=10, d_size=10) is supported",
+                     f"     s_size={s_size:02b}, d_size={d_size:02b}"]
+            if s_size == 0b00:
+                lines.append(f"     mcslidedown.b (8-bit) is NOT supported")
+            elif s_size == 0b01:
+                lines.append(f"     mcslidedown.h (16-bit) is NOT supported")
+            elif s_size == 0b11:
+                lines.append(f"     mcslidedown.d (64-bit) is NOT supported")
+            lines.append(f"     Use mcslidedown.w (FP32) only")
         
         # LOẠI BỎ các lệnh không được hỗ trợ
-        elif func4 == "0100" and uop == "11":
-            print(f"  -> ERROR: Pack operations (mpack*) are NOT supported")
-            print(f"     func4={func4}, uop={uop}")
-            print(f"     Not needed for standard neural networks")
-            return
+        elif func4 == 0b0100 and uop == 0b11:
+            lines = (f"  -> ERROR: Pack operations (mpack*) are NOT supported",
+                     f"     func4={func4:04b}, uop={uop:02b}",
+                     f"     Not needed for standard neural networks")
         
-        elif func4 == "0101" and uop == "10":
-            print(f"  -> ERROR: mbce8 broadcast is NOT supported")
-            print(f"     func4={func4}, uop={uop}")
-            print(f"     Use mdupw.m.x for broadcasting")
-            return
+        elif func4 == 0b0101 and uop == 0b10:
+            lines = (f"  -> ERROR: mbce8 broadcast is NOT supported",
+                     f"     func4={func4:04b}, uop={uop:02b}",
+                     f"     Use mdupw.m.x for broadcasting")
         
-        elif func4 == "0110":
-            if uop == "10":
-                print(f"  -> ERROR: mrbc.mv.i broadcast is NOT supported")
-                print(f"     Use mdupw.m.x for broadcasting")
-                return
-            elif uop == "11":
-                print(f"  -> ERROR: mrslideup is NOT supported")
-                print(f"     Use mrslidedown with appropriate offset")
-                return
+        elif func4 == 0b0110 and uop == 0b10:
+            lines = (f"  -> ERROR: mrbc.mv.i broadcast is NOT supported",
+                     f"     Use mdupw.m.x for broadcasting")
+
+        elif func4 == 0b0110 and uop == 0b11:
+            lines = (f"  -> ERROR: mrslideup is NOT supported",
+                     f"     Use mrslidedown with appropriate offset")
+
+        elif func4 == 0b0110: # uop khác: không có thông báo
+            lines = ()
         
-        elif func4 == "0111" and uop == "10":
-            print(f"  -> ERROR: mcbce8.mv.i broadcast is NOT supported")
-            print(f"     Use mdupw.m.x for broadcasting")
-            return
+        elif func4 == 0b0111 and uop == 0b10:
+            lines = (f"  -> ERROR: mcbce8.mv.i broadcast is NOT supported",
+                     f"     Use mdupw.m.x for broadcasting")
         
-        elif func4 == "1000" and uop == "11":
-            print(f"  -> ERROR: mcslideup.* operations are NOT supported")
-            print(f"     Use mcslidedown.w with appropriate offset")
-            return
+        elif func4 == 0b1000 and uop == 0b11:
+            lines = (f"  -> ERROR: mcslideup.* operations are NOT supported",
+                     f"     Use mcslidedown.w with appropriate offset")
         
-        elif func4 == "1001" or func4 == "1010":
-            print(f"  -> ERROR: Advanced broadcast operations (mrbca, mcbca*) are NOT supported")
-            print(f"     func4={func4}")
-            print(f"     Use mdupw.m.x for broadcasting")
-            return
+        elif func4 == 0b1001 or func4 == 0b1010:
+            lines = (f"  -> ERROR: Advanced broadcast operations (mrbca, mcbca*) are NOT supported",
+                     f"     func4={func4:04b}",
+                     f"     Use mdupw.m.x for broadcasting")
         
         else:
-            print(f"  -> ERROR: Unknown or unsupported MISC instruction")
-            print(f"     func4={func4}, uop={uop}")
-            print(f"     Only 7 core MISC instructions are supported (see docstring)")
-            return
\ No newline at end of file
+            lines = (f"  -> ERROR: Unknown or unsupported MISC instruction",
+                     f"     func4={func4:04b}, uop={uop:02b}",
+                     f"     Only 7 core MISC instructions are supported (see docstring)")
+
+        return partial(self._exec_misc_error, lines=tuple(lines))
+
+    def execute_misc(self, instruction):
+        """
+        Giải mã và điều phối các lệnh MISC (func3=000, uop=11).
+        CHỈ HỖ TRỢ 7 LỆNH CỐT LÕI.
+        """
+        self.resolve_misc(instruction)(instruction)
@@ -0,0 +1,128 @@
+# iss/profiler.py
+"""
+Đo đạc (instrumentation) tùy chọn cho Simulator.run.
+
+    profiler = Profiler()
+    sim.profiler = profiler          # None (mặc định): run() chạy vòng lặp gốc, không tốn gì thêm
+    sim.run()
+    print(profiler.report())
+
+Theo từng mnemonic: số lần thực thi, tổng thời gian handler (wall time, perf_counter)
+và số phần tử đã xử lý (M·N·K cho matmul, M·N cho element-wise, byte cho load/store).
+Hook `before(sim, pc, instruction, mnemonic)` / `after(sim, pc, instruction, mnemonic)`
+được gọi quanh mỗi lệnh (pc là PC của lệnh đang thực thi).
+
+Mnemonic được tra một lần cho mỗi PC khi bắt đầu run() (khớp với ALL_INSTRUCTIONS,
+xem dispatch.definition_mask), không nằm trong vòng lặp.
+"""
+import time
+from collections import defaultdict
+
+from .definitions import ALL_INSTRUCTIONS
+from .dispatch import definition_word, definition_mask
+from .logic_loadstore import LOADSTORE_LAYOUTS
+
+# (mnemonic, template, mask), mask nhiều bit hơn (cụ thể hơn) đứng trước; cùng độ cụ thể
+# thì mục định nghĩa sau thắng (các tên ngắn madd.w, mfmin.s, ... nằm cuối bảng)
+_DEFINITIONS = sorted(
+    ((name.strip(), definition_word(info), definition_mask(info), order)
+     for order, (name, info) in enumerate(ALL_INSTRUCTIONS.items())),
+    key=lambda entry: (-bin(entry[2]).count("1"), -entry[3]))
+_mnemonic_cache = {}
+
+
+def mnemonic_of(word):
+    """Tên lệnh (theo ALL_INSTRUCTIONS) của một từ lệnh 32-bit; 'unknown' nếu không khớp."""
+    name = _mnemonic_cache.get(word)
+    if name is None:
+        name = next((n for n, template, mask, _ in _DEFINITIONS if word & mask == template), "unknown")
+        _mnemonic_cache[word] = name
+    return name
+
+
+def _no_elements(csr):
+    return 0
+
+
+def _matmul_elements(csr):
+    return csr.read('mtilem') * csr.read('mtilen') * csr.read('mtilek')
+
+
+def _elementwise_elements(csr):
+    return csr.read('mtilem') * csr.read('mtilen')
+
+
+def _loadstore_elements(info):
+    layout = LOADSTORE_LAYOUTS.get(info["func"])
+    if layout is None or info["d_size"] == 0b11:
+        return _no_elements
+    row_csr, col_csr = layout[2][1], layout[3][1]
+    num_bytes = 1 << info["d_size"]
+    return lambda csr: csr.read(row_csr) * csr.read(col_csr) * num_bytes
+
+
+def element_counter(mnemonic):
+    """Hàm csr -> số phần tử (byte với load/store) mà lệnh xử lý, đọc CSR trước khi thực thi."""
+    info = ALL_INSTRUCTIONS.get(mnemonic) or ALL_INSTRUCTIONS.get(mnemonic + " ")
+    kind = info.get("instr_type") if info else None
+    if kind == "MULTIPLY":
+        return _matmul_elements
+    if kind == "EW":
+        return _elementwise_elements
+    if kind == "LOADSTORE":
+        return _loadstore_elements(info)
+    return _no_elements
+
+
+class Profiler:
+    """Bộ đếm theo mnemonic + hook trước/sau mỗi lệnh cho Simulator.run."""
+
+    def __init__(self, timing=True, before=None, after=None, clock=time.perf_counter):
+        """
+        timing: đo thời gian handler (False: chỉ đếm lệnh và phần tử)
+        before / after: hook(sim, pc, instruction, mnemonic), hoặc None
+        clock: hàm thời gian (giây)
+        """
+        self.timing = timing
+        self.before = before
+        self.after = after
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.counts = defaultdict(int)
+        self.times = defaultdict(float)
+        self.elements = defaultdict(int)
+
+    def prepare(self, decoded):
+        """(mnemonic, element counter) theo PC cho chương trình đã predecode."""
+        entries = []
+        for instruction in decoded:
+            mnemonic = mnemonic_of(instruction.word)
+            entries.append((mnemonic, element_counter(mnemonic)))
+        return entries
+
+    @property
+    def total_instructions(self):
+        return sum(self.counts.values())
+
+    @property
+    def total_time(self):
+        return sum(self.times.values())
+
+    def stats(self):
+        """[(mnemonic, count, seconds, elements)], lệnh tốn thời gian nhất trước."""
+        return sorted(((name, count, self.times[name], self.elements[name])
+                       for name, count in self.counts.items()),
+                      key=lambda row: (-row[2], -row[1], row[0]))
+
+    def report(self, top=None):
+        """Bảng văn bản tóm tắt (top: chỉ in `top` dòng đầu)."""
+        rows = self.stats()[:top] if top else self.stats()
+        total_time = self.total_time or 1.0
+        lines = [f"{'mnemonic':<16} {'count':>10} {'time (ms)':>12} {'%time':>7} {'us/instr':>10} {'elements':>12}"]
+        for name, count, seconds, elements in rows:
+            lines.append(f"{name:<16} {count:>10} {seconds * 1e3:>12.3f} {seconds * 100 / total_time:>6.1f}% "
+                         f"{seconds * 1e6 / count:>10.2f} {elements:>12}")
+        lines.append(f"{'total':<16} {self.total_instructions:>10} {self.total_time * 1e3:>12.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,272 @@
+# iss/program_file.py
+"""
+Binary program format (thay cho machine_code.txt: 33 byte ASCII / lệnh).
+
+Little-endian layout:
+  header  : magic "TPUPROG\0", version (u16), flags (u16, = 0),
+            word count (u32), section count (u32), symbol count (u32)
+  words   : word count x u32 (mã máy, lệnh thứ i ở PC = 4 * i)
+  sections: per section -> start pc (u32), word count (u32), name length (u8), name (ascii)
+  symbols : per symbol  -> pc (u32), name length (u8), name (ascii)
+
+Bảng section / symbol nằm sau mã máy, nên ProgramWriter ghi lệnh theo luồng (không
+cần biết trước số lệnh) rồi ghi hai bảng và sửa header khi đóng file.
+ProgramFile đọc mã máy bằng mmap cho file lớn: words là memoryview 'I' trỏ thẳng vào
+file (không sao chép, không parse chuỗi), dùng trực tiếp cho Simulator.load_program.
+"""
+import sys
+import mmap
+import array
+import struct
+
+PROGRAM_MAGIC = b"TPUPROG\0"
+PROGRAM_VERSION = 1
+
+_PROG_HEADER = struct.Struct("<8sHHIII")
+_PROG_SECTION = struct.Struct("<II")
+_PROG_SYMBOL = struct.Struct("<I")
+
+MMAP_THRESHOLD = 1 << 20     # File từ 1 MiB trở lên được đọc bằng mmap (use_mmap=None)
+_CHUNK_WORDS = 1 << 14       # Số lệnh mỗi lần ghi / đọc theo luồng
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _words_to_le(words):
+    """array('I') -> bytes little-endian."""
+    if not _LITTLE_ENDIAN:
+        words = array.array("I", words)
+        words.byteswap()
+    return words.tobytes()
+
+
+def _pack_name(name):
+    encoded = name.encode("ascii")
+    if len(encoded) > 255:
+        raise ValueError(f"Name too long for program file: '{name}'")
+    return bytes([len(encoded)]) + encoded
+
+
+def _read_name(data, offset):
+    """Tên (u8 độ dài + ascii) tại offset -> (tên, offset sau tên)."""
+    end = offset + 1 + data[offset]
+    if end > len(data):
+        raise IndexError(offset)
+    return bytes(data[offset + 1:end]).decode("ascii"), end
+
+
+def is_program_file(path):
+    """True nếu path là file chương trình nhị phân (kiểm tra magic)."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(PROGRAM_MAGIC)) == PROGRAM_MAGIC
+    except OSError:
+        return False
+
+
+class ProgramWriter:
+    """Ghi file chương trình nhị phân theo luồng.
+
+        with ProgramWriter(path) as writer:
+            writer.begin_section("text")
+            writer.add_symbol("kernel")       # PC hiện tại
+            writer.write(word)                # hoặc writer.write_words(iterable)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.sections = []       # [name, start_pc, word_count]
+        self.symbols = {}
+        self._buffer = array.array("I")
+        self._file = open(path, "wb")
+        self._file.write(_PROG_HEADER.pack(PROGRAM_MAGIC, PROGRAM_VERSION, 0, 0, 0, 0))
+
+    @property
+    def pc(self):
+        """PC của lệnh kế tiếp sẽ được ghi."""
+        return 4 * self.count
+
+    def write(self, word):
+        self._buffer.append(word & 0xFFFFFFFF)
+        self.count += 1
+        if len(self._buffer) >= _CHUNK_WORDS:
+            self._flush()
+
+    def write_words(self, words):
+        for word in words:
+            self.write(word)
+
+    def add_symbol(self, name, pc=None):
+        self.symbols[name] = self.pc if pc is None else pc
+
+    def begin_section(self, name):
+        """Bắt đầu section mới tại PC hiện tại (section trước kết thúc ở đây)."""
+        self._end_section()
+        self.sections.append([name, self.pc, 0])
+
+    def _end_section(self):
+        if self.sections:
+            self.sections[-1][2] = self.count - self.sections[-1][1] // 4
+
+    def _flush(self):
+        self._file.write(_words_to_le(self._buffer))
+        del self._buffer[:]
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._flush()
+        self._end_section()
+        parts = []
+        for name, start_pc, count in self.sections:
+            parts.append(_PROG_SECTION.pack(start_pc, count) + _pack_name(name))
+        for name, pc in self.symbols.items():
+            parts.append(_PROG_SYMBOL.pack(pc) + _pack_name(name))
+        self._file.write(b"".join(parts))
+        self._file.seek(0)
+        self._file.write(_PROG_HEADER.pack(PROGRAM_MAGIC, PROGRAM_VERSION, 0, self.count,
+                                           len(self.sections), len(self.symbols)))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_program(path, words, symbols=None, sections=None):
+    """Ghi một chương trình (iterable các lệnh 32-bit). symbols: {tên: pc};
+    sections: [(tên, start_pc)] theo thứ tự tăng dần, section kéo dài tới section sau."""
+    starts = {}
+    for name, start_pc in sections or ():
+        starts.setdefault(start_pc // 4, []).append(name)
+    with ProgramWriter(path) as writer:
+        for index, word in enumerate(words):
+            for name in starts.pop(index, ()):
+                writer.begin_section(name)
+            writer.write(word)
+        for index in sorted(starts):          # Section rỗng ở cuối chương trình
+            for name in starts[index]:
+                writer.begin_section(name)
+        for name, pc in (symbols or {}).items():
+            writer.add_symbol(name, pc)
+
+
+def _read_header(data, path):
+    if len(data) < _PROG_HEADER.size:
+        raise ValueError(f"{path}: not a TPU program file")
+    magic, version, _flags, count, num_sections, num_symbols = _PROG_HEADER.unpack_from(data, 0)
+    if magic != PROGRAM_MAGIC:
+        raise ValueError(f"{path}: not a TPU program file")
+    if version != PROGRAM_VERSION:
+        raise ValueError(f"{path}: unsupported program version {version}")
+    return count, num_sections, num_symbols
+
+
+class ProgramFile:
+    """File chương trình nhị phân đã mở: words (dãy int 32-bit), sections
+    [(tên, start_pc, số lệnh)], symbols {tên: pc}.
+
+    use_mmap=None: mmap khi file >= MMAP_THRESHOLD. Khi mmap trên máy little-endian,
+    words là memoryview trỏ vào file, chỉ hợp lệ tới close() (dùng with)."""
+
+    def __init__(self, path, use_mmap=None):
+        self.path = path
+        self._map = None
+        with open(path, "rb") as f:
+            header = f.read(_PROG_HEADER.size)
+            count, num_sections, num_symbols = _read_header(header, path)
+            end = _PROG_HEADER.size + 4 * count
+            size = f.seek(0, 2)
+            if size < end:
+                raise ValueError(f"{path}: truncated program ({count} words expected)")
+            if use_mmap is None:
+                use_mmap = size >= MMAP_THRESHOLD
+            if use_mmap and count:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(self._map)
+                tables = data[end:]
+                if _LITTLE_ENDIAN:
+                    self.words = data[_PROG_HEADER.size:end].cast("I")
+                else:
+                    self.words = array.array("I")
+                    self.words.frombytes(data[_PROG_HEADER.size:end])
+                    self.words.byteswap()
+            else:
+                f.seek(_PROG_HEADER.size)
+                self.words = array.array("I")
+                self.words.fromfile(f, count)
+                if not _LITTLE_ENDIAN:
+                    self.words.byteswap()
+                tables = f.read()
+        self.sections, self.symbols = self._read_tables(tables, num_sections, num_symbols)
+        if self._map is not None:
+            tables.release()
+            data.release()
+
+    def _read_tables(self, data, num_sections, num_symbols):
+        offset = 0
+        sections = []
+        symbols = {}
+        try:
+            for _ in range(num_sections):
+                start_pc, count = _PROG_SECTION.unpack_from(data, offset)
+                offset += _PROG_SECTION.size
+                name, offset = _read_name(data, offset)
+                sections.append((name, start_pc, count))
+            for _ in range(num_symbols):
+                pc = _PROG_SYMBOL.unpack_from(data, offset)[0]
+                offset += _PROG_SYMBOL.size
+                name, offset = _read_name(data, offset)
+                symbols[name] = pc
+        except (struct.error, IndexError):
+            raise ValueError(f"{self.path}: truncated section / symbol table") from None
+        return sections, symbols
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def mapped(self):
+        return self._map is not None
+
+    def close(self):
+        if self._map is not None:
+            if isinstance(self.words, memoryview):
+                self.words.release()
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_program_words(path, chunk_words=_CHUNK_WORDS):
+    """Đọc mã máy theo luồng (từng khối chunk_words lệnh), không giữ cả file trong RAM."""
+    with open(path, "rb") as f:
+        count = _read_header(f.read(_PROG_HEADER.size), path)[0]
+        while count:
+            chunk = array.array("I")
+            n = min(count, chunk_words)
+            try:
+                chunk.fromfile(f, n)
+            except EOFError:
+                raise ValueError(f"{path}: truncated program") from None
+            if not _LITTLE_ENDIAN:
+                chunk.byteswap()
+            yield from chunk
+            count -= n
+
+
+def read_machine_code(path):
+    """Đọc mã máy ở cả hai định dạng: file nhị phân (magic TPUPROG) hoặc file text
+    machine_code.txt (mỗi dòng một chuỗi 32 bit, bỏ qua dòng '#'). Trả về danh sách int."""
+    if is_program_file(path):
+        return list(iter_program_words(path))
+    with open(path, "r") as f:
+        return [int(line.strip(), 2) for line in f if line.strip() and not line.startswith('#')]
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Chạy song song chế độ --random của các script test (test_matmul.py, test_elementwise.py,
+test_loadstore.py, test_misc.py) trên một ProcessPoolExecutor.
+
+Mỗi case = một lượt chạy toàn bộ TEST_CASES của một script với một seed. Mỗi tiến trình
+worker import script một lần và dùng SimHarness riêng của nó (file trạng thái ảo trong bộ
+nhớ), nên các worker không chia sẻ iss/*.txt. Trước mỗi case, file ảo được đặt lại về bản
+gốc và `random` / numpy được seed, nên cùng seed cho cùng kết quả ở mọi worker.
+
+Usage:
+    python -m iss.run_random_tests                          # 100 case mỗi script, mọi CPU
+    python -m iss.run_random_tests --cases 2000 --workers 8
+    python -m iss.run_random_tests --scripts matmul misc --seed 1234
+    python -m iss.run_random_tests --scripts misc --seed 1042 --cases 1 --show-output   # chạy lại 1 case
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import importlib
+import traceback
+import contextlib
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+# Cho phép chạy trực tiếp: python iss/run_random_tests.py
+SCRIPT_DIR = Path(__file__).resolve().parent
+if str(SCRIPT_DIR.parent) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+SCRIPTS = {
+    "matmul": "iss.test_matmul",
+    "elementwise": "iss.test_elementwise",
+    "loadstore": "iss.test_loadstore",
+    "misc": "iss.test_misc",
+}
+
+_modules = {}     # Theo từng tiến trình worker: tên script -> (module, file trạng thái gốc)
+
+
+def _load_script(script):
+    if script not in _modules:
+        module = importlib.import_module(SCRIPTS[script])
+        _modules[script] = (module, dict(module.HARNESS.files))
+    return _modules[script]
+
+
+def _run_all_cases(script, module, seed):
+    """Lặp lại vòng test trong main() của script ở chế độ random (không input(), không ghi đĩa)."""
+    cases = module.TEST_CASES
+    total = len(cases)
+    results = []
+    if script == "matmul":
+        matrices = module.generate_random_test_matrices(seed)
+        module.setup_test_data(True, matrices)
+        run = lambda info, i: module.run_single_test(info, i, total, True, matrices)
+    elif script == "elementwise":
+        module.setup_test_data()
+        run = lambda info, i: module.run_single_test(info.copy(), i, total, True)
+    elif script == "loadstore":
+        module.setup_test_data()             # Dữ liệu bộ nhớ luôn ngẫu nhiên
+        run = lambda info, i: module.run_single_test(info, i, total)
+    else:
+        module.setup_initial_state()
+        run = lambda info, i: module.run_single_test(info, i, total, use_random=True)
+    for i, info in enumerate(cases, 1):
+        results.append((info['name'], bool(run(info, i))))
+    return results
+
+
+def run_case(script, seed):
+    """Chạy một case trong worker. Trả về (script, seed, [(tên test, passed)], output).
+    output chỉ được giữ lại khi có test thất bại (để in khi cần điều tra).
+    Script không import được (lỗi import / cú pháp) cũng chỉ là một lần chạy thất bại."""
+    buffer = io.StringIO()
+    try:
+        module, pristine = _load_script(script)    # Ngoài redirect: assembler reconfigure sys.stdout
+        module.HARNESS.files.clear()
+        module.HARNESS.files.update(pristine)
+        random.seed(seed)
+        with contextlib.redirect_stdout(buffer):
+            results = _run_all_cases(script, module, seed)
+    except Exception:
+        buffer.write(traceback.format_exc())
+        results = [("<exception>", False)]
+    failed = not all(passed for _, passed in results)
+    return script, seed, results, buffer.getvalue() if failed else ""
+
+
+def run_random_tests(scripts, cases, base_seed=0, workers=None, chunksize=None):
+    """Chạy `cases` seed (base_seed, base_seed + 1, ...) cho mỗi script.
+    workers=1 chạy tuần tự trong tiến trình hiện tại. Trả về danh sách kết quả theo thứ tự seed."""
+    jobs = [(script, base_seed + k) for script in scripts for k in range(cases)]
+    if workers == 1:
+        return [run_case(script, seed) for script, seed in jobs]
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_case, *zip(*jobs), chunksize=chunksize))
+
+
+def summarize(results):
+    """Gộp kết quả: {script: {tên test: [passed, total, [seed thất bại]]}}."""
+    summary = defaultdict(dict)
+    for script, seed, tests, _ in results:
+        for name, passed in tests:
+            entry = summary[script].setdefault(name, [0, 0, []])
+            entry[1] += 1
+            if passed:
+                entry[0] += 1
+            else:
+                entry[2].append(seed)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel randomized test runner")
+    parser.add_argument('--scripts', nargs='+', choices=list(SCRIPTS), default=list(SCRIPTS),
+                        help='Scripts to run (default: all)')
+    parser.add_argument('--cases', type=int, default=100, help='Random cases per script (default: 100)')
+    parser.add_argument('--seed', type=int, default=0, help='First seed; case k uses seed + k (default: 0)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--show-output', action='store_true', help='Print the full log of failing cases')
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    print("=" * 80)
+    print(f"PARALLEL RANDOM TESTS: {args.cases} case(s) x {len(args.scripts)} script(s), "
+          f"seeds {args.seed}..{args.seed + args.cases - 1}, {workers} worker(s)")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    results = run_random_tests(args.scripts, args.cases, args.seed, workers)
+    elapsed = time.perf_counter() - start
+
+    all_passed = True
+    for script, tests in summarize(results).items():
+        print(f"\n[{script}]")
+        for name, (passed, total, failed_seeds) in tests.items():
+            status = "[OK]" if passed == total else "[X] "
+            line = f"  {status} {name:<24} {passed}/{total}"
+            if failed_seeds:
+                all_passed = False
+                shown = ", ".join(str(s) for s in failed_seeds[:8])
+                more = f", ... (+{len(failed_seeds) - 8})" if len(failed_seeds) > 8 else ""
+                line += f"   failed seeds: {shown}{more}"
+            print(line)
+
+    if args.show_output:
+        for script, seed, _, output in results:
+            if output:
+                print("\n" + "=" * 80)
+                print(f"{script} seed={seed}")
+                print("=" * 80)
+                print(output)
+
+    print("\n" + "=" * 80)
+    print(f"{len(results)} case(s) in {elapsed:.2f} s ({len(results) / elapsed:.1f} cases/s)")
+    if not all_passed:
+        print("Re-run one case: python -m iss.run_random_tests --scripts <script> --seed <seed> --cases 1 --show-output")
+    print("=" * 80)
+    return 0 if all_passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,8 +5,11 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 
 # Import các thành phần của trình mô phỏng
 from .iss import Simulator
-from .state_manager import load_state_from_files, save_state_to_files
+from .state_manager import load_state_from_files, save_state_to_files, load_snapshot, save_snapshot
 from .matrix_input import run_interactive_setup
+from .profiler import Profiler
+from .timing import TimingModel
+from .program_file import ProgramFile, is_program_file
 
 def main():
     """
@@ -25,6 +28,40 @@ def main():
     machine_code_file = assembler_dir / "machine_code.txt"
 
     # --- Handle flags ---
+    # --quiet / -q           : tắt toàn bộ log của simulator (chế độ SILENT)
+    # --log-level=<level>    : silent | error | warning | info | debug (mặc định)
+    # --snapshot-in=<file>   : nạp trạng thái từ snapshot nhị phân thay cho 7 file .txt
+    # --snapshot-out=<file>  : lưu trạng thái cuối ra snapshot nhị phân thay cho 7 file .txt
+    # --profile              : in bảng đếm lệnh / thời gian / phần tử theo mnemonic sau khi chạy
+    # --timing               : ước lượng số chu kỳ (timing.TimingModel, tham số mặc định)
+    # --program=<file>       : file mã máy thay cho assembler/machine_code.txt; tự nhận dạng
+    #                          text hoặc nhị phân (program_file.py, file lớn được mmap)
+    # --delta-out=<file>     : lưu thêm delta snapshot (chỉ phần trạng thái đã đổi khi chạy)
+    # --full-save            : ghi lại cả 7 file .txt (mặc định chỉ ghi file có thay đổi)
+    log_level = "debug"
+    snapshot_in = snapshot_out = None
+    profile = timing = full_save = False
+    delta_out = None
+    for arg in sys.argv[1:]:
+        if arg in ['--quiet', '-q']:
+            log_level = "silent"
+        elif arg.startswith('--log-level='):
+            log_level = arg.split('=', 1)[1]
+        elif arg.startswith('--snapshot-in='):
+            snapshot_in = arg.split('=', 1)[1]
+        elif arg.startswith('--snapshot-out='):
+            snapshot_out = arg.split('=', 1)[1]
+        elif arg == '--profile':
+            profile = True
+        elif arg == '--timing':
+            timing = True
+        elif arg.startswith('--program='):
+            machine_code_file = Path(arg.split('=', 1)[1])
+        elif arg.startswith('--delta-out='):
+            delta_out = arg.split('=', 1)[1]
+        elif arg == '--full-save':
+            full_save = True
+
     if len(sys.argv) > 1:
         # Handle --setup flag
         if sys.argv[1] in ['--setup', '-s']:
@@ -35,22 +72,39 @@ def main():
 
     # --- 1. Initialize Simulator (Create objects in RAM) ---
     print("--- 1. Initializing Simulator (In RAM) ---")
-    my_simulator = Simulator()
+    my_simulator = Simulator(log_level=log_level, timing_model=TimingModel() if timing else None)
     
     # --- 2. Load State from Files into RAM ---
     # (This will read 7 .txt files and populate my_simulator)
-    load_state_from_files(my_simulator)
+    if snapshot_in:
+        load_snapshot(my_simulator, snapshot_in)
+        print(f"  State loaded from snapshot '{snapshot_in}'.")
+    else:
+        load_state_from_files(my_simulator)
+    # Trạng thái vừa nạp: lúc lưu chỉ ghi lại phần đã đổi so với nó (RAM fork copy-on-write, rẻ)
+    loaded_state = my_simulator.checkpoint()
 
     # --- 3. Read Machine Code (Input) ---
     print(f"--- 2. Reading Machine Code from '{machine_code_file}' ---")
+    program = None
     try:
-        with open(machine_code_file, "r") as f:
-            instructions = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        if is_program_file(machine_code_file):
+            # Nhị phân: mã máy được predecode thẳng từ file (mmap với file lớn)
+            program = ProgramFile(machine_code_file)
+            instructions = program.words
+        else:
+            with open(machine_code_file, "r") as f:
+                instructions = [line.strip() for line in f if line.strip() and not line.startswith('#')]
         if not instructions:
             print(f"Warning: Machine code file '{machine_code_file}' is empty.")
             return
         my_simulator.load_program(instructions)
         print(f"Loaded {len(instructions)} instructions.")
+        if program is not None:
+            for name, start_pc, count in program.sections:
+                print(f"  section {name}: pc 0x{start_pc:x}, {count} instructions")
+            for name, pc in sorted(program.symbols.items(), key=lambda item: item[1]):
+                print(f"  symbol  {name}: pc 0x{pc:x}")
     except FileNotFoundError:
         print(f"ERROR: File '{machine_code_file}' not found.")
         print("Have you run assembler/assembler.py to generate it?")
@@ -61,11 +115,30 @@ def main():
 
     # --- 4. Run Simulation (Entirely in RAM) ---
     print("--- 3. Starting Simulation Loop (Running in RAM) ---")
+    if profile:
+        my_simulator.profiler = Profiler()
     my_simulator.run()
+    if program is not None:
+        program.close()     # sim.instructions trỏ vào file được mmap tới đây
+    if profile:
+        print("--- Profile ---")
+        print(my_simulator.profiler.report())
+    if timing:
+        print("--- Timing model ---")
+        print(my_simulator.matrix_accelerator.timing.report(trace=True))
     
     # --- 5. Save Final State from RAM to Files ---
     print("--- 4. Saving Final State from RAM to Files ---")
-    save_state_to_files(my_simulator)
+    if snapshot_out:
+        save_snapshot(my_simulator, snapshot_out)
+        print(f"  State saved to snapshot '{snapshot_out}'.")
+    else:
+        # Các file .txt chỉ mang trạng thái đã nạp khi không dùng --snapshot-in
+        unchanged = None if full_save or snapshot_in else loaded_state
+        save_state_to_files(my_simulator, since=unchanged)
+    if delta_out:
+        save_snapshot(my_simulator, delta_out, since=loaded_state)
+        print(f"  Changes saved to delta snapshot '{delta_out}'.")
     
     print("\n--- Simulation Complete ---")
 
@@ -73,3 +146,10 @@ if __name__ == "__main__":
     main()
 # python -m iss.run_simulator
 # python -m iss.run_simulator -s # Run setup mode
+# python -m iss.run_simulator --quiet # Không in log mô phỏng
+# python -m iss.run_simulator --log-level=info
+# python -m iss.run_simulator --snapshot-in=state.snap --snapshot-out=final.snap
+# python -m iss.run_simulator --quiet --profile
+# python -m iss.run_simulator --quiet --timing
+# python -m iss.run_simulator --program=assembler/machine_code.bin
+# python -m iss.run_simulator --quiet --delta-out=run.delta
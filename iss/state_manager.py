@@ -1,10 +1,14 @@
+import io
 import re
 import os
+import sys
+import array
 import struct
 import math
 
 # ADD: Import lookup tables from definitions.py
-from .definitions import GPR_MAP, MATRIX_REG_MAP, ROWNUM, ELEMENTS_PER_ROW_TR
+from .definitions import GPR_MAP, MATRIX_REG_MAP
+from .converters import bits_to_signed_int32
 
 # =============================================================================
 # DATA TYPE CONVERSION UTILITY FUNCTIONS
@@ -60,6 +64,81 @@ def float_to_bits8_e5m2(f):
         if exponent8 >= 31: return 0b11111100 if sign else 0b01111100
     return (sign << 7) | (exponent8 << 2) | mantissa8
 
+# =============================================================================
+# IN-MEMORY STATE FILES
+# =============================================================================
+
+class StateFiles(dict):
+    """
+    Thư mục trạng thái nằm trong bộ nhớ: tên file (vd "gpr.txt") -> nội dung text.
+
+    Truyền vào load_state_from_files / save_state_to_files thay cho state_dir để
+    đọc/ghi đúng định dạng 7 file .txt mà không chạm tới đĩa (xem harness.py).
+    """
+
+    @classmethod
+    def from_dir(cls, state_dir, names=None):
+        """Nạp các file .txt có sẵn trong state_dir (mặc định: mọi file *.txt)."""
+        files = cls()
+        if names is None:
+            names = [n for n in os.listdir(state_dir) if n.endswith(".txt")]
+        for name in names:
+            path = os.path.join(state_dir, name)
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    files[name] = f.read()
+        return files
+
+    def to_dir(self, state_dir):
+        """Ghi toàn bộ nội dung ra thư mục state_dir trên đĩa."""
+        for name, text in self.items():
+            with open(os.path.join(state_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def open(self, name, mode="r"):
+        if "w" in mode:
+            return _StateFileWriter(self, name)
+        if "a" in mode:
+            writer = _StateFileWriter(self, name)
+            writer.write(self.get(name, ""))
+            return writer
+        if name not in self:
+            raise FileNotFoundError(f"No such state file: '{name}'")
+        return io.StringIO(self[name])
+
+
+class _StateFileWriter(io.StringIO):
+    """File ghi của StateFiles: nội dung được lưu lại khi đóng."""
+    def __init__(self, files, name):
+        super().__init__()
+        self.files = files
+        self.name = name
+
+    def close(self):
+        if not self.closed:
+            self.files[self.name] = self.getvalue()
+        super().close()
+
+
+class _StatePath(str):
+    """Tên file trong một StateFiles (in ra như một đường dẫn bình thường)."""
+    def __new__(cls, files, name):
+        path = super().__new__(cls, name)
+        path.files = files
+        return path
+
+
+def _state_path(state_dir, name):
+    if isinstance(state_dir, StateFiles):
+        return _StatePath(state_dir, name)
+    return os.path.join(state_dir, name)
+
+
+def _open_state(path, mode="r", **kwargs):
+    if isinstance(path, _StatePath):
+        return path.files.open(path, mode)
+    return open(path, mode, **kwargs)
+
 # =============================================================================
 # LOAD FUNCTIONS (READ FROM FILES INTO SIMULATOR RAM)
 # =============================================================================
@@ -69,8 +148,11 @@ def _load_matrix_file(filepath, reg_array, is_float_file, start_idx=0):
     Args:
         start_idx: Offset for file register index (e.g., tr4 in file maps to reg_array[0] when start_idx=4)
     """
+    # Số hàng / số phần tử mỗi hàng theo geometry của simulator (reg_array là row view)
+    rownum = len(reg_array[0])
+    cols = len(reg_array[0][0])
     try:
-        with open(filepath, "r") as f:
+        with _open_state(filepath, "r") as f:
             lines = f.readlines()
             current_file_reg_index = -1  # Index from file (e.g., 4 for tr4)
             current_row_index = 0
@@ -85,7 +167,7 @@ def _load_matrix_file(filepath, reg_array, is_float_file, start_idx=0):
                 
                 # If within a register block and encounter "Row" line
                 if current_file_reg_index != -1 and line.strip().startswith("Row"):
-                    if current_row_index < ROWNUM:
+                    if current_row_index < rownum:
                         # Calculate array index by subtracting start_idx
                         # E.g., tr4 (file_idx=4) - start_idx=4 = array_idx=0
                         array_index = current_file_reg_index - start_idx
@@ -100,16 +182,17 @@ def _load_matrix_file(filepath, reg_array, is_float_file, start_idx=0):
                                     if is_float_file:
                                         values = [float(v) for v in values_str.split()]
                                     else:
-                                        values = [int(v) for v in values_str.split()]
+                                        # Thanh ghi lưu int32: wrap giá trị ngoài dải (vd: 0xFFFFFFFF -> -1)
+                                        values = [bits_to_signed_int32(int(v)) for v in values_str.split()]
                                     
                                     # Write to RAM array (Simulator object)
-                                    for c in range(min(ELEMENTS_PER_ROW_TR, len(values))):
+                                    for c in range(min(cols, len(values))):
                                         reg_array[array_index][current_row_index][c] = values[c]
                                 except ValueError as e:
                                     print(f"  [Warning] Skipping invalid line in {filepath}: {line.strip()}. Error: {e}")
                         
                         current_row_index += 1
-                        if current_row_index >= ROWNUM:
+                        if current_row_index >= rownum:
                             current_file_reg_index = -1 # End this register block
                     
     except FileNotFoundError:
@@ -118,14 +201,16 @@ def _load_matrix_file(filepath, reg_array, is_float_file, start_idx=0):
         print(f"  [Error] Cannot read {filepath}. {e}")
 
 
-def load_state_from_files(sim):
-    """Load state from 7 .txt files into Simulator object (RAM)."""
+def load_state_from_files(sim, state_dir=None):
+    """Load state from 7 .txt files into Simulator object (RAM).
+    state_dir: folder containing the .txt files (default: the iss/ folder),
+    or a StateFiles object to read the same files from memory."""
     print("--- Loading state from files into RAM ---")
-    script_dir = os.path.dirname(os.path.abspath(__file__))
+    script_dir = state_dir if state_dir is not None else os.path.dirname(os.path.abspath(__file__))
     
     # 1. Load GPR
     try:
-        with open(os.path.join(script_dir, "gpr.txt"), "r") as f:
+        with _open_state(_state_path(script_dir, "gpr.txt"), "r") as f:
             for line in f:
                 match = re.search(r"x(\d+)\s*\(.+\):\s*(0x[0-9a-fA-F]+)", line)
                 if match:
@@ -138,7 +223,7 @@ def load_state_from_files(sim):
     # 2. Load CSRs
     try:
         for filename in ["config.txt", "status.txt"]:
-             with open(os.path.join(script_dir, filename), "r") as f:
+             with _open_state(_state_path(script_dir, filename), "r") as f:
                 for line in f:
                     # Support both formats: "name: 0xVAL" and "name (alias): 0xVAL"
                     match = re.search(r"(\w+)\s*(?:\(.+\))?\s*:\s*(0x[0-9a-fA-F]+)", line)
@@ -150,17 +235,17 @@ def load_state_from_files(sim):
     
     # 3. Load 4 matrix files
     # matrix.txt contains tr0-tr3 (pure tile registers)
-    _load_matrix_file(os.path.join(script_dir, "matrix.txt"), sim.matrix_accelerator.tr_int, is_float_file=False, start_idx=0)
-    _load_matrix_file(os.path.join(script_dir, "acc.txt"), sim.matrix_accelerator.acc_int, is_float_file=False, start_idx=0)
-    _load_matrix_file(os.path.join(script_dir, "matrix_float.txt"), sim.matrix_accelerator.tr_float, is_float_file=True, start_idx=0)
-    _load_matrix_file(os.path.join(script_dir, "acc_float.txt"), sim.matrix_accelerator.acc_float, is_float_file=True, start_idx=0)
+    _load_matrix_file(_state_path(script_dir, "matrix.txt"), sim.matrix_accelerator.tr_int, is_float_file=False, start_idx=0)
+    _load_matrix_file(_state_path(script_dir, "acc.txt"), sim.matrix_accelerator.acc_int, is_float_file=False, start_idx=0)
+    _load_matrix_file(_state_path(script_dir, "matrix_float.txt"), sim.matrix_accelerator.tr_float, is_float_file=True, start_idx=0)
+    _load_matrix_file(_state_path(script_dir, "acc_float.txt"), sim.matrix_accelerator.acc_float, is_float_file=True, start_idx=0)
     print("  Matrix registers loaded.")
     
     # 4. Load Memory from memory.txt
     try:
         loaded_count = 0
         print("  [Debug] Starting memory load...")
-        with open(os.path.join(script_dir, "memory.txt"), "r", encoding='utf-8') as f:
+        with _open_state(_state_path(script_dir, "memory.txt"), "r", encoding='utf-8') as f:
             for line_num, line in enumerate(f, 1):
                 # Parse lines like: "0x100: 00 00 80 3F 00 00 00 40"
                 match = re.search(r"0x([0-9a-fA-F]+):\s*([\s0-9a-fA-F]+)", line)
@@ -188,19 +273,20 @@ def load_state_from_files(sim):
 # SAVE FUNCTIONS (WRITE FROM SIMULATOR RAM TO FILES)
 # =============================================================================
 
+MEMORY_TEXT_END = 0x800     # memory.txt chỉ chứa RAM 0x000-0x7FF
+
 def _save_matrix_file(filepath, header, reg_prefix, reg_array, is_float_file, bits_converter_func=float_to_bits32, start_idx=0):
     """Common helper function to write matrix/acc files.
     Args:
         start_idx: Starting index for register naming (e.g., 4 for tr4-tr7)
     """
     try:
-        with open(filepath, "w") as f:
+        with _open_state(filepath, "w") as f:
             f.write(f"{header}\n")
             for i in range(len(reg_array)): # Loop through registers
                 reg_name = f"{reg_prefix}{i + start_idx}"  # Add start_idx for correct naming
                 f.write(f"\n{reg_name}:\n")
-                for r in range(ROWNUM): # Loop through 4 rows
-                    row_data = reg_array[i][r]
+                for r, row_data in enumerate(reg_array[i]): # Loop through rows
                     
                     if is_float_file:
                         # Write format: float (unsigned_integer_32bit)
@@ -231,231 +317,530 @@ def _save_matrix_file(filepath, header, reg_prefix, reg_array, is_float_file, bi
         print(f"  [Error] Could not write to {os.path.basename(filepath)}: {e}")
 
 
-def save_state_to_files(sim):
-    """Save state from Simulator objects (RAM) to 7 .txt files."""
+def _state_exists(state_dir, name):
+    if isinstance(state_dir, StateFiles):
+        return name in state_dir
+    return os.path.isfile(os.path.join(state_dir, name))
+
+
+def _dirty_state_files(sim, changes, config_csrs, status_csrs):
+    """Tên file trạng thái -> có phần nào đổi trong changes (Simulator.changes_since) không."""
+    text_pages = -(-MEMORY_TEXT_END // sim.memory.page_size)
+    return {
+        "gpr.txt": bool(changes.gpr),
+        "config.txt": not changes.csrs.isdisjoint(config_csrs),
+        "status.txt": not changes.csrs.isdisjoint(status_csrs),
+        "matrix.txt": any(r < 4 for r in changes.int_regs),
+        "acc.txt": any(r >= 4 for r in changes.int_regs),
+        "matrix_float.txt": any(r < 4 for r in changes.float_regs),
+        "acc_float.txt": any(r >= 4 for r in changes.float_regs),
+        "memory.txt": any(index < text_pages for index in changes.pages),
+    }
+
+
+def save_state_to_files(sim, state_dir=None, since=None):
+    """Save state from Simulator objects (RAM) to 7 .txt files.
+    state_dir: destination folder (default: the iss/ folder),
+    or a StateFiles object to keep the files in memory.
+    since: a Checkpoint of the state the files in state_dir already hold (e.g. taken
+    right after load_state_from_files); only files whose registers / CSRs / memory
+    pages changed since then (or that do not exist yet) are rewritten.
+    Returns the names of the files written."""
     print("--- Saving final state from RAM to files ---")
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
+    script_dir = state_dir if state_dir is not None else os.path.dirname(os.path.abspath(__file__))
+    config_csrs = ["mtilem", "mtilen", "mtilek", "xmxrm", "xmfrm", "xmsaten"]
+    status_csrs = ["xmcsr", "xmsat", "xmfflags", "xmisa", "xtlenb", "xtrlenb", "xalenb"]
+    dirty = None if since is None else _dirty_state_files(sim, sim.changes_since(since), config_csrs, status_csrs)
+    written = []
+
+    def _save_needed(name):
+        if dirty is None or dirty[name] or not _state_exists(script_dir, name):
+            written.append(name)
+            return True
+        print(f"  {name} unchanged, skipped.")
+        return False
+
     # 1. Write GPR (THIS SECTION WAS MISSING)
-    try:
-        # Tạo map ngược từ index -> tên ABI (bỏ 'x' và 'fp')
-        idx_to_abi = {v: k for k, v in GPR_MAP.items() if not k.startswith('x') and k != 'fp'}
+    if _save_needed("gpr.txt"):
+        try:
+            # Tạo map ngược từ index -> tên ABI (bỏ 'x' và 'fp')
+            idx_to_abi = {v: k for k, v in GPR_MAP.items() if not k.startswith('x') and k != 'fp'}
         
-        with open(os.path.join(script_dir, "gpr.txt"), "w") as f:
-            f.write("--- General Purpose Registers (GPRs) ---\n")
-            for i in range(32):
-                val = sim.gpr.read(i)
-                # Lấy tên ABI (ví dụ 'a0') hoặc dùng tên 'x' mặc định
-                abi_name = idx_to_abi.get(i, f'x{i}')
-                # Dùng tên 'x' cho dòng chính
-                f.write(f"x{i:<2} ({abi_name:<7}): 0x{val:08x}\n")
-        print(f"  gpr.txt saved.")
-    except IOError as e: 
-        print(f"  [Error] Error writing gpr.txt: {e}")
-    except Exception as e:
-        print(f"  [Error] Lỗi không xác định khi ghi GPR: {e}")
+            with _open_state(_state_path(script_dir, "gpr.txt"), "w") as f:
+                f.write("--- General Purpose Registers (GPRs) ---\n")
+                for i in range(32):
+                    val = sim.gpr.read(i)
+                    # Lấy tên ABI (ví dụ 'a0') hoặc dùng tên 'x' mặc định
+                    abi_name = idx_to_abi.get(i, f'x{i}')
+                    # Dùng tên 'x' cho dòng chính
+                    f.write(f"x{i:<2} ({abi_name:<7}): 0x{val:08x}\n")
+            print(f"  gpr.txt saved.")
+        except IOError as e: 
+            print(f"  [Error] Error writing gpr.txt: {e}")
+        except Exception as e:
+            print(f"  [Error] Lỗi không xác định khi ghi GPR: {e}")
 
     # 2. Ghi CSRs (DI CHUYỂN TỪ BÊN NGOÀI VÀO ĐÂY)
-    config_csrs = ["mtilem", "mtilen", "mtilek", "xmxrm", "xmfrm", "xmsaten"]
-    status_csrs = ["xmcsr", "xmsat", "xmfflags", "xmisa", "xtlenb", "xtrlenb", "xalenb"]
-    try:
-        with open(os.path.join(script_dir, "config.txt"), "w") as f:
-            f.write("--- Configuration CSRs ---\n")
-            for name in config_csrs:
-                val = sim.csr.read(name)
-                f.write(f"{name:<8}: 0x{val:08x}\n")
-        print(f"  config.txt saved.")
-    except IOError as e: print(f"  [Error] Error writing config.txt: {e}")
+    if _save_needed("config.txt"):
+        try:
+            with _open_state(_state_path(script_dir, "config.txt"), "w") as f:
+                f.write("--- Configuration CSRs ---\n")
+                for name in config_csrs:
+                    val = sim.csr.read(name)
+                    f.write(f"{name:<8}: 0x{val:08x}\n")
+            print(f"  config.txt saved.")
+        except IOError as e: print(f"  [Error] Error writing config.txt: {e}")
 
-    try:
-        with open(os.path.join(script_dir, "status.txt"), "w") as f:
-            f.write("--- Status CSRs ---\n")
-            for name in status_csrs:
-                val = sim.csr.read(name)
-                f.write(f"{name:<8}: 0x{val:08x}\n")
-        print(f"  status.txt saved.")
-    except IOError as e: print(f"  [Error] Error writing status.txt: {e}")
+    if _save_needed("status.txt"):
+        try:
+            with _open_state(_state_path(script_dir, "status.txt"), "w") as f:
+                f.write("--- Status CSRs ---\n")
+                for name in status_csrs:
+                    val = sim.csr.read(name)
+                    f.write(f"{name:<8}: 0x{val:08x}\n")
+            print(f"  status.txt saved.")
+        except IOError as e: print(f"  [Error] Error writing status.txt: {e}")
 
     
     # 3. Ghi 4 file Ma trận
     # SPECS: tr0-tr3 = pure tile registers, tr4-tr7 = acc0-acc3 (alias)
     # matrix.txt stores tr0-tr3 (pure tiles)
-    _save_matrix_file(os.path.join(script_dir, "matrix.txt"), 
-                    "--- Tile Registers (tr0-tr3) (Integer Only)---", "tr", 
-                    sim.matrix_accelerator.tr_int, is_float_file=False, start_idx=0)
+    if _save_needed("matrix.txt"):
+        _save_matrix_file(_state_path(script_dir, "matrix.txt"), 
+                        "--- Tile Registers (tr0-tr3) (Integer Only)---", "tr", 
+                        sim.matrix_accelerator.tr_int, is_float_file=False, start_idx=0)
 
     # --- (THAY THẾ) LOGIC GHI ACC.TXT (INTEGER) ---
-    try:
-        with open(os.path.join(script_dir, "acc.txt"), "w") as f:
-            f.write("--- Accumulator Registers (acc0-acc3) (Integer Only) ---\n")
+    if _save_needed("acc.txt"):
+        try:
+            with _open_state(_state_path(script_dir, "acc.txt"), "w") as f:
+                f.write("--- Accumulator Registers (acc0-acc3) (Integer Only) ---\n")
             
-            # Lặp qua 4 thanh ghi ACC
-            for i in range(4):
-                reg_name = f"acc{i}"
-                f.write(f"\n{reg_name}:\n")
+                # Lặp qua 4 thanh ghi ACC
+                for i in range(4):
+                    reg_name = f"acc{i}"
+                    f.write(f"\n{reg_name}:\n")
                 
-                # Lấy đúng bit-width cho thanh ghi INTEGER này
-                dest_bits = sim.matrix_accelerator.acc_dest_bits_int[i]
+                    # Lấy đúng bit-width cho thanh ghi INTEGER này
+                    dest_bits = sim.matrix_accelerator.acc_dest_bits_int[i]
                 
-                # Xác định tên format
-                if dest_bits == 8:
-                    bit_width_name = "INT8"
-                elif dest_bits == 16:
-                    bit_width_name = "INT16"
-                else:
-                    bit_width_name = "INT32"
+                    # Xác định tên format
+                    if dest_bits == 8:
+                        bit_width_name = "INT8"
+                    elif dest_bits == 16:
+                        bit_width_name = "INT16"
+                    else:
+                        bit_width_name = "INT32"
                 
-                # Ghi tiêu đề với thông tin bit-width
-                f.write(f"  (Destination: {bit_width_name}, {dest_bits}-bit)\n")
+                    # Ghi tiêu đề với thông tin bit-width
+                    f.write(f"  (Destination: {bit_width_name}, {dest_bits}-bit)\n")
                 
-                # Lặp qua 4 hàng của thanh ghi
-                for r in range(ROWNUM):
-                    row_data = sim.matrix_accelerator.acc_int[i][r]
+                    # Lặp qua các hàng của thanh ghi
+                    for r, row_data in enumerate(sim.matrix_accelerator.acc_int[i]):
                     
-                    # Chuyển sang integer và áp dụng mask theo bit-width
-                    int_parts = []
-                    bit_pattern_parts = []
+                        # Chuyển sang integer và áp dụng mask theo bit-width
+                        int_parts = []
+                        bit_pattern_parts = []
                     
-                    for val in row_data:
-                        int_val = int(val)
+                        for val in row_data:
+                            int_val = int(val)
                         
-                        # Mask theo bit-width
-                        if dest_bits == 8:
-                            masked_val = int_val & 0xFF
-                        elif dest_bits == 16:
-                            masked_val = int_val & 0xFFFF
-                        else:  # 32-bit
-                            masked_val = int_val & 0xFFFFFFFF
+                            # Mask theo bit-width
+                            if dest_bits == 8:
+                                masked_val = int_val & 0xFF
+                            elif dest_bits == 16:
+                                masked_val = int_val & 0xFFFF
+                            else:  # 32-bit
+                                masked_val = int_val & 0xFFFFFFFF
                         
-                        # Convert to signed representation
-                        if dest_bits == 8:
-                            signed_val = masked_val if masked_val <= 0x7F else masked_val - 0x100
-                        elif dest_bits == 16:
-                            signed_val = masked_val if masked_val <= 0x7FFF else masked_val - 0x10000
-                        else:
-                            signed_val = masked_val if masked_val <= 0x7FFFFFFF else masked_val - 0x100000000
+                            # Convert to signed representation
+                            if dest_bits == 8:
+                                signed_val = masked_val if masked_val <= 0x7F else masked_val - 0x100
+                            elif dest_bits == 16:
+                                signed_val = masked_val if masked_val <= 0x7FFF else masked_val - 0x10000
+                            else:
+                                signed_val = masked_val if masked_val <= 0x7FFFFFFF else masked_val - 0x100000000
                         
-                        # Both parts show signed value
-                        int_parts.append(str(signed_val))
-                        bit_pattern_parts.append(str(signed_val))
+                            # Both parts show signed value
+                            int_parts.append(str(signed_val))
+                            bit_pattern_parts.append(str(signed_val))
                     
-                    int_str = ' '.join(int_parts)
-                    bit_pattern_str = ', '.join(bit_pattern_parts)
-                    f.write(f"  Row {r}: {int_str} ({bit_pattern_str})\n")
+                        int_str = ' '.join(int_parts)
+                        bit_pattern_str = ', '.join(bit_pattern_parts)
+                        f.write(f"  Row {r}: {int_str} ({bit_pattern_str})\n")
         
-        print(f"  acc.txt saved.")
-    except IOError as e:
-        print(f"  [Error] Could not write to acc.txt: {e}")
-    # --- KẾT THÚC THAY THẾ ACC.TXT ---
+            print(f"  acc.txt saved.")
+        except IOError as e:
+            print(f"  [Error] Could not write to acc.txt: {e}")
+        # --- KẾT THÚC THAY THẾ ACC.TXT ---
     
     # Save matrix_float.txt (tr0-tr3 pure tiles)
-    _save_matrix_file(os.path.join(script_dir, "matrix_float.txt"), 
-                    "--- Tile Registers (tr0-tr3) (Floating-Point | 32-bit representation)---", "tr", 
-                    sim.matrix_accelerator.tr_float, is_float_file=True, 
-                    bits_converter_func=float_to_bits32, start_idx=0)
+    if _save_needed("matrix_float.txt"):
+        _save_matrix_file(_state_path(script_dir, "matrix_float.txt"), 
+                        "--- Tile Registers (tr0-tr3) (Floating-Point | 32-bit representation)---", "tr", 
+                        sim.matrix_accelerator.tr_float, is_float_file=True, 
+                        bits_converter_func=float_to_bits32, start_idx=0)
 
 # --- (THAY THẾ) LOGIC GHI ACC_FLOAT.TXT ---
-    try:
-        with open(os.path.join(script_dir, "acc_float.txt"), "w") as f:
-            f.write("--- Accumulator Registers (acc0-acc3) (Floating-Point) ---\n")
+    if _save_needed("acc_float.txt"):
+        try:
+            with _open_state(_state_path(script_dir, "acc_float.txt"), "w") as f:
+                f.write("--- Accumulator Registers (acc0-acc3) (Floating-Point) ---\n")
             
-            # Lặp qua 4 thanh ghi ACC
-            for i in range(4):
-                reg_name = f"acc{i}"
-                f.write(f"\n{reg_name}:\n")
+                # Lặp qua 4 thanh ghi ACC
+                for i in range(4):
+                    reg_name = f"acc{i}"
+                    f.write(f"\n{reg_name}:\n")
                 
-                # Lấy đúng bit-width cho thanh ghi FLOAT này từ simulator
-                dest_bits = sim.matrix_accelerator.acc_dest_bits_float[i]
+                    # Lấy đúng bit-width cho thanh ghi FLOAT này từ simulator
+                    dest_bits = sim.matrix_accelerator.acc_dest_bits_float[i]
                 
-                # Chọn hàm converter dựa trên bit-width
-                if dest_bits == 16:
-                    bits_converter_func = float_to_bits16
-                    bit_width_name = "FP16/BF16"
-                elif dest_bits == 8:
-                    # Nếu cần hỗ trợ FP8 trong tương lai
-                    bits_converter_func = float_to_bits32  # placeholder
-                    bit_width_name = "FP8"
-                else: # Mặc định là 32-bit
-                    bits_converter_func = float_to_bits32
-                    bit_width_name = "FP32"
+                    # Chọn hàm converter dựa trên bit-width
+                    if dest_bits == 16:
+                        bits_converter_func = float_to_bits16
+                        bit_width_name = "FP16/BF16"
+                    elif dest_bits == 8:
+                        # Nếu cần hỗ trợ FP8 trong tương lai
+                        bits_converter_func = float_to_bits32  # placeholder
+                        bit_width_name = "FP8"
+                    else: # Mặc định là 32-bit
+                        bits_converter_func = float_to_bits32
+                        bit_width_name = "FP32"
                 
-                # Ghi tiêu đề với thông tin bit-width
-                f.write(f"  (Destination: {bit_width_name}, {dest_bits}-bit)\n")
+                    # Ghi tiêu đề với thông tin bit-width
+                    f.write(f"  (Destination: {bit_width_name}, {dest_bits}-bit)\n")
                 
-                # Lặp qua 4 hàng của thanh ghi
-                for r in range(ROWNUM):
-                    row_data = sim.matrix_accelerator.acc_float[i][r]
-                    float_parts = [str(round(val, 6)) for val in row_data]
+                    # Lặp qua các hàng của thanh ghi
+                    for r, row_data in enumerate(sim.matrix_accelerator.acc_float[i]):
+                        float_parts = [str(round(val, 6)) for val in row_data]
                     
-                    # Dùng converter đã chọn để lấy bit pattern - HIỂN THỊ DƯỚI DẠNG UNSIGNED
-                    bit_pattern_parts = []
-                    for val in row_data:
-                        bits_unsigned = bits_converter_func(val)
+                        # Dùng converter đã chọn để lấy bit pattern - HIỂN THỊ DƯỚI DẠNG UNSIGNED
+                        bit_pattern_parts = []
+                        for val in row_data:
+                            bits_unsigned = bits_converter_func(val)
                         
-                        # Hiển thị unsigned (không chuyển sang signed)
-                        if dest_bits == 16:
-                            bits16 = bits_unsigned & 0xFFFF
-                            bit_pattern_parts.append(str(bits16))
-                        else:
-                            bits32 = bits_unsigned & 0xFFFFFFFF
-                            bit_pattern_parts.append(str(bits32))
+                            # Hiển thị unsigned (không chuyển sang signed)
+                            if dest_bits == 16:
+                                bits16 = bits_unsigned & 0xFFFF
+                                bit_pattern_parts.append(str(bits16))
+                            else:
+                                bits32 = bits_unsigned & 0xFFFFFFFF
+                                bit_pattern_parts.append(str(bits32))
                     
-                    float_str = ' '.join(float_parts)
-                    bit_pattern_str = ', '.join(bit_pattern_parts)
-                    f.write(f"  Row {r}: {float_str} ({bit_pattern_str})\n")
+                        float_str = ' '.join(float_parts)
+                        bit_pattern_str = ', '.join(bit_pattern_parts)
+                        f.write(f"  Row {r}: {float_str} ({bit_pattern_str})\n")
         
-        print(f"  acc_float.txt saved.")
-    except IOError as e:
-        print(f"  [Error] Could not write to acc_float.txt: {e}")
-    # --- END OF ACC_FLOAT.TXT REPLACEMENT ---
+            print(f"  acc_float.txt saved.")
+        except IOError as e:
+            print(f"  [Error] Could not write to acc_float.txt: {e}")
+        # --- END OF ACC_FLOAT.TXT REPLACEMENT ---
     
     # 4. Save Memory to memory.txt
-    try:
-        with open(os.path.join(script_dir, "memory.txt"), "w", encoding='utf-8') as f:
-            f.write("# Format: <Hex Address>: <Hex bytes separated by spaces>\n")
-            f.write("# Example: 0x3E8: 0A 14 1E\n")
-            f.write("# RAM 2KB (from 0x000 to 0x7FF)\n")
-            
-            # Detect which addresses have non-zero data
-            # Use adaptive stride: 4 bytes for 0x300+ (INT8), 8 bytes for 0x200+ (FP16), 16 bytes elsewhere
-            written_addresses = set()
+    if _save_needed("memory.txt"):
+        try:
+            with _open_state(_state_path(script_dir, "memory.txt"), "w", encoding='utf-8') as f:
+                f.write("# Format: <Hex Address>: <Hex bytes separated by spaces>\n")
+                f.write("# Example: 0x3E8: 0A 14 1E\n")
+                f.write("# RAM 2KB (from 0x000 to 0x7FF)\n")
             
-            # Strategy: Write in appropriate strides for each region
-            # 0x000-0x1FF: 16-byte stride (general)
-            for addr in range(0x000, 0x200, 0x10):
-                bytes_data = sim.memory.read(addr, 16)
-                hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
-                f.write(f"0x{addr:03X}: {hex_str}\n")
-                written_addresses.add(addr)
+                # Detect which addresses have non-zero data
+                # Use adaptive stride: 4 bytes for 0x300+ (INT8), 8 bytes for 0x200+ (FP16), 16 bytes elsewhere
+                written_addresses = set()
             
-            # 0x200-0x2FF: 8-byte stride (FP16/BF16 region)
-            for addr in range(0x200, 0x300, 0x08):
-                if addr not in written_addresses:
-                    bytes_data = sim.memory.read(addr, 8)
+                # Strategy: Write in appropriate strides for each region
+                # 0x000-0x1FF: 16-byte stride (general)
+                for addr in range(0x000, 0x200, 0x10):
+                    bytes_data = sim.memory.read(addr, 16)
                     hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
                     f.write(f"0x{addr:03X}: {hex_str}\n")
                     written_addresses.add(addr)
             
-            # 0x300-0x3FF: 4-byte stride (INT8/UINT8/FP8 region)
-            for addr in range(0x300, 0x320, 0x04):
-                if addr not in written_addresses:
-                    bytes_data = sim.memory.read(addr, 4)
-                    hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
-                    f.write(f"0x{addr:03X}: {hex_str}\n")
-                    written_addresses.add(addr)
+                # 0x200-0x2FF: 8-byte stride (FP16/BF16 region)
+                for addr in range(0x200, 0x300, 0x08):
+                    if addr not in written_addresses:
+                        bytes_data = sim.memory.read(addr, 8)
+                        hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
+                        f.write(f"0x{addr:03X}: {hex_str}\n")
+                        written_addresses.add(addr)
             
-            # 0x320-0x7FF: 16-byte stride (rest)
-            for addr in range(0x320, 0x800, 0x10):
-                if addr not in written_addresses:
-                    bytes_data = sim.memory.read(addr, 16)
-                    hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
-                    f.write(f"0x{addr:03X}: {hex_str}\n")
-                    written_addresses.add(addr)
+                # 0x300-0x3FF: 4-byte stride (INT8/UINT8/FP8 region)
+                for addr in range(0x300, 0x320, 0x04):
+                    if addr not in written_addresses:
+                        bytes_data = sim.memory.read(addr, 4)
+                        hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
+                        f.write(f"0x{addr:03X}: {hex_str}\n")
+                        written_addresses.add(addr)
+            
+                # 0x320-0x7FF: 16-byte stride (rest)
+                for addr in range(0x320, MEMORY_TEXT_END, 0x10):
+                    if addr not in written_addresses:
+                        bytes_data = sim.memory.read(addr, 16)
+                        hex_str = ' '.join(f'{b:02X}' for b in bytes_data)
+                        f.write(f"0x{addr:03X}: {hex_str}\n")
+                        written_addresses.add(addr)
         
-        print(f"  memory.txt saved ({len(written_addresses)} lines).")
-    except IOError as e:
-        print(f"  [Error] Could not write to memory.txt: {e}")
-    except Exception as e:
-        print(f"  [Error] Unknown error saving memory.txt: {type(e).__name__}: {e}")
+            print(f"  memory.txt saved ({len(written_addresses)} lines).")
+        except IOError as e:
+            print(f"  [Error] Could not write to memory.txt: {e}")
+        except Exception as e:
+            print(f"  [Error] Unknown error saving memory.txt: {type(e).__name__}: {e}")
     
     print("--- State saving complete ---")
+    return written
+
+# =============================================================================
+# BINARY SNAPSHOT (FAST ALTERNATIVE TO THE 7 TEXT FILES)
+# =============================================================================
+# Little-endian layout:
+#   header   : magic "TPUSNAP\0", version (u16), number of CSRs (u16), pc (u32)
+#   gpr      : 32 x u32
+#   csr      : per CSR -> name length (u8), name (ascii), value (i64)
+#   metadata : acc_dest_bits_float[4], acc_dest_bits_int[4] (u8 each)
+#   registers: bank size (u32), int bank, float bank (MatrixRegisterFile, 8 x TLEN bit each)
+#   memory   : memory size (u64), page size (u32), page count (u32),
+#              then per non-zero page -> page index (u32), page bytes
+#              (page size = MainMemory.page_size)
+# Values are stored bit-exactly (no round(val, 4) as in the text files).
+#
+# Delta snapshot (save_snapshot(..., since=checkpoint)): only what changed since a checkpoint,
+# applied on top of the current state by load_snapshot:
+#   header   : magic "TPUDELT\0", version (u16), number of changed CSRs (u16), pc (u32)
+#   gpr      : count (u32), then per changed GPR -> index (u8), value (u32)
+#   csr      : per changed CSR, as above
+#   metadata : as above (always)
+#   registers: register size (u32), count (u32), then per changed register ->
+#              bank (u8, 0 = int, 1 = float), index (u8), register bytes
+#   memory   : memory size (u64), page size (u32), page count (u32), then per changed
+#              page -> page index (u32), page bytes (pages that became zero included)
+
+SNAPSHOT_MAGIC = b"TPUSNAP\0"
+DELTA_MAGIC = b"TPUDELT\0"
+SNAPSHOT_VERSION = 1
+
+_SNAP_HEADER = struct.Struct("<8sHHI")
+_SNAP_GPR = struct.Struct("<32I")
+_SNAP_CSR_VALUE = struct.Struct("<q")
+_SNAP_META = struct.Struct("<8B")
+_SNAP_U32 = struct.Struct("<I")
+_SNAP_MEMORY = struct.Struct("<QII")
+_SNAP_GPR_ENTRY = struct.Struct("<BI")
+_SNAP_REG_ENTRY = struct.Struct("<BB")
+_SNAP_REGS = struct.Struct("<II")
+
+
+def _bank_to_le(bank, fmt):
+    """Register banks use native byte order (memoryview 'i'/'f'); the file is little-endian."""
+    if sys.byteorder == "little":
+        return bytes(bank)
+    swapped = array.array(fmt, bytes(bank))
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _pack_csr(name, value):
+    encoded = name.encode("ascii")
+    return bytes([len(encoded)]) + encoded + _SNAP_CSR_VALUE.pack(value)
+
+
+def _memory_page(memory, index):
+    """Nội dung trang index (cắt theo kích thước RAM), trang chưa cấp phát -> toàn 0."""
+    page_size = memory.page_size
+    length = min(page_size, len(memory) - index * page_size)
+    page = memory.pages.get(index)
+    return bytes(length) if page is None else page[:length]
+
+
+def save_snapshot(sim, path, since=None):
+    """Save the whole simulator state to one binary snapshot file (a few bulk writes).
+    since: a Checkpoint -> write a delta snapshot holding only the GPRs, CSRs, registers
+    and memory pages that changed since then (see Simulator.changes_since)."""
+    if since is not None:
+        _save_delta(sim, path, sim.changes_since(since))
+        return
+    ma = sim.matrix_accelerator
+    parts = []
+    csrs = sim.csr.csrs
+    parts.append(_SNAP_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(csrs), sim.pc & 0xFFFFFFFF))
+    parts.append(_SNAP_GPR.pack(*[sim.gpr.read(i) & 0xFFFFFFFF for i in range(32)]))
+    for name, value in csrs.items():
+        parts.append(_pack_csr(name, value))
+    parts.append(_SNAP_META.pack(*ma.acc_dest_bits_float, *ma.acc_dest_bits_int))
+
+    regs = ma.regs
+    parts.append(_SNAP_U32.pack(len(regs.int_bank)))
+    parts.append(_bank_to_le(regs.int_bank, "i"))
+    parts.append(_bank_to_le(regs.float_bank, "f"))
+
+    # Memory: only allocated, non-zero pages of the paged MainMemory
+    memory = sim.memory
+    page_size = memory.page_size
+    zero_page = bytes(page_size)
+    pages = []
+    for index in sorted(memory.pages):
+        page = _memory_page(memory, index)
+        if page != zero_page[:len(page)]:
+            pages.append(_SNAP_U32.pack(index))
+            pages.append(page)
+    parts.append(_SNAP_MEMORY.pack(len(memory), page_size, len(pages) // 2))
+    parts.extend(pages)
+
+    with open(path, "wb") as f:
+        f.write(b"".join(parts))
+
+
+def _save_delta(sim, path, changes):
+    ma = sim.matrix_accelerator
+    csrs = sim.csr.csrs
+    names = sorted(name for name in changes.csrs if name in csrs)
+    parts = [_SNAP_HEADER.pack(DELTA_MAGIC, SNAPSHOT_VERSION, len(names), sim.pc & 0xFFFFFFFF)]
+    parts.append(_SNAP_U32.pack(len(changes.gpr)))
+    for i in changes.gpr:
+        parts.append(_SNAP_GPR_ENTRY.pack(i, sim.gpr.read(i) & 0xFFFFFFFF))
+    for name in names:
+        parts.append(_pack_csr(name, csrs[name]))
+    parts.append(_SNAP_META.pack(*ma.acc_dest_bits_float, *ma.acc_dest_bits_int))
+
+    reg_bytes = sim.geometry.reg_bytes
+    registers = [(0, r) for r in changes.int_regs] + [(1, r) for r in changes.float_regs]
+    parts.append(_SNAP_REGS.pack(reg_bytes, len(registers)))
+    for bank_id, r in registers:
+        bank = ma.regs.float_bank if bank_id else ma.regs.int_bank
+        parts.append(_SNAP_REG_ENTRY.pack(bank_id, r))
+        parts.append(_bank_to_le(bank[r * reg_bytes:(r + 1) * reg_bytes], "f" if bank_id else "i"))
+
+    memory = sim.memory
+    parts.append(_SNAP_MEMORY.pack(len(memory), memory.page_size, len(changes.pages)))
+    for index in changes.pages:
+        parts.append(_SNAP_U32.pack(index))
+        parts.append(_memory_page(memory, index))
+
+    with open(path, "wb") as f:
+        f.write(b"".join(parts))
+
+
+def load_snapshot(sim, path):
+    """Restore simulator state from a binary snapshot written by save_snapshot()."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    magic, version, num_csrs, pc = _SNAP_HEADER.unpack_from(data, 0)
+    if magic not in (SNAPSHOT_MAGIC, DELTA_MAGIC):
+        raise ValueError(f"{path}: not a TPU snapshot file")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: unsupported snapshot version {version}")
+    if magic == DELTA_MAGIC:
+        _load_delta(sim, path, data, num_csrs, pc)
+        return
+    offset = _SNAP_HEADER.size
+    sim.pc = pc
+
+    gprs = _SNAP_GPR.unpack_from(data, offset)
+    offset += _SNAP_GPR.size
+    for i, value in enumerate(gprs):
+        sim.gpr.write(i, value)
+
+    offset = _unpack_csrs_and_meta(sim, data, offset, num_csrs)
+
+    ma = sim.matrix_accelerator
+    bank_size = _SNAP_U32.unpack_from(data, offset)[0]
+    offset += _SNAP_U32.size
+    regs = ma.regs
+    if bank_size != len(regs.int_bank):
+        raise ValueError(f"{path}: register bank size {bank_size} does not match simulator ({len(regs.int_bank)})")
+    regs.int_bank[:] = _bank_to_le(data[offset:offset + bank_size], "i")
+    offset += bank_size
+    regs.float_bank[:] = _bank_to_le(data[offset:offset + bank_size], "f")
+    offset += bank_size
+
+    memory_size, page_size, num_pages = _SNAP_MEMORY.unpack_from(data, offset)
+    offset += _SNAP_MEMORY.size
+    memory = sim.memory
+    if memory_size > len(memory):
+        raise ValueError(f"{path}: memory size {memory_size} exceeds simulator memory ({len(memory)})")
+    memory.clear()
+    for _ in range(num_pages):
+        index = _SNAP_U32.unpack_from(data, offset)[0]
+        offset += _SNAP_U32.size
+        address = index * page_size
+        length = min(page_size, memory_size - address)
+        memory.write(address, data[offset:offset + length])
+        offset += length
+
+
+def _unpack_csrs_and_meta(sim, data, offset, num_csrs):
+    # CSRs are restored as-is (including read-only ones such as xmisa)
+    for _ in range(num_csrs):
+        name_len = data[offset]
+        name = data[offset + 1:offset + 1 + name_len].decode("ascii")
+        offset += 1 + name_len
+        sim.csr.csrs[name] = _SNAP_CSR_VALUE.unpack_from(data, offset)[0]
+        offset += _SNAP_CSR_VALUE.size
+
+    ma = sim.matrix_accelerator
+    meta = _SNAP_META.unpack_from(data, offset)
+    ma.acc_dest_bits_float[:] = meta[:4]
+    ma.acc_dest_bits_int[:] = meta[4:]
+    return offset + _SNAP_META.size
+
+
+def _load_delta(sim, path, data, num_csrs, pc):
+    """Apply a delta snapshot on top of the current state (registers / pages not in the
+    delta keep their values)."""
+    sim.pc = pc
+    offset = _SNAP_HEADER.size
+    count = _SNAP_U32.unpack_from(data, offset)[0]
+    offset += _SNAP_U32.size
+    for _ in range(count):
+        index, value = _SNAP_GPR_ENTRY.unpack_from(data, offset)
+        offset += _SNAP_GPR_ENTRY.size
+        sim.gpr.write(index, value)
+
+    offset = _unpack_csrs_and_meta(sim, data, offset, num_csrs)
+
+    reg_bytes, count = _SNAP_REGS.unpack_from(data, offset)
+    offset += _SNAP_REGS.size
+    regs = sim.matrix_accelerator.regs
+    if reg_bytes != sim.geometry.reg_bytes:
+        raise ValueError(f"{path}: register size {reg_bytes} does not match simulator ({sim.geometry.reg_bytes})")
+    for _ in range(count):
+        bank_id, r = _SNAP_REG_ENTRY.unpack_from(data, offset)
+        offset += _SNAP_REG_ENTRY.size
+        bank, fmt = (regs.float_bank, "f") if bank_id else (regs.int_bank, "i")
+        bank[r * reg_bytes:(r + 1) * reg_bytes] = _bank_to_le(data[offset:offset + reg_bytes], fmt)
+        offset += reg_bytes
+
+    memory_size, page_size, num_pages = _SNAP_MEMORY.unpack_from(data, offset)
+    offset += _SNAP_MEMORY.size
+    memory = sim.memory
+    if memory_size != len(memory) or page_size != memory.page_size:
+        raise ValueError(f"{path}: memory {memory_size}/{page_size} does not match simulator "
+                         f"({len(memory)}/{memory.page_size})")
+    for _ in range(num_pages):
+        index = _SNAP_U32.unpack_from(data, offset)[0]
+        offset += _SNAP_U32.size
+        address = index * page_size
+        length = min(page_size, memory_size - address)
+        memory.write(address, data[offset:offset + length])
+        offset += length
+
+
+def _silent_simulator():
+    from .iss import Simulator
+    return Simulator(log_level="silent")
+
+
+def text_to_snapshot(path, state_dir=None):
+    """Convert the human-readable state files (in state_dir) into a binary snapshot."""
+    sim = _silent_simulator()
+    load_state_from_files(sim, state_dir)
+    save_snapshot(sim, path)
+    return sim
+
+
+def snapshot_to_text(path, state_dir=None):
+    """Write a binary snapshot back out as the 7 human-readable state files."""
+    sim = _silent_simulator()
+    load_snapshot(sim, path)
+    save_state_to_files(sim, state_dir)
+    return sim
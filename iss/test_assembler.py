@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test for the in-memory assembler API (Assembler.assemble).
+
+1. Every mnemonic in ALL_INSTRUCTIONS with random operands (x / ABI register
+   names, upper case, extra spaces, comments) gives the same machine code as
+   assemble_line
+2. str and iterable sources, blank / comment / label / .section lines, repeated
+   lines (cache) give the same array('I')
+3. Errors carry the line number and the original line: unknown mnemonic, bad
+   register, missing / extra operands, out-of-range immediate
+4. Lines with one operand too many / too few: assemble and assemble_line agree
+   (both raise ValueError, or both accept, e.g. mlme / msme with or without rs2)
+5. Throughput of assemble_line vs assemble (informational)
+
+Usage:
+    python test_assembler.py
+    python test_assembler.py --seed 1234
+"""
+
+import sys
+import time
+import random
+from array import array
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.definitions import ALL_INSTRUCTIONS, GPR_MAP, MATRIX_REG_MAP
+from assembler.assembler import Assembler, AssemblyError
+
+MATRIX_NAMES = sorted(MATRIX_REG_MAP)
+GPR_NAMES = sorted(GPR_MAP)
+MDUP = {"mdupb.m.x", "mduph.m.x", "mdupw.m.x", "mdupd.m.x"}
+# Khóa có khoảng trắng thừa trong definitions (vd 'mfsub.s.mv.i ') không dịch được bằng cả hai đường
+MNEMONICS = {mnemonic: info for mnemonic, info in ALL_INSTRUCTIONS.items() if mnemonic == mnemonic.strip()}
+
+
+def random_operands(rng, mnemonic, info):
+    """Toán hạng hợp lệ ngẫu nhiên cho một mnemonic (theo instr_type / variant)."""
+    m = lambda: rng.choice(MATRIX_NAMES)
+    x = lambda: rng.choice(GPR_NAMES)
+    imm3 = lambda: str(rng.randrange(8))
+    instr_type = info["instr_type"]
+    variant = info.get("variant")
+    if instr_type == "CONFIG":
+        return {"immediate": [str(rng.randrange(1024))], "register": [x()], "none": []}[info["operand_type"]]
+    if instr_type == "MULTIPLY":
+        return [m(), m(), m()]
+    if instr_type == "LOADSTORE":
+        base = rng.choice([f"({x()})", f"( {x()} )"])
+        if mnemonic.startswith(("mlme", "msme")) and rng.random() < 0.5:
+            return [m(), base]
+        return [m(), base, x()]
+    if variant in ("md_ms1", "mzero"):
+        return [m(), m()][:1 if variant == "mzero" else 2]
+    if variant in ("md_ms2_ms1",):
+        return [m(), m(), m()]
+    if variant == "md_ms2_ms1_imm3_direct":
+        return [m(), m(), f"{m()}[{imm3()}]"]
+    if variant == "md_rs2_rs1":
+        return [m(), x()] if mnemonic in MDUP else [m(), x(), x()]
+    if variant == "rd_ms2_rs1":
+        return [x(), m(), x()]
+    if variant == "md_ms1_imm3":
+        return [m(), f"{m()}[{imm3()}]"]
+    if variant == "md_ms1_imm3_direct":
+        return [m(), m(), imm3()]
+    raise AssertionError(f"no operand generator for {mnemonic} ({instr_type}/{variant})")
+
+
+def random_line(rng, mnemonic, info):
+    operands = random_operands(rng, mnemonic, info)
+    if rng.random() < 0.3:
+        operands = [op.upper() if not op.startswith("(") else op for op in operands]
+        mnemonic = mnemonic.upper()
+    separator = rng.choice([", ", ",", " , ", "  "])
+    line = f"{rng.choice(['', '  ', chr(9)])}{mnemonic} {separator.join(operands)}"
+    if rng.random() < 0.2:
+        line += "   # comment, x1"
+    return line
+
+
+def test_same_code(rng, per_mnemonic=30):
+    asm = Assembler()
+    lines = []
+    for mnemonic, info in MNEMONICS.items():
+        for _ in range(per_mnemonic):
+            line = random_line(rng, mnemonic, info)
+            expected = asm.assemble_line(line)
+            got = asm.assemble([line])
+            assert list(got) == [expected], f"{line!r}: {list(got)} != {expected}"
+            lines.append(line)
+    rng.shuffle(lines)
+    assert list(asm.assemble(lines)) == [asm.assemble_line(line) for line in lines]
+    print(f"  [OK] {len(MNEMONICS)} mnemonics x {per_mnemonic} random lines match assemble_line")
+
+
+def test_sources():
+    asm = Assembler()
+    source = """
+# kernel
+.section text
+start:
+msettilemi 4
+mlae32 tr0, (x1), x2     # A
+mlae32 tr0, (x1), x2
+
+mfmacc.s acc0, tr0, tr1
+"""
+    words = asm.assemble(source)
+    assert isinstance(words, array) and words.typecode == 'I'
+    expected = [asm.assemble_line(line) for line in ("msettilemi 4", "mlae32 tr0, (x1), x2",
+                                                     "mlae32 tr0, (x1), x2", "mfmacc.s acc0, tr0, tr1")]
+    assert list(words) == expected
+    assert asm.assemble(iter(source.splitlines(keepends=True))) == words
+    assert asm.assemble(line for line in source.split("\n")) == words
+    assert len(asm.assemble("")) == 0
+    print("  [OK] str / iterable sources, comments, labels and repeated lines")
+
+
+def test_errors():
+    asm = Assembler()
+    cases = [
+        ("mfoo tr0, tr1", "không tồn tại"),
+        ("mfmacc.s acc0, tr0, tr9", "Unknown matrix register"),
+        ("mlae32 tr0, (x99), x2", "Unknown RISC-V GPR"),
+        ("mlae32 tr0, x1, x2", "(rs1)"),
+        ("mlae32 tr0, (x1)", "3 toán hạng"),
+        ("mfmacc.s acc0, tr0", "3 toán hạng"),
+        ("mfmacc.s acc0, tr0, tr1, tr2", "3 toán hạng"),
+        ("msettilemi 4, 4", "1 toán hạng"),
+        ("mzero acc0, acc1", "1 toán hạng"),
+        ("msettilemi 1024", "out of range"),
+        ("msettilemi", "1 toán hạng"),
+        ("msettileki four", "invalid literal"),
+        ("mfmul.s.mv.i acc0, acc1, acc2", "ms1[imm3]"),
+        ("mrelease x1", "0 toán hạng"),
+    ]
+    for bad, message in cases:
+        source = f"msettilemi 4\n\n  {bad}  \nmrelease\n"
+        try:
+            asm.assemble(source)
+        except AssemblyError as e:
+            assert isinstance(e, ValueError)
+            assert e.line_num == 3 and e.line == f"  {bad}  ", (e.line_num, e.line)
+            assert message in e.message and str(e).startswith("line 3: "), str(e)
+            continue
+        raise AssertionError(f"{bad!r} must be rejected")
+    print(f"  [OK] {len(cases)} bad lines rejected with line number and text")
+
+
+def test_operand_counts(rng, per_mnemonic=20):
+    asm = Assembler()
+
+    def outcome(assemble, line):
+        try:
+            return assemble(line)
+        except ValueError:
+            return "ValueError"
+
+    rejected = 0
+    for mnemonic, info in MNEMONICS.items():
+        for _ in range(per_mnemonic):
+            operands = random_operands(rng, mnemonic, info)
+            if rng.random() < 0.5:
+                operands = operands + [rng.choice(MATRIX_NAMES + GPR_NAMES + ["3", "(x1)"])]
+            elif operands:
+                operands = operands[:-1]
+            line = f"{mnemonic} {', '.join(operands)}"
+            expected = outcome(asm.assemble_line, line)
+            got = outcome(lambda l: asm.assemble([l])[0], line)
+            assert got == expected, f"{line!r}: assemble {got} != assemble_line {expected}"
+            rejected += expected == "ValueError"
+    # Trước đây assemble_line bỏ qua toán hạng thừa của CONFIG / MULTIPLY
+    for line in ("mfmacc.s acc0, tr0, tr1, tr2", "msettilemi 4 4", "mrelease x1", "mfmacc.s acc0, tr0"):
+        assert outcome(asm.assemble_line, line) == "ValueError", line
+    print(f"  [OK] extra / missing operands: assemble matches assemble_line ({rejected} lines rejected by both)")
+
+
+def benchmark(rng, count=20000):
+    asm = Assembler()
+    kernel = [random_line(rng, mnemonic, MNEMONICS[mnemonic])
+              for mnemonic in ("msettilemi", "mlae32", "mlbe32", "mfmacc.s", "madd.w", "msce32")]
+    # Mỗi dòng khác nhau (số thứ tự trong chú thích) -> không trúng cache dòng
+    distinct = [f"{random_line(rng, m, MNEMONICS[m])} # {i}"
+                for i, m in enumerate(rng.choices(list(MNEMONICS), k=count))]
+    for name, lines in (("repeated kernel", kernel * (count // len(kernel))), ("distinct lines", distinct)):
+        start = time.perf_counter()
+        slow = [asm.assemble_line(line) for line in lines]
+        per_line = time.perf_counter() - start
+        start = time.perf_counter()
+        fast = asm.assemble(lines)
+        fast_time = time.perf_counter() - start
+        assert list(fast) == slow
+        print(f"  [i] {name:<15}: assemble_line {len(lines) / per_line / 1e3:5.0f} k lines/s, "
+              f"assemble {len(lines) / fast_time / 1e3:5.0f} k lines/s ({per_line / fast_time:.1f}x)")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    rng = random.Random(seed)
+
+    print("=" * 80)
+    print(f"IN-MEMORY ASSEMBLER TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_same_code(rng)
+        test_sources()
+        test_errors()
+        test_operand_counts(rng)
+        benchmark(rng)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] assemble() gives the same machine code as assemble_line.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
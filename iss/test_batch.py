@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Test for batched simulation (iss/batch.py).
+
+1. Each batch element ends in exactly the state of a Simulator that ran the same
+   program alone (GPR, CSR, both register banks, RAM, acc dest bits), for
+   load/store (all layouts, overlapping stores), all matmul variants,
+   element-wise int/float (saturation, .mv aliasing) and MISC; NaN / Inf loads and
+   stores raise no numpy RuntimeWarning
+2. Tile sizes that differ across the batch are rejected; a fault stops the batch
+   at the faulting instruction
+3. Timing of B separate runs vs one batched run (informational)
+
+Usage:
+    python test_batch.py
+    python test_batch.py --seed 1234
+"""
+
+import io
+import sys
+import time
+import random
+import warnings
+import struct
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.harness import SimHarness
+from iss.batch import BatchSimulator
+from iss.testing import state_of
+
+MEMORY_SIZE = 16 * 1024
+BATCH = 6
+
+PROGRAMS = {
+    "load/store + fp32 matmul": """
+msettilemi 4
+msettileki 4
+msettileni 4
+mlae32 tr0, (x1), x2
+mlbe32 tr1, (x3), x2
+mfmacc.s acc0, tr0, tr1
+msce32 acc0, (x4), x2
+mlate32 tr2, (x1), x2
+msate16 tr2, (x5), x2
+mlae16 tr3, (x5), x2
+mscte32 acc0, (x6), x2
+mlcte32 acc1, (x6), x2
+msettilemi 3
+msae32 tr0, (x7), x10
+msbe8 tr1, (x8), x11
+mrelease
+""",
+    "int8 / fp16 / bf16 / fp8 matmul": """
+msettilemi 4
+msettileki 4
+msettileni 4
+mlae8 tr0, (x9), x2
+mlbe8 tr1, (x9), x2
+mmacc.w.b acc0, tr0, tr1
+mmaccu.w.b acc1, tr0, tr1
+mmaccus.w.b acc1, tr1, tr0
+mmaccsu.w.b acc2, tr0, tr1
+mfmacc.bf16.e4 acc3, tr0, tr1
+mfmacc.bf16.e5 acc3, tr1, tr0
+mlae16 tr2, (x5), x2
+mlbe16 tr3, (x5), x2
+mfmacc.h acc0, tr2, tr3
+mfmacc.s.h acc1, tr2, tr3
+mfmacc.s.bf16 acc2, tr2, tr3
+msettilemi 2
+msettilen x12
+mfmacc.s acc0, tr2, tr3
+msettilemi 4
+mfmacc.s.bf16 acc1, tr3, tr2
+msce32 acc2, (x4), x2
+""",
+    "element-wise + misc": """
+msettilemi 4
+msettileni 4
+msettileki 4
+mlae32 tr0, (x1), x2
+mlae16 tr1, (x5), x2
+madd.w acc0, acc0, acc1
+mmul.w acc1, acc1, acc1
+msub.w acc2, acc1, acc0
+mmax.w acc3, acc2, acc1
+mumax.w acc0, acc3, acc1
+mmin.w acc1, acc2, acc3
+mumin.w acc2, acc0, acc1
+msll.w.mv.i acc3, acc3, acc2[5]
+msrl.w acc2, acc2, acc1
+msra.w.mv.i acc1, acc1, acc0[3]
+mfadd.s acc0, tr0, tr1
+mfsub.h acc1, tr1, tr0
+mfmul.s.mv.i tr0, tr1, tr0[1]
+mfmax.h acc2, tr1, tr0
+mfmin.s acc3, tr1, tr0
+mfmul.h.mv.i tr1, tr1, tr0[2]
+mmovw.x.m x20, tr0, x13
+mmovw.m.x acc0, x14, x13
+mdupw.m.x tr3, x14
+mrslidedown tr2, tr2, 1
+mcslidedown.w acc1, acc1, 3
+mrslidedown acc0, acc2, 2
+mmov.mm tr3, acc1
+mzero acc1
+mmovw.x.m x21, tr0, x15
+""",
+}
+
+
+def make_sims(seed, count=BATCH):
+    """count Simulator (qua SimHarness) với dữ liệu ngẫu nhiên khác nhau, cùng M/N/K."""
+    rng = random.Random(seed)
+    harnesses = []
+    for b in range(count):
+        h = SimHarness(log_level="silent", memory_size=MEMORY_SIZE)
+        specials = [float('inf'), -float('inf'), float('nan'), -0.0, 1e-40, 7e4]
+        floats = [rng.choice(specials) if rng.random() < 0.25 else rng.uniform(-300, 300) for _ in range(16)]
+        floats[5] = float('nan')   # tr0[1][1]: cột NaN sau mfmul.s.mv.i (thứ tự đối số của mfmax / mfmin)
+        h.write_memory(0x100, struct.pack('<16f', *floats))
+        h.write_memory(0x200, struct.pack('<16f', *(rng.uniform(-8, 8) for _ in range(16))))
+        h.write_memory(0x300, bytes(rng.getrandbits(8) for _ in range(64)))
+        h.write_memory(0x400, bytes(rng.getrandbits(8) for _ in range(64)))
+        h.write_memory(0x3000, bytes(rng.getrandbits(8) for _ in range(256)))
+        gprs = {1: 0x100, 2: 16, 3: 0x200, 4: 0x800 + 64 * rng.randrange(4), 5: 0x400, 6: 0x900,
+                7: 0xA00 + rng.randrange(16), 8: 0xB00, 9: 0x300, 10: rng.choice([4, 8, 16]),
+                11: rng.choice([1, 2, 4]), 12: 3, 13: rng.randrange(20), 14: rng.getrandbits(32),
+                15: rng.randrange(16)}
+        for index, value in gprs.items():
+            h.set_gpr(index, value)
+        h.set_csr("xmsaten", b % 2)
+        for reg in range(4, 8):
+            h.set_matrix(f"acc{reg - 4}", [[rng.randint(-2**31, 2**31 - 1) for _ in range(4)] for _ in range(4)])
+        harnesses.append(h)
+    return harnesses
+
+
+def run_quiet(run, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run(*args)
+
+
+def test_matches_scalar(seed):
+    for name, source in PROGRAMS.items():
+        for engine in ("reference", "numpy"):
+            scalar = make_sims(seed)
+            program = scalar[0].assemble(source)
+            batch = BatchSimulator.from_simulators((h.sim for h in make_sims(seed)), log_level="silent")
+            batch.load_program(program)
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", RuntimeWarning)
+                batch.run()
+            for b, h in enumerate(scalar):
+                h.sim.matrix_accelerator.matmul_engine = engine
+                h.sim.matrix_accelerator.loadstore_engine = engine
+                run_quiet(h.run, program)
+                got = state_of(batch.to_simulator(b))
+                expected = state_of(h.sim)
+                for part, (x, y) in enumerate(zip(got, expected)):
+                    assert x == y, f"{name} ({engine}): batch element {b} differs in state part {part}"
+    print(f"  [OK] {len(PROGRAMS)} programs x {BATCH} states match separate Simulator runs (both engines)")
+
+
+def test_errors(seed):
+    harnesses = make_sims(seed, 3)
+    program = harnesses[0].assemble("msettilemi 4\nmsettilek x10\nmsettileni 4\nmfmacc.s acc0, tr0, tr1\n")
+    for b, h in enumerate(harnesses):
+        h.set_gpr(10, 4 if b else 2)
+    batch = BatchSimulator.from_simulators((h.sim for h in harnesses), log_level="silent")
+    batch.load_program(program)
+    try:
+        batch.run()
+    except ValueError:
+        assert batch.pc == 12
+    else:
+        raise AssertionError("different K across the batch must be rejected")
+
+    batch = BatchSimulator.from_simulators((h.sim for h in make_sims(seed, 3)), log_level="silent")
+    batch.set_gpr(1, [0x100, MEMORY_SIZE - 8, 0x100])
+    batch.load_program(harnesses[0].assemble("msettilemi 4\nmsettileki 4\nmlae32 tr0, (x1), x2\nmzero tr1\n"))
+    try:
+        batch.run()
+    except MemoryError:
+        assert batch.pc == 8
+    else:
+        raise AssertionError("load past the end of RAM in one batch element must raise")
+
+    # Thông báo lỗi của lệnh không hỗ trợ được in một lần cho cả lô
+    batch = BatchSimulator(4, log_level="error")
+    batch.load_program(harnesses[0].assemble("mlae64 tr0, (x1), x2\n"))
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        batch.run()
+    assert buffer.getvalue().count("64-bit load/store is NOT supported") == 1
+    print("  [OK] non-uniform tile sizes rejected, faults stop the batch, errors logged once")
+
+
+def benchmark(seed, batch_size=256):
+    source = PROGRAMS["load/store + fp32 matmul"]
+    harnesses = make_sims(seed, batch_size)
+    program = harnesses[0].assemble(source)
+    batch = BatchSimulator.from_simulators((h.sim for h in harnesses), log_level="silent")
+    start = time.perf_counter()
+    for h in harnesses:
+        h.sim.matrix_accelerator.matmul_engine = "numpy"
+        h.sim.matrix_accelerator.loadstore_engine = "numpy"
+        h.run(program)
+    separate = time.perf_counter() - start
+    start = time.perf_counter()
+    batch.load_program(program)
+    batch.run()
+    batched = time.perf_counter() - start
+    print(f"  [INFO] B={batch_size}: separate runs {separate * 1e3:7.1f} ms, batched {batched * 1e3:6.1f} ms "
+          f"({separate / batched:.1f}x)")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"BATCHED SIMULATION TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_matches_scalar(seed)
+        test_errors(seed)
+        benchmark(seed)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Batched runs match separate Simulator runs.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
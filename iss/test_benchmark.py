@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test for the benchmark suite (iss/benchmark.py).
+
+1. Every benchmark program runs on its seeded input state without simulator
+   errors or warnings (so each one times a real handler, not an error path)
+2. run_suite() gives a JSON round-trippable report that compare() can diff
+
+Usage:
+    python test_benchmark.py
+"""
+
+import io
+import sys
+import json
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.benchmark import BENCHMARKS, GROUPS, setup_state, assemble_body, run_suite, select_benchmarks, compare
+
+
+def test_programs_execute():
+    for bench in BENCHMARKS:
+        sim = Simulator(log_level="warning")
+        setup_state(sim, 2024)
+        sim.load_program(assemble_body(bench, 3))
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            sim.run()
+        assert not buffer.getvalue().strip(), f"{bench.name}: {buffer.getvalue().strip()}"
+    assert {bench.group for bench in BENCHMARKS} == set(GROUPS)
+    print(f"  [OK] {len(BENCHMARKS)} benchmark programs run without errors")
+
+
+def test_report():
+    benches = select_benchmarks(["config", "matmul"], "mfmacc.s")
+    assert [b.name for b in benches] == ["mfmacc.s", "mfmacc.s.bf16", "mfmacc.s.h"]
+    report = json.loads(json.dumps(run_suite(benches, count=5, repeat=1)))
+    assert report["config"]["count"] == 5 and len(report["results"]) == 3
+    for result in report["results"]:
+        assert result["ns_per_instr"] > 0
+        assert abs(result["ns_per_element"] * result["elements"] - result["ns_per_instr"]) < 1e-6
+    rows = compare(report, report)
+    assert [row[1] for row in rows] == ["mfmacc.s", "mfmacc.s.bf16", "mfmacc.s.h"]
+    assert all(row[4] == 1.0 for row in rows)
+    print("  [OK] JSON report and comparison")
+
+
+def main():
+    print("=" * 80)
+    print("BENCHMARK SUITE TEST")
+    print("=" * 80)
+    try:
+        test_programs_execute()
+        test_report()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Benchmarks are runnable.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Test for straight-line block compilation (iss/blocks.py).
+
+1. Compiled and interpreted runs leave identical state and print the same
+   warnings / errors, for every engine, first run and cached re-run
+2. Blocks are cached per entry M/N/K (guard), kept when the same program is
+   reloaded, and end after an instruction outside the matrix groups
+3. A fault inside a block leaves the PC at the faulting instruction
+4. Blocks are compiled only when an engine has compiled steps (numpy matmul,
+   numpy / struct load/store); with only the reference engines runs stay interpreted
+5. Timing of interpreted vs compiled re-runs (informational)
+
+Usage:
+    python test_blocks.py
+    python test_blocks.py --seed 1234
+"""
+
+import io
+import sys
+import time
+import random
+import struct
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.harness import SimHarness
+from iss.blocks import worth_compiling
+from iss.testing import state_of
+
+KERNEL = """
+msettilemi 4
+msettileki 4
+msettileni 4
+mlae32 tr0, (x1), x2
+mlbe32 tr1, (x3), x2
+mfmacc.s acc0, tr0, tr1
+msce32 acc0, (x4), x2
+mlae8 tr2, (x5), x2
+mlbe8 tr3, (x5), x2
+mmacc.w.b acc1, tr2, tr3
+mmaccu.w.b acc1, tr2, tr3
+mmaccsu.w.b acc2, tr3, tr2
+msce32 acc1, (x6), x2
+msettilem x7
+mlae16 tr0, (x8), x2
+mlbe16 tr1, (x8), x2
+mfmacc.s.h acc3, tr0, tr1
+mfmacc.h acc2, tr0, tr1
+mfmacc.s.bf16 acc0, tr0, tr1
+madd.w acc1, acc2, acc1
+mfadd.s acc3, acc0, acc3
+mfmul.s.mv.i acc0, acc3, acc0[1]
+mmov.mm tr2, acc3
+mcslidedown.w tr3, tr2, 1
+msae16 tr2, (x9), x2
+msate8 tr3, (x9), x2
+msettileki 0
+mfmacc.s acc0, tr0, tr1
+mlae64 tr0, (x1), x2
+msettileki 4
+mfmacc.s acc0, tr0, tr1
+"""
+
+
+def make_harness(seed, compile_blocks, engine, m_reg=3):
+    rng = random.Random(seed)
+    h = SimHarness(log_level="warning", compile_blocks=compile_blocks,
+                   matmul_engine="numpy" if engine == "numpy" else "reference", loadstore_engine=engine)
+    h.write_memory(0x100, struct.pack('<16f', *(rng.uniform(-8, 8) for _ in range(16))))
+    h.write_memory(0x200, struct.pack('<16f', *(rng.uniform(-8, 8) for _ in range(16))))
+    h.write_memory(0x300, bytes(rng.getrandbits(8) for _ in range(64)))
+    h.write_memory(0x400, struct.pack('<32e', *(rng.uniform(-2, 2) for _ in range(32))))
+    for index, value in {1: 0x100, 2: 16, 3: 0x200, 4: 0x800, 5: 0x300, 6: 0x900,
+                         7: m_reg, 8: 0x400, 9: 0xA00}.items():
+        h.set_gpr(index, value)
+    return h
+
+
+def run_captured(h, source=None):
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        h.run(source)
+    return buffer.getvalue()
+
+
+def test_same_state(seed):
+    for engine in ("reference", "numpy", "struct"):
+        plain = make_harness(seed, False, engine)
+        compiled = make_harness(seed, True, engine)
+        for run in range(3):
+            source = KERNEL if run == 0 else None
+            if run == 2:   # Giá trị GPR khác, cùng khối đã biên dịch
+                for h in (plain, compiled):
+                    h.set_gpr(2, 32)
+                    h.set_gpr(7, 2)
+            out_plain, out_compiled = run_captured(plain, source), run_captured(compiled, source)
+            assert out_plain == out_compiled, f"{engine} run {run}: output differs"
+            assert "ERROR" in out_plain and "Warning" in out_plain
+            assert state_of(plain.sim) == state_of(compiled.sim), f"{engine} run {run}: state differs"
+        # Toàn engine tham chiếu: không có hook biên dịch -> chạy vòng lặp thông dịch
+        assert bool(compiled.sim.blocks) == (engine != "reference") and not plain.sim.blocks
+    print("  [OK] compiled and interpreted runs match (every load/store engine, re-runs)")
+
+
+def test_cache_and_guard(seed):
+    h = make_harness(seed, True, "numpy")
+    program = h.assemble(KERNEL)
+    run_captured(h, program)
+    assert len(h.sim.blocks) == 1
+    block = next(iter(h.sim.blocks.values()))
+    assert block.length == len(program) and len(block.steps) < len(program)
+    assert h.sim.block_guards == {0: ()}      # Kernel tự đặt M/N/K -> không cần guard
+
+    run_captured(h, program)                  # Chạy lại (M/N/K lúc vào đã khác) -> dùng lại khối
+    assert list(h.sim.blocks.values()) == [block]
+
+    body = program[3:]                        # Không có msettile*i ở đầu -> guard theo M/N/K
+    for m in (4, 4, 2):
+        h.set_csr("mtilem", m)
+        h.set_csr("mtilek", 4)
+        run_captured(h, body)
+    assert h.sim.block_guards == {0: ("mtilem", "mtilen", "mtilek")}
+    assert len(h.sim.blocks) == 2             # Chương trình khác xóa cache; 2 biến thể theo mtilem
+
+    # Lệnh ngoài các nhóm ma trận (opcode 0) kết thúc khối
+    output = run_captured(h, program[:3] + [0] + program[3:7])
+    assert "Unknown or unsupported instruction opcode" in output
+    assert sorted(b.length for b in h.sim.blocks.values()) == [4, 4]
+    print("  [OK] block cache, entry guard and block boundaries")
+
+
+def test_fault_pc(seed):
+    for compile_blocks in (False, True):
+        h = make_harness(seed, compile_blocks, "reference")
+        h.set_gpr(1, len(h.sim.memory) - 8)
+        try:
+            h.run("msettilemi 4\nmsettileki 4\nmlae32 tr1, (x3), x2\nmlae32 tr0, (x1), x2\nmzero tr2\n")
+        except MemoryError:
+            pass
+        else:
+            raise AssertionError("load past the end of RAM must raise")
+        assert h.sim.pc == 12, (compile_blocks, h.sim.pc)
+    print("  [OK] fault inside a block leaves PC at the faulting instruction")
+
+
+def test_worth_compiling(seed):
+    """Khối chỉ được biên dịch khi có engine có hook (worth_compiling); toàn engine tham
+    chiếu thì chạy thông dịch."""
+    for matmul_engine in ("reference", "numpy"):
+        for loadstore_engine in ("reference", "struct", "numpy"):
+            h = SimHarness(log_level="warning", matmul_engine=matmul_engine, loadstore_engine=loadstore_engine)
+            run_captured(h, KERNEL)
+            expected = matmul_engine == "numpy" or loadstore_engine != "reference"
+            assert worth_compiling(h.sim.matrix_accelerator) == expected
+            assert bool(h.sim.blocks) == expected, (matmul_engine, loadstore_engine, len(h.sim.blocks))
+    print("  [OK] blocks compiled only with numpy matmul or numpy / struct load/store")
+
+
+def benchmark(seed, repeats=20):
+    """Thời gian chạy lại kernel, thông dịch vs compile_blocks=True (chỉ để tham khảo).
+    Hai bản chạy xen kẽ, lấy thời gian nhỏ nhất để bớt nhiễu của máy."""
+    program_source = "\n".join(KERNEL.strip().splitlines()[:7]) + "\n"
+    for engine in ("reference", "struct", "numpy"):
+        harnesses = []
+        for compile_blocks in (False, True):
+            h = make_harness(seed, compile_blocks, engine)
+            program = h.assemble(program_source * 50)
+            h.run(program)
+            harnesses.append((h, program))
+        best = [float("inf")] * 2
+        for _ in range(repeats):
+            for k, (h, program) in enumerate(harnesses):
+                start = time.perf_counter()
+                h.run(program)
+                best[k] = min(best[k], (time.perf_counter() - start) / len(program))
+        print(f"  [i] {engine:<9} interpreted {best[0] * 1e6:6.2f} us/instr, "
+              f"compiled {best[1] * 1e6:6.2f} us/instr ({best[0] / best[1]:.1f}x)")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"BLOCK COMPILATION TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_same_state(seed)
+        test_cache_and_guard(seed)
+        test_fault_pc(seed)
+        test_worth_compiling(seed)
+        benchmark(seed)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Compiled blocks match the interpreter.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
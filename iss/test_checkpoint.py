@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test for in-memory checkpoints (Simulator.checkpoint / restore).
+
+1. Random state -> checkpoint -> program run + direct writes -> restore: every
+   GPR, CSR, register bank byte, dest-bit metadata and memory byte is back;
+   one checkpoint can be restored many times and into another Simulator
+2. Memory is shared copy-on-write: a checkpoint copies no pages, writes after
+   it copy only the touched pages and never leak into the checkpoint
+3. Compiled blocks keep working across restore (state is restored in place)
+4. Timing of restore vs rebuilding state from text files (informational)
+
+Usage:
+    python test_checkpoint.py
+    python test_checkpoint.py --seed 1234
+"""
+
+import io
+import sys
+import time
+import random
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.harness import SimHarness
+from iss.definitions import Geometry
+from iss.state_manager import StateFiles, save_state_to_files, load_state_from_files
+from iss.testing import randomize_simulator, random_simulator, state_of
+
+PROGRAM = """
+msettilemi 4
+msettileki 4
+msettileni 4
+mlae32 tr0, (x1), x2
+mlbe32 tr1, (x3), x2
+mfmacc.s acc0, tr0, tr1
+msce32 acc0, (x4), x2
+madd.w acc1, acc1, acc2
+mrelease
+"""
+
+
+def test_restore(rng, trials=10):
+    for trial in range(trials):
+        sim = random_simulator(rng)
+        expected = state_of(sim)
+        checkpoint = sim.checkpoint()
+        for _ in range(3):
+            for r, address in ((1, 0x100), (2, 16), (3, 0x200), (4, 0x800)):
+                sim.gpr.write(r, address)
+            with contextlib.redirect_stdout(io.StringIO()):
+                sim.load_program(SimHarness().assemble(PROGRAM))
+                sim.run()
+            randomize_simulator(sim, rng)
+            sim.csr.csrs["extra"] = 1
+            assert state_of(sim) != expected
+            sim.restore(checkpoint)
+            assert state_of(sim) == expected, f"trial {trial}: restored state differs"
+
+        other = Simulator(log_level="silent")
+        other.restore(checkpoint)
+        assert state_of(other) == expected, f"trial {trial}: restore into another Simulator differs"
+
+    for bad in (Simulator(log_level="silent", memory_size=64 * 1024),
+                Simulator(log_level="silent", geometry=Geometry(tlen=1024))):
+        try:
+            bad.restore(checkpoint)
+        except ValueError:
+            continue
+        raise AssertionError("checkpoint with different RAM size / geometry must be rejected")
+    print(f"  [OK] {trials} random states restored bit-exactly (repeatedly, and into another Simulator)")
+
+
+def test_copy_on_write(rng):
+    sim = random_simulator(rng)
+    memory = sim.memory
+    pages_before = dict(memory.pages)
+    checkpoint = sim.checkpoint()
+    # Không trang nào bị sao chép khi chụp
+    assert all(checkpoint.memory.pages[i] is page for i, page in pages_before.items())
+
+    touched = sorted(pages_before)[:3]
+    for index in touched:
+        memory.write(index * memory.page_size, b"\xAA" * 8)
+    memory.write(len(memory) - 8, b"\xBB" * 8)
+    copied = [i for i, page in memory.pages.items() if checkpoint.memory.pages.get(i) is not page]
+    assert sorted(copied) == sorted(set(touched) | {(len(memory) - 8) // memory.page_size}), copied
+    assert all(checkpoint.memory.pages[i][:8] == pages_before[i][:8] for i in touched)
+
+    sim.restore(checkpoint)
+    assert all(memory.pages[i] is checkpoint.memory.pages[i] for i in memory.pages)
+    memory.write(touched[0] * memory.page_size, b"\xCC")   # Ghi sau restore vẫn copy-on-write
+    assert checkpoint.memory.pages[touched[0]] is pages_before[touched[0]]
+    assert memory.pages[touched[0]] is not pages_before[touched[0]]
+    print("  [OK] memory pages shared copy-on-write with the checkpoint")
+
+
+def test_compiled_blocks(rng):
+    h = SimHarness(compile_blocks=True, matmul_engine="numpy", loadstore_engine="numpy")
+    for r, value in ((1, 0x100), (2, 16), (3, 0x200), (4, 0x800)):
+        h.set_gpr(r, value)
+    h.write_memory(0x100, bytes(rng.getrandbits(8) & 0x3F for _ in range(128)))
+    h.write_memory(0x200, bytes(rng.getrandbits(8) & 0x3F for _ in range(128)))
+    base = h.checkpoint()
+    h.run(PROGRAM)
+    first = state_of(h.sim)
+    blocks = dict(h.sim.blocks)
+    for _ in range(3):
+        h.restore(base)
+        h.run()
+        assert state_of(h.sim) == first, "re-run after restore differs"
+    assert h.sim.blocks == blocks, "restore must not invalidate compiled blocks"
+    print("  [OK] compiled blocks reused across restore")
+
+
+def benchmark(rng, repeats=20):
+    sim = random_simulator(rng)
+    checkpoint = sim.checkpoint()
+    files = StateFiles()
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_state_to_files(sim, files)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            load_state_from_files(sim, files)
+        text = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        sim.restore(checkpoint)
+    restore = (time.perf_counter() - start) / repeats
+    print(f"  [i] reset state: text files {text * 1e3:.2f} ms, restore {restore * 1e6:.1f} us "
+          f"({text / restore:.0f}x)")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    rng = random.Random(seed)
+
+    print("=" * 80)
+    print(f"CHECKPOINT / RESTORE TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_restore(rng)
+        test_copy_on_write(rng)
+        test_compiled_blocks(rng)
+        benchmark(rng)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Checkpoints restore the exact state.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
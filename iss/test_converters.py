@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Bit-exactness test for the lookup-table converters in converters.py.
+
+Compares the table-based public functions (and their *_array variants) with
+the original branch-per-value reference implementations (_*_ref):
+1. Decoders  - exhaustive over all 256 (FP8) / 65536 (FP16, BF16) bit patterns
+2. Encoders  - every float32 (sign, exponent, top-mantissa) bucket the tables key on,
+               plus special values and doubles that are not exactly float32
+3. Arrays    - *_array variants against the scalar functions on the same inputs
+4. Encoder kernels on float32 arrays - exhaustive over every float16 value (and its
+               neighbours), one random float32 per encoder bucket; quantize_float16_array;
+               timing of scalar loop vs array kernel (informational)
+
+Usage:
+    python test_converters.py
+    python test_converters.py --seed 1234
+"""
+
+import sys
+import math
+import time
+import random
+import struct
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss import converters as cv
+
+DECODERS = [
+    # (tên, hàm tra bảng, bản tham chiếu, số bit)
+    ("bits_to_float16",     cv.bits_to_float16,     cv._bits_to_float16_ref,     16),
+    ("bfloat16_to_float",   cv.bfloat16_to_float,   cv._bfloat16_to_float_ref,   16),
+    ("bits_to_float8_e4m3", cv.bits_to_float8_e4m3, cv._bits_to_float8_e4m3_ref, 8),
+    ("bits_to_float8_e5m2", cv.bits_to_float8_e5m2, cv._bits_to_float8_e5m2_ref, 8),
+]
+
+ENCODERS = [
+    ("float_to_bits16",     cv.float_to_bits16,     cv._float_to_bits16_ref),
+    ("float_to_bits8_e4m3", cv.float_to_bits8_e4m3, cv._float_to_bits8_e4m3_ref),
+    ("float_to_bits8_e5m2", cv.float_to_bits8_e5m2, cv._float_to_bits8_e5m2_ref),
+]
+
+SPECIAL_VALUES = [0.0, -0.0, math.inf, -math.inf, math.nan, -math.nan, 1e-300, -1e-300, 1e300, -1e300,
+                  3.4028235e38, 3.4028236e38, 65504.0, 65519.99, 65520.0, 2.0 ** -24, 2.0 ** -25, 448.0, 57344.0,
+                  1, -7, 0, 2 ** 40]
+
+
+def bit_key(value):
+    """So sánh theo bit (phân biệt -0.0, giữ nguyên NaN payload)."""
+    return struct.pack("<d", value)
+
+
+def encoder_inputs(rng):
+    """Một float32 ngẫu nhiên trong mỗi nhóm bits32 >> 13 (bảng FP16/FP8 chỉ phụ thuộc các bit này)."""
+    for bucket in range(1 << 19):
+        bits32 = (bucket << 13) | rng.getrandbits(13)
+        if (bits32 & 0x7F800000) == 0x7F800000 and (bits32 & 0x7FFFFF):
+            continue  # NaN - kiểm tra riêng
+        yield cv.bits_to_float32(bits32)
+
+
+def double_inputs(rng, count=20000):
+    """Các double không biểu diễn chính xác bằng float32 (kiểm tra bước làm tròn float64 -> float32)."""
+    values = list(SPECIAL_VALUES)
+    for _ in range(count):
+        values.append(rng.uniform(-1, 1) * 2.0 ** rng.randint(-160, 140))
+    values.append(struct.unpack("<d", struct.pack("<Q", 0x7FF0000000000123))[0])  # NaN có payload
+    values.append(struct.unpack("<d", struct.pack("<Q", 0xFFF8000000000001))[0])
+    return values
+
+
+def test_decoders_exhaustive():
+    failures = 0
+    for name, fast, ref, width in DECODERS:
+        bad = [b for b in range(1 << width) if bit_key(fast(b)) != bit_key(ref(b))]
+        status = "[OK]" if not bad else "[X]"
+        print(f"  {status} {name:<22} {(1 << width) - len(bad)}/{1 << width} bit patterns")
+        failures += len(bad)
+    assert failures == 0, f"{failures} decoder mismatches"
+
+
+def test_encoders(seed=2024):
+    rng = random.Random(seed)
+    values = list(encoder_inputs(rng)) + double_inputs(rng)
+    failures = 0
+    for name, fast, ref in ENCODERS:
+        bad = [v for v in values if fast(v) != ref(v)]
+        status = "[OK]" if not bad else "[X]"
+        print(f"  {status} {name:<22} {len(values) - len(bad)}/{len(values)} values")
+        if bad:
+            print(f"      first mismatch: {bad[0]!r} -> {fast(bad[0]):#x} (ref {ref(bad[0]):#x})")
+        failures += len(bad)
+    assert failures == 0, f"{failures} encoder mismatches"
+
+
+def test_array_variants(seed=2024):
+    import numpy as np
+    rng = random.Random(seed)
+    values = [cv.bits_to_float32(rng.getrandbits(32)) for _ in range(50000)] + double_inputs(rng)
+    failures = 0
+
+    for scalar, array_fn in cv.ARRAY_CONVERTERS.items():
+        if scalar.__name__.startswith("float_to"):
+            inputs = values
+            expected = [scalar(v) for v in inputs]
+            got = array_fn(inputs).tolist()
+        else:
+            inputs = list(range(1 << 16)) + [rng.getrandbits(20) for _ in range(1000)]
+            expected = [bit_key(scalar(b)) for b in inputs]
+            got = [bit_key(v) for v in array_fn(np.array(inputs)).tolist()]
+        bad = sum(1 for e, g in zip(expected, got) if e != g)
+        status = "[OK]" if bad == 0 else "[X]"
+        print(f"  {status} {array_fn.__name__:<28} {len(inputs) - bad}/{len(inputs)} elements")
+        failures += bad
+    assert failures == 0, f"{failures} array mismatches"
+
+
+ARRAY_ENCODERS = [
+    (cv.float_to_bits16, cv.float_to_bits16_array),
+    (cv.float_to_bfloat16, cv.float_to_bfloat16_array),
+    (cv.float_to_bits8_e4m3, cv.float_to_bits8_e4m3_array),
+    (cv.float_to_bits8_e5m2, cv.float_to_bits8_e5m2_array),
+]
+
+
+def float16_neighbourhood(np):
+    """Mọi giá trị float16 (kể cả ±0, subnormal, ±Inf, NaN) và hai float32 liền kề mỗi giá trị
+    (các biên cắt cụt / làm tròn của mọi định dạng hẹp hơn nằm trong tập này)."""
+    bits32 = np.arange(1 << 16, dtype=np.uint16).view(np.float16).astype(np.float32).view(np.uint32)
+    return np.concatenate([bits32, bits32 + 1, bits32 - 1]).view(np.float32)
+
+
+def test_array_kernels(seed=2024):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    # Một float32 ngẫu nhiên trong mỗi nhóm bits32 >> 13 (gồm cả NaN có payload)
+    buckets = ((np.arange(1 << 19, dtype=np.uint32) << 13)
+               | rng.integers(0, 1 << 13, 1 << 19, dtype=np.uint32)).view(np.float32)
+    failures = 0
+    for name, values in (("float16 values", float16_neighbourhood(np)), ("float32 buckets", buckets)):
+        scalars = values.tolist()
+        for scalar, array_fn in ARRAY_ENCODERS:
+            expected = np.array([scalar(v) for v in scalars])
+            got = array_fn(values)
+            bad = int((got != expected).sum())
+            if array_fn(values[::-2]).tolist() != expected[::-2].tolist():   # view không liên tục
+                bad += 1
+            status = "[OK]" if bad == 0 else "[X]"
+            print(f"  {status} {array_fn.__name__:<28} {len(values) - bad}/{len(values)} {name}")
+            failures += bad
+        expected = [bit_key(cv.bits_to_float16(cv.float_to_bits16(v))) for v in scalars]
+        quantizer = cv.array_quantizer(cv.float_to_bits16, cv.bits_to_float16)
+        bad = sum(1 for e, g in zip(expected, quantizer(values).tolist()) if e != bit_key(g))
+        status = "[OK]" if bad == 0 else "[X]"
+        print(f"  {status} {'quantize_float16_array':<28} {len(values) - bad}/{len(values)} {name}")
+        failures += bad
+    assert failures == 0, f"{failures} array kernel mismatches"
+
+    tile = rng.standard_normal((64, 64)).astype(np.float32)
+    scalars = tile.ravel().tolist()
+    for scalar, array_fn in ARRAY_ENCODERS:
+        start = time.perf_counter()
+        for v in scalars:
+            scalar(v)
+        loop = time.perf_counter() - start
+        start = time.perf_counter()
+        array_fn(tile)
+        vector = time.perf_counter() - start
+        print(f"  [i] {scalar.__name__:<20} 64x64 tile: loop {loop * 1e3:6.2f} ms, "
+              f"array {vector * 1e3:5.2f} ms ({loop / vector:.0f}x)")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"CONVERTER LOOKUP-TABLE BIT-EXACTNESS TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        print("\n[1] Decoders (exhaustive)")
+        test_decoders_exhaustive()
+        print("\n[2] Encoders (every float32 bucket + doubles)")
+        test_encoders(seed)
+        print("\n[3] Array variants")
+        test_array_variants(seed)
+        print("\n[4] Array kernels on float32 (exhaustive float16, every float32 bucket)")
+        test_array_kernels(seed)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] All converters are bit-exact.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,7 +35,15 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(SCRIPT_DIR.parent))
 
 # Import binary printing utilities
-from iss.binary_print_utils import print_operands_binary
+try:
+    from iss.binary_print_utils import print_operands_binary
+except ImportError:  # Module in nhị phân không có trong repo: bỏ qua phần in, test vẫn chạy
+    def print_operands_binary(*args, **kwargs):
+        pass
+
+# Assembler + simulator chạy trong tiến trình; iss/*.txt và assembly.txt là file ảo trong bộ nhớ
+from iss.harness import SimHarness
+HARNESS = SimHarness(SCRIPT_DIR)
 
 # Test cases definition
 TEST_CASES = [
@@ -451,7 +459,7 @@ def setup_test_data():
     # --- Setup Config (Tile Size) ---
     print("\n[0] Setting up config.txt (Tile Configuration)...")
     config_file = iss_dir / "config.txt"
-    with open(config_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(config_file, 'w', encoding='utf-8') as f:
         f.write("--- Configuration CSRs ---\n")
         f.write("mtilem  : 0x00000004\n")  # M=4
         f.write("mtilen  : 0x00000004\n")  # N=4
@@ -476,7 +484,7 @@ def setup_test_data():
         "t3", "t4", "t5", "t6"
     ]
     
-    with open(gpr_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'w', encoding='utf-8') as f:
         f.write("--- General Purpose Registers (GPRs) ---\n")
         for i in range(32):
             val = gpr_values.get(i, 0)
@@ -495,7 +503,7 @@ def reset_matrix_registers(test_info):
     ms1_val = test_info['ms1_init']
     ms2_val = test_info['ms2_init']
     
-    with open(memory_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'w', encoding='utf-8') as f:
         f.write("--- Memory (Byte-Addressable) ---\n")
         # Matrix 1 at address 0 (4x4 matrix = 64 bytes for int32)
         for row in range(4):
@@ -538,7 +546,7 @@ def reset_matrix_registers(test_info):
     }
     
     # Write matrix file (only 4 tile registers: tr0-tr3)
-    with open(matrix_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(matrix_file, 'w', encoding='utf-8') as f:
         if test_info['is_float']:
             f.write("--- Tile Registers (tr0-tr3) (Floating-Point | 32-bit representation)---\n")
         else:
@@ -567,11 +575,11 @@ def reset_accumulator(test_info):
     else:
         acc_file = iss_dir / 'acc.txt'
     
-    if not acc_file.exists():
+    if not HARNESS.exists(acc_file):
         return
     
     # Read current file
-    with open(acc_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     # Build initial values for each accumulator
@@ -627,10 +635,8 @@ def reset_accumulator(test_info):
                 new_lines.append(line)
     
     # Write back
-    with open(acc_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(acc_file, 'w', encoding='utf-8') as f:
         f.writelines(new_lines)
-        f.flush()
-        os.fsync(f.fileno())
 
 
 def create_assembly_for_test(test_info):
@@ -670,58 +676,29 @@ msettileni 4
 {test_info['instr']}
 """
     
-    with open(assembly_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(assembly_file, 'w', encoding='utf-8') as f:
         f.write(assembly_code)
-        f.flush()
-        os.fsync(f.fileno())
-    
-    # Add small delay to ensure file is written
-    import time
-    time.sleep(0.01)
     
     return assembly_file
 
 
 def run_assembler():
-    """Run assembler to generate machine code"""
-    assembler_dir = SCRIPT_DIR.parent / "assembler"
-    
-    import subprocess
-    result = subprocess.run(
-        ['python', 'assembler.py'],
-        cwd=str(assembler_dir),
-        capture_output=True,
-        text=True
-    )
-    
-    return result.returncode == 0
+    """Run assembler to generate machine code (in-process)"""
+    return HARNESS.assemble_file("assembly.txt")
 
 
 def run_simulator(debug=False):
-    """Run simulator"""
-    tpu_dir = SCRIPT_DIR.parent
-    
-    import subprocess
-    env = os.environ.copy()
-    env['PYTHONIOENCODING'] = 'utf-8'
-    env['PYTHONLEGACYWINDOWSSTDIO'] = 'utf-8'  # Force UTF-8 on Windows
-    
-    result = subprocess.run(
-        ['python', '-m', 'iss.run_simulator'],
-        cwd=str(tpu_dir),
-        capture_output=True,
-        encoding='utf-8',
-        errors='replace',  # Replace invalid characters instead of failing
-        env=env
-    )
+    """Run simulator on the in-memory state files (in-process)"""
+    # debug: chạy với log đầy đủ (như run_simulator mặc định) và in ra
+    success = HARNESS.run_files(log_level="debug" if debug else None)
     
     # Debug: print full simulator output for debugging
-    if debug and result.stdout:
+    if debug and HARNESS.output:
         print("\n[SIMULATOR FULL OUTPUT]")
-        print(result.stdout)
+        print(HARNESS.output)
         print("[END SIMULATOR OUTPUT]\n")
     
-    return result.returncode == 0
+    return success
 
 
 def read_register_values(test_info):
@@ -741,10 +718,10 @@ def read_register_values(test_info):
         else:
             matrix_file = iss_dir / 'matrix.txt'
         
-        if not matrix_file.exists():
+        if not HARNESS.exists(matrix_file):
             return reg_values
         
-        with open(matrix_file, 'r', encoding='utf-8') as f:
+        with HARNESS.open(matrix_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
         # Parse all relevant matrix registers (md, ms1, ms2)
@@ -781,10 +758,10 @@ def read_register_values(test_info):
         else:
             acc_file = iss_dir / 'acc.txt'
         
-        if not acc_file.exists():
+        if not HARNESS.exists(acc_file):
             return reg_values
         
-        with open(acc_file, 'r', encoding='utf-8') as f:
+        with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
         # Parse all relevant accumulator registers (md, ms1, ms2)
@@ -832,10 +809,10 @@ def verify_elementwise_result(test_info):
         else:
             matrix_file = iss_dir / 'matrix.txt'
         
-        if not matrix_file.exists():
+        if not HARNESS.exists(matrix_file):
             return False, f"{matrix_file.name} not found"
         
-        with open(matrix_file, 'r', encoding='utf-8') as f:
+        with HARNESS.open(matrix_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
         # Parse matrix result
@@ -872,10 +849,10 @@ def verify_elementwise_result(test_info):
         else:
             acc_file = iss_dir / 'acc.txt'
         
-        if not acc_file.exists():
+        if not HARNESS.exists(acc_file):
             return False, f"{acc_file.name} not found"
         
-        with open(acc_file, 'r', encoding='utf-8') as f:
+        with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
         # Parse accumulator result
@@ -1012,8 +989,8 @@ def display_results(test_info):
         
         print(f"\n[Source Registers] From {matrix_file.name}:")
         
-        if matrix_file.exists():
-            with open(matrix_file, 'r', encoding='utf-8') as f:
+        if HARNESS.exists(matrix_file):
+            with HARNESS.open(matrix_file, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
                 # Show both source registers
                 show_regs = [
@@ -1042,8 +1019,8 @@ def display_results(test_info):
         
         print(f"\n[Destination Register: tr{test_info['md_reg']}] From {matrix_file.name}:")
         
-        if matrix_file.exists():
-            with open(matrix_file, 'r', encoding='utf-8') as f:
+        if HARNESS.exists(matrix_file):
+            with HARNESS.open(matrix_file, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
                 tr_reg = f"tr{test_info['md_reg']}"
                 in_target = False
@@ -1075,8 +1052,8 @@ def display_results(test_info):
         
         print(f"\n[Source Registers] From {acc_file.name}:")
         
-        if acc_file.exists():
-            with open(acc_file, 'r', encoding='utf-8') as f:
+        if HARNESS.exists(acc_file):
+            with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
                 # Show both source registers
                 show_regs = [
@@ -1106,8 +1083,8 @@ def display_results(test_info):
         
         print(f"\n[Destination Register: acc{test_info['md_reg']}] From {acc_file.name}:")
         
-        if acc_file.exists():
-            with open(acc_file, 'r', encoding='utf-8') as f:
+        if HARNESS.exists(acc_file):
+            with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
                 acc_reg = f"acc{test_info['md_reg']}"
                 in_target = False
@@ -1292,6 +1269,7 @@ def main():
         print(f"\n[SUMMARY]")
         print(f"  [OK] Passed: {passed_tests}/{total_tests}")
         print(f"  [X] Failed: {failed_tests}/{total_tests}")
+        HARNESS.save_files(SCRIPT_DIR)
         print("\nOutput files:")
         print(f"  - {SCRIPT_DIR / 'acc.txt'}")
         print(f"  - {SCRIPT_DIR / 'acc_float.txt'}")
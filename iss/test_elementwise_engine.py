@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Bit-exactness test for the element-wise engines (reference vs numpy).
+
+Runs every supported EW-Integer / EW-Float operation (matrix-matrix and .mv.i,
+fp16 and fp32, md aliasing ms1 / ms2, saturation on and off) on identical random
+register contents through MatrixAccelerator(elementwise_engine="reference") and
+MatrixAccelerator(elementwise_engine="numpy") and compares registers bit for bit
+(including -0.0, inf and NaN), the xmsat flag and the log output. Tiles larger than
+the registers must fail the same way (same partial writes, same exception).
+
+Usage:
+    python test_elementwise_engine.py               # 100 random trials per operation
+    python test_elementwise_engine.py --trials 500
+    python test_elementwise_engine.py --seed 1234
+"""
+
+import sys
+import time
+import random
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.decoder import DecodedInstruction
+from iss.logger import SILENT, DEBUG
+from iss.definitions import Geometry, DEFAULT_GEOMETRY
+from iss.logic_elementwise import EW_INT_OPS, EW_FLOAT_OPS
+from iss.testing import make_accelerator, random_float
+
+SPECIAL_INTS = [0, 1, -1, 31, 32, 2**31 - 1, -2**31, 2**30, -2**30 - 7, 0x7FFF, -0x8000]
+
+
+def ew_word(uop, func4, ctrl, md, ms1, ms2, size):
+    """Dựng lệnh EW (func3=001) trực tiếp từ các trường (ctrl 0-6 = .mv.i, 7 = matrix-matrix)."""
+    return ((func4 << 28) | (uop << 26) | (ctrl << 23) | (ms2 << 20) | (size << 18) | (ms1 << 15)
+            | (0b001 << 12) | (size << 10) | (md << 7) | 0b0101011)
+
+
+def random_int(rng):
+    r = rng.random()
+    if r < 0.15:
+        return rng.choice(SPECIAL_INTS)
+    if r < 0.5:
+        return rng.randint(-300, 300)
+    return rng.randint(-2**31, 2**31 - 1)
+
+
+def fill_registers(ma, rng):
+    for r in range(4):
+        for i in range(ma.rownum):
+            for j in range(ma.elements_per_row_tr):
+                ma.tr_int[r][i][j] = random_int(rng)
+                ma.acc_int[r][i][j] = random_int(rng)
+                ma.tr_float[r][i][j] = random_float(rng)
+                ma.acc_float[r][i][j] = random_float(rng)
+
+
+def copy_state(src, dst):
+    dst.regs.int_bank[:] = src.regs.int_bank
+    dst.regs.float_bank[:] = src.regs.float_bank
+    dst.csr_ref.csrs.update(src.csr_ref.csrs)
+
+
+def run_both(word, rng, M, N, saturate, log_level=SILENT):
+    """Chạy cùng lệnh trên hai engine từ cùng trạng thái -> (ref, vec, [kết quả ref, kết quả vec])."""
+    ref = make_accelerator(log_level, elementwise_engine="reference")
+    vec = make_accelerator(log_level, elementwise_engine="numpy")
+    fill_registers(ref, rng)
+    ref.csr_ref.write('mtilem', M)
+    ref.csr_ref.write('mtilen', N)
+    ref.csr_ref.write('xmsaten', 1 if saturate else 0)
+    ref.csr_ref.write('xmsat', 0)
+    copy_state(ref, vec)
+    instruction = DecodedInstruction(word)
+    outcome = []
+    for ma in (ref, vec):
+        handler = ma.resolve_element_wise(instruction)
+        try:
+            handler(instruction)
+            outcome.append(None)
+        except Exception as e:
+            outcome.append(type(e).__name__)
+    return ref, vec, outcome
+
+
+def same_state(ref, vec):
+    return (bytes(ref.regs.int_bank) == bytes(vec.regs.int_bank)
+            and bytes(ref.regs.float_bank) == bytes(vec.regs.float_bank)
+            and ref.csr_ref.read('xmsat') == vec.csr_ref.read('xmsat'))
+
+
+def random_case(rng, uop, func4, size):
+    ctrl = 0b111 if rng.random() < 0.5 else rng.randrange(7)
+    md, ms1, ms2 = rng.randrange(8), rng.randrange(8), rng.randrange(8)
+    r = rng.random()
+    if r < 0.2:
+        ms1 = md       # .mv.i với md == ms1: các hàng sau hàng vector đọc hàng đã bị ghi đè
+    elif r < 0.35:
+        ms2 = md
+    return ew_word(uop, func4, ctrl, md, ms1, ms2, size), f"ctrl={ctrl} md={md} ms1={ms1} ms2={ms2}"
+
+
+def test_bit_exact(rng, trials):
+    total_failures = 0
+    cases = [("EW-Int", 0b01, func4, 0b10) for func4 in sorted(EW_INT_OPS)]
+    cases += [(f"EW-Float.{'h' if size == 0b01 else 's'}", 0b10, func4, size)
+              for size in (0b01, 0b10) for func4 in sorted(EW_FLOAT_OPS)]
+    for name, uop, func4, size in cases:
+        failures = 0
+        for trial in range(trials):
+            word, desc = random_case(rng, uop, func4, size)
+            M, N = rng.randint(1, 4), rng.randint(1, 4)
+            saturate = rng.random() < 0.5
+            ref, vec, outcome = run_both(word, rng, M, N, saturate)
+            if outcome != [None, None] or not same_state(ref, vec):
+                failures += 1
+                if failures <= 3:
+                    print(f"    [X] {name} func4={func4:04b} trial {trial}: M={M} N={N} {desc} "
+                          f"sat={saturate} {outcome}")
+        status = "[OK]" if failures == 0 else "[X]"
+        print(f"  {status} {name:<11} func4={func4:04b} {trials - failures}/{trials} bit-exact")
+        total_failures += failures
+    assert total_failures == 0, f"{total_failures} mismatching trials"
+
+
+def test_saturation():
+    # acc0 = tr0 + imm3(1): INT32_MAX + 1 bão hòa và bật xmsat; không bão hòa thì wrap-around
+    instruction = DecodedInstruction(ew_word(0b01, 0b0000, 0b001, 4, 1, 0, 0b10))
+    for saturate, expected in ((True, 2**31 - 1), (False, -2**31)):
+        for engine in ("reference", "numpy"):
+            ma = make_accelerator(elementwise_engine=engine)
+            ma.tr_int[0][0][0] = 2**31 - 1
+            ma.csr_ref.write('mtilem', 4)
+            ma.csr_ref.write('mtilen', 4)
+            ma.csr_ref.write('xmsaten', 1 if saturate else 0)
+            ma.resolve_element_wise(instruction)(instruction)
+            assert ma.acc_int[0][0][0] == expected, (engine, ma.acc_int[0][0][0])
+            assert ma.csr_ref.read('xmsat') == (1 if saturate else 0), engine
+    print("  [OK] int32 saturation sets xmsat, wrap-around without xmsaten")
+
+
+def test_fallback_and_log(rng):
+    # Tile vượt thanh ghi: cả hai đi vòng lặp tham chiếu, cùng ghi một phần rồi ném IndexError
+    for uop, func4, size in ((0b01, 0b0000, 0b10), (0b10, 0b0010, 0b01)):
+        for M, N in ((5, 2), (2, 9), (0, 3), (3, 0)):
+            ref, vec, outcome = run_both(ew_word(uop, func4, 0b111, 5, 1, 2, size), rng, M, N, True)
+            assert outcome[0] == outcome[1] and same_state(ref, vec), (uop, M, N, outcome)
+    # Log (info + debug) giống hệt nhau
+    for uop, func4, size in ((0b01, 0b0010, 0b10), (0b10, 0b0011, 0b10)):
+        ref, vec, outcome = run_both(ew_word(uop, func4, 0b011, 6, 2, 3, size), rng, 4, 4, True, DEBUG)
+        lines = ref.log.stream.getvalue()
+        assert lines and lines == vec.log.stream.getvalue(), (lines, vec.log.stream.getvalue())
+    print("  [OK] out-of-range tiles fall back identically; log output unchanged")
+
+
+def benchmark(repeat=2000):
+    # Tile nhỏ (4x4 mặc định) bị chi phí cố định của numpy lấn át; tile lớn mới có lợi
+    for geometry in (DEFAULT_GEOMETRY, Geometry(tlen=8192, trlen=512)):
+        M, N = geometry.rownum, geometry.elements_per_row
+        for name, word in (("madd.w (int)", ew_word(0b01, 0b0000, 0b111, 4, 1, 2, 0b10)),
+                           ("mfmul.h (fp16)", ew_word(0b10, 0b0010, 0b111, 4, 1, 2, 0b01))):
+            instruction = DecodedInstruction(word)
+            times, states = [], []
+            for engine in ("reference", "numpy"):
+                ma = make_accelerator(geometry=geometry, elementwise_engine=engine)
+                fill_registers(ma, random.Random(1))
+                ma.csr_ref.write('mtilem', M)
+                ma.csr_ref.write('mtilen', N)
+                handler = ma.resolve_element_wise(instruction)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    handler(instruction)
+                times.append(time.perf_counter() - start)
+                states.append(ma)
+            assert same_state(*states), f"{name} {M}x{N}: engines diverged"
+            print(f"  [i] {name:<15} {M:>2}x{N:<2}: reference {times[0] / repeat * 1e6:7.1f} us, "
+                  f"numpy {times[1] / repeat * 1e6:6.1f} us per tile ({times[0] / times[1]:.1f}x)")
+
+
+def main():
+    trials, seed = 100, 2024
+    if '--trials' in sys.argv:
+        trials = int(sys.argv[sys.argv.index('--trials') + 1])
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    rng = random.Random(seed)
+
+    print("=" * 80)
+    print(f"ELEMENT-WISE ENGINE BIT-EXACTNESS TEST (reference vs numpy, trials={trials}, seed={seed})")
+    print("=" * 80)
+    try:
+        test_bit_exact(rng, trials)
+        test_saturation()
+        test_fallback_and_log(rng)
+        benchmark()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] All element-wise operations are bit-exact.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test for configurable matrix register geometry (definitions.Geometry).
+
+1. Derived sizes, validation and the read-only xtlenb / xtrlenb / xalenb CSRs
+2. 1024 / 2048 / 4096-bit tiles: full-tile load -> element-wise -> store round
+   trip, matmul with both engines, mzero / mmov
+3. Text state files and binary snapshots follow the simulator geometry;
+   the default geometry is unchanged (4 x 4 x 32-bit)
+
+Usage:
+    python test_geometry.py
+    python test_geometry.py --seed 1234
+"""
+
+import io
+import sys
+import random
+import struct
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.harness import SimHarness
+from iss.definitions import Geometry, DEFAULT_GEOMETRY, ROWNUM, ELEMENTS_PER_ROW_TR
+from iss.state_manager import StateFiles, save_state_to_files, load_state_from_files, save_snapshot, load_snapshot
+
+GEOMETRIES = [Geometry(tlen=1024), Geometry(tlen=2048), Geometry(tlen=4096),
+              Geometry(tlen=1024, trlen=256), Geometry(tlen=4096, trlen=256)]
+
+
+def make_harness(geometry, **kwargs):
+    h = SimHarness(geometry=geometry, **kwargs)
+    rows, cols = geometry.rownum, geometry.elements_per_row
+    h.set_gpr(1, 0x1000)
+    h.set_gpr(2, geometry.row_bytes)
+    h.set_gpr(3, 0x4000)
+    h.set_gpr(4, 0x2000)
+    h.set_gpr(5, rows)
+    h.set_gpr(6, cols)
+    return h, rows, cols
+
+
+def test_geometry_object():
+    assert DEFAULT_GEOMETRY == Geometry(512, 128, 32)
+    assert (DEFAULT_GEOMETRY.rownum, DEFAULT_GEOMETRY.elements_per_row) == (ROWNUM, ELEMENTS_PER_ROW_TR)
+    g = Geometry(tlen=4096, trlen=256)
+    assert (g.rownum, g.elements_per_row, g.reg_bytes, g.row_bytes) == (16, 8, 512, 32)
+    for bad in (dict(tlen=1000), dict(trlen=100), dict(elen=64), dict(tlen=0)):
+        try:
+            Geometry(**bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"Geometry({bad}) should be rejected")
+
+    default = Simulator(log_level="silent")
+    assert default.geometry is DEFAULT_GEOMETRY
+    assert [default.csr.read(n) for n in ("xtlenb", "xtrlenb", "xalenb")] == [64, 16, 64]
+    sim = Simulator(log_level="silent", geometry=g)
+    assert [sim.csr.read(n) for n in ("xtlenb", "xtrlenb", "xalenb")] == [512, 32, 512]
+    sim.csr.write("xtlenb", 1)
+    assert sim.csr.read("xtlenb") == 512
+    ma = sim.matrix_accelerator
+    assert len(ma.regs.int_bank) == 8 * 512 and ma.regs.view(5, "fp32").shape == (16, 8)
+    assert (ma.rownum, ma.elements_per_row_tr) == (16, 8)
+    print("  [OK] derived sizes, validation and length CSRs")
+
+
+def test_programs(rng):
+    for g in GEOMETRIES:
+        h, rows, cols = make_harness(g)
+        a = [rng.randint(-50, 50) for _ in range(rows * cols)]
+        b = [rng.randint(-50, 50) for _ in range(rows * cols)]
+        h.write_memory(0x1000, struct.pack(f"<{rows * cols}f", *a))
+        h.write_memory(0x2000, struct.pack(f"<{rows * cols}f", *b))
+        h.run("msettilem x5\nmsettilen x6\nmsettilek x6\nmlae32 tr0, (x1), x2\n"
+              "mlae32 tr1, (x4), x2\nmfadd.s acc0, tr1, tr0\nmfsub.s acc1, tr1, tr0\n"
+              "msae32 acc0, (x3), x2\nmmov.mm tr2, acc1\nmzero tr3\n")
+        expected = [y + x for x, y in zip(a, b)]
+        assert list(struct.unpack(f"<{rows * cols}f", h.read_memory(0x4000, 4 * rows * cols))) == expected, g
+        assert sum(h.matrix("tr2", "float"), []) == [y - x for x, y in zip(a, b)], g
+        assert h.matrix("tr3", "float") == [[0.0] * cols for _ in range(rows)], g
+
+        # Matrix-vector dùng hàng theo ctrl trên tile nhiều hàng
+        h.run("mfadd.s.mv.i acc2, tr1, tr0[3]\n")
+        row3 = a[3 * cols:4 * cols]
+        assert h.matrix("acc2", "float") == [[b[i * cols + j] + row3[j] for j in range(cols)]
+                                             for i in range(rows)], g
+
+        # Matmul (A·Bᵀ, B lưu N x K): M = rownum, N = K = min(rownum, số phần tử mỗi hàng);
+        # hai engine cho cùng kết quả
+        results = []
+        for engine in ("reference", "numpy"):
+            m, _, _ = make_harness(g, matmul_engine=engine)
+            m.set_matrix("tr0", [a[i * cols:(i + 1) * cols] for i in range(rows)], "float")
+            m.set_matrix("tr1", [b[i * cols:(i + 1) * cols] for i in range(rows)], "float")
+            m.set_gpr(6, min(rows, cols))
+            m.run("msettilem x5\nmsettilen x6\nmsettilek x6\nmfmacc.s acc0, tr0, tr1\n")
+            results.append(m.matrix("acc0", "float"))
+        assert results[0] == results[1], g
+        assert any(value != 0 for row in results[0] for value in row[:cols]), g
+    print(f"  [OK] load / element-wise / store / matmul / misc on {len(GEOMETRIES)} geometries")
+
+
+def test_state_files(rng):
+    g = Geometry(tlen=2048)
+    sim = Simulator(log_level="silent", geometry=g)
+    ma = sim.matrix_accelerator
+    for reg in range(8):
+        for row in range(g.rownum):
+            for col in range(g.elements_per_row):
+                ma.regs.int_regs[reg][row][col] = rng.randint(-1000, 1000)
+                ma.regs.float_regs[reg][row][col] = rng.randint(-1000, 1000) / 4
+    files = StateFiles()
+    copy = Simulator(log_level="silent", geometry=g)
+    with contextlib.redirect_stdout(io.StringIO()):
+        save_state_to_files(sim, files)
+        load_state_from_files(copy, files)
+    assert "Row 15:" in files["matrix.txt"] and "Row 16:" not in files["matrix.txt"]
+    assert copy.matrix_accelerator.regs.int_bank == ma.regs.int_bank
+    assert copy.matrix_accelerator.regs.float_bank == ma.regs.float_bank
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "state.snap"
+        save_snapshot(sim, path)
+        restored = Simulator(log_level="silent", geometry=g)
+        load_snapshot(restored, path)
+        assert restored.matrix_accelerator.regs.float_bank == ma.regs.float_bank
+        try:
+            load_snapshot(Simulator(log_level="silent"), path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("snapshot with a different geometry must be rejected")
+    print("  [OK] text state files and snapshots follow the geometry")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    rng = random.Random(seed)
+
+    print("=" * 80)
+    print(f"MATRIX GEOMETRY TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_geometry_object()
+        test_programs(rng)
+        test_state_files(rng)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Geometry is configurable per simulator.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
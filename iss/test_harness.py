@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test for the in-process test harness (iss/harness.py).
+
+1. Python API: assemble + run a load / matmul program and inspect registers
+2. Virtual state files: assemble_file() + run_files() give the same iss/*.txt
+   output as `python -m iss.run_simulator` on the same input (via save_state_to_files)
+
+Usage:
+    python test_harness.py
+"""
+
+import io
+import sys
+import struct
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.harness import SimHarness, STATE_FILE_NAMES
+from iss.iss import Simulator
+from iss.state_manager import StateFiles, load_state_from_files, save_state_to_files
+
+PROGRAM = """
+# A (fp32) tại 0x100, B tại 0x140, stride 16 byte
+msettilemi 4
+msettileki 4
+msettileni 4
+mlae32 tr0, (x1), x2
+mlae32 tr1, (x3), x2
+mfmacc.s acc0, tr0, tr1
+"""
+
+
+def test_python_api():
+    h = SimHarness()
+    a = [float(i) for i in range(16)]
+    b = [1.0 if i % 5 == 0 else 0.0 for i in range(16)]       # Ma trận đơn vị
+    h.write_memory(0x100, struct.pack('<16f', *a))
+    h.write_memory(0x140, struct.pack('<16f', *b))
+    h.set_gpr(1, 0x100)
+    h.set_gpr(2, 16)
+    h.set_gpr(3, 0x140)
+    h.set_matrix("acc0", [[0.5] * 4] * 4, "float")
+    h.run(PROGRAM)
+
+    assert h.matrix("tr0", "float") == [a[r * 4:r * 4 + 4] for r in range(4)]
+    assert h.matrix("acc0", "float") == [[v + 0.5 for v in a[r * 4:r * 4 + 4]] for r in range(4)]
+    assert h.csr("mtilem") == 4
+    assert len(h.program) == 6
+    try:
+        h.assemble("mfmacc.s acc0, tr0\nbogus x1")
+        raise AssertionError("invalid assembly not rejected")
+    except ValueError:
+        pass
+    print("  [OK] assemble / run / inspect through the Python API")
+
+
+def test_virtual_state_files():
+    h = SimHarness(SCRIPT_DIR)
+    with h.open(SCRIPT_DIR.parent / "assembler" / "assembly.txt", 'w', encoding='utf-8') as f:
+        f.write(PROGRAM)
+    assert h.assemble_file() and h.run_files(), h.output
+    assert "Saving final state" in h.output
+
+    # Tham chiếu: cùng trạng thái đầu vào, chạy như run_simulator rồi lưu text
+    expected = StateFiles()
+    sim = Simulator(log_level="silent")
+    with contextlib.redirect_stdout(io.StringIO()):
+        load_state_from_files(sim, StateFiles.from_dir(SCRIPT_DIR, STATE_FILE_NAMES))
+        sim.load_program(h.program)
+        sim.run()
+        save_state_to_files(sim, expected)
+    for name in STATE_FILE_NAMES:
+        assert h.files[name] == expected[name], f"{name} differs"
+
+    assert h.open("assembly.txt").read().strip()
+    assert not h.exists("missing.txt")
+    with h.open("assembly.txt", 'w') as f:
+        f.write("not_an_instruction tr0\n")
+    assert not h.assemble_file()
+    print("  [OK] assemble_file / run_files on in-memory state files")
+
+
+def main():
+    print("=" * 80)
+    print("IN-PROCESS TEST HARNESS TEST")
+    print("=" * 80)
+    try:
+        test_python_api()
+        test_virtual_state_files()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Harness runs programs in process.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
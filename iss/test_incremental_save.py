@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Test for dirty-tracked, incremental state saving.
+
+1. Simulator.changes_since(checkpoint) reports exactly the GPRs, CSRs, tile /
+   accumulator registers (int and float bank, dest-bit changes) and memory pages
+   that differ; writing back the same value is not a change
+2. save_state_to_files(since=checkpoint) rewrites only the files that changed
+   (plus missing ones); the files load to the same state as a full save
+3. save_snapshot(since=checkpoint) writes a delta snapshot; base snapshot + delta
+   reproduce the final state bit for bit (including pages cleared back to zero)
+4. Timing of a full vs incremental save after a run that touches one accumulator
+   (informational)
+
+Usage:
+    python test_incremental_save.py
+    python test_incremental_save.py --seed 1234
+"""
+
+import io
+import sys
+import time
+import random
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.state_manager import (StateFiles, save_state_to_files, load_state_from_files,
+                               save_snapshot, load_snapshot)
+from iss.testing import random_simulator, state_of
+
+
+def quiet(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def mutate(sim, rng):
+    """Đổi ngẫu nhiên một phần trạng thái -> tập thay đổi mong đợi (gpr, csrs, int, float, pages)."""
+    ma = sim.matrix_accelerator
+    gpr, csrs, int_regs, float_regs, pages = set(), set(), set(), set(), set()
+    for r in rng.sample(range(1, 32), rng.randint(0, 3)):
+        sim.gpr.write(r, sim.gpr.read(r) ^ (1 << rng.randrange(32)))
+        gpr.add(r)
+    sim.gpr.write(5, sim.gpr.read(5))                       # Ghi lại cùng giá trị: không đổi
+    if rng.random() < 0.5:
+        sim.csr.write("mtilen", sim.csr.read("mtilen") % 4 + 1)
+        csrs.add("mtilen")
+    for bank, regs, changed in ((ma.regs.int_regs, "i", int_regs), (ma.regs.float_regs, "f", float_regs)):
+        for r in rng.sample(range(8), rng.randint(0, 2)):
+            row = bank[r][rng.randrange(ma.rownum)]
+            row[0] = row[0] + 1 if regs == "i" else row[0] + 0.5
+            changed.add(r)
+    if rng.random() < 0.3:
+        ma.acc_dest_bits_int[1] = 8 if ma.acc_dest_bits_int[1] != 8 else 16
+        int_regs.add(5)
+    for _ in range(rng.randint(0, 3)):
+        address = rng.randrange(0, len(sim.memory) - 8)
+        old = sim.memory.read(address, 8)
+        sim.memory.write(address, bytes(b ^ 0xFF for b in old))
+        pages.add(address >> sim.memory.page_shift)
+        if (address + 7) >> sim.memory.page_shift != address >> sim.memory.page_shift:
+            pages.add((address + 7) >> sim.memory.page_shift)
+    # Ghi lại đúng nội dung cũ (trang bị sao chép nhưng không đổi)
+    address = rng.randrange(0, len(sim.memory) - 16)
+    sim.memory.write(address, sim.memory.read(address, 16))
+    return sorted(gpr), csrs, sorted(int_regs), sorted(float_regs), sorted(pages)
+
+
+def test_changes(rng, trials=200):
+    for trial in range(trials):
+        sim = random_simulator(rng, text_safe=True) if trial % 20 == 0 else sim
+        checkpoint = sim.checkpoint()
+        assert not sim.changes_since(checkpoint)
+        expected = mutate(sim, rng)
+        changes = sim.changes_since(checkpoint)
+        got = (changes.gpr, changes.csrs, changes.int_regs, changes.float_regs, changes.pages)
+        assert got == expected, f"trial {trial}: {got} != {expected}"
+
+    # Trang bị xóa về 0 vẫn là thay đổi; restore() -> không còn gì khác
+    sim = random_simulator(rng, text_safe=True)
+    checkpoint = sim.checkpoint()
+    index = next(iter(sim.memory.pages))
+    sim.memory.write(index * sim.memory.page_size, bytes(sim.memory.page_size))
+    assert sim.changes_since(checkpoint).pages == [index]
+    sim.restore(checkpoint)
+    assert not sim.changes_since(checkpoint)
+    print(f"  [OK] changes_since matches {trials} random mutations exactly")
+
+
+def test_incremental_text(rng, trials=40):
+    for trial in range(trials):
+        sim = random_simulator(rng, text_safe=True)
+        files = StateFiles()
+        quiet(save_state_to_files, sim, files)
+        quiet(load_state_from_files, sim, files)   # Trạng thái trong RAM = nội dung các file
+        checkpoint = sim.checkpoint()
+        gpr, csrs, int_regs, float_regs, pages = mutate(sim, rng)
+        del files["status.txt"]                    # File thiếu luôn được ghi
+
+        full = StateFiles()
+        quiet(save_state_to_files, sim, full)
+        written = quiet(save_state_to_files, sim, files, since=checkpoint)
+        expected = {"status.txt"}
+        expected |= {"gpr.txt"} if gpr else set()
+        expected |= {"config.txt"} if csrs else set()
+        expected |= {"matrix.txt"} if any(r < 4 for r in int_regs) else set()
+        expected |= {"acc.txt"} if any(r >= 4 for r in int_regs) else set()
+        expected |= {"matrix_float.txt"} if any(r < 4 for r in float_regs) else set()
+        expected |= {"acc_float.txt"} if any(r >= 4 for r in float_regs) else set()
+        expected |= {"memory.txt"} if any(p * sim.memory.page_size < 0x800 for p in pages) else set()
+        assert set(written) == expected, f"trial {trial}: wrote {written}, expected {sorted(expected)}"
+        for name in written:
+            assert files[name] == full[name], f"trial {trial}: {name} differs from a full save"
+        # File giữ nguyên có thể khác text của bản lưu đầy đủ (cặp bit in kèm giá trị float đã làm
+        # tròn), nhưng nạp lại phải ra cùng trạng thái
+        incremental_sim, full_sim = Simulator(log_level="silent"), Simulator(log_level="silent")
+        quiet(load_state_from_files, incremental_sim, files)
+        quiet(load_state_from_files, full_sim, full)
+        assert state_of(incremental_sim) == state_of(full_sim), f"trial {trial}: files load differently"
+    print(f"  [OK] incremental text save writes only changed files ({trials} trials)")
+
+
+def test_delta_snapshot(rng, tmp, trials=30):
+    base_path, delta_path, full_path = tmp / "base.snap", tmp / "run.delta", tmp / "full.snap"
+    for trial in range(trials):
+        sim = random_simulator(rng, text_safe=True)
+        save_snapshot(sim, base_path)
+        checkpoint = sim.checkpoint()
+        mutate(sim, rng)
+        if trial % 3 == 0:
+            index = next(iter(sim.memory.pages))
+            sim.memory.write(index * sim.memory.page_size, bytes(sim.memory.page_size))
+        sim.pc = rng.randrange(1 << 10) * 4
+        save_snapshot(sim, delta_path, since=checkpoint)
+        save_snapshot(sim, full_path)
+
+        restored = Simulator(log_level="silent")
+        load_snapshot(restored, base_path)
+        load_snapshot(restored, delta_path)
+        assert state_of(restored) == state_of(sim), f"trial {trial}: base + delta != final state"
+        assert delta_path.stat().st_size < full_path.stat().st_size
+
+    # Delta của geometry / RAM khác bị từ chối
+    small = Simulator(log_level="silent", memory_size=64 * 1024)
+    try:
+        load_snapshot(small, delta_path)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("delta for a different memory size must be rejected")
+    print(f"  [OK] base snapshot + delta reproduce the final state ({trials} trials)")
+
+
+def benchmark(rng, tmp, repeat=20):
+    sim = random_simulator(rng, text_safe=True)
+    for address in range(0, 0x800, 16):
+        sim.memory.write(address, bytes(rng.getrandbits(8) for _ in range(16)))
+    quiet(save_state_to_files, sim, tmp)
+    checkpoint = sim.checkpoint()
+    sim.matrix_accelerator.acc_float[0][0][0] = 42.0        # Chương trình chỉ chạm acc0
+    times = []
+    for since in (None, checkpoint):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            written = quiet(save_state_to_files, sim, tmp, since=since)
+        times.append((time.perf_counter() - start) / repeat)
+    delta = tmp / "acc0.delta"
+    save_snapshot(sim, delta, since=checkpoint)
+    print(f"  [i] save after touching acc0: full {times[0] * 1e3:.2f} ms, incremental {times[1] * 1e3:.2f} ms "
+          f"({', '.join(written)}; {times[0] / times[1]:.1f}x), delta snapshot {delta.stat().st_size} bytes")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    rng = random.Random(seed)
+
+    print("=" * 80)
+    print(f"INCREMENTAL STATE SAVING TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            test_changes(rng)
+            test_incremental_text(rng)
+            test_delta_snapshot(rng, tmp)
+            benchmark(rng, tmp)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Only changed state is saved.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
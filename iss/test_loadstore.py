@@ -29,7 +29,15 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(SCRIPT_DIR.parent))
 
 # Import binary printing utilities
-from iss.binary_print_utils import print_instruction_binary, print_register_binary_512bit
+try:
+    from iss.binary_print_utils import print_instruction_binary
+except ImportError:  # Module in nhị phân không có trong repo: bỏ qua phần in, test vẫn chạy
+    def print_instruction_binary(*args, **kwargs):
+        pass
+
+# Assembler + simulator chạy trong tiến trình; iss/*.txt và assembly.txt là file ảo trong bộ nhớ
+from iss.harness import SimHarness
+HARNESS = SimHarness(SCRIPT_DIR)
 
 # Test cases definition
 TEST_CASES = [
@@ -304,7 +312,7 @@ def setup_test_data():
     print("\n[1] Setting up memory.txt...")
     memory_file = iss_dir / "memory.txt"
     
-    with open(memory_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'r', encoding='utf-8') as f:
         memory_lines = f.readlines()
     
     test_data = generate_random_test_data()
@@ -328,7 +336,7 @@ def setup_test_data():
         else:
             new_memory_lines.append(line)
     
-    with open(memory_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'w', encoding='utf-8') as f:
         f.writelines(new_memory_lines)
     
     print(f"    [OK] Memory updated with random test data")
@@ -353,7 +361,7 @@ def setup_test_data():
         "t3", "t4", "t5", "t6"
     ]
     
-    with open(gpr_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'w', encoding='utf-8') as f:
         f.write("--- General Purpose Registers (GPRs) ---\n")
         for i in range(32):
             val = gpr_values.get(i, 0)
@@ -389,46 +397,20 @@ msettileni 4
 {instruction_body}
 """
     
-    with open(assembly_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(assembly_file, 'w', encoding='utf-8') as f:
         f.write(assembly_code)
     
     return assembly_file
 
 
 def run_assembler():
-    """Run assembler to generate machine code"""
-    assembler_dir = SCRIPT_DIR.parent / "assembler"
-    
-    import subprocess
-    result = subprocess.run(
-        ['python', 'assembler.py'],
-        cwd=str(assembler_dir),
-        capture_output=True,
-        text=True
-    )
-    
-    return result.returncode == 0
+    """Run assembler to generate machine code (in-process)"""
+    return HARNESS.assemble_file("assembly.txt")
 
 
 def run_simulator():
-    """Run simulator"""
-    tpu_dir = SCRIPT_DIR.parent
-    
-    import subprocess
-    env = os.environ.copy()
-    env['PYTHONIOENCODING'] = 'utf-8'
-    
-    result = subprocess.run(
-        ['python', '-m', 'iss.run_simulator'],
-        cwd=str(tpu_dir),
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace',
-        env=env
-    )
-    
-    return result.returncode == 0
+    """Run simulator on the in-memory state files (in-process)"""
+    return HARNESS.run_files()
 
 
 def verify_test(test_info):
@@ -436,10 +418,10 @@ def verify_test(test_info):
     iss_dir = SCRIPT_DIR
     memory_file = iss_dir / "memory.txt"
     
-    if not memory_file.exists():
+    if not HARNESS.exists(memory_file):
         return False, "memory.txt not found"
     
-    with open(memory_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     # Parse memory to get input and output data
@@ -643,8 +625,8 @@ def display_register_state(test_info, success):
         hex_to_uint = hex_to_uint32
 
     print(f"\n  [Memory Source Data] (Address: 0x{input_addr:03X}):")
-    if memory_file.exists():
-        with open(memory_file, 'r', encoding='utf-8') as f:
+    if HARNESS.exists(memory_file):
+        with HARNESS.open(memory_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         memory_data = {}
         for line in lines:
@@ -703,12 +685,12 @@ def display_register_state(test_info, success):
 
     print(f"\n  [Register Content After LOAD] (Target: {reg_name_to_find}, File: {file_name}):")
     
-    if not file_path.exists():
+    if not HARNESS.exists(file_path):
         print("  ✗ FAIL - Register state file not found!")
         print("-"*80)
         return False
 
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with HARNESS.open(file_path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
         in_reg_block = False
         found = False
@@ -788,8 +770,8 @@ def display_and_verify_memory(test_info, success):
     file_path = iss_dir / file_name
     
     print(f"\n  [Expected Data from Register] (Source: {reg_name_to_find}, File: {file_name}):")
-    if file_path.exists():
-        with open(file_path, 'r', encoding='utf-8') as f:
+    if HARNESS.exists(file_path):
+        with HARNESS.open(file_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
             in_reg_block = False
             for line in lines:
@@ -825,12 +807,12 @@ def display_and_verify_memory(test_info, success):
     # --- 2. Display Memory Output ---
     memory_file = iss_dir / "memory.txt"
     
-    if not memory_file.exists():
+    if not HARNESS.exists(memory_file):
         print("  ✗ FAIL - memory.txt not found!")
         print("-"*80)
         return False
 
-    with open(memory_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     memory_data = {}
@@ -1006,6 +988,7 @@ def main():
         print(f"\n[SUMMARY]")
         print(f"  ✓ Passed: {passed_tests}/{total_tests}")
         print(f"  ✗ Failed: {failed_tests}/{total_tests}")
+        HARNESS.save_files(SCRIPT_DIR)
         
         if not auto_mode:
             print("\nOutput files:")
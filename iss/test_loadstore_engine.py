@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Bit-exactness test for the load/store engines (reference vs numpy / struct).
+
+Runs random tile loads and stores (all 5 layouts x int8/fp16/fp32) through
+MatrixAccelerator(loadstore_engine="reference"), loadstore_engine="numpy" and
+loadstore_engine="struct" on identical state, including out-of-range tiles,
+overlapping strides and special float bit patterns, and compares registers,
+memory, exceptions and log output byte for byte. Also times one tile load/store
+per engine (informational). A large-stride tile (one row per 256 MB of a 4 GB
+RAM) must only touch the pages holding its rows.
+
+Usage:
+    python test_loadstore_engine.py               # 300 random trials per layout
+    python test_loadstore_engine.py --trials 1000
+    python test_loadstore_engine.py --seed 1234
+"""
+
+import sys
+import time
+import random
+import struct
+from array import array
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.components import MainMemory
+from iss.decoder import DecodedInstruction
+from iss.logger import DEBUG
+from iss.testing import make_accelerator
+from iss.logic_loadstore import LOADSTORE_LAYOUTS
+
+MEMORY_BYTES = 1024
+FAST_ENGINES = ("numpy", "struct")
+OPCODE = 0b0101011
+
+# Bit pattern đặc biệt (sNaN, qNaN, inf, -0, subnormal) cho fp16/fp32
+SPECIAL_F32 = [0x7F800001, 0x7FC00000, 0xFF800000, 0x80000000, 0x00000001, 0x7F7FFFFF]
+SPECIAL_F16 = [0x7C01, 0x7E00, 0xFC00, 0x8000, 0x0001, 0x7BFF]
+
+
+def encode(func4, is_load, d_size, md, rs1, rs2):
+    return ((func4 << 28) | (0b01 << 26) | ((0 if is_load else 1) << 25) | (rs2 << 20) |
+            (rs1 << 15) | (d_size << 10) | (md << 7) | OPCODE)
+
+
+def fill_state(ma, rng):
+    mem = ma.memory
+    mem.write(0, bytes(rng.getrandbits(8) for _ in range(len(mem))))
+    for _ in range(40):
+        addr = rng.randrange(0, len(mem) - 4)
+        if rng.random() < 0.5:
+            mem.write(addr, struct.pack('<I', rng.choice(SPECIAL_F32)))
+        else:
+            mem.write(addr, struct.pack('<H', rng.choice(SPECIAL_F16)))
+    for r in range(8):
+        for i in range(4):
+            for j in range(4):
+                # Phần lớn nằm trong dải int8, một số ngoài dải (store int8 phải báo lỗi như cũ)
+                ma.regs.int_regs[r][i][j] = rng.randint(-128, 127) if rng.random() < 0.97 else rng.randint(-2**31, 2**31 - 1)
+                ma.regs.float_regs[r][i][j] = struct.unpack('<f', struct.pack('<I', rng.getrandbits(32)))[0]
+
+
+def copy_state(src, dst):
+    dst.memory.write(0, src.memory.tobytes())
+    dst.regs.int_bank[:] = src.regs.int_bank
+    dst.regs.float_bank[:] = src.regs.float_bank
+    dst.gpr_ref.registers[:] = src.gpr_ref.registers
+    dst.csr_ref.csrs.update(src.csr_ref.csrs)
+
+
+def snapshot(ma):
+    return (ma.memory.tobytes(), bytes(ma.regs.int_bank), bytes(ma.regs.float_bank), ma.log.stream.getvalue())
+
+
+def run_layout(func4, trials, rng):
+    failures = dict.fromkeys(FAST_ENGINES, 0)
+    for trial in range(trials):
+        is_load = rng.random() < 0.5
+        d_size = rng.choice([0b00, 0b01, 0b10])
+        md = rng.randrange(8)
+        num_bytes = {0b00: 1, 0b01: 2, 0b10: 4}[d_size]
+
+        ref = make_accelerator(DEBUG, MEMORY_BYTES, loadstore_engine="reference")
+        fast = [make_accelerator(DEBUG, MEMORY_BYTES, loadstore_engine=engine) for engine in FAST_ENGINES]
+        fill_state(ref, rng)
+        # Base: thường hợp lệ, đôi khi lệch hàng / sát cuối RAM; stride: đôi khi chồng lấn hoặc 0
+        base = rng.choice([rng.randrange(0, 512), rng.randrange(MEMORY_BYTES - 64, MEMORY_BYTES)])
+        stride = rng.choice([4 * num_bytes, 16, 32, rng.randrange(0, 3 * num_bytes + 1), rng.randrange(0, 80)])
+        ref.gpr_ref.write(5, base)
+        ref.gpr_ref.write(6, stride)
+        for csr in ('mtilem', 'mtilen', 'mtilek'):
+            ref.csr_ref.write(csr, rng.choice([1, 2, 3, 4, 4, 4, 0, 5]))
+        for ma in fast:
+            copy_state(ref, ma)
+        instruction = DecodedInstruction(encode(func4, is_load, d_size, md, 5, 6))
+
+        outcome = []
+        for ma in [ref] + fast:
+            try:
+                ma.execute_load_store(instruction)
+                outcome.append(None)
+            except Exception as e:
+                outcome.append(type(e).__name__)
+
+        expected = snapshot(ref)
+        for engine, ma, result in zip(FAST_ENGINES, fast, outcome[1:]):
+            if result != outcome[0] or snapshot(ma) != expected:
+                failures[engine] += 1
+                if failures[engine] <= 3:
+                    print(f"    [X] {engine} trial {trial}: {'load' if is_load else 'store'} d_size={d_size:02b} "
+                          f"md={md} base=0x{base:X} stride={stride} -> {outcome[0]} / {result}")
+    return failures
+
+
+def test_loadstore_engines_bit_exact(trials=300, seed=2024):
+    rng = random.Random(seed)
+    total_failures = 0
+    for func4, layout in LOADSTORE_LAYOUTS.items():
+        failures = run_layout(func4, trials, rng)
+        name = f"ml{layout[0]}{layout[1]} / ms{layout[0]}{layout[1]}"
+        for engine, count in failures.items():
+            status = "[OK]" if count == 0 else "[X]"
+            print(f"  {status} {name:<18} {engine:<7} {trials - count}/{trials} bit-exact")
+            total_failures += count
+    assert total_failures == 0, f"{total_failures} mismatching trials"
+
+
+def test_large_stride(engines=("reference",) + FAST_ENGINES):
+    # 4x4 fp32, stride 1 << 28 trên RAM 4 GB: mỗi dòng một trang, không được chạm RAM giữa các dòng
+    stride, base, page = 1 << 28, 0x1000, MainMemory.PAGE_SIZE
+    for func4, label in ((0b0000, "msae32"), (0b0100, "msate32")):
+        states = []
+        for engine in engines:
+            ma = make_accelerator(memory_bytes=1 << 32, loadstore_engine=engine)
+            ma.gpr_ref.write(5, base)
+            ma.gpr_ref.write(6, stride)
+            for csr in ('mtilem', 'mtilek'):
+                ma.csr_ref.write(csr, 4)
+            for i in range(4):
+                ma.regs.float_regs[1][i][:] = array('f', (i * 4 + j + 0.5 for j in range(4)))
+            untouched = base + stride // 2
+            ma.memory.write(untouched, b"\x01")
+            parent = ma.memory.fork()                    # Như checkpoint(): mọi trang dùng chung
+
+            start = time.perf_counter()
+            ma.execute_load_store(DecodedInstruction(encode(func4, False, 0b10, 1, 5, 6)))
+            elapsed = time.perf_counter() - start
+            touched = ma.memory.changed_pages(parent)
+            assert len(touched) == 4, f"{label} {engine}: store touched pages {touched}"
+            assert ma.memory.allocated_bytes() == 5 * page, \
+                f"{label} {engine}: {ma.memory.allocated_bytes()} bytes allocated"
+            assert untouched // page in ma.memory.shared, f"{label} {engine}: copy-on-write page copied"
+
+            # Load lại vào tr2: không cấp phát thêm trang nào
+            ma.execute_load_store(DecodedInstruction(encode(func4, True, 0b10, 2, 5, 6)))
+            assert ma.memory.allocated_bytes() == 5 * page, f"{label} {engine}: load allocated pages"
+            assert bytes(ma.regs.float_bank[2 * 64:3 * 64]) == bytes(ma.regs.float_bank[64:128])
+            states.append([bytes(ma.memory.read(base + k * stride, 16)) for k in range(4)])
+            assert elapsed < 0.05, f"{label} {engine}: store took {elapsed * 1e3:.1f} ms"
+        assert all(state == states[0] for state in states), f"{label}: engines wrote different bytes"
+    print(f"  [OK] large-stride store/load touches only the tile's rows ({', '.join(engines)})")
+
+
+def benchmark(repeat=3000):
+    rng = random.Random(1)
+    for d_size, label in ((0b00, "int8"), (0b01, "fp16"), (0b10, "fp32")):
+        for is_load in (True, False):
+            instruction = DecodedInstruction(encode(0b0010, is_load, d_size, 4, 5, 6))
+            times = []
+            for engine in ("reference",) + FAST_ENGINES:
+                ma = make_accelerator(memory_bytes=MEMORY_BYTES, loadstore_engine=engine)
+                fill_state(ma, rng)
+                for reg in ma.regs.int_regs:
+                    for row in reg:
+                        row[:] = array('i', (v & 0x7F for v in row))
+                ma.gpr_ref.write(5, 0x40)
+                ma.gpr_ref.write(6, 64)
+                for csr in ('mtilem', 'mtilen'):
+                    ma.csr_ref.write(csr, 4)
+                handler = ma.resolve_load_store(instruction)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    handler(instruction)
+                times.append((time.perf_counter() - start) / repeat * 1e6)
+            name = f"{'load' if is_load else 'store'} {label}"
+            print(f"  [i] {name:<11} 4x4: " + ", ".join(
+                f"{engine} {t:5.1f} us" for engine, t in zip(("reference",) + FAST_ENGINES, times)))
+
+
+def main():
+    trials, seed = 300, 2024
+    if '--trials' in sys.argv:
+        trials = int(sys.argv[sys.argv.index('--trials') + 1])
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"LOAD/STORE ENGINE BIT-EXACTNESS TEST (reference vs numpy / struct, trials={trials}, seed={seed})")
+    print("=" * 80)
+    try:
+        test_loadstore_engines_bit_exact(trials, seed)
+        test_large_stride()
+        benchmark()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] All load/store layouts are bit-exact.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
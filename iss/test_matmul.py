@@ -27,7 +27,6 @@ import os
 from pathlib import Path
 import struct
 import random
-import numpy as np
 import math
 
 # Add parent directory to sys.path
@@ -38,10 +37,19 @@ sys.path.insert(0, str(SCRIPT_DIR.parent))
 from iss.converters import float_to_bits8_e5m2, float_to_bits8_e4m3, bits_to_float8_e5m2, bits_to_float8_e4m3, float_to_bits16, bits_to_float16, float_to_bfloat16, bfloat16_to_float
 
 # Import binary printing utilities
-from iss.binary_print_utils import print_operands_binary
-
-def generate_random_test_matrices():
-    rng = np.random.default_rng()
+try:
+    from iss.binary_print_utils import print_operands_binary
+except ImportError:  # Module in nhị phân không có trong repo: bỏ qua phần in, test vẫn chạy
+    def print_operands_binary(*args, **kwargs):
+        pass
+
+# Assembler + simulator chạy trong tiến trình; iss/*.txt và assembly.txt là file ảo trong bộ nhớ
+from iss.harness import SimHarness
+HARNESS = SimHarness(SCRIPT_DIR)
+
+def generate_random_test_matrices(seed=None):
+    import numpy as np   # Chỉ chế độ --random / kiểm tra kết quả cần numpy
+    rng = np.random.default_rng(seed)
     # Float32
     f32_a = rng.uniform(-10, 10, 16).astype(np.float32).tolist()  # tr4
     f32_b = rng.uniform(-10, 10, 16).astype(np.float32).tolist()  # tr5
@@ -346,7 +354,7 @@ def setup_test_data(random_mode=False, random_matrices=None):
     print("\n[1] Setting up memory.txt for matrix loading...")
     memory_file = iss_dir / "memory.txt"
     
-    with open(memory_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'r', encoding='utf-8') as f:
         memory_lines = f.readlines()
     
     test_data = {}
@@ -432,10 +440,8 @@ def setup_test_data(random_mode=False, random_matrices=None):
     for addr in sorted(memory_dict.keys()):
         new_memory_lines.append(f"0x{addr:03X}: {memory_dict[addr]}\n")
     
-    with open(memory_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'w', encoding='utf-8') as f:
         f.writelines(new_memory_lines)
-        f.flush()
-        os.fsync(f.fileno())
     
     print(f"    [OK] Memory rebuilt with {len(memory_dict)} lines")
     
@@ -477,7 +483,7 @@ def setup_test_data(random_mode=False, random_matrices=None):
         "t3", "t4", "t5", "t6"
     ]
     
-    with open(gpr_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'w', encoding='utf-8') as f:
         f.write("--- General Purpose Registers (GPRs) ---\n")
         for i in range(32):
             val = gpr_values.get(i, 0)
@@ -491,7 +497,7 @@ def setup_test_data(random_mode=False, random_matrices=None):
     
     # Float accumulators
     acc_float_file = iss_dir / "acc_float.txt"
-    with open(acc_float_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(acc_float_file, 'w', encoding='utf-8') as f:
         f.write("--- Accumulator Registers (acc0-acc3) (Float Only) ---\n\n")
         
         # acc0: Float32, initialize with 10.0
@@ -530,7 +536,7 @@ def setup_test_data(random_mode=False, random_matrices=None):
     
     # Int accumulators
     acc_file = iss_dir / "acc.txt"
-    with open(acc_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(acc_file, 'w', encoding='utf-8') as f:
         f.write("--- Accumulator Registers (acc0-acc3) (Integer Only) ---\n\n")
         
         # acc0: INT32 (for mmaccus.w.b), initialize with 100
@@ -583,7 +589,7 @@ def update_memory_for_test(test_info, random_mode=False, random_matrices=None):
     test_name = test_info['name']
 
     # Read current memory
-    with open(memory_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'r', encoding='utf-8') as f:
         memory_lines = f.readlines()
     
     # Determine addresses and data based on data type
@@ -706,10 +712,8 @@ def update_memory_for_test(test_info, random_mode=False, random_matrices=None):
         new_memory_lines.append(f"0x{addr:03X}: {data}\n")
     
     # Write back to memory file
-    with open(memory_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(memory_file, 'w', encoding='utf-8') as f:
         f.writelines(new_memory_lines)
-        f.flush()  # Force write to disk
-        os.fsync(f.fileno())  # Ensure OS writes to disk
 
 
 def reset_accumulator(test_info):
@@ -758,21 +762,17 @@ def reset_accumulator(test_info):
 
     # Rewrite the float accumulator file completely
     acc_float_file = iss_dir / 'acc_float.txt'
-    with open(acc_float_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(acc_float_file, 'w', encoding='utf-8') as f:
         f.write("--- Accumulator Registers (acc0-acc3) (Float Only) ---\n\n")
         for acc_num, initial_val in acc_initial_states_float.items():
             write_float_acc_block(f, acc_num, initial_val)
-        f.flush()
-        os.fsync(f.fileno())
     
     # Rewrite the integer accumulator file completely
     acc_file = iss_dir / 'acc.txt'
-    with open(acc_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(acc_file, 'w', encoding='utf-8') as f:
         f.write("--- Accumulator Registers (acc0-acc3) (Integer Only) ---\n\n")
         for acc_num, initial_val in acc_initial_states_int.items():
             write_int_acc_block(f, acc_num, initial_val)
-        f.flush()
-        os.fsync(f.fileno())
 
 
 
@@ -837,56 +837,25 @@ msettileni 4
 {test_info['instr']}
 """
     
-    with open(assembly_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(assembly_file, 'w', encoding='utf-8') as f:
         f.write(assembly_code)
-        f.flush()
-        os.fsync(f.fileno())
-    
-    # Add small delay to ensure file is written
-    import time
-    time.sleep(0.01)
     
     return assembly_file
 
 
 def run_assembler():
-    """Run assembler to generate machine code"""
-    assembler_dir = SCRIPT_DIR.parent / "assembler"
-    
-    import subprocess
-    result = subprocess.run(
-        ['python', 'assembler.py'],
-        cwd=str(assembler_dir),
-        capture_output=True,
-        text=True
-    )
-    
-    return result.returncode == 0
+    """Run assembler to generate machine code (in-process)"""
+    return HARNESS.assemble_file("assembly.txt")
 
 
 def run_simulator():
-    """Run simulator"""
-    tpu_dir = SCRIPT_DIR.parent
-    
-    import subprocess
-    env = os.environ.copy()
-    env['PYTHONIOENCODING'] = 'utf-8'
-    
-    result = subprocess.run(
-        ['python', '-m', 'iss.run_simulator'],
-        cwd=str(tpu_dir),
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace',
-        env=env
-    )
-    
-    return result.returncode == 0
+    """Run simulator on the in-memory state files (in-process)"""
+    return HARNESS.run_files()
 
 
 def verify_matmul_result(test_info, random_mode=False, random_matrices=None):
     """Verify matrix multiplication result with hardware-like precision simulation."""
+    import numpy as np
     iss_dir = SCRIPT_DIR
     
     # Read accumulator file
@@ -895,10 +864,10 @@ def verify_matmul_result(test_info, random_mode=False, random_matrices=None):
     else:
         acc_file = iss_dir / 'acc.txt'
     
-    if not acc_file.exists():
+    if not HARNESS.exists(acc_file):
         return False, f"{acc_file.name} not found"
     
-    with open(acc_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     # Parse accumulator result from file
@@ -1047,9 +1016,9 @@ def read_register_values_matmul(test_info):
     
     # Read tile registers A and B
     for reg_name, reg_num in [('A', test_info['tr_a_reg']), ('B', test_info['tr_b_reg'])]:
-        if tr_file.exists():
+        if HARNESS.exists(tr_file):
             matrix = []
-            with open(tr_file, 'r', encoding='utf-8') as f:
+            with HARNESS.open(tr_file, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
             
             reg_label = f"tr{reg_num}:"
@@ -1081,9 +1050,9 @@ def read_register_values_matmul(test_info):
                 reg_values[f"tr{reg_num}"] = matrix
     
     # Read accumulator
-    if acc_file.exists():
+    if HARNESS.exists(acc_file):
         matrix = []
-        with open(acc_file, 'r', encoding='utf-8') as f:
+        with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         
         acc_reg = f"acc{test_info['acc_reg']}"
@@ -1147,8 +1116,8 @@ def display_results(test_info, random_mode=False, random_matrices=None):
     # Helper function to read a matrix from a file
     def read_matrix(file_path, reg_num, test_info):
         matrix = []
-        if not file_path.exists(): return matrix
-        with open(file_path, 'r', encoding='utf-8') as f:
+        if not HARNESS.exists(file_path): return matrix
+        with HARNESS.open(file_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         reg_label = f"tr{reg_num}:"
         in_reg = False
@@ -1245,8 +1214,8 @@ def display_results(test_info, random_mode=False, random_matrices=None):
 
     # 5. Print Final Accumulator State
     print(f"\n[Accumulator: acc{test_info['acc_reg']}] From {acc_file.name}:")
-    if acc_file.exists():
-        with open(acc_file, 'r', encoding='utf-8') as f:
+    if HARNESS.exists(acc_file):
+        with HARNESS.open(acc_file, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         acc_reg_label = f"acc{test_info['acc_reg']}"
         in_target_block = False
@@ -1399,6 +1368,7 @@ def main():
         print(f"\n[SUMMARY]")
         print(f"  [OK] Passed: {passed_tests}/{total_tests}")
         print(f"  [X] Failed: {failed_tests}/{total_tests}")
+        HARNESS.save_files(SCRIPT_DIR)
         print("\nOutput files:")
         print(f"  - {SCRIPT_DIR / 'matrix.txt'}")
         print(f"  - {SCRIPT_DIR / 'matrix_float.txt'}")
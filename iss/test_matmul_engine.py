@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Bit-exactness test for the matmul engines (reference vs numpy).
+
+Runs every supported matmul variant on identical random register contents
+through MatrixAccelerator(matmul_engine="reference") and
+MatrixAccelerator(matmul_engine="numpy") and compares the resulting
+accumulators bit for bit (including -0.0, inf and NaN payloads).
+
+Usage:
+    python test_matmul_engine.py               # 200 random trials per variant
+    python test_matmul_engine.py --trials 1000
+    python test_matmul_engine.py --seed 1234
+"""
+
+import sys
+import random
+import struct
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.decoder import DecodedInstruction
+from iss.testing import make_accelerator, random_float
+from assembler.assembler import Assembler
+
+# 10 lệnh matmul được hỗ trợ
+MATMUL_INSTRUCTIONS = [
+    "mfmacc.s", "mfmacc.s.h", "mfmacc.s.bf16", "mfmacc.h",
+    "mfmacc.bf16.e4", "mfmacc.bf16.e5",
+    "mmaccu.w.b", "mmaccus.w.b", "mmaccsu.w.b", "mmacc.w.b",
+]
+
+def fill_registers(ma, rng):
+    for r in range(4):
+        for i in range(4):
+            for j in range(4):
+                ma.tr_int[r][i][j] = rng.randint(-300, 300)
+                ma.acc_int[r][i][j] = rng.randint(-2**31, 2**31 - 1)
+                ma.tr_float[r][i][j] = random_float(rng, special_rate=0.05)
+                ma.acc_float[r][i][j] = random_float(rng, special_rate=0.05)
+
+
+def copy_registers(src, dst):
+    dst.regs.int_bank[:] = src.regs.int_bank
+    dst.regs.float_bank[:] = src.regs.float_bank
+
+
+def float_key(value):
+    """So sánh theo bit (phân biệt -0.0, giữ nguyên NaN)."""
+    if isinstance(value, float):
+        return ("f", struct.pack("<d", value))
+    return ("i", value)
+
+
+def snapshot(ma):
+    return [[[float_key(v) for v in row] for row in reg]
+            for name in ("tr_int", "tr_float", "acc_int", "acc_float") for reg in getattr(ma, name)]
+
+
+def run_variant(mnemonic, trials, rng):
+    asm = Assembler()
+    failures = 0
+    for trial in range(trials):
+        md = rng.choice(["acc0", "acc1", "acc2", "acc3"])
+        ms1, ms2 = rng.choice(["tr0", "tr1", "tr2", "tr3"]), rng.choice(["tr0", "tr1", "tr2", "tr3"])
+        instruction = DecodedInstruction(asm.assemble_line(f"{mnemonic} {md}, {ms1}, {ms2}"))
+
+        ref = make_accelerator(matmul_engine="reference")
+        vec = make_accelerator(matmul_engine="numpy")
+        fill_registers(ref, rng)
+        copy_registers(ref, vec)
+        M, N, K = rng.randint(1, 4), rng.randint(1, 4), rng.randint(1, 4)
+        for ma in (ref, vec):
+            ma.csr_ref.write('mtilem', M)
+            ma.csr_ref.write('mtilen', N)
+            ma.csr_ref.write('mtilek', K)
+
+        # Engine tham chiếu có thể ném lỗi (vd: FP8 với N > K) - engine numpy phải ném cùng loại
+        outcome = []
+        for ma in (ref, vec):
+            try:
+                ma.execute_matmul(instruction)
+                outcome.append(None)
+            except Exception as e:
+                outcome.append(type(e).__name__)
+
+        if outcome[0] != outcome[1] or snapshot(ref) != snapshot(vec):
+            failures += 1
+            if failures <= 3:
+                print(f"    [X] {mnemonic} trial {trial}: M={M} N={N} K={K} {md}, {ms1}, {ms2} mismatch")
+    return failures
+
+
+def test_matmul_engines_bit_exact(trials=200, seed=2024):
+    rng = random.Random(seed)
+    total_failures = 0
+    for mnemonic in MATMUL_INSTRUCTIONS:
+        failures = run_variant(mnemonic, trials, rng)
+        status = "[OK]" if failures == 0 else "[X]"
+        print(f"  {status} {mnemonic:<16} {trials - failures}/{trials} bit-exact")
+        total_failures += failures
+    assert total_failures == 0, f"{total_failures} mismatching trials"
+
+
+def main():
+    trials, seed = 200, 2024
+    if '--trials' in sys.argv:
+        trials = int(sys.argv[sys.argv.index('--trials') + 1])
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"MATMUL ENGINE BIT-EXACTNESS TEST (reference vs numpy, trials={trials}, seed={seed})")
+    print("=" * 80)
+    try:
+        test_matmul_engines_bit_exact(trials, seed)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] All matmul variants are bit-exact.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
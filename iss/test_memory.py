@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test for the paged MainMemory.
+
+1. read/write inside one page, across page boundaries and at the end of RAM
+   against a flat bytearray model (random trials)
+2. 4 GB address space: only written pages are allocated
+3. fork(): copy-on-write page sharing between two memories / simulators
+
+Usage:
+    python test_memory.py
+    python test_memory.py --seed 1234
+"""
+
+import sys
+import random
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.components import MainMemory
+from iss.iss import Simulator
+from iss.logger import SimLogger, SILENT
+
+
+def make_memory(size, page_size=MainMemory.PAGE_SIZE):
+    return MainMemory(size, log=SimLogger(SILENT), page_size=page_size)
+
+
+def test_against_flat_model(seed=2024, trials=3000):
+    rng = random.Random(seed)
+    size, page_size = 5000, 256          # Trang cuối không đầy
+    memory = make_memory(size, page_size)
+    model = bytearray(size)
+    for _ in range(trials):
+        length = rng.choice([1, 2, 4, 16, rng.randrange(0, 700)])
+        address = rng.randrange(0, size + 8)
+        if rng.random() < 0.5:
+            data = bytes(rng.getrandbits(8) for _ in range(length))
+            if address + length > size:
+                try:
+                    memory.write(address, data)
+                    raise AssertionError(f"write past end at 0x{address:X} not rejected")
+                except MemoryError:
+                    continue
+            memory.write(address, data)
+            model[address:address + length] = data
+        else:
+            if address + length > size:
+                try:
+                    memory.read(address, length)
+                    raise AssertionError(f"read past end at 0x{address:X} not rejected")
+                except MemoryError:
+                    continue
+            got = memory.read(address, length)
+            assert got == model[address:address + length], f"read 0x{address:X}+{length} differs"
+            assert isinstance(got, bytearray)
+    assert memory.tobytes() == bytes(model)
+    print(f"  [OK] {trials} random reads/writes match a flat bytearray ({len(memory.pages)} pages allocated)")
+
+
+def test_large_address_space():
+    memory = make_memory(4 << 30)
+    top = (4 << 30) - 4
+    memory.write(top, b"\x01\x02\x03\x04")
+    memory.write(0x1000_0000 - 2, b"\xAA\xBB\xCC\xDD")     # Qua biên trang
+    assert memory.read(top, 4) == b"\x01\x02\x03\x04"
+    assert memory.read(0x1000_0000 - 2, 4) == b"\xAA\xBB\xCC\xDD"
+    assert memory.read(0x8000_0000, 8) == bytes(8)           # Trang chưa ghi đọc ra 0
+    assert memory.allocated_bytes() == 3 * memory.page_size
+    print(f"  [OK] 4 GB address space, {memory.allocated_bytes()} bytes allocated")
+
+
+def test_fork_copy_on_write():
+    parent = make_memory(1 << 20)
+    parent.write(0x100, b"parent")
+    parent.write(0x5000, b"shared")
+    child = parent.fork()
+    assert child.pages[0] is parent.pages[0]
+
+    child.write(0x100, b"child!")
+    assert parent.read(0x100, 6) == b"parent"
+    assert child.read(0x100, 6) == b"child!"
+    assert child.pages[5] is parent.pages[5]                 # Trang chưa ghi vẫn dùng chung
+
+    parent.write(0x5000, b"SHARED")
+    assert child.read(0x5000, 6) == b"shared"
+    parent.clear()
+    assert child.read(0x5000, 6) == b"shared" and parent.read(0x5000, 6) == bytes(6)
+
+    sim = Simulator(log_level="silent")
+    sim.memory.write(0x200, b"\x2A")
+    other = Simulator(log_level="silent", memory=sim.memory.fork())
+    other.memory.write(0x200, b"\x07")
+    assert sim.memory.read(0x200, 1) == b"\x2A"
+    assert other.matrix_accelerator.memory is other.memory
+    print("  [OK] fork() shares pages copy-on-write")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"PAGED MAIN MEMORY TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_against_flat_model(seed)
+        test_large_address_space()
+        test_fork_copy_on_write()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Paged memory behaves like flat RAM.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -30,7 +30,15 @@ SCRIPT_DIR = Path(__file__).resolve().parent
 sys.path.insert(0, str(SCRIPT_DIR.parent))
 
 # Import binary printing utilities
-from iss.binary_print_utils import print_instruction_binary
+try:
+    from iss.binary_print_utils import print_instruction_binary
+except ImportError:  # Module in nhị phân không có trong repo: bỏ qua phần in, test vẫn chạy
+    def print_instruction_binary(*args, **kwargs):
+        pass
+
+# Assembler + simulator chạy trong tiến trình; iss/*.txt và assembly.txt là file ảo trong bộ nhớ
+from iss.harness import SimHarness
+HARNESS = SimHarness(SCRIPT_DIR)
 
 # Test cases definition
 TEST_CASES = [
@@ -167,7 +175,7 @@ def setup_initial_state():
         5: 0,       # x5 (will hold float value 42.75)
     }
     
-    with open(gpr_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'w', encoding='utf-8') as f:
         f.write("--- General Purpose Registers (GPRs) ---\n")
         for i in range(32):
             val = gpr_values.get(i, 0)
@@ -180,7 +188,7 @@ def setup_initial_state():
     print("\n[2] Initializing matrix registers...")
     matrix_float_file = iss_dir / "matrix_float.txt"
     
-    with open(matrix_float_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(matrix_float_file, 'w', encoding='utf-8') as f:
         f.write("--- Tile Registers (tr0-tr3) (Floating-Point | 32-bit representation)---\n\n")
         for i in range(0, 4):  # tr0-tr3 (pure tiles)
             f.write(f"tr{i}:\n")
@@ -338,7 +346,7 @@ def setup_test_data(test_info, use_random=False):
 def write_matrix_register(matrix_file, reg_index, data):
     """Write data to a specific tile register in matrix_float.txt"""
     # reg_index: 0-3 for tr0-tr3 (pure tiles)
-    if not matrix_file.exists():
+    if not HARNESS.exists(matrix_file):
         # Create new file
         lines = ["--- Tile Registers (tr0-tr3) (Float Only) ---\n\n"]
         for i in range(4):
@@ -347,11 +355,11 @@ def write_matrix_register(matrix_file, reg_index, data):
             for row in range(4):
                 lines.append(f"  Row {row}: 0.0 0.0 0.0 0.0\n")
             lines.append("\n")
-        with open(matrix_file, 'w', encoding='utf-8') as f:
+        with HARNESS.open(matrix_file, 'w', encoding='utf-8') as f:
             f.writelines(lines)
     
     # Read current file
-    with open(matrix_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(matrix_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     # Update the target register
@@ -379,14 +387,8 @@ def write_matrix_register(matrix_file, reg_index, data):
             new_lines.append(line)
     
     # Write back
-    with open(matrix_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(matrix_file, 'w', encoding='utf-8') as f:
         f.writelines(new_lines)
-        f.flush()
-        os.fsync(f.fileno())
-    
-    # Longer delay to ensure file is fully written
-    import time
-    time.sleep(0.5)
 
 
 def setup_gpr(gpr_file, reg_idx, value):
@@ -397,7 +399,7 @@ def setup_gpr(gpr_file, reg_idx, value):
         int_val = int(value)
     
     # Read current file
-    with open(gpr_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     # Update the register
@@ -415,17 +417,11 @@ def setup_gpr(gpr_file, reg_idx, value):
             new_lines.append(line)
     
     # Write back
-    with open(gpr_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'w', encoding='utf-8') as f:
         f.writelines(new_lines)
-        f.flush()
-        os.fsync(f.fileno())
-    
-    # Longer delay to ensure file is fully written before subprocess reads
-    import time
-    time.sleep(0.5)
     
     # Verify write by reading back
-    with open(gpr_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'r', encoding='utf-8') as f:
         for line in f:
             if line.strip().startswith(f'x{reg_idx} '):
                 written_val = int(line.split(':')[1].strip(), 16)
@@ -451,58 +447,20 @@ msettileni 4
 {test_info['instr']}
 """
     
-    with open(assembly_file, 'w', encoding='utf-8') as f:
+    with HARNESS.open(assembly_file, 'w', encoding='utf-8') as f:
         f.write(assembly_code)
-        f.flush()
-        os.fsync(f.fileno())
-    
-    # Ensure file is written before assembler reads it
-    import time
-    time.sleep(0.2)
     
     return assembly_file
 
 
 def run_assembler():
-    """Run assembler to generate machine code"""
-    assembler_dir = SCRIPT_DIR.parent / "assembler"
-    
-    import subprocess
-    result = subprocess.run(
-        ['python', 'assembler.py'],
-        cwd=str(assembler_dir),
-        capture_output=True,
-        text=True
-    )
-    
-    # Ensure machine_code.txt is written before simulator reads it
-    if result.returncode == 0:
-        import time
-        time.sleep(0.2)
-    
-    return result.returncode == 0
+    """Run assembler to generate machine code (in-process)"""
+    return HARNESS.assemble_file("assembly.txt")
 
 
 def run_simulator():
-    """Run simulator - allow it to save state so we can read results"""
-    tpu_dir = SCRIPT_DIR.parent
-    
-    import subprocess
-    env = os.environ.copy()
-    env['PYTHONIOENCODING'] = 'utf-8'
-    # DON'T set NO_SAVE_STATE - we need simulator to save results
-    
-    result = subprocess.run(
-        ['python', '-m', 'iss.run_simulator'],
-        cwd=str(tpu_dir),
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        errors='replace',
-        env=env
-    )
-    
-    return result.returncode == 0
+    """Run simulator on the in-memory state files (in-process)"""
+    return HARNESS.run_files()
 
 
 def verify_test(test_info):
@@ -650,10 +608,10 @@ def verify_test(test_info):
 
 def read_matrix_register(matrix_file, reg_index):
     """Read data from a specific tile register"""
-    if not matrix_file.exists():
+    if not HARNESS.exists(matrix_file):
         return [[0.0] * 4 for _ in range(4)]
     
-    with open(matrix_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(matrix_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     reg_name = f"tr{reg_index}"
@@ -676,7 +634,7 @@ def read_matrix_register(matrix_file, reg_index):
 
 def read_gpr(gpr_file, reg_idx):
     """Read a GPR register value"""
-    with open(gpr_file, 'r', encoding='utf-8') as f:
+    with HARNESS.open(gpr_file, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
     for line in lines:
@@ -790,10 +748,6 @@ def run_single_test(test_info, test_num, total_tests, use_random=False):
         return False
     print("  [OK] Simulation complete")
     
-    # CRITICAL: Wait for simulator subprocess to finish saving files
-    import time
-    time.sleep(1.0)
-    
     # Step 4: Display results and verify
     passed = display_results(test_info)
     
@@ -860,6 +814,7 @@ def main():
         print(f"\n[SUMMARY]")
         print(f"  ✓ Passed: {passed_tests}/{total_tests}")
         print(f"  ✗ Failed: {failed_tests}/{total_tests}")
+        HARNESS.save_files(SCRIPT_DIR)
         
         return 0
         
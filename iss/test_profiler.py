@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test for the optional run() instrumentation (iss/profiler.py).
+
+1. Per-mnemonic counts and elements (M·N·K matmul, M·N element-wise,
+   bytes for load/store) on a small program
+2. before/after hooks see every instruction in order; timing can be turned off
+3. Profiled and plain runs leave identical state; mnemonic lookup matches the
+   assembler for a sample of instructions
+
+Usage:
+    python test_profiler.py
+"""
+
+import sys
+import struct
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.harness import SimHarness
+from iss.profiler import Profiler, mnemonic_of
+
+PROGRAM = """
+msettilemi 2
+msettileki 3
+msettileni 4
+mlae32 tr0, (x1), x2
+mlbe32 tr1, (x3), x2
+mfmacc.s acc0, tr0, tr1
+mfmacc.s acc0, tr0, tr1
+madd.w acc1, acc2, acc3
+msae16 tr0, (x3), x2
+"""
+
+
+def make_harness():
+    h = SimHarness()
+    h.write_memory(0x100, struct.pack('<16f', *range(16)))
+    h.set_gpr(1, 0x100)
+    h.set_gpr(2, 16)
+    h.set_gpr(3, 0x200)
+    return h
+
+
+def test_counts_and_elements():
+    h = make_harness()
+    profiler = h.sim.profiler = Profiler()
+    h.run(PROGRAM)
+    assert dict(profiler.counts) == {"msettilemi": 1, "msettileki": 1, "msettileni": 1, "mlae32": 1,
+                                     "mlbe32": 1, "mfmacc.s": 2, "madd.w": 1, "msae16": 1}
+    assert profiler.elements["mfmacc.s"] == 2 * (2 * 4 * 3)
+    assert profiler.elements["madd.w"] == 2 * 4
+    assert profiler.elements["mlae32"] == 2 * 3 * 4         # M x K fp32
+    assert profiler.elements["mlbe32"] == 3 * 4 * 4         # K x N fp32
+    assert profiler.elements["msae16"] == 2 * 3 * 2         # M x K fp16
+    assert profiler.elements["msettilemi"] == 0
+    assert profiler.total_instructions == 9 and profiler.total_time > 0
+    assert all(profiler.times[name] > 0 for name in profiler.counts)
+    assert profiler.stats()[0][1] >= 1 and "mfmacc.s" in profiler.report()
+    print("  [OK] per-mnemonic counts, elements and time")
+
+
+def test_hooks():
+    events = []
+    h = make_harness()
+    profiler = Profiler(timing=False,
+                        before=lambda sim, pc, ins, name: events.append(("before", pc, name)),
+                        after=lambda sim, pc, ins, name: events.append(("after", pc, name, sim.pc)))
+    h.sim.profiler = profiler
+    h.run(PROGRAM)
+    assert len(events) == 18
+    assert events[0] == ("before", 0, "msettilemi") and events[1] == ("after", 0, "msettilemi", 0)
+    assert [e[1] for e in events[::2]] == [4 * i for i in range(9)]
+    assert events[-2][2] == "msae16" and not profiler.times
+    print("  [OK] before/after hooks in program order, timing off")
+
+
+def test_same_state():
+    plain, profiled = make_harness(), make_harness()
+    profiled.sim.profiler = Profiler()
+    plain.run(PROGRAM)
+    profiled.run(PROGRAM)
+    for reg in ("tr0", "tr1", "acc0", "acc1"):
+        assert plain.matrix(reg, "float") == profiled.matrix(reg, "float"), reg
+    assert plain.read_memory(0x200, 64) == profiled.read_memory(0x200, 64)
+
+    h = SimHarness()
+    for source in ("mfmacc.s.bf16 acc0, tr0, tr1", "mmaccsu.w.b acc1, tr2, tr3", "mfmin.s acc0, acc2, acc1",
+                   "madd.w.mv.i acc0, acc2, acc1[1]", "mdupw.m.x tr2, x5", "mmovw.m.x tr2, x5, x6",
+                   "mcslidedown.w tr2, tr0, 1", "msettilem x5", "mrelease", "mlate8 tr0, (x1), x2"):
+        word = h.assemble(source)[0]
+        assert mnemonic_of(word) == source.split()[0], source
+    assert mnemonic_of(0) == "unknown"
+    print("  [OK] profiled run leaves the same state; mnemonics match the assembler")
+
+
+def main():
+    print("=" * 80)
+    print("RUN INSTRUMENTATION TEST")
+    print("=" * 80)
+    try:
+        test_counts_and_elements()
+        test_hooks()
+        test_same_state()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Profiler counts and hooks work.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test for the binary program format (iss/program_file.py).
+
+1. Random words + sections + symbols -> write_program / ProgramWriter -> ProgramFile
+   (read and mmap) and iter_program_words give back the same words and tables;
+   the words part is exactly little-endian u32
+2. Assembler.assemble_file writes text or binary (labels -> symbols, .section ->
+   sections), both load into a Simulator with the same final state; an assembly
+   error keeps the previous output file
+3. Bad magic / version / truncated files are rejected
+4. Timing of loading a large program from text vs binary vs mmap (informational)
+
+Usage:
+    python test_program_file.py
+    python test_program_file.py --seed 1234
+"""
+
+import io
+import sys
+import time
+import random
+import struct
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.program_file import (ProgramFile, ProgramWriter, write_program, iter_program_words,
+                              read_machine_code, is_program_file)
+from iss.testing import state_of
+from assembler.assembler import Assembler
+
+SOURCE = """
+.section setup
+msettilemi 4
+msettileki 4
+msettileni 4
+.section text
+kernel:
+mlae32 tr0, (x1), x2
+mlbe32 tr1, (x3), x2
+mfmacc.s acc0, tr0, tr1   # C += A * B
+store:
+msce32 acc0, (x4), x2
+"""
+
+
+def test_round_trip(rng, tmp):
+    path = tmp / "random.bin"
+    for count in (0, 1, 1000, 40000):
+        words = [rng.getrandbits(32) for _ in range(count)]
+        sections = [("a", 0), ("b", 4 * (count // 2)), ("empty", 4 * count)]
+        symbols = {f"sym{i}": 4 * rng.randrange(count + 1) for i in range(5)}
+        write_program(path, words, symbols, sections)
+
+        data = path.read_bytes()
+        assert data[24:24 + 4 * count] == struct.pack(f"<{count}I", *words), "words are not little-endian u32"
+        expected_sections = [("a", 0, count // 2), ("b", 4 * (count // 2), count - count // 2),
+                             ("empty", 4 * count, 0)]
+        for use_mmap in (False, True):
+            with ProgramFile(path, use_mmap=use_mmap) as program:
+                assert list(program.words) == words, f"{count} words, mmap={use_mmap}"
+                assert program.sections == expected_sections, program.sections
+                assert program.symbols == symbols
+                assert program.mapped == (use_mmap and count > 0)
+        assert list(iter_program_words(path, chunk_words=333)) == words
+        assert read_machine_code(path) == words
+
+    # ProgramWriter: section / symbol tại PC hiện tại
+    with ProgramWriter(path) as writer:
+        writer.begin_section("text")
+        writer.write_words([1, 2, 3])
+        writer.add_symbol("end")
+        writer.write(0x1_0000_0004)     # Chỉ giữ 32 bit
+    with ProgramFile(path) as program:
+        assert list(program.words) == [1, 2, 3, 4]
+        assert program.sections == [("text", 0, 4)] and program.symbols == {"end": 12}
+    print("  [OK] words, sections and symbols round-trip (read, mmap, streamed)")
+
+
+def run_program(words, rng_seed):
+    rng = random.Random(rng_seed)
+    sim = Simulator(log_level="silent")
+    sim.memory.write(0x100, struct.pack('<16f', *(rng.uniform(-8, 8) for _ in range(16))))
+    sim.memory.write(0x200, struct.pack('<16f', *(rng.uniform(-8, 8) for _ in range(16))))
+    for index, value in ((1, 0x100), (2, 16), (3, 0x200), (4, 0x800)):
+        sim.gpr.write(index, value)
+    sim.load_program(words)
+    sim.run()
+    return state_of(sim)
+
+
+def test_assembler(rng, tmp):
+    source = tmp / "assembly.txt"
+    source.write_text(SOURCE, encoding="utf-8")
+    text, binary = tmp / "machine_code.txt", tmp / "machine_code.bin"
+    asm = Assembler()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert asm.assemble_file(source, text) and asm.assemble_file(source, binary)
+    assert not is_program_file(text) and is_program_file(binary)
+
+    lines = text.read_text().split("\n")
+    assert len(lines) == 7 and all(len(line) == 32 for line in lines)
+    with ProgramFile(binary) as program:
+        assert list(program.words) == [int(line, 2) for line in lines]
+        assert program.sections == [("setup", 0, 3), ("text", 12, 4)]
+        assert program.symbols == {"kernel": 12, "store": 24}
+
+    seed = rng.getrandbits(32)
+    from_text = run_program([line for line in lines], seed)
+    with ProgramFile(binary, use_mmap=True) as program:
+        from_binary = run_program(program.words, seed)
+    assert from_text == from_binary and from_text[0] == 28, "text and binary programs run differently"
+
+    # Lỗi dịch: file output cũ được giữ nguyên, không có file tạm còn sót
+    before = binary.read_bytes()
+    source.write_text(SOURCE + "mbogus tr0\n", encoding="utf-8")
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not asm.assemble_file(source, binary)
+    assert binary.read_bytes() == before
+    assert sorted(p.name for p in tmp.iterdir() if p.name.endswith(".tmp")) == []
+    print("  [OK] assembler writes text / binary; both run to the same state")
+
+
+def test_bad_files(tmp):
+    path = tmp / "bad.bin"
+    good = tmp / "good.bin"
+    write_program(good, range(10), {"x": 4}, [("text", 0)])
+    data = good.read_bytes()
+    cases = {
+        "magic": b"TPUSNAP\0" + data[8:],
+        "version": data[:8] + struct.pack("<H", 9) + data[10:],
+        "words": data[:24 + 20],
+        "tables": data[:-1],
+    }
+    for name, content in cases.items():
+        path.write_bytes(content)
+        for use_mmap in (False, True):
+            try:
+                ProgramFile(path, use_mmap=use_mmap).close()
+            except ValueError:
+                continue
+            raise AssertionError(f"{name}: bad program file must be rejected")
+    print("  [OK] bad magic / version / truncated files rejected")
+
+
+def benchmark(rng, tmp, count=200000):
+    words = [rng.getrandbits(32) for _ in range(count)]
+    text = tmp / "big.txt"
+    text.write_text("\n".join(f"{word:032b}" for word in words))
+    binary = tmp / "big.bin"
+    write_program(binary, words)
+
+    start = time.perf_counter()
+    with open(text, "r") as f:
+        parsed = [int(line.strip(), 2) for line in f if line.strip() and not line.startswith('#')]
+    times = [time.perf_counter() - start]
+    for use_mmap in (False, True):
+        start = time.perf_counter()
+        with ProgramFile(binary, use_mmap=use_mmap) as program:
+            total = sum(program.words)
+        times.append(time.perf_counter() - start)
+    assert total == sum(parsed)
+    print(f"  [i] {count} words: text {times[0] * 1e3:.1f} ms ({text.stat().st_size // 1024} KiB), "
+          f"binary {times[1] * 1e3:.1f} ms, mmap {times[2] * 1e3:.1f} ms ({binary.stat().st_size // 1024} KiB)")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    rng = random.Random(seed)
+
+    print("=" * 80)
+    print(f"BINARY PROGRAM FORMAT TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            test_round_trip(rng, tmp)
+            test_assembler(rng, tmp)
+            test_bad_files(tmp)
+            benchmark(rng, tmp)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Binary programs load exactly like the text format.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
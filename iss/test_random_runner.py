@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test for the parallel randomized test runner (iss/run_random_tests.py).
+
+1. Same seeds -> same per-test results and same logs, sequential (workers=1)
+   and across a process pool, in any order
+2. Harness state is reset between cases: re-running a seed after other seeds
+   in the same worker gives the same result
+3. Every script imports and runs its cases; a script that fails to import is
+   reported as a failed run instead of crashing the runner
+
+Usage:
+    python test_random_runner.py
+    python test_random_runner.py --seed 1234
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.run_random_tests import SCRIPTS, run_case, run_random_tests, summarize
+
+
+def test_reproducible(seed=2024, cases=3):
+    scripts = list(SCRIPTS)
+    serial = run_random_tests(scripts, cases, seed, workers=1)
+    parallel = run_random_tests(scripts, cases, seed, workers=2, chunksize=1)
+    assert [r[:2] for r in serial] == [(s, seed + k) for s in scripts for k in range(cases)]
+    assert serial == parallel, "process pool results differ from the sequential run"
+    summary = summarize(parallel)
+    assert sorted(summary) == sorted(scripts)
+    assert all(total == cases for tests in summary.values() for _, total, _ in tests.values())
+    assert all("<exception>" not in tests for tests in summary.values()), \
+        [output for *_, output in serial if "Traceback" in output][:1]
+    print(f"  [OK] {len(serial)} cases: identical results and logs with 1 and 2 workers")
+
+
+def test_isolated_cases(seed=2024):
+    for script in SCRIPTS:
+        first = run_case(script, seed)
+        run_case(script, seed + 1)
+        assert run_case(script, seed) == first, f"{script}: state leaked between cases"
+    print("  [OK] harness state is reset between cases")
+
+
+def test_broken_script(seed=2024):
+    SCRIPTS["broken"] = "iss.no_such_test_script"
+    try:
+        script, _, results, output = run_case("broken", seed)
+        assert (script, results) == ("broken", [("<exception>", False)]), results
+        assert "ModuleNotFoundError" in output, output
+        summary = summarize(run_random_tests(["broken", "loadstore"], 1, seed, workers=1))
+        assert summary["broken"]["<exception>"][:2] == [0, 1] and "<exception>" not in summary["loadstore"]
+    finally:
+        del SCRIPTS["broken"]
+    print("  [OK] a script that fails to import is reported as a failed run")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"PARALLEL RANDOM RUNNER TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_reproducible(seed)
+        test_isolated_cases(seed)
+        test_broken_script(seed)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Random cases are reproducible across workers.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
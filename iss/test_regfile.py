@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test for the byte-backed matrix register file (MatrixRegisterFile).
+
+Checks that tr_*/acc_* row views, the raw byte banks and the typed numpy views
+all see the same storage, and that mzero / mmov.mm work on whole registers.
+
+Usage:
+    python test_regfile.py
+"""
+
+import sys
+import struct
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+import numpy as np
+
+from iss.converters import float_to_bfloat16, float_to_bits16
+from iss.testing import make_accelerator
+
+
+def test_row_views_share_bank():
+    ma = make_accelerator()
+    ma.tr_int[1][2][3] = -5
+    ma.acc_float[0][1][0] = 1.5
+    regs = ma.regs
+
+    # tr1 = thanh ghi vật lý 1, acc0 = thanh ghi vật lý 4 (alias tr4)
+    assert ma.get_matrix_reg_int(1)[2][3] == -5
+    assert ma.get_matrix_reg_float(4)[1][0] == 1.5
+    assert bytes(regs.raw(1, "int")[(2 * 4 + 3) * 4:(2 * 4 + 4) * 4]) == struct.pack("=i", -5)
+    assert regs.view(4, "fp32")[1, 0] == 1.5
+    # Hai bank độc lập
+    assert ma.tr_float[1][2][3] == 0.0
+    print("  [OK] row views, raw bytes and numpy views share one buffer")
+
+
+def test_typed_views():
+    ma = make_accelerator()
+    ma.tr_int[0][0][0] = -2     # int8/int16 = byte thấp của khe int32
+    ma.tr_int[0][0][1] = 0x1234
+    ma.tr_float[0][3][2] = 3.140625
+    regs = ma.regs
+
+    assert regs.view(0, "int8")[0, 0] == -2
+    assert regs.view(0, "int16")[0, 1] == 0x1234
+    assert regs.view(0, "int32").shape == (4, 4)
+    assert regs.view(0, "bf16")[3, 2] == float_to_bfloat16(3.140625)
+    assert regs.view(0, "fp16")[3, 2] == float_to_bits16(3.140625)
+
+    # View numpy ghi được và không sao chép
+    regs.view(0, "int32")[2, 2] = 77
+    assert ma.tr_int[0][2][2] == 77
+    # fp16: bản sao đã chuyển đổi (bank float chỉ giữ fp32), ghi vào không đổi thanh ghi
+    fp16 = regs.view(0, "fp16")
+    fp16[3, 2] = 0
+    assert ma.tr_float[0][3][2] == 3.140625
+    print("  [OK] int8/int16/int32/fp32/bf16/fp16 views")
+
+
+def test_zero_and_copy():
+    ma = make_accelerator()
+    for i in range(4):
+        for j in range(4):
+            ma.acc_int[2][i][j] = i * 4 + j
+            ma.acc_float[2][i][j] = i - j / 2
+
+    ma.regs.copy(1, 6)          # mmov.mm tr1, acc2
+    assert np.array_equal(ma.regs.view(1, "int32"), ma.regs.view(6, "int32"))
+    assert np.array_equal(ma.regs.view(1, "fp32"), ma.regs.view(6, "fp32"))
+
+    ma.regs.zero(6)             # mzero acc2
+    assert not any(ma.regs.raw(6, "int")) and not any(ma.regs.raw(6, "float"))
+    assert ma.tr_int[1][3][3] == 15
+    print("  [OK] zero / copy whole registers")
+
+
+def main():
+    print("=" * 80)
+    print("MATRIX REGISTER FILE TEST")
+    print("=" * 80)
+    try:
+        test_row_views_share_bank()
+        test_typed_views()
+        test_zero_and_copy()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Register file views are consistent.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
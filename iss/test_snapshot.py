@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test for the binary state snapshot (state_manager.save_snapshot / load_snapshot).
+
+1. Random simulator state -> snapshot -> fresh simulator: every GPR, CSR,
+   register bank byte, dest-bit metadata and memory byte must match
+2. Text files -> snapshot -> text files: the text format rounds floats and
+   drops dest-bit metadata, so the converters must reach a fixed point after
+   one pass (text -> snap -> text -> snap gives identical files and snapshots)
+3. Timing of binary vs text save/load (informational)
+
+Usage:
+    python test_snapshot.py
+    python test_snapshot.py --seed 1234
+"""
+
+import os
+import io
+import sys
+import time
+import random
+import filecmp
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.iss import Simulator
+from iss.state_manager import (save_snapshot, load_snapshot, text_to_snapshot, snapshot_to_text,
+                               save_state_to_files, load_state_from_files)
+from iss.harness import STATE_FILE_NAMES
+from iss.testing import random_simulator, state_of
+
+
+def test_snapshot_round_trip(seed=2024, trials=20):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.snap")
+        for trial in range(trials):
+            sim = random_simulator(rng)
+            save_snapshot(sim, path)
+            restored = Simulator(log_level="silent")
+            load_snapshot(restored, path)
+            assert state_of(restored) == state_of(sim), f"trial {trial}: restored state differs"
+        size = os.path.getsize(path)
+    print(f"  [OK] {trials} random states restored bit-exactly (last snapshot: {size} bytes)")
+
+
+def test_text_conversion(seed=2024):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = [os.path.join(tmp, name) for name in ("a", "b", "c")]
+        for d in dirs:
+            os.makedirs(d)
+        snaps = [os.path.join(tmp, "1.snap"), os.path.join(tmp, "2.snap")]
+
+        sim = random_simulator(rng)
+        with contextlib.redirect_stdout(io.StringIO()):
+            save_state_to_files(sim, dirs[0])       # Text gốc (làm tròn float)
+            text_to_snapshot(snaps[0], dirs[0])     # text -> snapshot
+            snapshot_to_text(snaps[0], dirs[1])     # snapshot -> text
+            text_to_snapshot(snaps[1], dirs[1])
+            snapshot_to_text(snaps[1], dirs[2])
+        _, mismatch, errors = filecmp.cmpfiles(dirs[1], dirs[2], STATE_FILE_NAMES, shallow=False)
+        assert not mismatch and not errors, f"text files differ after conversion: {mismatch or errors}"
+        with open(snaps[0], "rb") as f1, open(snaps[1], "rb") as f2:
+            assert f1.read() == f2.read(), "snapshots differ after text round trip"
+        # GPR / CSR / bộ nhớ không bị làm tròn -> giống hệt text gốc
+        _, mismatch, _ = filecmp.cmpfiles(dirs[0], dirs[1], ["gpr.txt", "config.txt", "memory.txt"], shallow=False)
+        assert not mismatch, f"lossless files changed: {mismatch}"
+    print(f"  [OK] text -> snapshot -> text is stable for all {len(STATE_FILE_NAMES)} state files")
+
+
+def benchmark(seed=2024, repeats=20):
+    rng = random.Random(seed)
+    sim = random_simulator(rng)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        snap = os.path.join(tmp, "state.snap")
+        start = time.perf_counter()
+        for _ in range(repeats):
+            save_snapshot(sim, snap)
+            load_snapshot(sim, snap)
+        binary = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            save_state_to_files(sim, tmp)
+            load_state_from_files(sim, tmp)
+        text = (time.perf_counter() - start) / repeats
+    print(f"  [i] save+load: binary {binary * 1e3:.2f} ms, text {text * 1e3:.2f} ms")
+
+
+def main():
+    seed = 2024
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    print("=" * 80)
+    print(f"BINARY SNAPSHOT TEST (seed={seed})")
+    print("=" * 80)
+    try:
+        test_snapshot_round_trip(seed)
+        test_text_conversion(seed)
+        benchmark(seed)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Snapshots are bit-exact.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Startup test: `import iss` / `from iss import Simulator` must stay light.
+
+1. In a fresh interpreter, importing the package and running a small program with
+   the reference engines does not import numpy, batch, state_manager, profiler,
+   matrix_input, typing or re (compared with a bare `python -c pass`)
+2. The LUTs in converters are built on first use, give the same values, and the
+   numpy engines still import numpy on demand
+3. The lazy package exports: every name in __all__ resolves, `from iss import *`
+   works, unknown names raise AttributeError
+4. Import + Simulator() with the reference engines is faster than with the numpy
+   engines (which import numpy eagerly), and the median import time of
+   `from iss import Simulator` (bytecode cached) is under a generous absolute budget
+   (100 ms, or ISS_IMPORT_BUDGET_MS / --budget-ms); the time of each step is printed
+
+Usage:
+    python test_startup.py
+    python test_startup.py --runs 11 --budget-ms 40
+    ISS_IMPORT_BUDGET_MS=40 python test_startup.py
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+# Module không được nạp khi chỉ chạy simulator với engine tham chiếu
+HEAVY_MODULES = ("numpy", "iss.batch", "iss.state_manager", "iss.profiler", "iss.matrix_input",
+                 "iss.timing", "typing", "re")
+
+PROGRAM = """
+import sys, json, time
+start = time.perf_counter()
+from iss import Simulator
+imported = time.perf_counter()
+sim = Simulator(log_level="silent")
+# msettile{m,n,k}i 4; mzero acc0; madd.w acc1, acc0, acc0; mfmacc.s acc2, tr0, tr1
+sim.load_program([0x2002002b, 0x3002002b, 0x1002002b, 0x0c00022b, 0x07ca1aab, 0x08180b2b])
+created = time.perf_counter()
+sim.run()
+finished = time.perf_counter()
+print(json.dumps({"import": imported - start, "create": created - imported, "run": finished - created,
+                  "pc": sim.pc, "modules": sorted(sys.modules)}))
+"""
+
+# Cùng bước import + khởi tạo nhưng với engine numpy (nạp numpy ngay) để so sánh tương đối
+EAGER_PROGRAM = """
+import time
+start = time.perf_counter()
+from iss import Simulator
+Simulator(log_level="silent", matmul_engine="numpy", loadstore_engine="numpy", elementwise_engine="numpy")
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(code, env=None):
+    """Chạy code trong trình thông dịch mới (cwd = thư mục gốc repo) -> stdout."""
+    result = subprocess.run([sys.executable, "-c", code], cwd=SCRIPT_DIR.parent, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def fresh_env():
+    # Cho phép ghi __pycache__: lần chạy đầu dịch bytecode, các lần đo sau đọc từ cache
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def test_no_heavy_imports(env):
+    baseline = set(json.loads(run_python("import sys, json; print(json.dumps(sorted(sys.modules)))", env)))
+    result = json.loads(run_python(PROGRAM, env))
+    assert result["pc"] == 24, f"program stopped at pc={result['pc']}"
+    loaded = set(result["modules"]) - baseline
+    unexpected = [name for name in HEAVY_MODULES
+                  if name in loaded or any(m.startswith(name + ".") for m in loaded)]
+    assert not unexpected, f"imported at startup: {unexpected}"
+    package = set(json.loads(run_python("import sys, json, iss; print(json.dumps(sorted(sys.modules)))",
+                                        env))) - baseline
+    assert package == {"iss"}, f"`import iss` loads {sorted(package - {'iss'})}"
+    print(f"  [OK] Simulator run loads {len(loaded)} modules; none of {', '.join(HEAVY_MODULES)}")
+
+
+def test_lazy_tables(env):
+    code = """
+import sys
+from iss import converters
+lazy = type(converters._FP16_DECODE).__name__
+values = [converters.bits_to_float16(b) == converters._bits_to_float16_ref(b) for b in (0, 0x3C00, 0xFBFF, 1)]
+values += [converters.bits_to_float8_e4m3(b) == converters._bits_to_float8_e4m3_ref(b) for b in (0x38, 0x41)]
+values += [converters.float_to_bits8_e5m2(1.5) == converters._float_to_bits8_e5m2_ref(1.5)]
+print(lazy, type(converters._FP16_DECODE).__name__, all(values), 'numpy' in sys.modules)
+converters.float_to_bits16_array([1.0, 2.0])
+print('numpy' in sys.modules)
+"""
+    before, after, same, numpy_early, numpy_late = run_python(code, env).split()
+    assert (before, after, same) == ("_LazyTable", "tuple", "True"), (before, after, same)
+    assert numpy_early == "False" and numpy_late == "True", (numpy_early, numpy_late)
+    print("  [OK] converter LUTs built on first lookup; numpy only for array converters")
+
+
+def test_exports():
+    import iss
+    for name in iss.__all__:
+        assert getattr(iss, name) is not None, name
+    namespace = {}
+    exec("from iss import *", namespace)
+    assert set(iss.__all__) <= set(namespace) and set(iss.__all__) <= set(dir(iss))
+    assert iss.Simulator is iss.iss.Simulator and iss.Geometry is iss.definitions.Geometry
+    try:
+        iss.NoSuchName
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("unknown attribute must raise AttributeError")
+    print(f"  [OK] {len(iss.__all__)} exported names resolve lazily")
+
+
+def test_import_time(env, runs, budget_ms):
+    run_python(PROGRAM, env)     # Dịch bytecode một lần
+    run_python(EAGER_PROGRAM, env)
+    samples, eager = [], []
+    for _ in range(runs):        # Xen kẽ hai chương trình để nhiễu của máy ảnh hưởng như nhau
+        samples.append(json.loads(run_python(PROGRAM, env)))
+        eager.append(float(run_python(EAGER_PROGRAM, env)))
+    samples.sort(key=lambda sample: sample["import"])
+    median = samples[len(samples) // 2]
+    import_ms = median["import"] * 1e3
+    lazy_ms = sorted(sample["import"] + sample["create"] for sample in samples)[runs // 2] * 1e3
+    eager_ms = sorted(eager)[runs // 2] * 1e3
+    print(f"  [i] from iss import Simulator: {import_ms:.1f} ms (median of {runs}, budget {budget_ms:.0f} ms), "
+          f"Simulator(): {median['create'] * 1e3:.1f} ms, run: {median['run'] * 1e3:.1f} ms")
+    print(f"  [i] import + Simulator(): reference engines {lazy_ms:.1f} ms, numpy engines {eager_ms:.1f} ms")
+    assert lazy_ms < eager_ms, f"lazy startup {lazy_ms:.1f} ms is not faster than eager {eager_ms:.1f} ms"
+    assert import_ms < budget_ms, f"import took {import_ms:.1f} ms (budget {budget_ms:.0f} ms)"
+
+
+def main():
+    runs, budget_ms = 7, float(os.environ.get("ISS_IMPORT_BUDGET_MS", 100))
+    if '--runs' in sys.argv:
+        runs = int(sys.argv[sys.argv.index('--runs') + 1])
+    if '--budget-ms' in sys.argv:
+        budget_ms = float(sys.argv[sys.argv.index('--budget-ms') + 1])
+    env = fresh_env()
+
+    print("=" * 80)
+    print(f"STARTUP TEST (runs={runs}, budget={budget_ms:.0f} ms)")
+    print("=" * 80)
+    try:
+        test_no_heavy_imports(env)
+        test_lazy_tables(env)
+        test_exports()
+        test_import_time(env, runs, budget_ms)
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Simulator startup stays within budget.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
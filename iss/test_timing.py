@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test for the cycle-approximate timing model (iss/timing.py).
+
+1. Hand-computed cycles for load -> matmul -> store with and without
+   load / compute / store overlap
+2. MAC throughput per data type and load/store cost per stride / layout
+3. MISC instructions wait only on the matrix registers their variant reads / writes
+   (mmovw.x.m reads ms2, mmovw.m.x / mdupw.m.x read none, GPR destinations are free)
+4. Attaching a timing model does not change the functional result
+
+Usage:
+    python test_timing.py
+"""
+
+import sys
+import struct
+from pathlib import Path
+
+# Add parent directory to sys.path
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR.parent))
+
+from iss.harness import SimHarness
+from iss.timing import TimingModel, TimingConfig
+
+SETUP = "msettilemi 4\nmsettileki 4\nmsettileni 4\n"
+
+# mem: 16 B/cycle, latency 10, 1 cycle/row. MAC: fp32 16/cycle, latency 2
+CONFIG = dict(mem_bytes_per_cycle=16, mem_latency=10, mem_burst_overhead=1,
+              macs_per_cycle={"fp32": 16, "int8": 64}, matmul_latency=2)
+
+
+def run(source, stride=16, **config):
+    model = TimingModel(TimingConfig(**{**CONFIG, **config}))
+    h = SimHarness(timing_model=model)
+    h.set_gpr(1, 0x100)
+    h.set_gpr(2, stride)
+    h.set_gpr(3, 0x400)
+    h.set_gpr(4, 0x800)
+    h.run(SETUP + source)
+    return model, h
+
+
+def test_pipeline():
+    source = "mlae32 tr0, (x1), x2\nmlbe32 tr1, (x3), x2\nmfmacc.s acc0, tr0, tr1\nmsce32 acc0, (x4), x2\n"
+    model, _ = run(source)
+    t = {x.mnemonic: x for x in model.trace}
+    # Tile 4x4 fp32, stride 16 = hàng liền nhau -> 1 đoạn 64 byte: 4 + 1 chu kỳ, +10 độ trễ
+    assert (t["mlae32"].start, t["mlae32"].end) == (3, 18)
+    assert (t["mlbe32"].start, t["mlbe32"].end) == (8, 23)          # Chờ đơn vị load
+    assert (t["mfmacc.s"].start, t["mfmacc.s"].end) == (23, 29)     # 64 MAC / 16 + 2
+    assert (t["msce32"].start, t["msce32"].end) == (29, 44)
+    assert model.total_cycles == 44 and model.instructions == 7
+
+    serial, _ = run(source, overlap=False)
+    assert serial.total_cycles == 3 + 15 + 15 + 6 + 15
+    assert "Total cycles: 44" in model.report()
+    print(f"  [OK] load/compute/store pipeline: {model.total_cycles} cycles, {serial.total_cycles} without overlap")
+
+
+def test_throughput_and_layout():
+    fp32, _ = run("mfmacc.s acc0, tr0, tr1\n")
+    int8, _ = run("mmacc.w.b acc0, tr0, tr1\n")
+    assert fp32.trace[-1].cycles == 64 // 16 + 2 and int8.trace[-1].cycles == 64 // 64 + 2
+
+    contiguous, _ = run("mlae32 tr0, (x1), x2\n", stride=16)
+    strided, _ = run("mlae32 tr0, (x1), x2\n", stride=64)
+    transposed, _ = run("mlate8 tr0, (x1), x2\n", stride=64)
+    assert contiguous.trace[-1].cycles == 4 + 1 + 10
+    assert strided.trace[-1].cycles == 4 * (1 + 1) + 10           # 4 hàng 16 byte
+    assert transposed.trace[-1].cycles == 4 * (1 + 1) + 10        # 4 cột 4 byte
+
+    # Load đọc vùng vừa store phải chờ store xong
+    model, _ = run("msae32 tr0, (x1), x2\nmlae32 tr1, (x1), x2\n")
+    assert model.trace[-1].start == model.trace[-2].end
+    print("  [OK] MAC throughput per type, stride / layout cost, store -> load ordering")
+
+
+def test_misc_dependencies():
+    # Thanh ghi vừa load sẵn sàng ở chu kỳ 18; x0 / x1 trùng số hiệu tr0 / tr1 trong trường ms1 / rd
+    for loaded, source, waits in (("tr1", "mmovw.x.m x5, tr1, x0\n", True),    # Đọc ms2
+                                  ("tr1", "mmovw.x.m x1, tr0, x0\n", False),   # rd là GPR
+                                  ("tr1", "mmovw.m.x tr2, x1, x1\n", False),   # Nguồn là GPR
+                                  ("tr0", "mdupw.m.x tr2, x1\n", False),
+                                  ("tr0", "mzero tr2\n", False),
+                                  ("tr1", "mmov.mm tr2, tr1\n", True),
+                                  ("tr1", "mzero tr1\n", True)):               # WAW
+        model, _ = run(f"mlae32 {loaded}, (x1), x2\n" + source)
+        load, misc = model.trace[-2:]
+        assert (misc.start == load.end) == waits, f"{source.strip()}: start {misc.start}, load ends {load.end}"
+    print("  [OK] MISC dependencies follow the decoded variant")
+
+
+def test_functional_result_unchanged():
+    source = "mlae32 tr0, (x1), x2\nmlae32 tr1, (x3), x2\nmfmacc.s acc0, tr0, tr1\nmsae32 acc0, (x4), x2\n"
+    plain = SimHarness()
+    _, timed = run("")
+    for h in (plain, timed):
+        h.write_memory(0x100, struct.pack('<16f', *range(16)))
+        h.write_memory(0x400, struct.pack('<16f', *range(16, 32)))
+        h.set_gpr(1, 0x100)
+        h.set_gpr(2, 16)
+        h.set_gpr(3, 0x400)
+        h.set_gpr(4, 0x800)
+        h.run(SETUP + source)
+    assert plain.read_memory(0x800, 64) == timed.read_memory(0x800, 64)
+    assert timed.sim.matrix_accelerator.timing.total_cycles > 0
+    print("  [OK] timing model does not change results")
+
+
+def main():
+    print("=" * 80)
+    print("TIMING MODEL TEST")
+    print("=" * 80)
+    try:
+        test_pipeline()
+        test_throughput_and_layout()
+        test_misc_dependencies()
+        test_functional_result_unchanged()
+    except AssertionError as e:
+        print(f"\n[FAIL] {e}")
+        return 1
+    print("\n[PASS] Timing model matches hand-computed cycles.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# iss/testing.py
+"""
+Hàm dùng chung cho các test: dựng một MatrixAccelerator độc lập (không cần Simulator /
+assembler), sinh giá trị float ngẫu nhiên có trộn các giá trị đặc biệt, dựng Simulator có
+trạng thái ngẫu nhiên và chụp toàn bộ trạng thái của nó để so sánh.
+"""
+import io
+import math
+import struct
+
+from .components import RegisterFile, CSRFile, MatrixAccelerator, MainMemory
+from .definitions import DEFAULT_GEOMETRY
+from .logger import SimLogger, SILENT
+from .iss import Simulator
+
+# ±0, ±inf, NaN, subnormal fp32 / fp16, biên fp16 (65504, 65520 tràn thành inf), lớn / sát biên fp32
+SPECIAL_FLOATS = [0.0, -0.0, math.inf, -math.inf, math.nan, 1e-8, -3e-6, 6e-8, 65504.0, 65520.0,
+                  70000.0, 1e38, 3.4e38, -1e-40]
+
+
+def make_accelerator(log_level=SILENT, memory_bytes=1024, geometry=DEFAULT_GEOMETRY, **engines):
+    """
+    MatrixAccelerator với CSR / GPR / RAM riêng. Log ghi vào một io.StringIO (ma.log.stream)
+    để so sánh output giữa các engine.
+    engines: matmul_engine / loadstore_engine / elementwise_engine (mặc định 'reference').
+    """
+    log = SimLogger(log_level, stream=io.StringIO())
+    return MatrixAccelerator(CSRFile(log=log, geometry=geometry), RegisterFile(),
+                             MainMemory(memory_bytes, log=log), log=log, geometry=geometry, **engines)
+
+
+def random_float(rng, special_rate=0.1):
+    """Float ngẫu nhiên: giá trị đặc biệt (tỉ lệ special_rate), dải [-10, 10] hoặc
+    độ lớn 2^-30..2^30."""
+    r = rng.random()
+    if r < special_rate:
+        return rng.choice(SPECIAL_FLOATS)
+    if r < 0.5:
+        return rng.uniform(-10, 10)
+    return rng.uniform(-1, 1) * 2.0 ** rng.randint(-30, 30)
+
+
+def randomize_simulator(sim, rng, text_safe=False):
+    """
+    Ghi giá trị ngẫu nhiên vào mọi phần trạng thái của sim: PC, GPR, CSR, hai bank thanh
+    ghi ma trận, acc_dest_bits và một số vùng RAM (kể cả trang cuối). Trả về sim.
+    text_safe: trạng thái phải đi qua được các file text (state_manager): giữ PC và
+    acc_dest_bits, CSR tile trong 1..4, bank float chỉ chứa số hữu hạn trong [-8, 8).
+    """
+    ma = sim.matrix_accelerator
+    if not text_safe:
+        sim.pc = 4 * rng.randrange(1 << 12)
+    for r in range(1, 32):
+        sim.gpr.write(r, rng.getrandbits(32))
+    if text_safe:
+        for name in ("mtilem", "mtilen", "mtilek", "xmsaten"):
+            sim.csr.write(name, rng.randint(1, 4))
+    else:
+        for name in ("mtilem", "mtilen", "mtilek", "xmsaten", "xmsat", "xmfflags"):
+            sim.csr.write(name, rng.randint(0, 15))
+    ma.regs.int_bank[:] = bytes(rng.getrandbits(8) for _ in range(len(ma.regs.int_bank)))
+    if text_safe:
+        count = len(ma.regs.float_bank) // 4
+        ma.regs.float_bank[:] = struct.pack(f"{count}f", *(rng.uniform(-8, 8) for _ in range(count)))
+    else:
+        ma.regs.float_bank[:] = bytes(rng.getrandbits(8) for _ in range(len(ma.regs.float_bank)))
+        ma.acc_dest_bits_float[:] = [rng.choice([16, 32]) for _ in range(4)]
+        ma.acc_dest_bits_int[:] = [rng.choice([8, 16, 32]) for _ in range(4)]
+    for _ in range(40):
+        address = rng.randrange(0, len(sim.memory) - 64)
+        sim.memory.write(address, bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 64))))
+    sim.memory.write(len(sim.memory) - 1, b"\x5A")   # Trang cuối
+    return sim
+
+
+def random_simulator(rng, text_safe=False, **kwargs):
+    """Simulator(log_level="silent", **kwargs) với trạng thái ngẫu nhiên (randomize_simulator)."""
+    return randomize_simulator(Simulator(log_level="silent", **kwargs), rng, text_safe)
+
+
+def state_of(sim):
+    """Toàn bộ trạng thái của sim (PC, GPR, CSR, thanh ghi ma trận, acc_dest_bits, RAM) để so sánh."""
+    ma = sim.matrix_accelerator
+    return (sim.pc, list(sim.gpr.registers), dict(sim.csr.csrs), bytes(ma.regs.int_bank),
+            bytes(ma.regs.float_bank), list(ma.acc_dest_bits_float), list(ma.acc_dest_bits_int),
+            sim.memory.tobytes())
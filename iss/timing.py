@@ -0,0 +1,240 @@
+# iss/timing.py
+"""
+Mô hình thời gian xấp xỉ theo chu kỳ (cycle-approximate) cho MatrixAccelerator.
+
+Simulator vẫn chạy chức năng như cũ; nếu gắn TimingModel thì mỗi lệnh được ước lượng
+số chu kỳ trước khi thực thi (đọc CSR / GPR tại thời điểm đó):
+
+    model = TimingModel(TimingConfig(macs_per_cycle={"fp32": 64}))
+    sim = Simulator(log_level="silent", timing_model=model)
+    sim.load_program(program); sim.run()
+    print(model.total_cycles)
+    print(model.report())
+
+Mô hình:
+- Lệnh được phát (issue) tuần tự, issue_width lệnh mỗi chu kỳ, vào một trong ba đơn vị:
+  load, compute (MAC / element-wise / misc / config), store. Mỗi đơn vị xử lý một lệnh
+  tại một thời điểm (occupancy chu kỳ), kết quả sẵn sàng sau thêm `latency` chu kỳ.
+- Lệnh chờ thanh ghi nguồn (RAW), thanh ghi đích (WAR/WAW) và vùng nhớ (load sau store
+  chồng lấn, store sau load/store chồng lấn). overlap=False: mỗi lệnh chờ lệnh trước xong.
+- Matmul: ceil(M·N·K / MAC mỗi chu kỳ của kiểu dữ liệu) + độ trễ pipeline.
+- Load/store: mỗi đoạn liền mạch trong bộ nhớ (một hàng, hoặc một cột với layout
+  transposed; gộp làm một nếu stride đúng bằng độ dài hàng) tốn
+  ceil(byte / mem_bytes_per_cycle) + mem_burst_overhead; cộng mem_latency mỗi lệnh.
+"""
+import math
+
+from .definitions import ALL_INSTRUCTIONS
+from .logic_loadstore import LOADSTORE_LAYOUTS
+
+LOAD, COMPUTE, STORE = "load", "compute", "store"
+UNITS = (LOAD, COMPUTE, STORE)
+
+# Thanh ghi ma trận (trường đã giải mã) mà lệnh MISC đọc / ghi, theo variant.
+# Mặc định (mmov.mm, slide, broadcast): đọc ms1, ghi md.
+MISC_OPERANDS = {
+    "mzero": ((), ("md",)),
+    "md_rs2_rs1": ((), ("md",)),                # mmov.m.x / mdup.m.x: nguồn là GPR
+    "rd_ms2_rs1": (("ms2",), ()),               # mmov.x.m: đích là GPR rd
+    "md_ms2_ms1": (("ms2", "ms1"), ("md",)),    # mpack*
+}
+
+
+class TimingConfig:
+    """Tham số của mô hình. Mọi tham số có thể ghi đè qua keyword, vd
+    TimingConfig(mem_bytes_per_cycle=32, macs_per_cycle={"int8": 1024})."""
+
+    issue_width = 1                 # Lệnh phát mỗi chu kỳ
+    overlap = True                  # False: không chồng lấn load / compute / store
+    # MAC mỗi chu kỳ theo kiểu nguồn (fp16 gồm cả bf16)
+    macs_per_cycle = {"int8": 256, "fp8": 256, "fp16": 128, "fp32": 32}
+    matmul_latency = 4              # Độ trễ pipeline MAC (chu kỳ)
+    ew_ops_per_cycle = 16           # Phần tử element-wise mỗi chu kỳ
+    ew_latency = 2
+    misc_elements_per_cycle = 16    # mmov / mzero / mdup / slide
+    misc_latency = 1
+    config_cycles = 1               # msettile* / mrelease
+    mem_bytes_per_cycle = 16        # Băng thông load/store
+    mem_latency = 20                # Độ trễ mỗi lệnh truy cập bộ nhớ
+    mem_burst_overhead = 1          # Chi phí mỗi đoạn liền mạch (hàng / cột)
+
+    def __init__(self, **overrides):
+        for name, value in overrides.items():
+            if not hasattr(TimingConfig, name) or name.startswith("_"):
+                raise ValueError(f"Unknown timing parameter: {name!r}")
+            if name == "macs_per_cycle":
+                value = {**TimingConfig.macs_per_cycle, **value}
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in vars(TimingConfig)
+                if not name.startswith("_") and not callable(getattr(TimingConfig, name))}
+
+
+class InstructionTiming:
+    """Kết quả ước lượng cho một lệnh đã thực thi."""
+
+    __slots__ = ("pc", "mnemonic", "unit", "issue", "start", "end", "cycles", "stall")
+
+    def __init__(self, pc, mnemonic, unit, issue, start, end, cycles):
+        self.pc = pc
+        self.mnemonic = mnemonic
+        self.unit = unit
+        self.issue = issue          # Chu kỳ phát lệnh
+        self.start = start          # Chu kỳ đơn vị bắt đầu xử lý
+        self.end = end              # Chu kỳ kết quả sẵn sàng
+        self.cycles = cycles        # Chi phí riêng của lệnh (occupancy + latency)
+        self.stall = start - issue  # Chu kỳ chờ đơn vị / phụ thuộc
+
+    def __repr__(self):
+        return (f"InstructionTiming(pc=0x{self.pc:x}, {self.mnemonic}, {self.unit}, "
+                f"start={self.start}, end={self.end}, cycles={self.cycles}, stall={self.stall})")
+
+
+def _matmul_dtype(info):
+    bits = 8 << info.get("s_size", 0)
+    if info.get("func", 0) == 0b0000:        # mfmacc.*
+        return {8: "fp8", 16: "fp16"}.get(bits, "fp32")
+    return "int8" if bits == 8 else "int16"
+
+
+class TimingModel:
+    """Ước lượng chu kỳ cho chuỗi lệnh (gắn vào MatrixAccelerator.timing)."""
+
+    def __init__(self, config=None, keep_trace=True):
+        """
+        config: TimingConfig (mặc định: tham số mặc định)
+        keep_trace: lưu InstructionTiming của từng lệnh trong self.trace
+        """
+        self.config = config if config is not None else TimingConfig()
+        self.keep_trace = keep_trace
+        self.reset()
+
+    def reset(self):
+        self.trace = []
+        self.by_mnemonic = {}       # mnemonic -> [count, cycles, stall]
+        self.unit_busy = dict.fromkeys(UNITS, 0)
+        self.total_cycles = 0
+        self.instructions = 0
+        self._issue = 0             # Chu kỳ phát của lệnh tiếp theo
+        self._issued_this_cycle = 0
+        self._unit_free = dict.fromkeys(UNITS, 0)
+        self._reg_ready = [0] * 8   # Chu kỳ thanh ghi vật lý được ghi xong
+        self._reg_read = [0] * 8    # Chu kỳ lần đọc cuối của thanh ghi kết thúc
+        self._mem_ops = []          # (lo, hi, end, is_store) của các truy cập gần đây
+        self._last_end = 0
+
+    # --- Chi phí từng nhóm lệnh: (unit, occupancy, latency, đọc, ghi, vùng nhớ) ---
+    def _cost(self, sim, instruction, mnemonic):
+        cfg = self.config
+        info = ALL_INSTRUCTIONS.get(mnemonic) or ALL_INSTRUCTIONS.get(mnemonic + " ") or {}
+        kind = info.get("instr_type")
+        csr = sim.csr
+        md, ms1, ms2 = instruction.md, instruction.ms1, instruction.ms2
+        if kind == "MULTIPLY":
+            macs = csr.read('mtilem') * csr.read('mtilen') * csr.read('mtilek')
+            rate = cfg.macs_per_cycle.get(_matmul_dtype(info), cfg.macs_per_cycle["fp32"])
+            return COMPUTE, max(1, math.ceil(macs / rate)), cfg.matmul_latency, (ms1, ms2, md), (md,), None
+        if kind == "EW":
+            elements = csr.read('mtilem') * csr.read('mtilen')
+            return (COMPUTE, max(1, math.ceil(elements / cfg.ew_ops_per_cycle)), cfg.ew_latency,
+                    (ms1, ms2), (md,), None)
+        if kind == "LOADSTORE":
+            return self._loadstore_cost(sim, instruction, info)
+        if kind == "MISC":
+            elements = sim.matrix_accelerator.rownum * sim.matrix_accelerator.elements_per_row_tr
+            reads, writes = MISC_OPERANDS.get(info.get("variant"), (("ms1",), ("md",)))
+            return (COMPUTE, max(1, math.ceil(elements / cfg.misc_elements_per_cycle)), cfg.misc_latency,
+                    tuple(getattr(instruction, field) for field in reads),
+                    tuple(getattr(instruction, field) for field in writes), None)
+        return COMPUTE, cfg.config_cycles, 0, (), (), None
+
+    def _loadstore_cost(self, sim, instruction, info):
+        cfg = self.config
+        layout = LOADSTORE_LAYOUTS.get(info.get("func"))
+        is_load = info.get("ls", 0) == 0
+        unit = LOAD if is_load else STORE
+        if layout is None or info.get("d_size") == 0b11:
+            return unit, 1, 0, (), (), None         # Lệnh bị từ chối: không truy cập bộ nhớ
+        num_bytes = 1 << info["d_size"]
+        rows = sim.csr.read(layout[2][1])
+        cols = sim.csr.read(layout[3][1])
+        base = sim.gpr.read(instruction.rs1)
+        stride = sim.gpr.read(instruction.rs2)
+        transposed = layout[4]
+        # Đoạn liền mạch: hàng (cols phần tử) hoặc cột (rows phần tử) nếu transposed
+        runs, run_bytes = (cols, rows * num_bytes) if transposed else (rows, cols * num_bytes)
+        if runs > 1 and stride == run_bytes:
+            runs, run_bytes = 1, runs * run_bytes
+        transfer = runs * (math.ceil(run_bytes / cfg.mem_bytes_per_cycle) + cfg.mem_burst_overhead) if run_bytes else 0
+        span = (runs - 1) * stride + run_bytes if runs else 0
+        region = (base, base + span, not is_load)
+        reg = 4 + (instruction.md - 4) % 4 if layout[5] else instruction.md
+        if is_load:
+            return unit, max(1, transfer), cfg.mem_latency, (), (reg,), region
+        return unit, max(1, transfer), cfg.mem_latency, (reg,), (), region
+
+    def account(self, sim, pc, instruction, mnemonic):
+        """Ước lượng một lệnh (gọi trước khi lệnh thực thi). Trả về InstructionTiming."""
+        cfg = self.config
+        unit, occupancy, latency, reads, writes, region = self._cost(sim, instruction, mnemonic)
+
+        # Phát lệnh tuần tự
+        if self._issued_this_cycle >= cfg.issue_width:
+            self._issue += 1
+            self._issued_this_cycle = 0
+        issue = self._issue
+        self._issued_this_cycle += 1
+
+        start = max(issue, self._unit_free[unit])
+        for reg in reads:
+            start = max(start, self._reg_ready[reg])                                  # RAW
+        for reg in writes:
+            start = max(start, self._reg_ready[reg], self._reg_read[reg])             # WAW / WAR
+        if region is not None:
+            lo, hi, is_store = region
+            for other_lo, other_hi, other_end, other_store in self._mem_ops:
+                if (is_store or other_store) and lo < other_hi and other_lo < hi:
+                    start = max(start, other_end)
+        if not cfg.overlap:
+            start = max(start, self._last_end)
+
+        end = start + occupancy + latency
+        self._unit_free[unit] = start + occupancy
+        self.unit_busy[unit] += occupancy
+        for reg in reads:
+            self._reg_read[reg] = max(self._reg_read[reg], start + occupancy)
+        for reg in writes:
+            self._reg_ready[reg] = end
+        if region is not None:
+            self._mem_ops.append((region[0], region[1], end, region[2]))
+            if len(self._mem_ops) > 64:
+                del self._mem_ops[0]
+        self._last_end = max(self._last_end, end)
+        self.total_cycles = max(self.total_cycles, end)
+        self.instructions += 1
+
+        timing = InstructionTiming(pc, mnemonic, unit, issue, start, end, occupancy + latency)
+        stats = self.by_mnemonic.setdefault(mnemonic, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += timing.cycles
+        stats[2] += timing.stall
+        if self.keep_trace:
+            self.trace.append(timing)
+        return timing
+
+    def report(self, trace=False):
+        """Bảng tóm tắt: tổng chu kỳ, mức bận của từng đơn vị, chu kỳ theo mnemonic
+        (trace=True: thêm từng lệnh)."""
+        total = self.total_cycles or 1
+        lines = [f"Total cycles: {self.total_cycles} ({self.instructions} instructions, "
+                 f"IPC {self.instructions / total:.3f})"]
+        lines.append("  " + ", ".join(f"{unit} busy {self.unit_busy[unit] * 100 / total:.1f}%" for unit in UNITS))
+        lines.append(f"{'mnemonic':<16} {'count':>8} {'cycles':>10} {'cyc/instr':>10} {'stall':>10}")
+        for name, (count, cycles, stall) in sorted(self.by_mnemonic.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{name:<16} {count:>8} {cycles:>10} {cycles / count:>10.1f} {stall:>10}")
+        if trace:
+            lines.append(f"{'pc':>8} {'mnemonic':<16} {'unit':<8} {'issue':>7} {'start':>7} {'end':>7} {'cycles':>7}")
+            for t in self.trace:
+                lines.append(f"{t.pc:>8x} {t.mnemonic:<16} {t.unit:<8} {t.issue:>7} {t.start:>7} {t.end:>7} {t.cycles:>7}")
+        return "\n".join(lines)